@@ -3,9 +3,12 @@ Analyzer untuk deteksi sideways, breakout, dan korelasi broker
 """
 import pandas as pd
 import numpy as np
+from collections import deque
 from datetime import datetime, timedelta
 from typing import List, Dict, Tuple, Optional
-from database import get_cursor, execute_query
+from database import get_cursor
+from data_window import fetch_window
+from broker_cube import get_broker_cube
 
 # ============================================================
 # PARAMETER KONFIGURASI
@@ -19,119 +22,123 @@ ACCUMULATION_MIN_DAYS = 3     # Minimal hari net buy berturut untuk akumulasi
 # ============================================================
 # DATA RETRIEVAL
 # ============================================================
-def get_price_data(stock_code: str = 'CDIA', days: int = 180) -> pd.DataFrame:
-    """Ambil data harga dari database"""
-    query = """
-        SELECT date, open_price, high_price, low_price, close_price,
-               volume, value, net_foreign
-        FROM stock_daily
-        WHERE stock_code = %s
-        ORDER BY date
+def get_price_data(stock_code: str = 'CDIA', days: int = None, start_date=None, end_date=None,
+                   columns: List[str] = None, limit: int = None) -> pd.DataFrame:
     """
-    results = execute_query(query, (stock_code,))
-    df = pd.DataFrame(results)
-    if not df.empty:
-        df['date'] = pd.to_datetime(df['date'])
-        # Convert numeric columns
-        numeric_cols = ['open_price', 'high_price', 'low_price', 'close_price', 'volume', 'value', 'net_foreign']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-    return df
+    Ambil data harga (snapshot lokal jika tersedia, fallback ke database).
 
-def get_broker_data(stock_code: str = 'CDIA') -> pd.DataFrame:
-    """Ambil data broker dari database"""
-    query = """
-        SELECT date, broker_code, buy_value, sell_value, net_value,
-               buy_lot, sell_lot, net_lot
-        FROM broker_summary
-        WHERE stock_code = %s
-        ORDER BY date, net_value DESC
+    Jendela di-push down ke sumber data (lihat data_window.fetch_window):
+    days = hari kalender ke belakang dari tanggal terakhir, start_date/end_date
+    inklusif, columns = proyeksi kolom, limit = N baris terakhir.
+    Tanpa argumen jendela: seluruh histori.
     """
-    results = execute_query(query, (stock_code,))
-    df = pd.DataFrame(results)
-    if not df.empty:
-        df['date'] = pd.to_datetime(df['date'])
-        # Convert numeric columns
-        numeric_cols = ['buy_value', 'sell_value', 'net_value', 'buy_lot', 'sell_lot', 'net_lot']
-        for col in numeric_cols:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-    return df
+    return fetch_window(stock_code, 'stock_daily', columns=columns, days=days,
+                        start_date=start_date, end_date=end_date, limit=limit)
+
+def get_broker_data(stock_code: str = 'CDIA', days: int = None, start_date=None, end_date=None,
+                    columns: List[str] = None, limit: int = None) -> pd.DataFrame:
+    """
+    Ambil data broker (snapshot lokal jika tersedia, fallback ke database).
+    Argumen jendela sama dengan get_price_data (days dihitung dari tanggal broker terakhir).
+    """
+    return fetch_window(stock_code, 'broker_summary', columns=columns, days=days,
+                        start_date=start_date, end_date=end_date, limit=limit)
 
 # ============================================================
 # SIDEWAYS & BREAKOUT DETECTION
 # ============================================================
+def _sideways_zone(sideways_window: pd.DataFrame, status: str) -> Dict:
+    """Bangun dict zona sideways dari slice window"""
+    return {
+        'start_date': sideways_window['date'].iloc[0],
+        'end_date': sideways_window['date'].iloc[-1],
+        'support': sideways_window['low_price'].min(),
+        'resistance': sideways_window['high_price'].max(),
+        'range_percent': ((sideways_window['high_price'].max() -
+                          sideways_window['low_price'].min()) /
+                          sideways_window['low_price'].min()) * 100,
+        'duration_days': len(sideways_window),
+        'status': status
+    }
+
 def detect_sideways_zones(price_df: pd.DataFrame) -> List[Dict]:
     """
     Deteksi zona sideways dalam data harga
     Kriteria: range < SIDEWAYS_RANGE_PERCENT% selama minimal SIDEWAYS_MIN_DAYS hari
+
+    Single pass O(n): window [start, end) hanya bergerak maju, high/low window
+    dijaga dengan monotonic deque (running max/min) tanpa slicing per hari.
     """
     if price_df.empty or len(price_df) < SIDEWAYS_MIN_DAYS:
         return []
 
+    n = len(price_df)
+    # NaN diabaikan seperti .max()/.min() pandas
+    highs = np.nan_to_num(price_df['high_price'].to_numpy(dtype='float64'), nan=-np.inf).tolist()
+    lows = np.nan_to_num(price_df['low_price'].to_numpy(dtype='float64'), nan=np.inf).tolist()
+
+    max_q = deque()  # index, high menurun
+    min_q = deque()  # index, low menaik
     zones = []
     i = 0
-
-    while i < len(price_df) - SIDEWAYS_MIN_DAYS + 1:
-        # Cek window dari posisi i
-        for window_size in range(SIDEWAYS_MIN_DAYS, len(price_df) - i + 1):
-            window = price_df.iloc[i:i + window_size]
-            high = window['high_price'].max()
-            low = window['low_price'].min()
-            range_pct = ((high - low) / low) * 100 if low > 0 else 0
-
-            # Jika range masih dalam batas sideways, extend window
-            if range_pct <= SIDEWAYS_RANGE_PERCENT:
+    end = 0  # index berikutnya yang masuk window
+
+    while i < n - SIDEWAYS_MIN_DAYS + 1:
+        while max_q and max_q[0] < i:
+            max_q.popleft()
+        while min_q and min_q[0] < i:
+            min_q.popleft()
+
+        # Extend window dari posisi i sampai range melewati batas sideways
+        window_size = None
+        while end < n:
+            while max_q and highs[max_q[-1]] <= highs[end]:
+                max_q.pop()
+            max_q.append(end)
+            while min_q and lows[min_q[-1]] >= lows[end]:
+                min_q.pop()
+            min_q.append(end)
+            end += 1
+
+            if end - i < SIDEWAYS_MIN_DAYS:
                 continue
-            else:
-                # Window sebelumnya adalah zona sideways
-                if window_size > SIDEWAYS_MIN_DAYS:
-                    sideways_window = price_df.iloc[i:i + window_size - 1]
-                    zone = {
-                        'start_date': sideways_window['date'].iloc[0],
-                        'end_date': sideways_window['date'].iloc[-1],
-                        'support': sideways_window['low_price'].min(),
-                        'resistance': sideways_window['high_price'].max(),
-                        'range_percent': ((sideways_window['high_price'].max() -
-                                          sideways_window['low_price'].min()) /
-                                          sideways_window['low_price'].min()) * 100,
-                        'duration_days': len(sideways_window),
-                        'status': 'completed'
-                    }
-
-                    # Cek breakout setelah zona sideways
-                    if i + window_size < len(price_df):
-                        next_day = price_df.iloc[i + window_size - 1]
-                        if next_day['close_price'] > zone['resistance'] * (1 + BREAKOUT_BUFFER_PERCENT/100):
-                            zone['status'] = 'breakout_up'
-                            zone['breakout_date'] = next_day['date']
-                            zone['breakout_price'] = next_day['close_price']
-                        elif next_day['close_price'] < zone['support'] * (1 - BREAKOUT_BUFFER_PERCENT/100):
-                            zone['status'] = 'breakout_down'
-                            zone['breakout_date'] = next_day['date']
-                            zone['breakout_price'] = next_day['close_price']
-
-                    zones.append(zone)
-                    i = i + window_size - 1
+            high = highs[max_q[0]]
+            low = lows[min_q[0]]
+            if high == -np.inf:
+                high = np.nan
+            if low == np.inf:
+                low = np.nan
+            range_pct = ((high - low) / low) * 100 if low > 0 else 0
+            if range_pct > SIDEWAYS_RANGE_PERCENT or np.isnan(range_pct):
+                window_size = end - i
                 break
-        else:
+
+        if window_size is None:
             # Seluruh sisa data adalah sideways
             sideways_window = price_df.iloc[i:]
             if len(sideways_window) >= SIDEWAYS_MIN_DAYS:
-                zone = {
-                    'start_date': sideways_window['date'].iloc[0],
-                    'end_date': sideways_window['date'].iloc[-1],
-                    'support': sideways_window['low_price'].min(),
-                    'resistance': sideways_window['high_price'].max(),
-                    'range_percent': ((sideways_window['high_price'].max() -
-                                      sideways_window['low_price'].min()) /
-                                      sideways_window['low_price'].min()) * 100,
-                    'duration_days': len(sideways_window),
-                    'status': 'ongoing'
-                }
-                zones.append(zone)
+                zones.append(_sideways_zone(sideways_window, 'ongoing'))
             break
 
+        if window_size > SIDEWAYS_MIN_DAYS:
+            # Window sebelumnya adalah zona sideways
+            zone = _sideways_zone(price_df.iloc[i:i + window_size - 1], 'completed')
+
+            # Cek breakout setelah zona sideways
+            if i + window_size < n:
+                next_day = price_df.iloc[i + window_size - 1]
+                if next_day['close_price'] > zone['resistance'] * (1 + BREAKOUT_BUFFER_PERCENT/100):
+                    zone['status'] = 'breakout_up'
+                    zone['breakout_date'] = next_day['date']
+                    zone['breakout_price'] = next_day['close_price']
+                elif next_day['close_price'] < zone['support'] * (1 - BREAKOUT_BUFFER_PERCENT/100):
+                    zone['status'] = 'breakout_down'
+                    zone['breakout_date'] = next_day['date']
+                    zone['breakout_price'] = next_day['close_price']
+
+            zones.append(zone)
+            i = i + window_size - 1
+
         i += 1
 
     return zones
@@ -305,10 +312,10 @@ def calculate_optimal_lookback_days(stock_code: str = 'CDIA') -> Dict:
     Returns:
         Dict dengan optimal_days, stats, dan detail analisis
     """
-    price_df = get_price_data(stock_code)
-    broker_df = get_broker_data(stock_code)
+    price_df = get_price_data(stock_code, columns=['close_price'])
+    cube = get_broker_cube(stock_code)
 
-    if price_df.empty or broker_df.empty:
+    if price_df.empty or cube.latest_date is None:
         return {
             'optimal_days': 10,  # Default fallback
             'method': 'default',
@@ -357,24 +364,21 @@ def calculate_optimal_lookback_days(stock_code: str = 'CDIA') -> Dict:
             lookback_start = uptrend_start - timedelta(days=lookback + 5)
             lookback_end = uptrend_start - timedelta(days=lookback - 5)
 
-            pre_brokers = broker_df[
-                (broker_df['date'] >= lookback_start) &
-                (broker_df['date'] < lookback_end)
-            ]
-
-            if pre_brokers.empty:
+            lo, hi = cube.window(lookback_start, lookback_end, end_inclusive=False)
+            if hi <= lo:
                 continue
 
-            # Hitung total net buy dalam periode ini
-            total_net = pre_brokers.groupby('broker_code')['net_value'].sum()
-            accumulating_brokers = len(total_net[total_net > 0])
+            # Total net buy per broker dalam periode ini (selisih prefix sum, satu operasi vektor)
+            total_net = cube.totals('net_value', lo, hi)
+            accumulating = total_net > 0
+            accumulating_brokers = int(accumulating.sum())
 
             if accumulating_brokers >= 5:  # Minimal 5 broker akumulasi
                 accumulation_starts.append({
                     'uptrend_date': uptrend_start,
                     'lookback_days': lookback,
                     'accumulating_brokers': accumulating_brokers,
-                    'total_net': total_net[total_net > 0].sum()
+                    'total_net': float(total_net[accumulating].sum())
                 })
 
     if not accumulation_starts:
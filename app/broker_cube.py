@@ -0,0 +1,163 @@
+"""
+Broker Position Cube - prefix sum broker x tanggal bursa
+
+Banyak analisis menjumlahkan net/buy/sell broker atas jendela tanggal:
+posisi broker, avg buy (VWAP), flow 1D/1W/2W/3W/1M, optimal lookback
+(16 jendela x setiap uptrend). Sebelumnya tiap jendela = boolean mask +
+groupby atas seluruh broker_summary.
+
+BrokerCube menyimpan cumulative sum per broker sepanjang tanggal bursa
+(kolom 0 = nol), sehingga total satu broker untuk jendela [lo, hi) adalah
+cum[b, hi] - cum[b, lo] (O(1)) dan total semua broker satu operasi vektor.
+Cube dibangun sekali per data version (cached_by_data_version).
+"""
+from datetime import date, timedelta
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from data_window import fetch_window
+from data_version import cached_by_data_version
+
+CUBE_METRICS = ['buy_value', 'sell_value', 'net_value', 'buy_lot', 'sell_lot', 'net_lot']
+
+
+class BrokerCube:
+    """
+    Prefix-sum cube untuk satu saham.
+
+    Attributes:
+        stock_code: Kode saham
+        brokers: Array kode broker (urut)
+        dates: Array tanggal bursa (datetime64[D], urut naik)
+        cum: metric -> array (n_brokers, n_dates + 1) cumulative sum; 'active' = jumlah hari aktif
+        active: Matrix bool (n_brokers, n_dates) - broker punya baris di tanggal itu
+    """
+    def __init__(self, stock_code: str, broker_df: pd.DataFrame):
+        self.stock_code = stock_code
+        if broker_df.empty:
+            self.brokers = np.array([], dtype='U8')
+            self.dates = np.array([], dtype='datetime64[D]')
+        else:
+            self.brokers, b_idx = np.unique(broker_df['broker_code'].to_numpy(dtype=str), return_inverse=True)
+            self.dates, d_idx = np.unique(broker_df['date'].to_numpy(dtype='datetime64[D]'), return_inverse=True)
+        shape = (len(self.brokers), len(self.dates))
+
+        self.active = np.zeros(shape, dtype=bool)
+        self.cum = {}
+        for metric in CUBE_METRICS:
+            daily = np.zeros(shape, dtype='float64')
+            if shape[0] and shape[1]:
+                # (date, broker) unik di broker_summary; add.at tetap aman jika ada duplikat
+                np.add.at(daily, (b_idx, d_idx), broker_df[metric].to_numpy(dtype='float64'))
+            self.cum[metric] = _prefix(daily)
+        if shape[0] and shape[1]:
+            self.active[b_idx, d_idx] = True
+        self.cum['active'] = _prefix(self.active.astype('int64'))
+        self._broker_index = {code: i for i, code in enumerate(self.brokers)}
+
+    @property
+    def latest_date(self) -> Optional[pd.Timestamp]:
+        return pd.Timestamp(self.dates[-1]) if len(self.dates) else None
+
+    # ------------------------------------------------------------
+    # Jendela
+    # ------------------------------------------------------------
+
+    def window(self, start=None, end=None, start_inclusive: bool = True,
+               end_inclusive: bool = True) -> Tuple[int, int]:
+        """Indeks [lo, hi) kolom tanggal untuk jendela start..end"""
+        lo, hi = 0, len(self.dates)
+        if start is not None:
+            lo = int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start).date(), 'D'),
+                                     side='left' if start_inclusive else 'right'))
+        if end is not None:
+            hi = int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end).date(), 'D'),
+                                     side='right' if end_inclusive else 'left'))
+        return lo, max(lo, hi)
+
+    def since_days(self, days: int, today: date = None) -> Tuple[int, int]:
+        """Jendela date >= CURRENT_DATE - days (sama dengan filter INTERVAL di SQL)"""
+        today = today or date.today()
+        return self.window(start=today - timedelta(days=days))
+
+    def after_latest_minus(self, days: int) -> Tuple[int, int]:
+        """Jendela date > tanggal broker terakhir - days (periode 1D/1W/.../1M)"""
+        if self.latest_date is None:
+            return 0, 0
+        return self.window(start=self.latest_date - timedelta(days=days), start_inclusive=False)
+
+    # ------------------------------------------------------------
+    # Query
+    # ------------------------------------------------------------
+
+    def totals(self, metric: str, lo: int, hi: int) -> np.ndarray:
+        """Total metric semua broker dalam jendela (vektor n_brokers)"""
+        cum = self.cum[metric]
+        return cum[:, hi] - cum[:, lo]
+
+    def broker_total(self, broker_code: str, metric: str, lo: int, hi: int) -> float:
+        """Total metric satu broker dalam jendela (O(1))"""
+        i = self._broker_index.get(broker_code)
+        if i is None:
+            return 0.0
+        cum = self.cum[metric]
+        return float(cum[i, hi] - cum[i, lo])
+
+    def avg_buy(self, broker_code: str, lo: int, hi: int) -> float:
+        """Avg buy (VWAP) per lembar satu broker: buy_value / buy_lot / 100"""
+        lots = self.broker_total(broker_code, 'buy_lot', lo, hi)
+        return self.broker_total(broker_code, 'buy_value', lo, hi) / lots / 100 if lots > 0 else 0.0
+
+    def window_frame(self, lo: int, hi: int, brokers: Sequence[str] = None,
+                     with_dates: bool = False) -> pd.DataFrame:
+        """
+        Agregat per broker untuk jendela (hanya broker yang aktif di jendela,
+        sama dengan GROUP BY broker_code atas baris jendela).
+
+        Kolom: broker_code, active_days, buy/sell/net value & lot,
+        avg_buy_price, avg_sell_price (+ first_date/last_date jika with_dates)
+        """
+        data = {'broker_code': self.brokers}
+        data['active_days'] = self.totals('active', lo, hi)
+        for metric in CUBE_METRICS:
+            data[metric] = self.totals(metric, lo, hi)
+        df = pd.DataFrame(data)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            df['avg_buy_price'] = np.where(df['buy_lot'] > 0, df['buy_value'] / df['buy_lot'] / 100, 0.0)
+            df['avg_sell_price'] = np.where(df['sell_lot'] > 0, df['sell_value'] / df['sell_lot'] / 100, 0.0)
+
+        if with_dates:
+            window_active = self.active[:, lo:hi]
+            has_any = window_active.any(axis=1)
+            first = lo + window_active.argmax(axis=1)
+            last = hi - 1 - window_active[:, ::-1].argmax(axis=1)
+            if hi > lo:
+                df['first_date'] = np.where(has_any, self.dates[np.minimum(first, hi - 1)], np.datetime64('NaT'))
+                df['last_date'] = np.where(has_any, self.dates[np.maximum(last, lo)], np.datetime64('NaT'))
+            else:
+                df['first_date'] = pd.NaT
+                df['last_date'] = pd.NaT
+
+        mask = df['active_days'] > 0
+        if brokers is not None:
+            mask &= df['broker_code'].isin(list(brokers))
+        return df[mask].reset_index(drop=True)
+
+    def __repr__(self):
+        return f"BrokerCube({self.stock_code}, brokers={len(self.brokers)}, dates={len(self.dates)})"
+
+
+def _prefix(daily: np.ndarray) -> np.ndarray:
+    """Cumulative sum sepanjang tanggal dengan kolom nol di depan"""
+    cum = np.zeros((daily.shape[0], daily.shape[1] + 1), dtype=daily.dtype)
+    np.cumsum(daily, axis=1, out=cum[:, 1:])
+    return cum
+
+
+@cached_by_data_version
+def get_broker_cube(stock_code: str) -> BrokerCube:
+    """Cube broker saham (dibangun sekali per data version)"""
+    broker_df = fetch_window(stock_code, 'broker_summary',
+                             columns=['broker_code'] + CUBE_METRICS)
+    return BrokerCube(stock_code, broker_df)
@@ -0,0 +1,228 @@
+"""
+Materialized Daily Broker Flow (tabel broker_flow_daily)
+
+Kartu-kartu flow (timeline persistence, recent broker flow, foreign flow,
+accumulation score) sebelumnya melakukan GROUP BY date atas broker_summary
+setiap request. broker_flow_daily menyimpan agregat per (saham, tanggal)
+sehingga kartu tersebut cukup membaca range indeks (stock_code, date).
+
+Isi per baris:
+- total net value / lot, gross buy/sell value & lot
+- sisi positif / negatif net (net_buy_* / net_sell_*) dan jumlah broker buyer/seller
+- net split FOREIGN / BUMN / LOCAL sesuai klasifikasi broker_config
+- jumlah broker aktif
+
+Tabel di-refresh oleh pipeline import (parser.py, upload_to_web.py) mulai dari
+tanggal pertama yang berubah. Pembaca juga memeriksa sekali per watermark apakah
+tanggal terakhir masih sama dengan broker_summary (jaring pengaman untuk import
+lewat script lama) dan me-rebuild jika tidak.
+"""
+import threading
+from datetime import date
+from typing import Dict, List, Optional, Set
+
+from database import execute_query, get_cursor, clear_stock_cache
+from data_version import get_data_version
+from broker_config import FOREIGN_BROKER_CODES, BUMN_BROKER_CODES
+
+FLOW_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS broker_flow_daily (
+        stock_code VARCHAR(10) NOT NULL,
+        date DATE NOT NULL,
+        net_value NUMERIC(20,2) DEFAULT 0,
+        net_lot BIGINT DEFAULT 0,
+        buy_value NUMERIC(20,2) DEFAULT 0,
+        sell_value NUMERIC(20,2) DEFAULT 0,
+        buy_lot BIGINT DEFAULT 0,
+        sell_lot BIGINT DEFAULT 0,
+        net_buy_value NUMERIC(20,2) DEFAULT 0,
+        net_sell_value NUMERIC(20,2) DEFAULT 0,
+        net_buy_lot BIGINT DEFAULT 0,
+        net_sell_lot BIGINT DEFAULT 0,
+        buyer_count INTEGER DEFAULT 0,
+        seller_count INTEGER DEFAULT 0,
+        active_brokers INTEGER DEFAULT 0,
+        foreign_net_value NUMERIC(20,2) DEFAULT 0,
+        foreign_net_lot BIGINT DEFAULT 0,
+        foreign_buy_value NUMERIC(20,2) DEFAULT 0,
+        foreign_sell_value NUMERIC(20,2) DEFAULT 0,
+        bumn_net_value NUMERIC(20,2) DEFAULT 0,
+        bumn_net_lot BIGINT DEFAULT 0,
+        local_net_value NUMERIC(20,2) DEFAULT 0,
+        local_net_lot BIGINT DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (stock_code, date)
+    )
+"""
+
+FLOW_COLUMNS = [
+    'net_value', 'net_lot', 'buy_value', 'sell_value', 'buy_lot', 'sell_lot',
+    'net_buy_value', 'net_sell_value', 'net_buy_lot', 'net_sell_lot',
+    'buyer_count', 'seller_count', 'active_brokers',
+    'foreign_net_value', 'foreign_net_lot', 'foreign_buy_value', 'foreign_sell_value',
+    'bumn_net_value', 'bumn_net_lot', 'local_net_value', 'local_net_lot',
+]
+
+# Agregasi satu tanggal dari broker_summary (urutan = FLOW_COLUMNS).
+# %(foreign)s / %(bumn)s = array kode broker dari broker_config.
+_REFRESH_SELECT = """
+    SELECT
+        stock_code, date,
+        SUM(net_value), SUM(net_lot),
+        SUM(buy_value), SUM(sell_value), SUM(buy_lot), SUM(sell_lot),
+        SUM(CASE WHEN net_value > 0 THEN net_value ELSE 0 END),
+        SUM(CASE WHEN net_value < 0 THEN -net_value ELSE 0 END),
+        SUM(CASE WHEN net_lot > 0 THEN net_lot ELSE 0 END),
+        SUM(CASE WHEN net_lot < 0 THEN -net_lot ELSE 0 END),
+        COUNT(*) FILTER (WHERE net_lot > 0),
+        COUNT(*) FILTER (WHERE net_lot < 0),
+        COUNT(*),
+        COALESCE(SUM(net_value) FILTER (WHERE broker_code = ANY(%(foreign)s)), 0),
+        COALESCE(SUM(net_lot) FILTER (WHERE broker_code = ANY(%(foreign)s)), 0),
+        COALESCE(SUM(buy_value) FILTER (WHERE broker_code = ANY(%(foreign)s)), 0),
+        COALESCE(SUM(sell_value) FILTER (WHERE broker_code = ANY(%(foreign)s)), 0),
+        COALESCE(SUM(net_value) FILTER (WHERE broker_code = ANY(%(bumn)s)), 0),
+        COALESCE(SUM(net_lot) FILTER (WHERE broker_code = ANY(%(bumn)s)), 0),
+        COALESCE(SUM(net_value) FILTER (WHERE NOT broker_code = ANY(%(foreign)s)
+                                           AND NOT broker_code = ANY(%(bumn)s)), 0),
+        COALESCE(SUM(net_lot) FILTER (WHERE NOT broker_code = ANY(%(foreign)s)
+                                         AND NOT broker_code = ANY(%(bumn)s)), 0)
+    FROM broker_summary
+    WHERE stock_code = %(stock_code)s AND date >= %(since)s
+    GROUP BY stock_code, date
+"""
+
+# Database yang tabelnya sudah dicek (DSN koneksi; None = pool database.py).
+# Satu proses bisa menulis ke beberapa database (upload_to_web.py: lokal + Railway).
+_ready_databases: Set[Optional[str]] = set()
+_checked_versions: Dict[str, int] = {}
+_check_lock = threading.Lock()
+
+
+def ensure_broker_flow_table(cursor=None) -> bool:
+    """Create broker_flow_daily table if not exists (sekali per database per proses)"""
+    key = cursor.connection.dsn if cursor is not None else None
+    if key in _ready_databases:
+        return True
+    try:
+        if cursor is not None:
+            cursor.execute(FLOW_TABLE_DDL)
+        else:
+            execute_query(FLOW_TABLE_DDL, fetch=False, use_cache=False)
+        _ready_databases.add(key)
+        return True
+    except Exception as e:
+        print(f"Error creating broker_flow_daily table: {e}")
+        return False
+
+
+def _refresh(cursor, stock_code: str, since: Optional[date]) -> int:
+    since = since or date.min
+    cursor.execute("DELETE FROM broker_flow_daily WHERE stock_code = %s AND date >= %s",
+                   (stock_code, since))
+    cursor.execute(f"""
+        INSERT INTO broker_flow_daily (stock_code, date, {', '.join(FLOW_COLUMNS)})
+        {_REFRESH_SELECT}
+    """, {
+        'stock_code': stock_code,
+        'since': since,
+        'foreign': sorted(FOREIGN_BROKER_CODES),
+        'bumn': sorted(BUMN_BROKER_CODES),
+    })
+    return cursor.rowcount
+
+
+def refresh_broker_flow(stock_code: str, since: date = None, cursor=None) -> int:
+    """
+    Rebuild agregat broker_flow_daily untuk satu saham mulai tanggal since
+    (None = seluruh histori). Delete + insert dalam satu transaksi.
+
+    Args:
+        cursor: Cursor psycopg2 opsional - dipakai agar refresh ikut transaksi import
+                (upload_to_web.py). Default: cursor baru dari pool.
+
+    Returns:
+        Jumlah tanggal yang ditulis (-1 jika gagal)
+    """
+    if cursor is not None:
+        # Savepoint: refresh yang gagal tidak boleh membatalkan import di transaksi yang sama
+        cursor.execute("SAVEPOINT broker_flow_refresh")
+        try:
+            ensure_broker_flow_table(cursor)
+            count = _refresh(cursor, stock_code, since)
+            cursor.execute("RELEASE SAVEPOINT broker_flow_refresh")
+            return count
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT broker_flow_refresh")
+            print(f"Broker flow refresh failed for {stock_code}: {e}")
+            return -1
+    try:
+        ensure_broker_flow_table()
+        with get_cursor() as cur:
+            count = _refresh(cur, stock_code, since)
+        # Tulis lewat cursor langsung - query cache tabel ini harus dibuang manual
+        clear_stock_cache(stock_code, tables=['broker_flow_daily'])
+        return count
+    except Exception as e:
+        print(f"Broker flow refresh failed for {stock_code}: {e}")
+        return -1
+
+
+def _ensure_fresh(stock_code: str):
+    """
+    Sekali per watermark: pastikan broker_flow_daily sinkron dengan broker_summary
+    (tanggal terakhir & jumlah tanggal sama), rebuild jika tidak.
+    """
+    version = get_data_version(stock_code)
+    with _check_lock:
+        if _checked_versions.get(stock_code) == version:
+            return
+    if not ensure_broker_flow_table():
+        return
+    rows = execute_query("""
+        SELECT
+            (SELECT MAX(date) FROM broker_summary WHERE stock_code = %s) AS source_last,
+            (SELECT COUNT(DISTINCT date) FROM broker_summary WHERE stock_code = %s) AS source_days,
+            (SELECT MAX(date) FROM broker_flow_daily WHERE stock_code = %s) AS flow_last,
+            (SELECT COUNT(*) FROM broker_flow_daily WHERE stock_code = %s) AS flow_days
+    """, (stock_code, stock_code, stock_code, stock_code), use_cache=False)
+    row = rows[0] if rows else {}
+    if row.get('source_last') != row.get('flow_last') or row.get('source_days') != row.get('flow_days'):
+        refresh_broker_flow(stock_code)
+    with _check_lock:
+        _checked_versions[stock_code] = version
+
+
+def get_broker_flow_daily(stock_code: str, days: int = None, limit: int = None,
+                          start_date: date = None, columns: List[str] = None) -> List[Dict]:
+    """
+    Baca agregat flow harian (urut tanggal naik).
+
+    Args:
+        days: Tanggal >= CURRENT_DATE - days (sama dengan filter INTERVAL di query lama)
+        limit: Hanya N tanggal terakhir
+        start_date: Tanggal awal inklusif
+        columns: Subset FLOW_COLUMNS (default semua)
+    """
+    try:
+        _ensure_fresh(stock_code)
+    except Exception as e:
+        print(f"Broker flow freshness check failed for {stock_code}: {e}")
+
+    cols = FLOW_COLUMNS if columns is None else [c for c in FLOW_COLUMNS if c in columns]
+    where = ["stock_code = %s"]
+    params = [stock_code]
+    if days is not None:
+        where.append("date >= CURRENT_DATE - %s")
+        params.append(int(days))
+    if start_date is not None:
+        where.append("date >= %s")
+        params.append(start_date)
+
+    select = f"SELECT date, {', '.join(cols)} FROM broker_flow_daily WHERE {' AND '.join(where)}"
+    if limit is not None:
+        query = f"SELECT * FROM ({select} ORDER BY date DESC LIMIT %s) AS f ORDER BY date"
+        params.append(int(limit))
+    else:
+        query = f"{select} ORDER BY date"
+    return execute_query(query, tuple(params))
@@ -0,0 +1,223 @@
+"""
+Parser Broker Summary dari Sheet Excel (kolom A-H)
+
+Layout sheet:
+- Baris tanggal separator: kolom A berisi datetime atau teks "30 des" (kolom B kosong)
+- Baris header: "buy" / "buy_val"
+- Baris data: kolom A-D = broker buy (kode, value, lot, avg),
+              kolom E-H = broker sell (kode, value, lot, avg)
+
+Data buy & sell digabung per (tanggal, broker) dengan dict accumulator,
+sehingga parsing linear terhadap jumlah baris (sebelumnya setiap baris sell
+mencari pasangan buy dengan scan seluruh list).
+
+Dua path dengan hasil sama:
+- parse_broker_rows(): loop per baris
+- parse_broker_rows_vectorized(): klasifikasi baris (separator / header / buy / sell)
+  dengan operasi string pandas, lalu accumulator hanya untuk baris data
+"""
+import re
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+MONTH_MAP = {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'mei': 5, 'jun': 6,
+             'jul': 7, 'agu': 8, 'sep': 9, 'okt': 10, 'nov': 11, 'des': 12}
+MONTH_DATE_RE = re.compile(r'(\d{1,2})\s*(jan|feb|mar|apr|mei|jun|jul|agu|sep|okt|nov|des)', re.IGNORECASE)
+ISO_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+BUY_SKIP = ('buy', '-', '')
+SELL_SKIP = ('SL', 'SELL', '-', '')
+
+
+class BrokerSummaryAccumulator:
+    """
+    Kumpulan baris broker summary, digabung per (tanggal, broker).
+    Sell dicatat ke entry PERTAMA untuk (tanggal, broker) yang sama; jika belum ada,
+    dibuat entry sell-only. Urutan entry = urutan kemunculan di sheet.
+    """
+
+    def __init__(self):
+        self.rows: List[Dict] = []
+        self._first: Dict[tuple, Dict] = {}
+
+    def add_buy(self, day, broker_code: str, value: float, lot: float, avg: float):
+        item = {
+            'date': day,
+            'broker_code': broker_code,
+            'buy_value': value,
+            'buy_lot': int(lot),
+            'buy_avg': avg,
+            'sell_value': 0,
+            'sell_lot': 0,
+            'sell_avg': 0
+        }
+        self.rows.append(item)
+        self._first.setdefault((day, broker_code), item)
+
+    def add_sell(self, day, broker_code: str, value: float, lot: float, avg: float):
+        item = self._first.get((day, broker_code))
+        if item is not None:
+            item['sell_value'] = value
+            item['sell_lot'] = int(lot)
+            item['sell_avg'] = avg
+            return
+
+        item = {
+            'date': day,
+            'broker_code': broker_code,
+            'buy_value': 0,
+            'buy_lot': 0,
+            'buy_avg': 0,
+            'sell_value': value,
+            'sell_lot': int(lot),
+            'sell_avg': avg
+        }
+        self.rows.append(item)
+        self._first[(day, broker_code)] = item
+
+
+def _month_date(match, year_for_month: Callable[[int], int]):
+    day = int(match.group(1))
+    month = MONTH_MAP.get(match.group(2).lower(), 12)
+    return datetime(year_for_month(month), month, day).date()
+
+
+def _valid_code(code: str, max_code_len: Optional[int]) -> bool:
+    return max_code_len is None or len(code) <= max_code_len
+
+
+def parse_broker_rows(df: pd.DataFrame, parse_value: Callable, parse_float: Callable,
+                      year_for_month: Callable[[int], int],
+                      header_values: Sequence[str] = ('buy', 'buy_val'),
+                      iso_separator: bool = True,
+                      max_code_len: Optional[int] = None) -> List[Dict]:
+    """
+    Parse broker summary per baris (kolom 0-7 df dari pd.read_excel header=None).
+
+    Args:
+        parse_value: parser value/lot (mis. parse_value_string, suffix B/M/K)
+        parse_float: parser avg (mis. safe_float)
+        year_for_month: tahun untuk tanggal separator "30 des" (bulan -> tahun)
+        header_values: isi kolom A (lowercase) yang dianggap header dan di-skip
+        iso_separator: teks 'YYYY-MM-DD' di kolom A juga dianggap separator
+        max_code_len: panjang maksimal kode broker (None = tanpa batas)
+
+    Returns: list dict broker (date, broker_code, buy_*, sell_*)
+    """
+    width = len(df.columns)
+    acc = BrokerSummaryAccumulator()
+    current_date = None
+
+    for row in df.itertuples(index=False, name=None):
+        col0 = row[0]
+        col1 = row[1] if width > 1 else None
+        col4 = row[4] if width > 4 else None
+
+        if pd.notna(col0):
+            if isinstance(col0, datetime):
+                current_date = col0.date()
+                continue
+
+            col0_str = str(col0).strip().lower()
+            if col0_str in header_values:
+                continue
+
+            match = MONTH_DATE_RE.search(col0_str)
+            is_date_row = match is not None or (iso_separator and ISO_DATE_RE.search(col0_str) is not None)
+            if is_date_row and pd.isna(col1):
+                # Baris tanggal separator
+                if match:
+                    current_date = _month_date(match, year_for_month)
+                continue
+
+            # Baris data broker buy
+            if current_date and col0_str not in BUY_SKIP:
+                buy_broker = col0_str.upper()
+                if buy_broker != '-' and _valid_code(buy_broker, max_code_len):
+                    acc.add_buy(current_date, buy_broker,
+                                parse_value(col1) if width > 1 else 0,
+                                parse_value(row[2]) if width > 2 else 0,
+                                parse_float(row[3]) if width > 3 else 0)
+
+        # Sell side (kolom 4-7)
+        if current_date and pd.notna(col4):
+            sell_broker = str(col4).strip().upper()
+            if sell_broker not in SELL_SKIP and _valid_code(sell_broker, max_code_len):
+                acc.add_sell(current_date, sell_broker,
+                             parse_value(row[5]) if width > 5 else 0,
+                             parse_value(row[6]) if width > 6 else 0,
+                             parse_float(row[7]) if width > 7 else 0)
+
+    return acc.rows
+
+
+def parse_broker_rows_vectorized(df: pd.DataFrame, parse_value: Callable, parse_float: Callable,
+                                 year_for_month: Callable[[int], int],
+                                 header_values: Sequence[str] = ('buy', 'buy_val'),
+                                 iso_separator: bool = True,
+                                 max_code_len: Optional[int] = None) -> List[Dict]:
+    """
+    Sama dengan parse_broker_rows, tetapi klasifikasi baris (datetime / header /
+    separator / buy / sell) dan tanggal berjalan dihitung per kolom dengan pandas.
+    """
+    df = df.reset_index(drop=True)
+    width = len(df.columns)
+    missing = pd.Series([None] * len(df), dtype=object)
+
+    def column(k):
+        return df.iloc[:, k].astype(object) if width > k else missing
+
+    col0, col1, col4 = column(0), column(1), column(4)
+    col0_notna = col0.notna()
+    col0_str = col0.map(lambda v: str(v).strip().lower())
+
+    # Baris yang di-skip seluruhnya (continue): datetime, header, separator tanggal
+    is_datetime = col0_notna & col0.map(lambda v: isinstance(v, datetime))
+    is_header = col0_notna & ~is_datetime & col0_str.isin(list(header_values))
+    candidate = col0_notna & ~is_datetime & ~is_header
+    month_parts = col0_str.str.extract(MONTH_DATE_RE)
+    has_date = month_parts[0].notna()
+    if iso_separator:
+        has_date |= col0_str.str.contains(ISO_DATE_RE)
+    is_separator = candidate & has_date & col1.isna()
+
+    # Tanggal berjalan = tanggal separator terakhir sebelum baris (forward fill)
+    marks = pd.Series([None] * len(df), dtype=object)
+    marks[is_datetime] = col0[is_datetime].map(lambda v: v.date())
+    month_sep = is_separator & month_parts[0].notna()
+    for i in month_sep[month_sep].index:
+        marks[i] = _month_date(MONTH_DATE_RE.search(col0_str[i]), year_for_month)
+    has_mark = is_datetime | month_sep
+    current = marks.where(has_mark).ffill().shift(1)
+    # Baris datetime / separator di-skip, jadi tanggal baris data cukup dari shift
+    has_current = current.notna()
+
+    skipped = is_datetime | is_header | is_separator
+    buy_code = col0_str.str.upper()
+    is_buy = candidate & ~is_separator & has_current & ~col0_str.isin(list(BUY_SKIP))
+    sell_code = col4.map(lambda v: str(v).strip().upper())
+    is_sell = ~skipped & has_current & col4.notna() & ~sell_code.isin(list(SELL_SKIP))
+    if max_code_len is not None:
+        is_buy &= buy_code.str.len() <= max_code_len
+        is_sell &= sell_code.str.len() <= max_code_len
+
+    def parsed(k, rows, parser):
+        return column(k)[rows].map(parser).to_dict() if width > k else dict.fromkeys(rows[rows].index, 0)
+
+    buy_value, buy_lot, buy_avg = (parsed(1, is_buy, parse_value), parsed(2, is_buy, parse_value),
+                                   parsed(3, is_buy, parse_float))
+    sell_value, sell_lot, sell_avg = (parsed(5, is_sell, parse_value), parsed(6, is_sell, parse_value),
+                                      parsed(7, is_sell, parse_float))
+
+    acc = BrokerSummaryAccumulator()
+    buy_rows = set(is_buy[is_buy].index)
+    sell_rows = set(is_sell[is_sell].index)
+    for i in sorted(buy_rows | sell_rows):
+        day = current[i]
+        if i in buy_rows:
+            acc.add_buy(day, buy_code[i], buy_value[i], buy_lot[i], buy_avg[i])
+        if i in sell_rows:
+            acc.add_sell(day, sell_code[i], sell_value[i], sell_lot[i], sell_avg[i])
+    return acc.rows
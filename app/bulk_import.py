@@ -0,0 +1,374 @@
+"""
+Bulk Import via COPY untuk stock_daily & broker_summary
+
+Import per baris (cursor.execute per row / execute_batch) butuh satu round
+trip per baris atau per page ke database. Untuk file broker multi-tahun
+(puluhan ribu baris) lewat koneksi Railway ini sangat lambat.
+
+Bulk path:
+1. DataFrame dikonversi per kolom menjadi list record bertipe (tanpa iterrows)
+2. Record di-stream ke temp staging table dengan COPY FROM STDIN
+3. Merge ke tabel tujuan dengan satu INSERT ... SELECT ... ON CONFLICT
+
+Jika COPY / merge gagal, transaksi di-rollback ke savepoint lalu fallback ke
+row path (execute_batch) di transaksi yang sama.
+Set BULK_COPY_ENABLED=0 untuk selalu memakai row path.
+
+Diff import (diff_upsert): fingerprint md5 per (saham, tanggal) dari data
+masuk dibandingkan dengan fingerprint baris yang sudah ada di database
+(dihitung di server, hanya 1 baris per tanggal yang ditransfer). Hanya tanggal
+yang baru / berubah yang ditulis ulang, sehingga update harian tidak menulis
+ulang histori bertahun-tahun dan cache hanya perlu dihitung ulang dari
+tanggal pertama yang berubah.
+"""
+import io
+import os
+import hashlib
+from datetime import datetime, date
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from psycopg2.extras import execute_batch
+
+BULK_COPY_ENABLED = os.environ.get('BULK_COPY_ENABLED', '1') != '0'
+
+PRICE_COLUMNS = [
+    'stock_code', 'date', 'open_price', 'high_price', 'low_price', 'close_price', 'avg_price',
+    'volume', 'value', 'frequency', 'foreign_buy', 'foreign_sell', 'net_foreign',
+    'change_value', 'change_percent',
+]
+PRICE_KEY = ['stock_code', 'date']
+
+BROKER_COLUMNS = [
+    'stock_code', 'date', 'broker_code', 'buy_value', 'buy_lot', 'buy_avg',
+    'sell_value', 'sell_lot', 'sell_avg', 'net_value', 'net_lot',
+]
+BROKER_KEY = ['stock_code', 'date', 'broker_code']
+
+# Skala kolom di database (NUMERIC(p, scale) / 0 = integer / None = text), lihat sql/schema.sql.
+# Dipakai agar fingerprint data masuk sama dengan fingerprint nilai yang tersimpan.
+COLUMN_SCALES = {
+    'stock_daily': {
+        'open_price': 2, 'high_price': 2, 'low_price': 2, 'close_price': 2, 'avg_price': 2,
+        'volume': 0, 'value': 2, 'frequency': 0, 'foreign_buy': 2, 'foreign_sell': 2,
+        'net_foreign': 2, 'change_value': 2, 'change_percent': 4,
+    },
+    'broker_summary': {
+        'broker_code': None, 'buy_value': 2, 'buy_lot': 0, 'buy_avg': 2,
+        'sell_value': 2, 'sell_lot': 0, 'sell_avg': 2, 'net_value': 2, 'net_lot': 0,
+    },
+}
+
+
+# ============================================================
+# TYPED RECORDS
+# ============================================================
+
+def parse_date(value) -> date:
+    """Tanggal dari Excel (datetime / 'YYYY-MM-DD' / format lain yang dikenal pandas)"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    return pd.to_datetime(value).date()
+
+
+def _optional_float(value) -> Optional[float]:
+    return float(value) if pd.notna(value) else None
+
+
+def _convert_column(values, func, errors):
+    """Konversi satu kolom; error pertama per baris dicatat di errors {index: exception}"""
+    converted = []
+    for i, value in enumerate(values):
+        try:
+            converted.append(func(value))
+        except Exception as e:
+            converted.append(None)
+            errors.setdefault(i, e)
+    return converted
+
+
+def price_records(price_df: pd.DataFrame, stock_code: str,
+                  parse_value_string=None, parse_change_string=None) -> List[tuple]:
+    """
+    Record stock_daily (urutan PRICE_COLUMNS) dari price_df hasil read_excel_data.
+    Baris yang gagal di-parse dilewati (dicetak), sama dengan import per baris.
+
+    parse_value_string / parse_change_string: parser kolom (default dari parser.py)
+    """
+    if parse_value_string is None or parse_change_string is None:
+        # Import di sini agar upload_to_web.py bisa memakai parser-nya sendiri
+        from parser import parse_value_string, parse_change_string
+
+    if price_df.empty:
+        return []
+
+    errors = {}
+    dates = _convert_column(price_df['date'].tolist(), parse_date, errors)
+    changes = _convert_column(price_df['change'].tolist(), parse_change_string, errors)
+    columns = [
+        _convert_column(price_df['open'].tolist(), _optional_float, errors),
+        _convert_column(price_df['high'].tolist(), _optional_float, errors),
+        _convert_column(price_df['low'].tolist(), _optional_float, errors),
+        _convert_column(price_df['close'].tolist(), _optional_float, errors),
+        _convert_column(price_df['avg'].tolist(), _optional_float, errors),
+        _convert_column(price_df['volume'].tolist(), lambda v: int(parse_value_string(v)), errors),
+        _convert_column(price_df['value'].tolist(), parse_value_string, errors),
+        _convert_column(price_df['freq'].tolist(), lambda v: int(parse_value_string(v)), errors),
+        _convert_column(price_df['f_buy'].tolist(), parse_value_string, errors),
+        _convert_column(price_df['f_sell'].tolist(), parse_value_string, errors),
+        _convert_column(price_df['n_foreign'].tolist(), parse_value_string, errors),
+    ]
+
+    raw_dates = price_df['date'].tolist()
+    records = []
+    for i, values in enumerate(zip(dates, changes, *columns)):
+        if i in errors:
+            print(f"Error importing row: {raw_dates[i]} - {errors[i]}")
+            continue
+        row_date, (change_val, change_pct) = values[0], values[1]
+        records.append((stock_code, row_date, *values[2:], change_val, change_pct))
+    return records
+
+
+def broker_records(broker_df: pd.DataFrame, stock_code: str) -> List[tuple]:
+    """Record broker_summary (urutan BROKER_COLUMNS) dari broker_df hasil read_excel_data"""
+    if broker_df.empty:
+        return []
+
+    net_value = (broker_df['buy_value'] - broker_df['sell_value']).tolist()
+    net_lot = (broker_df['buy_lot'] - broker_df['sell_lot']).tolist()
+    return list(zip(
+        [stock_code] * len(broker_df),
+        broker_df['date'].tolist(),
+        broker_df['broker_code'].tolist(),
+        broker_df['buy_value'].tolist(),
+        broker_df['buy_lot'].tolist(),
+        broker_df['buy_avg'].tolist(),
+        broker_df['sell_value'].tolist(),
+        broker_df['sell_lot'].tolist(),
+        broker_df['sell_avg'].tolist(),
+        net_value,
+        net_lot,
+    ))
+
+
+# ============================================================
+# COPY + MERGE
+# ============================================================
+
+def _copy_text(value) -> str:
+    """Nilai dalam format text COPY (NULL = \\N, escape backslash/tab/newline)"""
+    if value is None or value is pd.NaT or value is pd.NA:
+        return '\\N'
+    if isinstance(value, float) and value != value:
+        return 'NaN'
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    text = str(value)
+    return (text.replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def copy_buffer(records: Sequence[tuple]) -> io.StringIO:
+    """Stream text COPY untuk records"""
+    buffer = io.StringIO()
+    buffer.writelines(
+        '\t'.join(_copy_text(value) for value in record) + '\n'
+        for record in records
+    )
+    buffer.seek(0)
+    return buffer
+
+
+def dedupe_records(records: Sequence[tuple], columns: Sequence[str],
+                   key_columns: Sequence[str]) -> List[tuple]:
+    """
+    Satu record per key (yang terakhir menang, sama dengan upsert per baris).
+    INSERT ... ON CONFLICT tidak boleh menyentuh baris yang sama dua kali.
+    """
+    key_index = [list(columns).index(col) for col in key_columns]
+    latest = {}
+    for record in records:
+        latest[tuple(record[i] for i in key_index)] = record
+    return list(latest.values())
+
+
+def copy_upsert(cursor, table: str, columns: Sequence[str], key_columns: Sequence[str],
+                records: Sequence[tuple]) -> int:
+    """
+    COPY records ke temp staging table lalu merge dengan satu INSERT ... ON CONFLICT.
+    Returns: jumlah baris yang di-insert/update di tabel tujuan
+    """
+    stage = f"_stage_{table}"
+    column_list = ', '.join(columns)
+    updates = ',\n            '.join(
+        f"{col} = EXCLUDED.{col}" for col in columns if col not in key_columns
+    )
+
+    cursor.execute(f"DROP TABLE IF EXISTS {stage}")
+    # Tipe kolom staging = tipe kolom tabel tujuan (tanpa constraint / index)
+    cursor.execute(f"""
+        CREATE TEMP TABLE {stage} ON COMMIT DROP AS
+        SELECT {column_list} FROM {table} WITH NO DATA
+    """)
+    cursor.copy_expert(
+        f"COPY {stage} ({column_list}) FROM STDIN",
+        copy_buffer(dedupe_records(records, columns, key_columns))
+    )
+    cursor.execute(f"""
+        INSERT INTO {table} ({column_list})
+        SELECT {column_list} FROM {stage}
+        ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET
+            {updates}
+    """)
+    merged = cursor.rowcount
+    cursor.execute(f"DROP TABLE IF EXISTS {stage}")
+    return merged
+
+
+def bulk_upsert(cursor, table: str, columns: Sequence[str], key_columns: Sequence[str],
+                records: Sequence[tuple], row_query: str, page_size: int = 500) -> Tuple[int, str]:
+    """
+    Upsert records: COPY path, fallback ke row path (execute_batch row_query) jika gagal.
+    Dijalankan di transaksi cursor (commit oleh pemanggil).
+
+    Returns: (jumlah record, 'copy' | 'rows')
+    """
+    if not records:
+        return 0, 'copy'
+
+    if BULK_COPY_ENABLED:
+        cursor.execute("SAVEPOINT bulk_upsert")
+        try:
+            copy_upsert(cursor, table, columns, key_columns, records)
+            cursor.execute("RELEASE SAVEPOINT bulk_upsert")
+            return len(records), 'copy'
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT bulk_upsert")
+            print(f"  COPY import {table} error: {e} - fallback ke row insert")
+
+    execute_batch(cursor, row_query, records, page_size=page_size)
+    return len(records), 'rows'
+
+
+# ============================================================
+# DIFF IMPORT (FINGERPRINT PER TANGGAL)
+# ============================================================
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _fingerprint_text(value, scale) -> str:
+    """Nilai seperti ::text di Postgres setelah disimpan di kolom dengan skala tsb"""
+    if value is None or value is pd.NaT or value is pd.NA:
+        return '\\N'
+    if scale is None:
+        return str(value)
+    if isinstance(value, float):
+        if value != value:
+            return 'NaN'
+        value = repr(value)
+    rounded = Decimal(str(value)).quantize(Decimal(1).scaleb(-scale), rounding=ROUND_HALF_UP)
+    if rounded == 0:
+        rounded = abs(rounded)  # Postgres tidak menyimpan -0
+    return str(rounded)
+
+
+def _fingerprint_layout(table: str, columns: Sequence[str], key_columns: Sequence[str]):
+    """(index kolom nilai, skala, index kolom urut dalam 1 tanggal)"""
+    scales = COLUMN_SCALES[table]
+    value_cols = [c for c in columns if c not in ('stock_code', 'date')]
+    sort_cols = [c for c in key_columns if c not in ('stock_code', 'date')]
+    return ([list(columns).index(c) for c in value_cols], [scales[c] for c in value_cols],
+            [list(columns).index(c) for c in sort_cols], value_cols, sort_cols)
+
+
+def record_fingerprints(table: str, columns: Sequence[str], key_columns: Sequence[str],
+                        records: Sequence[tuple]) -> Dict[date, str]:
+    """Fingerprint md5 per tanggal untuk records (sudah di-dedupe per key)"""
+    value_index, scales, sort_index, _, _ = _fingerprint_layout(table, columns, key_columns)
+    date_index = list(columns).index('date')
+
+    lines_by_date = {}
+    for record in records:
+        line = '|'.join(_fingerprint_text(record[i], scale) for i, scale in zip(value_index, scales))
+        sort_key = tuple(str(record[i]) for i in sort_index)
+        lines_by_date.setdefault(_as_date(record[date_index]), []).append((sort_key, line))
+
+    return {
+        day: hashlib.md5('\n'.join(line for _, line in sorted(lines)).encode('utf-8')).hexdigest()
+        for day, lines in lines_by_date.items()
+    }
+
+
+def fetch_fingerprints(cursor, table: str, columns: Sequence[str], key_columns: Sequence[str],
+                       stock_code: str, start: date, end: date) -> Dict[date, str]:
+    """Fingerprint md5 per tanggal untuk baris di database (dihitung di server)"""
+    _, _, _, value_cols, sort_cols = _fingerprint_layout(table, columns, key_columns)
+    row_text = ", '|', ".join(f"COALESCE({c}::text, '\\N')" for c in value_cols)
+    order_by = ', '.join(f'{c} COLLATE "C"' for c in sort_cols) or 'date'
+
+    cursor.execute(f"""
+        SELECT date, md5(string_agg(concat({row_text}), E'\\n' ORDER BY {order_by})) AS fingerprint
+        FROM {table}
+        WHERE stock_code = %s AND date BETWEEN %s AND %s
+        GROUP BY date
+    """, (stock_code, start, end))
+
+    fingerprints = {}
+    for row in cursor.fetchall():
+        day, fingerprint = (row['date'], row['fingerprint']) if isinstance(row, dict) else row
+        fingerprints[day] = fingerprint
+    return fingerprints
+
+
+def diff_upsert(cursor, table: str, columns: Sequence[str], key_columns: Sequence[str],
+                records: Sequence[tuple], row_query: str, page_size: int = 500) -> Dict:
+    """
+    Diff import: tulis ulang hanya tanggal yang baru / berubah (append-only,
+    tanggal yang tidak ada di data masuk tidak dihapus).
+    Baris di tanggal yang berubah diganti seluruhnya (mis. broker yang hilang ikut terhapus).
+
+    Returns: dict report {rows, mode, changed_dates, unchanged_dates, first_changed, last_changed}
+    """
+    report = {'rows': 0, 'mode': None, 'changed_dates': 0, 'unchanged_dates': 0,
+              'first_changed': None, 'last_changed': None}
+    if not records:
+        return report
+
+    records = dedupe_records(records, columns, key_columns)
+    stock_code = records[0][list(columns).index('stock_code')]
+    date_index = list(columns).index('date')
+
+    incoming = record_fingerprints(table, columns, key_columns, records)
+    existing = fetch_fingerprints(cursor, table, columns, key_columns, stock_code,
+                                  min(incoming), max(incoming))
+    changed = sorted(day for day, fingerprint in incoming.items() if existing.get(day) != fingerprint)
+
+    report['unchanged_dates'] = len(incoming) - len(changed)
+    report['changed_dates'] = len(changed)
+    if not changed:
+        return report
+
+    changed_set = set(changed)
+    cursor.execute(f"DELETE FROM {table} WHERE stock_code = %s AND date = ANY(%s)",
+                   (stock_code, changed))
+    changed_records = [r for r in records if _as_date(r[date_index]) in changed_set]
+    report['rows'], report['mode'] = bulk_upsert(cursor, table, columns, key_columns,
+                                                 changed_records, row_query, page_size)
+    report['first_changed'] = changed[0]
+    report['last_changed'] = changed[-1]
+    return report
+
+
+def format_diff_report(report: Dict) -> str:
+    """Ringkasan report diff_upsert untuk log"""
+    if not report['changed_dates']:
+        return f"no changes ({report['unchanged_dates']} dates unchanged)"
+    return (f"{report['rows']} rows, {report['changed_dates']} dates changed "
+            f"({report['first_changed']} s/d {report['last_changed']}), "
+            f"{report['unchanged_dates']} unchanged [{report['mode']}]")
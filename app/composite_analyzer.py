@@ -4,12 +4,13 @@ Comprehensive Bandarmology + Sensitivity Analysis
 """
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, List, Tuple
 from functools import lru_cache
 import hashlib
-from database import execute_query
 from analyzer import get_price_data, get_broker_data, calculate_optimal_lookback_days
+from market_data import MarketData, load_market_data
+from broker_cube import get_broker_cube
 from broker_config import (
     get_broker_type, get_broker_color, get_broker_info,
     classify_brokers, is_foreign_broker, FOREIGN_BROKER_CODES, BUMN_BROKER_CODES
@@ -19,8 +20,10 @@ from broker_config import (
 _analysis_cache = {}
 _cache_timeout = 300  # 5 minutes
 
-def _get_cache_key(stock_code: str) -> str:
+def _get_cache_key(stock_code: str, market_data: MarketData = None) -> str:
     """Generate cache key based on stock code and latest data date"""
+    if market_data is not None:
+        return market_data.version
     try:
         price_df = get_price_data(stock_code)
         if not price_df.empty:
@@ -123,6 +126,24 @@ def calculate_price_movements(stock_code: str = 'CDIA') -> Dict:
     return movements
 
 
+# Periode flow (hari kalender ke belakang dari tanggal broker terakhir)
+FLOW_PERIODS = {
+    '1D': 1,
+    '1W': 7,
+    '2W': 14,
+    '3W': 21,
+    '1M': 30,
+}
+
+
+def _period_broker_agg(cube, days: int, brokers: List[str] = None) -> pd.DataFrame:
+    """Net/buy/sell value per broker untuk tanggal > latest - days (selisih prefix sum)"""
+    lo, hi = cube.after_latest_minus(days)
+    if hi <= lo:
+        return None
+    return cube.window_frame(lo, hi, brokers)[['broker_code', 'net_value', 'buy_value', 'sell_value']]
+
+
 def calculate_broker_flow_by_period(stock_code: str = 'CDIA', broker_codes: List[str] = None) -> Dict:
     """
     Calculate broker net flow for multiple time periods.
@@ -134,52 +155,23 @@ def calculate_broker_flow_by_period(stock_code: str = 'CDIA', broker_codes: List
     Returns:
         Dict with broker flows for each period
     """
-    broker_df = get_broker_data(stock_code)
+    cube = get_broker_cube(stock_code)
 
-    if broker_df.empty:
+    if cube.latest_date is None:
         return {'error': 'No broker data'}
 
-    # Convert Decimal to float
-    for col in ['net_value', 'buy_value', 'sell_value', 'net_lot']:
-        if col in broker_df.columns:
-            broker_df[col] = broker_df[col].astype(float)
-
-    # Get latest date
-    latest_date = broker_df['date'].max()
-
-    # Define periods (calendar days for query)
-    periods = {
-        '1D': 1,
-        '1W': 7,
-        '2W': 14,
-        '3W': 21,
-        '1M': 30,
-    }
-
     result = {
-        'latest_date': latest_date,
+        'latest_date': cube.latest_date,
         'periods': {}
     }
 
-    for period_name, days in periods.items():
-        cutoff_date = latest_date - timedelta(days=days)
-        period_df = broker_df[broker_df['date'] > cutoff_date]
+    for period_name, days in FLOW_PERIODS.items():
+        broker_agg = _period_broker_agg(cube, days, broker_codes or None)
 
-        if period_df.empty:
+        if broker_agg is None:
             result['periods'][period_name] = {'total_net': 0, 'brokers': {}}
             continue
 
-        # Filter by specific brokers if provided
-        if broker_codes:
-            period_df = period_df[period_df['broker_code'].isin(broker_codes)]
-
-        # Aggregate by broker
-        broker_agg = period_df.groupby('broker_code').agg({
-            'net_value': 'sum',
-            'buy_value': 'sum',
-            'sell_value': 'sum',
-        }).reset_index()
-
         # Add broker type
         broker_agg['broker_type'] = broker_agg['broker_code'].apply(get_broker_type)
         broker_agg['broker_color'] = broker_agg['broker_code'].apply(get_broker_color)
@@ -200,49 +192,30 @@ def calculate_foreign_flow_by_period(stock_code: str = 'CDIA') -> Dict:
     Returns:
         Dict with foreign flow for each period
     """
-    broker_df = get_broker_data(stock_code)
+    cube = get_broker_cube(stock_code)
 
-    if broker_df.empty:
+    if cube.latest_date is None:
         return {'error': 'No broker data'}
 
-    # Convert Decimal to float
-    for col in ['net_value', 'buy_value', 'sell_value', 'net_lot']:
-        if col in broker_df.columns:
-            broker_df[col] = broker_df[col].astype(float)
-
-    # Add broker classification
-    broker_df['broker_type'] = broker_df['broker_code'].apply(get_broker_type)
+    # Foreign brokers yang pernah aktif (cube hanya memuat broker dengan baris data)
+    foreign_brokers = [code for code in cube.brokers if get_broker_type(code) == 'FOREIGN']
 
-    # Filter foreign brokers
-    foreign_df = broker_df[broker_df['broker_type'] == 'FOREIGN']
-
-    if foreign_df.empty:
+    if not foreign_brokers:
         return {
             'message': 'No foreign broker activity',
             'periods': {p: {'net_flow': 0, 'buy_value': 0, 'sell_value': 0, 'top_buyers': [], 'top_sellers': []}
-                       for p in ['1D', '1W', '2W', '3W', '1M']}
+                       for p in FLOW_PERIODS}
         }
 
-    latest_date = broker_df['date'].max()
-
-    periods = {
-        '1D': 1,
-        '1W': 7,
-        '2W': 14,
-        '3W': 21,
-        '1M': 30,
-    }
-
     result = {
-        'latest_date': latest_date,
+        'latest_date': cube.latest_date,
         'periods': {}
     }
 
-    for period_name, days in periods.items():
-        cutoff_date = latest_date - timedelta(days=days)
-        period_df = foreign_df[foreign_df['date'] > cutoff_date]
+    for period_name, days in FLOW_PERIODS.items():
+        broker_agg = _period_broker_agg(cube, days, foreign_brokers)
 
-        if period_df.empty:
+        if broker_agg is None or broker_agg.empty:
             result['periods'][period_name] = {
                 'net_flow': 0,
                 'buy_value': 0,
@@ -252,13 +225,6 @@ def calculate_foreign_flow_by_period(stock_code: str = 'CDIA') -> Dict:
             }
             continue
 
-        # Aggregate
-        broker_agg = period_df.groupby('broker_code').agg({
-            'net_value': 'sum',
-            'buy_value': 'sum',
-            'sell_value': 'sum',
-        }).reset_index()
-
         # Top buyers and sellers
         top_buyers = broker_agg.nlargest(3, 'net_value')[['broker_code', 'net_value']].to_dict('records')
         top_sellers = broker_agg.nsmallest(3, 'net_value')[['broker_code', 'net_value']].to_dict('records')
@@ -297,43 +263,24 @@ def calculate_sensitive_broker_flow_by_period(stock_code: str = 'CDIA', sensitiv
     if not sensitive_brokers:
         return {'error': 'No sensitive brokers found'}
 
-    broker_df = get_broker_data(stock_code)
+    cube = get_broker_cube(stock_code)
 
-    if broker_df.empty:
+    if cube.latest_date is None:
         return {'error': 'No broker data'}
 
-    # Convert Decimal to float
-    for col in ['net_value', 'buy_value', 'sell_value', 'net_lot']:
-        if col in broker_df.columns:
-            broker_df[col] = broker_df[col].astype(float)
-
-    # Filter sensitive brokers
-    sens_df = broker_df[broker_df['broker_code'].isin(sensitive_brokers)]
-
-    if sens_df.empty:
+    if not set(sensitive_brokers) & set(cube.brokers):
         return {'error': 'No sensitive broker activity'}
 
-    latest_date = broker_df['date'].max()
-
-    periods = {
-        '1D': 1,
-        '1W': 7,
-        '2W': 14,
-        '3W': 21,
-        '1M': 30,
-    }
-
     result = {
-        'latest_date': latest_date,
+        'latest_date': cube.latest_date,
         'sensitive_brokers': sensitive_brokers,
         'periods': {}
     }
 
-    for period_name, days in periods.items():
-        cutoff_date = latest_date - timedelta(days=days)
-        period_df = sens_df[sens_df['date'] > cutoff_date]
+    for period_name, days in FLOW_PERIODS.items():
+        broker_agg = _period_broker_agg(cube, days, sensitive_brokers)
 
-        if period_df.empty:
+        if broker_agg is None or broker_agg.empty:
             result['periods'][period_name] = {
                 'net_flow': 0,
                 'buy_value': 0,
@@ -342,13 +289,6 @@ def calculate_sensitive_broker_flow_by_period(stock_code: str = 'CDIA', sensitiv
             }
             continue
 
-        # Aggregate by broker
-        broker_agg = period_df.groupby('broker_code').agg({
-            'net_value': 'sum',
-            'buy_value': 'sum',
-            'sell_value': 'sum',
-        }).reset_index()
-
         # Add broker type info
         broker_agg['broker_type'] = broker_agg['broker_code'].apply(get_broker_type)
         broker_agg['broker_color'] = broker_agg['broker_code'].apply(get_broker_color)
@@ -415,46 +355,22 @@ def get_broker_avg_buy(stock_code: str = 'CDIA', days: int = 30) -> pd.DataFrame
     Returns:
         DataFrame dengan kolom: broker_code, total_buy_value, total_buy_lot, avg_buy_price
     """
-    query = """
-        SELECT
-            broker_code,
-            SUM(buy_value) as total_buy_value,
-            SUM(buy_lot) as total_buy_lot,
-            CASE WHEN SUM(buy_lot) > 0
-                THEN SUM(buy_value) / SUM(buy_lot) / 100
-                ELSE 0
-            END as avg_buy_price,
-            SUM(sell_value) as total_sell_value,
-            SUM(sell_lot) as total_sell_lot,
-            CASE WHEN SUM(sell_lot) > 0
-                THEN SUM(sell_value) / SUM(sell_lot) / 100
-                ELSE 0
-            END as avg_sell_price,
-            SUM(net_value) as net_value,
-            SUM(net_lot) as net_lot
-        FROM broker_summary
-        WHERE stock_code = %s
-          AND date >= CURRENT_DATE - INTERVAL '%s days'
-        GROUP BY broker_code
-        HAVING SUM(buy_lot) > 0
-        ORDER BY SUM(buy_value) DESC
-    """
-    results = execute_query(query, (stock_code, days))
+    # Total per broker = selisih prefix sum di cube (tanpa GROUP BY ulang)
+    cube = get_broker_cube(stock_code)
+    lo, hi = cube.since_days(days)
+    df = cube.window_frame(lo, hi)
+    df = df[df['buy_lot'] > 0]
 
-    if not results:
+    if df.empty:
         return pd.DataFrame()
 
-    df = pd.DataFrame(results)
-
-    # Convert Decimal columns to float
-    numeric_cols = ['total_buy_value', 'total_buy_lot', 'avg_buy_price',
-                    'total_sell_value', 'total_sell_lot', 'avg_sell_price',
-                    'net_value', 'net_lot']
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = df[col].astype(float)
-
-    return df
+    df = df.sort_values('buy_value', ascending=False, kind='mergesort').rename(columns={
+        'buy_value': 'total_buy_value', 'buy_lot': 'total_buy_lot',
+        'sell_value': 'total_sell_value', 'sell_lot': 'total_sell_lot',
+    })
+    return df[['broker_code', 'total_buy_value', 'total_buy_lot', 'avg_buy_price',
+               'total_sell_value', 'total_sell_lot', 'avg_sell_price',
+               'net_value', 'net_lot']].reset_index(drop=True)
 
 
 def analyze_avg_buy_position(stock_code: str = 'CDIA', current_price: float = None) -> Dict:
@@ -475,10 +391,10 @@ def analyze_avg_buy_position(stock_code: str = 'CDIA', current_price: float = No
     """
     # Get current price if not provided
     if current_price is None:
-        price_df = get_price_data(stock_code)
+        price_df = get_price_data(stock_code, limit=1, columns=['close_price'])
         if price_df.empty:
             return {'error': 'No price data'}
-        current_price = float(price_df.sort_values('date').iloc[-1]['close_price'])
+        current_price = float(price_df.iloc[-1]['close_price'])
     else:
         current_price = float(current_price)
 
@@ -1383,18 +1299,17 @@ def track_buy_signal(stock_code: str, lookback_days: int = 60) -> Dict:
         get_stock_data
     )
 
-    price_df = get_price_data(stock_code)
-    broker_df = get_broker_data(stock_code)
+    price_df = get_price_data(stock_code, limit=lookback_days)
 
     if price_df.empty:
         return {'has_signal': False, 'message': 'No price data'}
 
+    # Broker hanya dipakai untuk 10 hari bursa terakhir
+    broker_df = get_broker_data(stock_code, start_date=price_df['date'].iloc[-10:].min())
+
     if broker_df.empty:
         return {'has_signal': False, 'message': 'No broker data'}
 
-    price_df = price_df.sort_values('date').tail(lookback_days).reset_index(drop=True)
-    broker_df = broker_df.sort_values('date')
-
     # Convert Decimal to float for price columns
     for col in ['close_price', 'open_price', 'high_price', 'low_price', 'volume', 'value']:
         if col in price_df.columns:
@@ -1778,114 +1693,157 @@ def track_buy_signal(stock_code: str, lookback_days: int = 60) -> Dict:
     }
 
 
-def calculate_broker_sensitivity_advanced(stock_code: str = 'CDIA', max_brokers: int = 40) -> Dict:
+def _masked_pearson(X: np.ndarray, y: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """
+    Pearson correlation of every row of X with y, using only cells where valid is True
+    (pairwise-complete, same as Series.corr). Returns NaN for rows with < 2 points
+    or zero variance.
+    """
+    cnt = valid.sum(axis=1)
+    Y = np.broadcast_to(y, X.shape)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.where(valid, X, 0.0).sum(axis=1) / cnt
+        mean_y = np.where(valid, Y, 0.0).sum(axis=1) / cnt
+        dx = np.where(valid, X - mean_x[:, None], 0.0)
+        dy = np.where(valid, Y - mean_y[:, None], 0.0)
+        corr = (dx * dy).sum(axis=1) / np.sqrt((dx * dx).sum(axis=1) * (dy * dy).sum(axis=1))
+    corr = np.clip(corr, -1.0, 1.0)
+    corr[cnt < 2] = np.nan
+    return corr
+
+
+def calculate_broker_sensitivity_advanced(stock_code: str = 'CDIA', max_brokers: int = None,
+                                          market_data: MarketData = None) -> Dict:
     """
-    Advanced Broker Sensitivity Analysis (Optimized):
+    Advanced Broker Sensitivity Analysis (Vectorized):
     - Lead Time: Berapa hari sebelum harga naik, broker X mulai akumulasi (T+1 s/d T+10)
     - Win Rate: % kejadian broker X akumulasi -> harga naik >= 10% dalam 10 hari
     - Sensitivity Score: Korelasi net buy dengan return T+1 s/d T+10
 
+    Semua broker dihitung sekaligus dari matriks broker x tanggal (net_value)
+    yang di-align dengan matriks forward return, tanpa loop per broker.
+
     Args:
-        max_brokers: Limit analysis to top N brokers by activity (default 40)
+        max_brokers: Optional limit to top N brokers by activity (default: all brokers)
+        market_data: Pre-loaded MarketData bundle (optional, avoids re-fetching)
 
     Parameter sesuai panduan:
     - Threshold Kenaikan Signifikan: >= 10%
     - Lead Time Analysis: T+1 sampai T+10 (fleksibel)
     """
-    price_df = get_price_data(stock_code)
-    broker_df = get_broker_data(stock_code)
+    price_df = market_data.price if market_data is not None else get_price_data(stock_code)
+    broker_df = market_data.broker if market_data is not None else get_broker_data(stock_code)
 
     if price_df.empty or broker_df.empty:
         return {'brokers': [], 'summary': {}, 'top_5_brokers': [], 'total_analyzed': 0}
 
     price_df = price_df.sort_values('date').reset_index(drop=True)
-
-    # Calculate forward returns (T+1 to T+10) - sesuai panduan
-    for i in range(1, 11):
-        price_df[f'return_t{i}'] = price_df['close_price'].shift(-i) / price_df['close_price'] - 1
-
-    # Max forward return in 10 days
-    return_cols = [f'return_t{i}' for i in range(1, 11)]
-    price_df['max_return_10d'] = price_df[return_cols].max(axis=1)
-    # Threshold >= 10% sesuai panduan
-    price_df['significant_rise'] = price_df['max_return_10d'] >= 0.10
-
-    # Pre-compute significant rise dates for faster lookup
-    sig_rise_dates = set(price_df[price_df['significant_rise'] == True]['date'].tolist())
-
-    # Limit to top brokers by total absolute net value (most active)
-    broker_activity = broker_df.groupby('broker_code')['net_value'].apply(lambda x: x.abs().sum()).sort_values(ascending=False)
-    top_brokers = broker_activity.head(max_brokers).index.tolist()
-
-    broker_stats = {}
-
-    for broker in top_brokers:
-        broker_data = broker_df[broker_df['broker_code'] == broker].copy()
-        broker_dates = set(broker_data['date'].tolist())
-
-        # Fast merge using pre-sorted data
-        merged = pd.merge(
-            broker_data[['date', 'net_value', 'net_lot']],
-            price_df[['date', 'close_price', 'max_return_10d', 'significant_rise'] + return_cols],
-            on='date',
-            how='inner'
-        )
-
-        if len(merged) < 10:
-            continue
-
-        accumulation_days = merged[merged['net_value'] > 0]
-        if len(accumulation_days) < 5:
-            continue
-
+    price_dates = pd.DatetimeIndex(price_df['date'])
+    close = price_df['close_price'].to_numpy(dtype='float64')
+    n_days = len(close)
+
+    # Forward return matrix (hari x T+1..T+10) - sesuai panduan
+    fwd_returns = np.full((n_days, 10), np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for i in range(1, 11):
+            if i < n_days:
+                fwd_returns[:-i, i - 1] = close[i:] / close[:-i] - 1
+
+    # Max forward return in 10 days, threshold >= 10% sesuai panduan
+    max_return_10d = pd.DataFrame(fwd_returns).max(axis=1).to_numpy()
+    significant_rise = max_return_10d >= 0.10
+
+    # Significant rise dates (sample up to 20 rises for lead time)
+    sig_rise_dates = set(price_dates[significant_rise].tolist())
+    sample_rises = list(sig_rise_dates)[:20]
+
+    # Brokers ordered by total absolute net value (most active first)
+    broker_activity = broker_df['net_value'].abs().groupby(broker_df['broker_code']).sum().sort_values(ascending=False)
+    if max_brokers is not None:
+        broker_activity = broker_activity.head(max_brokers)
+    brokers = broker_activity.index
+    n_brokers = len(brokers)
+
+    b_idx = brokers.get_indexer(broker_df['broker_code'])
+    in_scope = b_idx >= 0
+    b_idx = b_idx[in_scope]
+    row_dates = pd.DatetimeIndex(broker_df['date'])[in_scope]
+    row_net = broker_df['net_value'].to_numpy(dtype='float64')[in_scope]
+
+    # Total net per broker (semua tanggal broker, termasuk yang tidak ada data harga)
+    total_net = np.bincount(b_idx, weights=row_net, minlength=n_brokers)
+
+    # Broker x tanggal matrix, aligned ke tanggal harga (inner join)
+    d_idx = price_dates.get_indexer(row_dates)
+    on_price = d_idx >= 0
+    net_matrix = np.zeros((n_brokers, n_days))
+    present = np.zeros((n_brokers, n_days), dtype=bool)
+    net_matrix[b_idx[on_price], d_idx[on_price]] = row_net[on_price]
+    present[b_idx[on_price], d_idx[on_price]] = True
+
+    accumulating = present & (net_matrix > 0)
+    days_present = present.sum(axis=1)
+    accum_days = accumulating.sum(axis=1)
+    successful = (accumulating & significant_rise[None, :]).sum(axis=1)
+
+    # Lead Time T+1 s/d T+10: lookback pertama (kalender) di mana broker akumulasi
+    avg_lead_time = np.full(n_brokers, 5.0)  # Default 5 days
+    lead_count = np.zeros(n_brokers, dtype=int)
+    if sample_rises:
+        lookbacks = np.arange(1, 11)
+        check_dates = (np.array(sample_rises, dtype='datetime64[ns]')[:, None]
+                       - lookbacks[None, :].astype('timedelta64[D]'))
+        unique_checks, check_inverse = np.unique(check_dates, return_inverse=True)
+        u_idx = pd.DatetimeIndex(unique_checks).get_indexer(row_dates)
+        hit_rows = (u_idx >= 0) & (row_net > 0)
+        accum_on_check = np.zeros((n_brokers, len(unique_checks)), dtype=bool)
+        accum_on_check[b_idx[hit_rows], u_idx[hit_rows]] = True
+        hits = accum_on_check[:, check_inverse.reshape(-1)].reshape(n_brokers, len(sample_rises), 10)
+        has_hit = hits.any(axis=2)
+        first_lookback = hits.argmax(axis=2) + 1
+        lead_count = has_hit.sum(axis=1)
+        lead_sum = np.where(has_hit, first_lookback, 0).sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg_lead_time = np.where(lead_count > 0, lead_sum / lead_count, 5.0)
+
+    # Sensitivity: Correlation T+1, T+5, T+10 untuk coverage lebih baik
+    correlations = np.column_stack([
+        _masked_pearson(net_matrix, fwd_returns[:, t - 1], present & ~np.isnan(fwd_returns[:, t - 1])[None, :])
+        for t in (1, 5, 10)
+    ])
+    corr_count = (~np.isnan(correlations)).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_correlation = np.where(corr_count > 0, np.nansum(correlations, axis=1) / corr_count, np.nan)
+
+    broker_stats = []
+    for i in np.flatnonzero((days_present >= 10) & (accum_days >= 5)):
         # Win Rate: % akumulasi yang diikuti kenaikan >= 10% dalam 10 hari
-        accum_then_rise = accumulation_days[accumulation_days['significant_rise'] == True]
-        win_rate = len(accum_then_rise) / len(accumulation_days) * 100 if len(accumulation_days) > 0 else 0
-
-        # Lead Time Analysis T+1 s/d T+10 (sample up to 20 rises for speed)
-        lead_times = []
-        sample_rises = list(sig_rise_dates)[:20]
-        broker_accum_dates = set(broker_data[broker_data['net_value'] > 0]['date'].tolist())
-
-        for rise_date in sample_rises:
-            for lookback in range(1, 11):  # T+1 s/d T+10 sesuai panduan
-                check_date = rise_date - timedelta(days=lookback)
-                if check_date in broker_accum_dates:
-                    lead_times.append(lookback)
-                    break
-
-        avg_lead_time = np.mean(lead_times) if lead_times else 5.0  # Default 5 days
-
-        # Sensitivity Score: Correlation T+1, T+5, T+10 untuk coverage lebih baik
-        corr_t1 = merged['net_value'].corr(merged['return_t1'])
-        corr_t5 = merged['net_value'].corr(merged['return_t5'])
-        corr_t10 = merged['net_value'].corr(merged['return_t10'])
-        avg_correlation = np.nanmean([corr_t1, corr_t5, corr_t10])
-
-        # Calculate total accumulation
-        total_net = broker_data['net_value'].sum()
+        # (scalar types kept as before: rounding of numpy floats is half-to-even)
+        win_rate = int(successful[i]) / int(accum_days[i]) * 100
+        lead_time = avg_lead_time[i] if lead_count[i] > 0 else 5.0
+        avg_corr = avg_correlation[i]
 
         # Composite Sensitivity Score (0-100)
         # Win Rate contributes 40%, Lead Time (inverse) 30%, Correlation 30%
         win_rate_score = min(win_rate, 100) * 0.4
-        lead_time_score = max(0, (10 - avg_lead_time) / 10 * 100) * 0.3 if avg_lead_time > 0 else 0
-        corr_score = max(0, avg_correlation * 100) * 0.3
+        lead_time_score = max(0, (10 - lead_time) / 10 * 100) * 0.3 if lead_time > 0 else 0
+        corr_score = max(0, avg_corr * 100) * 0.3
 
         sensitivity_score = win_rate_score + lead_time_score + corr_score
 
-        broker_stats[broker] = {
-            'broker_code': broker,
+        broker_stats.append({
+            'broker_code': brokers[i],
             'win_rate': round(win_rate, 1),
-            'avg_lead_time': round(avg_lead_time, 1),
-            'correlation': round(avg_correlation * 100, 1),
+            'avg_lead_time': round(lead_time, 1),
+            'correlation': round(avg_corr * 100, 1),
             'sensitivity_score': round(sensitivity_score, 1),
-            'total_net': total_net,
-            'accum_days': len(accumulation_days),
-            'successful_signals': len(accum_then_rise)
-        }
+            'total_net': float(total_net[i]),
+            'accum_days': int(accum_days[i]),
+            'successful_signals': int(successful[i])
+        })
 
     # Sort by sensitivity score
-    sorted_brokers = sorted(broker_stats.values(), key=lambda x: x['sensitivity_score'], reverse=True)
+    sorted_brokers = sorted(broker_stats, key=lambda x: x['sensitivity_score'], reverse=True)
 
     return {
         'brokers': sorted_brokers[:30],  # Top 30
@@ -1899,7 +1857,8 @@ def calculate_broker_sensitivity_advanced(stock_code: str = 'CDIA', max_brokers:
 # B. FOREIGN FLOW MOMENTUM
 # ============================================================
 
-def calculate_foreign_flow_momentum(stock_code: str = 'CDIA', lookback: int = 20) -> Dict:
+def calculate_foreign_flow_momentum(stock_code: str = 'CDIA', lookback: int = 20,
+                                    market_data: MarketData = None) -> Dict:
     """
     Foreign Flow Analysis dengan:
     - Flow Direction: N Foreign hari ini (+/-)
@@ -1913,8 +1872,8 @@ def calculate_foreign_flow_momentum(stock_code: str = 'CDIA', lookback: int = 20
     (bukan net_foreign dari stock_daily yang mungkin salah)
     """
     # Get price data for correlation calculation
-    price_df = get_price_data(stock_code)
-    broker_df = get_broker_data(stock_code)
+    price_df = market_data.price if market_data is not None else get_price_data(stock_code)
+    broker_df = market_data.broker if market_data is not None else get_broker_data(stock_code)
 
     if price_df.empty or broker_df.empty:
         return {'score': 0, 'signal': 'NO_DATA', 'total_5d': 0, 'total_10d': 0}
@@ -2024,7 +1983,8 @@ def calculate_foreign_flow_momentum(stock_code: str = 'CDIA', lookback: int = 20
 # C. SMART MONEY INDICATOR
 # ============================================================
 
-def calculate_smart_money_indicator(stock_code: str = 'CDIA', lookback: int = 20) -> Dict:
+def calculate_smart_money_indicator(stock_code: str = 'CDIA', lookback: int = 20,
+                                    market_data: MarketData = None) -> Dict:
     """
     Smart Money Detection berdasarkan Volume-Frequency Analysis:
 
@@ -2041,7 +2001,7 @@ def calculate_smart_money_indicator(stock_code: str = 'CDIA', lookback: int = 20
     - Avg Transaction Size = Value / Freq
     - Lot per Transaction = Volume / Freq
     """
-    price_df = get_price_data(stock_code)
+    price_df = market_data.price if market_data is not None else get_price_data(stock_code)
 
     if price_df.empty:
         return {'score': 0, 'signal': 'NO_DATA'}
@@ -2151,7 +2111,7 @@ def calculate_smart_money_indicator(stock_code: str = 'CDIA', lookback: int = 20
 # D. PRICE POSITION & PATTERN
 # ============================================================
 
-def calculate_price_position(stock_code: str = 'CDIA') -> Dict:
+def calculate_price_position(stock_code: str = 'CDIA', market_data: MarketData = None) -> Dict:
     """
     Price Position Analysis:
     - Close vs Avg
@@ -2160,7 +2120,7 @@ def calculate_price_position(stock_code: str = 'CDIA') -> Dict:
     - Distance from 20-day Low
     - Breakout Signal (Close > High5)
     """
-    price_df = get_price_data(stock_code)
+    price_df = market_data.price if market_data is not None else get_price_data(stock_code)
 
     if price_df.empty or len(price_df) < 20:
         return {'score': 50, 'signal': 'INSUFFICIENT_DATA'}
@@ -2273,7 +2233,8 @@ def calculate_price_position(stock_code: str = 'CDIA') -> Dict:
 # E. ACCUMULATION PHASE DETECTION
 # ============================================================
 
-def detect_accumulation_phase(stock_code: str = 'CDIA', sensitivity_data: Dict = None) -> Dict:
+def detect_accumulation_phase(stock_code: str = 'CDIA', sensitivity_data: Dict = None,
+                              market_data: MarketData = None) -> Dict:
     """
     Detect if stock is in accumulation phase:
     - Harga sideways (range < 10% dalam 10 hari)
@@ -2284,9 +2245,10 @@ def detect_accumulation_phase(stock_code: str = 'CDIA', sensitivity_data: Dict =
 
     Args:
         sensitivity_data: Pre-computed broker sensitivity data (optional, to avoid duplicate calls)
+        market_data: Pre-loaded MarketData bundle (optional, avoids re-fetching)
     """
-    price_df = get_price_data(stock_code)
-    broker_df = get_broker_data(stock_code)
+    price_df = market_data.price if market_data is not None else get_price_data(stock_code)
+    broker_df = market_data.broker if market_data is not None else get_broker_data(stock_code)
 
     if price_df.empty or len(price_df) < 30:
         return {'score': 50, 'phase': 'UNKNOWN', 'in_accumulation': False}
@@ -2328,7 +2290,7 @@ def detect_accumulation_phase(stock_code: str = 'CDIA', sensitivity_data: Dict =
     foreign_score = min(100, max(0, 50 + (recent_foreign / 1e9) * 5))
 
     # 4. Sensitive Brokers Check (use pre-computed if available)
-    sensitivity = sensitivity_data if sensitivity_data else calculate_broker_sensitivity_advanced(stock_code)
+    sensitivity = sensitivity_data if sensitivity_data else calculate_broker_sensitivity_advanced(stock_code, market_data=market_data)
     top_5_sensitive = sensitivity.get('top_5_brokers', [])
 
     # Check if top sensitive brokers are accumulating recently
@@ -2423,7 +2385,7 @@ def detect_accumulation_phase(stock_code: str = 'CDIA', sensitivity_data: Dict =
 # F. VOLUME ANALYSIS (RVOL & Volume-Price Trend)
 # ============================================================
 
-def calculate_volume_analysis(stock_code: str, lookback: int = 20) -> Dict:
+def calculate_volume_analysis(stock_code: str, lookback: int = 20, market_data: MarketData = None) -> Dict:
     """
     Volume Analysis untuk mendeteksi aktivitas abnormal.
 
@@ -2447,11 +2409,12 @@ def calculate_volume_analysis(stock_code: str, lookback: int = 20) -> Dict:
     Args:
         stock_code: Kode saham (dinamis, bisa untuk semua emiten)
         lookback: Periode analisis (default 20 hari)
+        market_data: Pre-loaded MarketData bundle (optional, avoids re-fetching)
 
     Returns:
         Dict dengan volume analysis metrics
     """
-    price_df = get_price_data(stock_code)
+    price_df = market_data.price if market_data is not None else get_price_data(stock_code)
 
     if price_df.empty or len(price_df) < lookback:
         return {
@@ -2585,7 +2548,7 @@ def calculate_volume_analysis(stock_code: str, lookback: int = 20) -> Dict:
 # G. LAYER 1 BASIC FILTER (Syarat Minimum Entry)
 # ============================================================
 
-def check_layer1_filter(stock_code: str) -> Dict:
+def check_layer1_filter(stock_code: str, market_data: MarketData = None) -> Dict:
     """
     LAYER 1 Basic Filter - Syarat minimum sebelum analisis lanjutan.
 
@@ -2600,11 +2563,12 @@ def check_layer1_filter(stock_code: str) -> Dict:
 
     Args:
         stock_code: Kode saham (dinamis untuk semua emiten)
+        market_data: Pre-loaded MarketData bundle (optional, avoids re-fetching)
 
     Returns:
         Dict dengan status filter dan detail kriteria
     """
-    price_df = get_price_data(stock_code)
+    price_df = market_data.price if market_data is not None else get_price_data(stock_code)
 
     if price_df.empty:
         return {
@@ -2741,16 +2705,19 @@ def calculate_composite_score(stock_code: str) -> Dict:
     Args:
         stock_code: Kode saham (dinamis untuk semua emiten)
     """
+    # Load price & broker data once for all components
+    market_data = load_market_data(stock_code)
+
     # Check Layer 1 Filter first
-    layer1 = check_layer1_filter(stock_code)
+    layer1 = check_layer1_filter(stock_code, market_data=market_data)
 
     # Get all component scores
-    sensitivity = calculate_broker_sensitivity_advanced(stock_code)
-    foreign_flow = calculate_foreign_flow_momentum(stock_code)
-    smart_money = calculate_smart_money_indicator(stock_code)
-    price_position = calculate_price_position(stock_code)
-    accumulation = detect_accumulation_phase(stock_code, sensitivity_data=sensitivity)
-    volume_analysis = calculate_volume_analysis(stock_code)
+    sensitivity = calculate_broker_sensitivity_advanced(stock_code, market_data=market_data)
+    foreign_flow = calculate_foreign_flow_momentum(stock_code, market_data=market_data)
+    smart_money = calculate_smart_money_indicator(stock_code, market_data=market_data)
+    price_position = calculate_price_position(stock_code, market_data=market_data)
+    accumulation = detect_accumulation_phase(stock_code, sensitivity_data=sensitivity, market_data=market_data)
+    volume_analysis = calculate_volume_analysis(stock_code, market_data=market_data)
 
     # Extract scores
     # A. Broker Sensitivity (from top brokers' win rate)
@@ -2863,7 +2830,8 @@ def calculate_composite_score(stock_code: str) -> Dict:
 # G. ENHANCED ALERT SYSTEM
 # ============================================================
 
-def generate_alerts(stock_code: str = 'CDIA', sensitivity_data: Dict = None, composite_score: float = None) -> List[Dict]:
+def generate_alerts(stock_code: str = 'CDIA', sensitivity_data: Dict = None, composite_score: float = None,
+                    market_data: MarketData = None) -> List[Dict]:
     """
     Generate alerts based on:
     1. Broker sensitif (top 5) mulai akumulasi setelah 3+ hari tidak aktif
@@ -2875,11 +2843,12 @@ def generate_alerts(stock_code: str = 'CDIA', sensitivity_data: Dict = None, com
     Args:
         sensitivity_data: Pre-computed broker sensitivity data (optional)
         composite_score: Pre-computed composite score value (optional)
+        market_data: Pre-loaded MarketData bundle (optional, avoids re-fetching)
     """
     alerts = []
 
-    price_df = get_price_data(stock_code)
-    broker_df = get_broker_data(stock_code)
+    price_df = market_data.price if market_data is not None else get_price_data(stock_code)
+    broker_df = market_data.broker if market_data is not None else get_broker_data(stock_code)
 
     if price_df.empty or broker_df.empty:
         return alerts
@@ -2887,7 +2856,7 @@ def generate_alerts(stock_code: str = 'CDIA', sensitivity_data: Dict = None, com
     df = price_df.sort_values('date').copy()
 
     # 1. Sensitive Broker Activation (use pre-computed if available)
-    sensitivity = sensitivity_data if sensitivity_data else calculate_broker_sensitivity_advanced(stock_code)
+    sensitivity = sensitivity_data if sensitivity_data else calculate_broker_sensitivity_advanced(stock_code, market_data=market_data)
     top_5 = sensitivity.get('top_5_brokers', [])
 
     for broker in top_5:
@@ -3002,8 +2971,11 @@ def get_comprehensive_analysis(stock_code: str, use_cache: bool = True) -> Dict:
     """
     global _analysis_cache
 
+    # Load price & broker data once - shared by every component below
+    market_data = load_market_data(stock_code)
+
     # Check cache first
-    cache_key = _get_cache_key(stock_code)
+    cache_key = _get_cache_key(stock_code, market_data)
     if use_cache and _is_cache_valid(cache_key):
         cached = _analysis_cache[cache_key].copy()
         cached['from_cache'] = True
@@ -3011,15 +2983,15 @@ def get_comprehensive_analysis(stock_code: str, use_cache: bool = True) -> Dict:
         return cached
 
     # Check Layer 1 Filter first
-    layer1 = check_layer1_filter(stock_code)
+    layer1 = check_layer1_filter(stock_code, market_data=market_data)
 
     # Calculate each component once (pass pre-computed data to avoid duplicates)
-    sensitivity = calculate_broker_sensitivity_advanced(stock_code)
-    foreign_flow = calculate_foreign_flow_momentum(stock_code)
-    smart_money = calculate_smart_money_indicator(stock_code)
-    price_position = calculate_price_position(stock_code)
-    accumulation = detect_accumulation_phase(stock_code, sensitivity_data=sensitivity)
-    volume_analysis = calculate_volume_analysis(stock_code)
+    sensitivity = calculate_broker_sensitivity_advanced(stock_code, market_data=market_data)
+    foreign_flow = calculate_foreign_flow_momentum(stock_code, market_data=market_data)
+    smart_money = calculate_smart_money_indicator(stock_code, market_data=market_data)
+    price_position = calculate_price_position(stock_code, market_data=market_data)
+    accumulation = detect_accumulation_phase(stock_code, sensitivity_data=sensitivity, market_data=market_data)
+    volume_analysis = calculate_volume_analysis(stock_code, market_data=market_data)
 
     # Calculate composite score using pre-computed values
     # A. Broker Sensitivity
@@ -3128,7 +3100,8 @@ def get_comprehensive_analysis(stock_code: str, use_cache: bool = True) -> Dict:
     }
 
     # Generate alerts (uses pre-computed data to avoid duplicate calls)
-    alerts = generate_alerts(stock_code, sensitivity_data=sensitivity, composite_score=composite_val)
+    alerts = generate_alerts(stock_code, sensitivity_data=sensitivity, composite_score=composite_val,
+                             market_data=market_data)
 
     result = {
         'stock_code': stock_code,
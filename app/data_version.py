@@ -0,0 +1,343 @@
+"""
+Data Version (Watermark) per Saham + Cache Warmer
+
+Setiap saham punya watermark "last import" di tabel data_watermark.
+Watermark dinaikkan oleh fungsi import di parser.py, gdrive_sync dan upload_to_web.py.
+Cache (query cache, analysis cache, hasil analisis berat) hanya di-invalidate
+jika watermark saham tersebut bergerak - bukan setiap navigasi halaman.
+
+Komponen:
+- bump_data_version(): naikkan watermark setelah import (+ tanggal pertama yang berubah)
+- get_changed_from(): tanggal pertama yang berubah sejak versi tertentu, untuk
+  recompute incremental (diff import)
+- sync_data_version(): cek watermark (poll dibatasi), jalankan hook invalidasi
+  jika watermark berubah sejak terakhir dilihat proses ini
+- cached_by_data_version(): decorator - hasil fungsi (stock_code, ...) di-cache
+  sampai watermark saham berubah
+- schedule_warmup(): precompute analisis berat di background thread
+- after_external_import(): di web process setelah import di process lain
+  (background job): sinkronkan watermark + invalidate cache, lalu warm-up
+"""
+import time
+import queue
+import threading
+from datetime import date
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+from database import execute_query, clear_stock_cache
+
+# Interval minimum antar query watermark ke database (detik).
+# Import di proses lain (mis. upload_to_web.py) terdeteksi paling lambat setelah interval ini.
+WATERMARK_POLL_SECONDS = 30
+# Batas umur hasil ter-cache (jaring pengaman untuk data yang diubah tanpa bump watermark)
+RESULT_MAX_AGE_SECONDS = 6 * 3600
+
+_lock = threading.Lock()
+_version_cache: Dict[str, tuple] = {}     # stock_code -> (version, fetched_at)
+_seen_versions: Dict[str, int] = {}       # stock_code -> version terakhir yang sudah diproses
+_invalidation_hooks: List[Callable] = []
+_table_ready = False
+
+
+WATERMARK_DDL = """
+    CREATE TABLE IF NOT EXISTS data_watermark (
+        stock_code VARCHAR(10) PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0,
+        source VARCHAR(50),
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+# Log perubahan per versi: changed_from = tanggal pertama yang berubah (NULL = semua data)
+CHANGE_LOG_DDL = """
+    CREATE TABLE IF NOT EXISTS data_change_log (
+        stock_code VARCHAR(10) NOT NULL,
+        version BIGINT NOT NULL,
+        source VARCHAR(50),
+        changed_from DATE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (stock_code, version)
+    )
+"""
+BUMP_SQL = """
+    INSERT INTO data_watermark (stock_code, version, source, updated_at)
+    VALUES (%s, 1, %s, CURRENT_TIMESTAMP)
+    ON CONFLICT (stock_code) DO UPDATE SET
+        version = data_watermark.version + 1,
+        source = EXCLUDED.source,
+        updated_at = EXCLUDED.updated_at
+    RETURNING version
+"""
+CHANGE_LOG_SQL = """
+    INSERT INTO data_change_log (stock_code, version, source, changed_from)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT (stock_code, version) DO NOTHING
+"""
+
+
+# ============================================================
+# WATERMARK
+# ============================================================
+
+def ensure_watermark_table():
+    """Create data_watermark table if not exists"""
+    global _table_ready
+    if _table_ready:
+        return True
+    try:
+        execute_query(WATERMARK_DDL, fetch=False, use_cache=False)
+        execute_query(CHANGE_LOG_DDL, fetch=False, use_cache=False)
+        _table_ready = True
+        return True
+    except Exception as e:
+        print(f"Error creating data_watermark table: {e}")
+        return False
+
+
+def get_data_version(stock_code: str, max_age: float = WATERMARK_POLL_SECONDS) -> int:
+    """Watermark saham saat ini (0 jika belum pernah di-import)"""
+    now = time.time()
+    with _lock:
+        cached = _version_cache.get(stock_code)
+        if cached and now - cached[1] < max_age:
+            return cached[0]
+
+    version = 0
+    try:
+        ensure_watermark_table()
+        rows = execute_query(
+            "SELECT version FROM data_watermark WHERE stock_code = %s",
+            (stock_code,), use_cache=False
+        )
+        if rows:
+            version = int(rows[0]['version'])
+    except Exception as e:
+        print(f"Error reading data watermark for {stock_code}: {e}")
+        if cached:
+            return cached[0]
+
+    with _lock:
+        _version_cache[stock_code] = (version, now)
+    return version
+
+
+def bump_data_version(stock_code: str, source: str = 'import', changed_from: date = None) -> int:
+    """
+    Naikkan watermark saham (panggil setelah data saham berubah).
+    Hook invalidasi dijalankan langsung di proses ini.
+
+    changed_from: tanggal pertama yang berubah (diff import); None = seluruh histori
+    """
+    version = 0
+    try:
+        ensure_watermark_table()
+        rows = execute_query(BUMP_SQL, (stock_code, source), use_cache=False)
+        if rows:
+            version = int(rows[0]['version'])
+            execute_query(CHANGE_LOG_SQL, (stock_code, version, source, changed_from),
+                          fetch=False, use_cache=False)
+    except Exception as e:
+        print(f"Error bumping data watermark for {stock_code}: {e}")
+
+    with _lock:
+        _version_cache[stock_code] = (version, time.time())
+        _seen_versions[stock_code] = version
+    _run_invalidation_hooks(stock_code)
+    return version
+
+
+def bump_data_version_in_transaction(cursor, stock_code: str, source: str = 'import',
+                                     changed_from: date = None) -> int:
+    """
+    Naikkan watermark lewat cursor milik caller (ikut commit/rollback transaksi import).
+
+    Untuk script dengan koneksi sendiri di luar pool (upload_to_web.py, bisa dari
+    mesin lain): dashboard mendeteksi versi baru lewat poll watermark / stamp
+    snapshot. Hook invalidasi proses ini tidak dijalankan.
+
+    Returns:
+        Versi baru (0 jika gagal)
+    """
+    # Savepoint: bump yang gagal tidak boleh membatalkan import di transaksi yang sama
+    cursor.execute("SAVEPOINT data_version_bump")
+    try:
+        cursor.execute(WATERMARK_DDL)
+        cursor.execute(CHANGE_LOG_DDL)
+        cursor.execute(BUMP_SQL, (stock_code, source))
+        row = cursor.fetchone()
+        version = int(row['version'] if isinstance(row, dict) else row[0])
+        cursor.execute(CHANGE_LOG_SQL, (stock_code, version, source, changed_from))
+        cursor.execute("RELEASE SAVEPOINT data_version_bump")
+        return version
+    except Exception as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT data_version_bump")
+        print(f"Error bumping data watermark for {stock_code}: {e}")
+        return 0
+
+def get_changed_from(stock_code: str, since_version: int) -> Optional[date]:
+    """
+    Tanggal pertama yang berubah di semua versi > since_version.
+    None = harus recompute seluruh histori (ada import replace / log tidak lengkap).
+    """
+    try:
+        ensure_watermark_table()
+        rows = execute_query("""
+            SELECT COUNT(*) AS versions,
+                   COUNT(changed_from) AS dated,
+                   MIN(changed_from) AS changed_from
+            FROM data_change_log
+            WHERE stock_code = %s AND version > %s
+        """, (stock_code, since_version), use_cache=False)
+    except Exception as e:
+        print(f"Error reading data change log for {stock_code}: {e}")
+        return None
+
+    if not rows:
+        return None
+    row = rows[0]
+    # Versi yang tidak tercatat di log (mis. sebelum log ada) dianggap perubahan penuh
+    expected = get_data_version(stock_code, max_age=0) - since_version
+    if row['versions'] == 0 or row['dated'] != row['versions'] or row['versions'] < expected:
+        return None
+    return row['changed_from']
+
+
+def register_invalidation_hook(hook: Callable):
+    """Daftarkan fungsi hook(stock_code) yang dipanggil saat watermark saham bergerak"""
+    if hook not in _invalidation_hooks:
+        _invalidation_hooks.append(hook)
+
+
+def _run_invalidation_hooks(stock_code: str):
+    clear_stock_cache(stock_code)
+    clear_versioned_cache(stock_code)
+    for hook in _invalidation_hooks:
+        try:
+            hook(stock_code)
+        except Exception as e:
+            print(f"Invalidation hook {getattr(hook, '__name__', hook)} failed for {stock_code}: {e}")
+
+
+def sync_data_version(stock_code: str) -> int:
+    """
+    Cek watermark saham; invalidate cache hanya jika watermark bergerak
+    sejak terakhir kali dilihat proses ini. Murah dipanggil setiap navigasi.
+    """
+    version = get_data_version(stock_code)
+    with _lock:
+        previous = _seen_versions.get(stock_code)
+        _seen_versions[stock_code] = version
+    if previous is not None and previous != version:
+        print(f"[DATA VERSION] {stock_code}: watermark {previous} -> {version}, invalidating caches")
+        _run_invalidation_hooks(stock_code)
+    return version
+
+
+# ============================================================
+# VERSIONED RESULT CACHE
+# ============================================================
+
+_result_cache: Dict[tuple, tuple] = {}    # (func, stock, args, kwargs) -> (version, cached_at, result)
+_result_lock = threading.Lock()
+
+
+def cached_by_data_version(func: Callable) -> Callable:
+    """
+    Decorator: cache hasil func(stock_code, ...) sampai watermark saham berubah.
+    Argumen pertama harus stock_code. Hasil error (dict dengan key 'error') tidak di-cache,
+    begitu juga panggilan dengan argumen yang tidak hashable (mis. params dict).
+    """
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @wraps(func)
+    def wrapper(stock_code, *args, **kwargs):
+        key = (name, stock_code, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return func(stock_code, *args, **kwargs)
+
+        version = get_data_version(stock_code)
+        with _result_lock:
+            cached = _result_cache.get(key)
+        if cached is not None and cached[0] == version and time.time() - cached[1] < RESULT_MAX_AGE_SECONDS:
+            return cached[2]
+
+        result = func(stock_code, *args, **kwargs)
+        if not (isinstance(result, dict) and result.get('error')):
+            with _result_lock:
+                _result_cache[key] = (version, time.time(), result)
+        return result
+
+    wrapper.uncached = func
+    return wrapper
+
+
+def clear_versioned_cache(stock_code: str = None):
+    """Hapus hasil ter-cache (semua, atau hanya untuk satu saham)"""
+    with _result_lock:
+        if stock_code is None:
+            _result_cache.clear()
+        else:
+            for key in [k for k in _result_cache if k[1] == stock_code]:
+                del _result_cache[key]
+
+
+# ============================================================
+# CACHE WARMER
+# ============================================================
+
+_warm_tasks: List[tuple] = []             # (label, func, args)
+_warm_queue: "queue.Queue[str]" = queue.Queue()
+_warm_pending = set()
+_warm_thread = None
+
+
+def register_warm_task(label: str, func: Callable, *args):
+    """Daftarkan fungsi func(stock_code, *args) yang di-precompute setelah import"""
+    _warm_tasks.append((label, func, args))
+
+
+def _warm_worker():
+    while True:
+        stock_code = _warm_queue.get()
+        with _lock:
+            _warm_pending.discard(stock_code)
+        started = time.time()
+        for label, func, args in _warm_tasks:
+            try:
+                func(stock_code, *args)
+            except Exception as e:
+                print(f"[WARMUP] {stock_code} {label} failed: {e}")
+        print(f"[WARMUP] {stock_code} warmed in {time.time() - started:.1f}s")
+        _warm_queue.task_done()
+
+
+def schedule_warmup(stock_codes):
+    """Antrekan saham untuk di-precompute di background (duplikat diabaikan)"""
+    global _warm_thread
+    with _lock:
+        if _warm_thread is None or not _warm_thread.is_alive():
+            _warm_thread = threading.Thread(target=_warm_worker, name='cache-warmer', daemon=True)
+            _warm_thread.start()
+        for code in stock_codes:
+            if code not in _warm_pending:
+                _warm_pending.add(code)
+                _warm_queue.put(code)
+
+
+def after_external_import(stock_codes, warm=None):
+    """
+    Panggil di web process setelah import berjalan di process lain (background job).
+    Watermark dibaca ulang tanpa menunggu poll, cache proses ini di-invalidate
+    (hook import hanya berjalan di process job), lalu warm-up di thread proses ini.
+
+    Args:
+        stock_codes: Saham yang datanya berubah
+        warm: Urutan saham untuk warm-up (default: stock_codes)
+    """
+    for code in stock_codes:
+        version = get_data_version(code, max_age=0)
+        with _lock:
+            _seen_versions[code] = version
+        _run_invalidation_hooks(code)
+    schedule_warmup(list(warm or stock_codes))
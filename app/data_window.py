@@ -0,0 +1,320 @@
+"""
+Window-aware Data Retrieval untuk stock_daily & broker_summary
+
+get_price_data / get_broker_data sebelumnya selalu mengambil seluruh histori
+saham, lalu caller memotongnya di pandas (.tail(), filter tanggal). Modul ini
+mendorong (push down) jendela tanggal, proyeksi kolom dan limit baris ke
+sumber data:
+
+- Snapshot lokal (snapshot_store): array di-slice dengan searchsorted pada
+  kolom date sebelum DataFrame dibangun - hanya baris & kolom jendela yang
+  dibaca dari memory-map.
+- Database: WHERE date >= / <=, daftar kolom eksplisit dan LIMIT di SQL.
+
+Hasil query database disimpan di window cache per (saham, tabel). Request
+dengan jendela yang lebih kecil (dan kolom subset) dilayani dengan slicing
+dari superset yang sudah ada. Jika tidak tercover, jendela baru di-fetch
+sebagai gabungan jendela lama + request, sehingga superset tumbuh dan request
+berikutnya tetap hit. Cache divalidasi dengan watermark saham (data_version).
+
+Semantik jendela:
+    days       : hari kalender ke belakang dari tanggal terakhir saham itu
+                 (sama dengan filter analysis_days di signal_validation)
+    start_date : tanggal awal (inklusif)
+    end_date   : tanggal akhir (inklusif)
+    limit      : hanya N baris terakhir (setelah filter tanggal)
+"""
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from database import execute_query
+from data_version import get_data_version, register_invalidation_hook
+from snapshot_store import SNAPSHOT_TABLES, get_fresh_arrays
+
+# Kolom & urutan per tabel (sama dengan snapshot_store dan query lama)
+WINDOW_TABLES = {
+    'stock_daily': {
+        'columns': SNAPSHOT_TABLES['stock_daily']['columns'],
+        'order_by': 'date',
+        'reverse_order_by': 'date DESC',
+    },
+    'broker_summary': {
+        'columns': SNAPSHOT_TABLES['broker_summary']['columns'],
+        'order_by': 'date, net_value DESC',
+        'reverse_order_by': 'date DESC, net_value ASC',
+    },
+}
+TEXT_COLUMNS = ('date', 'broker_code')
+
+# Jumlah (saham, tabel) yang disimpan di window cache (LRU)
+WINDOW_CACHE_MAX_ENTRIES = 64
+
+DateLike = Union[str, date, pd.Timestamp, None]
+
+_window_cache: "OrderedDict[tuple, Dict]" = OrderedDict()
+_window_lock = threading.Lock()
+_window_stats = {'hits': 0, 'misses': 0}
+
+
+# ============================================================
+# HELPERS
+# ============================================================
+
+def _to_timestamp(value: DateLike) -> Optional[pd.Timestamp]:
+    if value is None:
+        return None
+    return pd.Timestamp(value).normalize()
+
+
+def _resolve_columns(table: str, columns: Optional[List[str]]) -> List[str]:
+    """Kolom yang diminta (urutan tabel), date selalu ikut"""
+    all_columns = WINDOW_TABLES[table]['columns']
+    if columns is None:
+        return list(all_columns)
+    unknown = set(columns) - set(all_columns)
+    if unknown:
+        raise ValueError(f"Unknown columns for {table}: {sorted(unknown)}")
+    wanted = set(columns) | {'date'}
+    return [c for c in all_columns if c in wanted]
+
+
+def _finalize_frame(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Tipe kolom sama dengan get_price_data lama (date datetime, angka float NaN -> 0)"""
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    df['date'] = pd.to_datetime(df['date'])
+    for col in columns:
+        if col not in TEXT_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    return df
+
+
+def _slice_frame(df: pd.DataFrame, start: Optional[pd.Timestamp], end: Optional[pd.Timestamp],
+                 limit: Optional[int], columns: List[str]) -> pd.DataFrame:
+    """Slice frame terurut tanggal dengan searchsorted (tanpa boolean mask penuh)"""
+    dates = df['date'].values
+    lo = 0 if start is None else int(np.searchsorted(dates, start.to_datetime64(), side='left'))
+    hi = len(df) if end is None else int(np.searchsorted(dates, end.to_datetime64(), side='right'))
+    if limit is not None:
+        lo = max(lo, hi - limit)
+    return df.iloc[lo:hi][columns].reset_index(drop=True)
+
+
+# ============================================================
+# SNAPSHOT PATH
+# ============================================================
+
+def _window_from_snapshot(arrays: Dict[str, np.ndarray], columns: List[str], days: Optional[int],
+                          start: Optional[pd.Timestamp], end: Optional[pd.Timestamp],
+                          limit: Optional[int]) -> pd.DataFrame:
+    """Slice array snapshot (memory-mapped) lalu bangun DataFrame hanya untuk jendela"""
+    dates = arrays['date']
+    n = len(dates)
+    if days is not None and n:
+        anchor = pd.Timestamp(dates[n - 1]) - pd.Timedelta(days=days)
+        start = anchor if start is None else max(start, anchor)
+    lo = 0 if start is None else int(np.searchsorted(dates, np.datetime64(start.date(), 'D'), side='left'))
+    hi = n if end is None else int(np.searchsorted(dates, np.datetime64(end.date(), 'D'), side='right'))
+    if limit is not None:
+        lo = max(lo, hi - limit)
+    df = pd.DataFrame({col: np.asarray(arrays[col][lo:hi]) for col in columns})
+    return _finalize_frame(df, columns)
+
+
+# ============================================================
+# DATABASE PATH
+# ============================================================
+
+def _query_window(stock_code: str, table: str, columns: List[str], days: Optional[int],
+                  start: Optional[pd.Timestamp], end: Optional[pd.Timestamp],
+                  limit: Optional[int]) -> pd.DataFrame:
+    """Fetch jendela dari database dengan filter tanggal, proyeksi kolom dan LIMIT di SQL"""
+    spec = WINDOW_TABLES[table]
+    where = ["stock_code = %s"]
+    params = [stock_code]
+    if days is not None:
+        where.append(f"date >= (SELECT MAX(date) FROM {table} WHERE stock_code = %s) - %s")
+        params.extend([stock_code, int(days)])
+    if start is not None:
+        where.append("date >= %s")
+        params.append(start.date())
+    if end is not None:
+        where.append("date <= %s")
+        params.append(end.date())
+
+    select = f"SELECT {', '.join(columns)} FROM {table} WHERE {' AND '.join(where)}"
+    if limit is not None:
+        # Ambil N baris terakhir, lalu urutkan kembali naik
+        query = f"""
+            SELECT * FROM ({select} ORDER BY {spec['reverse_order_by']} LIMIT %s) AS w
+            ORDER BY {spec['order_by']}
+        """
+        params.append(int(limit))
+    else:
+        query = f"{select} ORDER BY {spec['order_by']}"
+
+    # Tidak di-cache di query cache - window cache di bawah yang menyimpan superset
+    rows = execute_query(query, tuple(params), use_cache=False)
+    return _finalize_frame(pd.DataFrame(rows), columns)
+
+
+def _covers(entry: Dict, columns: List[str], start: Optional[pd.Timestamp],
+            end: Optional[pd.Timestamp], limit: Optional[int]) -> bool:
+    """Apakah entry cache memuat seluruh jendela yang diminta"""
+    if not set(columns) <= entry['columns']:
+        return False
+    if entry['end'] is not None and (end is None or end > entry['end']):
+        return False
+    if entry['start'] is None or (start is not None and start >= entry['start']):
+        return True
+    # Request limit tetap tercover jika bagian lengkap superset punya >= limit baris
+    if limit is None:
+        return False
+    dates = entry['df']['date'].values
+    lo = int(np.searchsorted(dates, entry['start'].to_datetime64(), side='left'))
+    hi = len(dates) if end is None else int(np.searchsorted(dates, end.to_datetime64(), side='right'))
+    return hi - lo >= limit
+
+
+def _window_bounds(entry: Dict) -> tuple:
+    start = pd.Timestamp.min if entry['start'] is None else entry['start']
+    end = pd.Timestamp.max if entry['end'] is None else entry['end']
+    return start, end
+
+
+def _is_superset(new: Dict, old: Dict) -> bool:
+    new_start, new_end = _window_bounds(new)
+    old_start, old_end = _window_bounds(old)
+    return new_start <= old_start and new_end >= old_end and new['columns'] >= old['columns']
+
+
+def _cached_window(stock_code: str, table: str, columns: List[str], days: Optional[int],
+                   start: Optional[pd.Timestamp], end: Optional[pd.Timestamp],
+                   limit: Optional[int]) -> pd.DataFrame:
+    """Layani jendela dari window cache, fetch superset baru jika tidak tercover"""
+    key = (stock_code, table)
+    version = get_data_version(stock_code)
+
+    with _window_lock:
+        entry = _window_cache.get(key)
+        if entry is not None and entry['version'] != version:
+            del _window_cache[key]
+            entry = None
+
+    # days -> start: anchor (tanggal terakhir) diketahui dari entry yang open-ended
+    if days is not None and entry is not None and entry['last_date'] is not None:
+        anchor = entry['last_date'] - pd.Timedelta(days=days)
+        start = anchor if start is None else max(start, anchor)
+        days = None
+
+    if days is None and entry is not None and _covers(entry, columns, start, end, limit):
+        with _window_lock:
+            _window_cache.move_to_end(key)
+            _window_stats['hits'] += 1
+        if entry['start'] is not None:
+            start = entry['start'] if start is None else max(start, entry['start'])
+        return _slice_frame(entry['df'], start, end, limit, columns)
+
+    with _window_lock:
+        _window_stats['misses'] += 1
+
+    # Request rentang tanggal biasa: fetch gabungan dengan jendela lama agar superset tumbuh
+    fetch_columns, fetch_start, fetch_end = columns, start, end
+    if entry is not None and days is None and limit is None:
+        fetch_columns = [c for c in WINDOW_TABLES[table]['columns'] if c in entry['columns'] or c in columns]
+        fetch_start = None if start is None or entry['start'] is None else min(start, entry['start'])
+        fetch_end = None if end is None or entry['end'] is None else max(end, entry['end'])
+
+    df = _query_window(stock_code, table, fetch_columns, days, fetch_start, fetch_end, limit)
+    if df.empty:
+        return df[columns]
+
+    # Batas awal yang pasti lengkap: filter days mengambil semua baris sejak tanggal pertama,
+    # sedangkan LIMIT bisa memotong baris pada tanggal pertama (broker: banyak baris per tanggal)
+    stored_start = fetch_start
+    if days is not None:
+        stored_start = df['date'].iloc[0]
+    if limit is not None and len(df) >= limit:
+        stored_start = df['date'].iloc[0] + pd.Timedelta(days=1)
+
+    new_entry = {
+        'version': version,
+        'columns': frozenset(fetch_columns),
+        'start': stored_start,
+        'end': fetch_end,
+        'last_date': df['date'].iloc[-1] if fetch_end is None else None,
+        'df': df,
+    }
+    if entry is None or _is_superset(new_entry, entry):
+        with _window_lock:
+            _window_cache[key] = new_entry
+            _window_cache.move_to_end(key)
+            while len(_window_cache) > WINDOW_CACHE_MAX_ENTRIES:
+                _window_cache.popitem(last=False)
+
+    if days is not None or limit is not None:
+        return df[columns].reset_index(drop=True)
+    return _slice_frame(df, start, end, None, columns)
+
+
+# ============================================================
+# PUBLIC API
+# ============================================================
+
+def fetch_window(stock_code: str, table: str, columns: List[str] = None, days: int = None,
+                 start_date: DateLike = None, end_date: DateLike = None,
+                 limit: int = None) -> pd.DataFrame:
+    """
+    Ambil jendela data satu saham dengan filter yang di-push down ke sumber data.
+
+    Args:
+        stock_code: Kode saham
+        table: 'stock_daily' atau 'broker_summary'
+        columns: Proyeksi kolom (default semua; 'date' selalu ikut)
+        days: Hari kalender ke belakang dari tanggal terakhir saham
+        start_date / end_date: Batas tanggal inklusif
+        limit: Hanya N baris terakhir
+
+    Returns:
+        DataFrame terurut seperti query asli (date, lalu net_value DESC untuk broker)
+    """
+    if table not in WINDOW_TABLES:
+        raise ValueError(f"Unsupported table: {table}")
+    columns = _resolve_columns(table, columns)
+    start = _to_timestamp(start_date)
+    end = _to_timestamp(end_date)
+
+    arrays = get_fresh_arrays(stock_code, table)
+    if arrays is not None:
+        return _window_from_snapshot(arrays, columns, days, start, end, limit)
+    return _cached_window(stock_code, table, columns, days, start, end, limit)
+
+
+def clear_window_cache(stock_code: str = None):
+    """Hapus window cache (semua, atau hanya satu saham)"""
+    with _window_lock:
+        if stock_code is None:
+            _window_cache.clear()
+        else:
+            for key in [k for k in _window_cache if k[0] == stock_code]:
+                del _window_cache[key]
+
+
+def get_window_cache_stats() -> Dict:
+    """Statistik window cache untuk monitoring"""
+    with _window_lock:
+        total = _window_stats['hits'] + _window_stats['misses']
+        return {
+            'hits': _window_stats['hits'],
+            'misses': _window_stats['misses'],
+            'hit_rate': f"{(_window_stats['hits'] / total * 100) if total > 0 else 0:.1f}%",
+            'entries': len(_window_cache),
+            'rows': sum(len(e['df']) for e in _window_cache.values()),
+        }
+
+
+register_invalidation_hook(clear_window_cache)
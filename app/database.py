@@ -7,8 +7,11 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 from psycopg2 import pool
 from contextlib import contextmanager
-from functools import wraps
+from functools import lru_cache, wraps
+from collections import OrderedDict, defaultdict
 import hashlib
+import re
+import sys
 import time
 import threading
 
@@ -70,6 +73,32 @@ def get_pool():
                     _connection_pool = None
     return _connection_pool
 
+# Pool warisan process induk setelah fork (lihat reset_connection_pool)
+_inherited_pools = []
+
+
+def reset_connection_pool():
+    """
+    Lepas pool warisan setelah fork dan buat pool baru saat dipakai berikutnya.
+
+    Child hasil fork (job background Dash, worker ProcessPoolExecutor) mewarisi
+    socket psycopg2 milik process induk. Memakai socket itu bersamaan dengan
+    induk merusak protokol, dan menutupnya (close / GC) mengirim Terminate ke
+    server sehingga sesi induk ikut putus. Pool lama karena itu tidak ditutup,
+    hanya disimpan referensinya agar tidak pernah di-GC.
+    """
+    global _connection_pool, _pool_lock
+    if _connection_pool is not None:
+        _inherited_pools.append(_connection_pool)
+        _connection_pool = None
+    # Lock bisa sedang dipegang thread lain saat fork - buat baru
+    _pool_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_connection_pool)
+
+
 @contextmanager
 def get_connection():
     """Context manager untuk database connection from pool"""
@@ -111,70 +140,286 @@ def get_cursor(commit=True):
 # QUERY CACHING (untuk data update harian)
 # ============================================================
 
+# Tabel yang disentuh query (untuk tag invalidasi)
+_TABLE_PATTERN = re.compile(r'\b(?:FROM|JOIN|INTO|UPDATE)\s+([a-zA-Z_][a-zA-Z0-9_]*)', re.IGNORECASE)
+# Placeholder psycopg2: %s / %(name)s (%% = persen literal)
+_PLACEHOLDER_PATTERN = re.compile(r'%(?:\((\w+)\))?s|%%')
+# Placeholder yang dibandingkan dengan kolom stock_code:
+# stock_code = %s, stock_code = ANY(%s), stock_code IN %s, stock_code IN (%s, %s)
+_STOCK_FILTER_PATTERN = re.compile(
+    r'\bstock_code\s*(?:=\s*(?:ANY\s*\(\s*)?|IN\s*\(?\s*)(%(?:\(\w+\))?s(?:\s*,\s*%(?:\(\w+\))?s)*)',
+    re.IGNORECASE
+)
+# INSERT INTO t (kolom, ...) VALUES ( -> posisi stock_code di daftar kolom
+_INSERT_PATTERN = re.compile(r'\bINSERT\s+INTO\s+\w+\s*\(([^)]*)\)\s*VALUES\s*\(', re.IGNORECASE)
+_WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE', 'TRUNCATE')
+
+
+def extract_tables(query):
+    """Ambil nama tabel yang disentuh query (lowercase)"""
+    return {t.lower() for t in _TABLE_PATTERN.findall(query)}
+
+
+def _insert_stock_span(query, match):
+    """Rentang teks item VALUES yang mengisi kolom stock_code (None jika tidak ada)"""
+    columns = [c.strip().lower() for c in match.group(1).split(',')]
+    if 'stock_code' not in columns:
+        return None
+    target = columns.index('stock_code')
+    # Pisah item VALUES (...) pada koma level teratas
+    item, start, depth = 0, match.end(), 0
+    for pos in range(match.end(), len(query)):
+        ch = query[pos]
+        if ch == '(':
+            depth += 1
+        elif ch in '),' and depth == 0:
+            if item == target:
+                return start, pos
+            if ch == ')':
+                return None
+            item, start = item + 1, pos + 1
+        elif ch == ')':
+            depth -= 1
+    return None
+
+
+@lru_cache(maxsize=1024)
+def _stock_param_slots(query):
+    """
+    Parameter query yang berisi kode saham: index (%s) atau nama (%(name)s)
+    dari placeholder di posisi stock_code. Di-cache per teks query.
+    """
+    spans = [m.span(1) for m in _STOCK_FILTER_PATTERN.finditer(query)]
+    for m in _INSERT_PATTERN.finditer(query):
+        span = _insert_stock_span(query, m)
+        if span:
+            spans.append(span)
+    if not spans:
+        return ()
+    placeholders = [m for m in _PLACEHOLDER_PATTERN.finditer(query) if m.group(0) != '%%']
+    return tuple(
+        m.group(1) if m.group(1) is not None else index
+        for index, m in enumerate(placeholders)
+        if any(lo <= m.start() < hi for lo, hi in spans)
+    )
+
+
+def extract_stock_codes(query, params):
+    """
+    Ambil kode saham dari parameter di posisi kolom stock_code
+    (stock_code = %s / = ANY(%s) / IN (...), atau kolom stock_code di INSERT).
+    Parameter lain tidak pernah dianggap kode saham walau berbentuk 4 huruf
+    kapital ('SELL', 'HOLD', 'BUMN').
+    """
+    if params is None:
+        return set()
+    if isinstance(params, (str, bytes)):
+        params = (params,)
+    codes = set()
+    for slot in _stock_param_slots(query):
+        try:
+            value = params[slot]
+        except (KeyError, IndexError, TypeError):
+            continue
+        values = value if isinstance(value, (list, tuple)) else (value,)
+        codes.update(v for v in values if isinstance(v, str))
+    return codes
+
+
+def estimate_size(data, sample=20):
+    """
+    Estimasi ukuran hasil query dalam bytes.
+    Untuk list of rows, ukuran dihitung dari sampel rows lalu diskalakan.
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return len(data)
+    if not isinstance(data, list):
+        return sys.getsizeof(data)
+    n = len(data)
+    if n == 0:
+        return sys.getsizeof(data)
+    step = max(1, n // sample)
+    sampled = data[::step]
+    total = 0
+    for row in sampled:
+        values = row.values() if isinstance(row, dict) else (row if isinstance(row, (list, tuple)) else (row,))
+        total += sys.getsizeof(row)
+        for v in values:
+            total += len(v) if isinstance(v, (bytes, bytearray, memoryview)) else sys.getsizeof(v)
+    return sys.getsizeof(data) + int(total * n / len(sampled))
+
+
 class QueryCache:
     """
-    Simple in-memory cache for database queries.
+    In-memory LRU cache for database queries.
     Perfect for daily-updated data - cache expires after 1 hour.
-    Limited to max_entries to prevent unbounded memory growth.
+
+    - O(1) get/set/evict (OrderedDict, least recently used evicted first)
+    - Bounded by max_entries AND max_bytes (estimated result size)
+    - Entries tagged by table ('table:stock_daily') and stock ('stock:BBCA'),
+      so an import can invalidate exactly the entries that depend on it
+    - Per-tag hit/miss counters
     """
-    def __init__(self, default_ttl=3600, max_entries=100):  # 1 hour default, max 100 entries
-        self._cache = {}
+    def __init__(self, default_ttl=3600, max_entries=2000, max_bytes=128 * 1024 * 1024):
+        self._cache = OrderedDict()
+        self._tag_index = defaultdict(set)
         self._lock = threading.Lock()
         self.default_ttl = default_ttl
         self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
         self.hits = 0
         self.misses = 0
+        self.evictions = 0
+        self._tag_hits = defaultdict(int)
+        self._tag_misses = defaultdict(int)
 
     def _make_key(self, query, params):
         """Generate cache key from query and params"""
         key_str = f"{query}:{str(params)}"
         return hashlib.md5(key_str.encode()).hexdigest()
 
-    def get(self, query, params=None):
+    @staticmethod
+    def make_tags(query, params=None, extra_tags=None):
+        """Build tags for a query: tables touched + stock codes bound to stock_code"""
+        tags = {f"table:{t}" for t in extract_tables(query)}
+        tags.update(f"stock:{c}" for c in extract_stock_codes(query, params))
+        if extra_tags:
+            tags.update(extra_tags)
+        return tags
+
+    def _remove(self, key):
+        """Remove entry and its tag index references (lock must be held)"""
+        entry = self._cache.pop(key)
+        self.total_bytes -= entry['size']
+        for tag in entry['tags']:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+    def get(self, query, params=None, tags=None):
         """Get cached result if valid"""
         key = self._make_key(query, params)
         with self._lock:
-            if key in self._cache:
-                entry = self._cache[key]
+            entry = self._cache.get(key)
+            if entry is not None:
                 if time.time() < entry['expires']:
+                    self._cache.move_to_end(key)
                     self.hits += 1
+                    for tag in entry['tags']:
+                        self._tag_hits[tag] += 1
                     return entry['data']
-                else:
-                    # Expired, remove it
-                    del self._cache[key]
+                # Expired, remove it
+                self._remove(key)
             self.misses += 1
+            for tag in (tags if tags is not None else self.make_tags(query, params)):
+                self._tag_misses[tag] += 1
             return None
 
-    def set(self, query, params, data, ttl=None):
-        """Cache query result (evicts oldest if max_entries reached)"""
+    def set(self, query, params, data, ttl=None, tags=None):
+        """Cache query result (evicts least recently used entries when full)"""
         key = self._make_key(query, params)
         ttl = ttl or self.default_ttl
+        size = estimate_size(data)
+        if size > self.max_bytes // 4:
+            return  # Too large to cache (e.g. blobs)
+        tags = tags if tags is not None else self.make_tags(query, params)
         with self._lock:
-            # Evict oldest entries if cache is full
-            if len(self._cache) >= self.max_entries and key not in self._cache:
-                oldest_key = min(self._cache, key=lambda k: self._cache[k]['created'])
-                del self._cache[oldest_key]
+            if key in self._cache:
+                self._remove(key)
+            while self._cache and (len(self._cache) >= self.max_entries or
+                                   self.total_bytes + size > self.max_bytes):
+                oldest_key = next(iter(self._cache))
+                self._remove(oldest_key)
+                self.evictions += 1
+            now = time.time()
             self._cache[key] = {
                 'data': data,
-                'expires': time.time() + ttl,
-                'created': time.time()
+                'query': query,
+                'params': params,
+                'tags': frozenset(tags),
+                'size': size,
+                'expires': now + ttl,
+                'created': now
             }
+            self.total_bytes += size
+            for tag in tags:
+                self._tag_index[tag].add(key)
 
     def clear(self):
         """Clear all cache"""
         with self._lock:
             self._cache.clear()
+            self._tag_index.clear()
+            self.total_bytes = 0
             print("Query cache cleared")
 
+    def invalidate_tags(self, tags):
+        """Remove every entry carrying any of the given tags. Returns count removed."""
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self._tag_index.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def invalidate_stock(self, stock_code, tables=None):
+        """
+        Invalidate entries affected by a data change for one stock.
+
+        Removes entries tagged with the stock, plus entries reading the given
+        tables that are not scoped to any stock (cross-stock queries such as
+        stock lists or landing-page aggregates). If tables is given, stock
+        entries are only removed when they touch one of those tables.
+        """
+        stock_tag = f"stock:{stock_code}"
+        with self._lock:
+            keys = set()
+            stock_keys = self._tag_index.get(stock_tag, set())
+            if tables is None:
+                keys.update(stock_keys)
+            else:
+                for table in tables:
+                    table_keys = self._tag_index.get(f"table:{table}", set())
+                    keys.update(stock_keys & table_keys)
+                    keys.update(k for k in table_keys
+                                if not any(t.startswith('stock:') for t in self._cache[k]['tags']))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
     def clear_pattern(self, pattern):
-        """Clear cache entries containing pattern in query"""
+        """Clear cache entries containing pattern in query text or params"""
         with self._lock:
-            keys_to_delete = []
-            for key in self._cache:
-                if pattern in str(self._cache[key].get('query', '')):
-                    keys_to_delete.append(key)
+            keys_to_delete = [
+                key for key, entry in self._cache.items()
+                if pattern in entry['query'] or pattern in str(entry['params'])
+            ]
             for key in keys_to_delete:
-                del self._cache[key]
+                self._remove(key)
+            return len(keys_to_delete)
+
+    def tag_stats(self, prefix=None):
+        """Per-tag hit/miss metrics (optionally filtered by tag prefix, e.g. 'stock:')"""
+        with self._lock:
+            tags = set(self._tag_hits) | set(self._tag_misses) | set(self._tag_index)
+            result = {}
+            for tag in sorted(tags):
+                if prefix and not tag.startswith(prefix):
+                    continue
+                hits = self._tag_hits.get(tag, 0)
+                misses = self._tag_misses.get(tag, 0)
+                total = hits + misses
+                result[tag] = {
+                    'hits': hits,
+                    'misses': misses,
+                    'hit_rate': f"{(hits / total * 100) if total > 0 else 0:.1f}%",
+                    'entries': len(self._tag_index.get(tag, ()))
+                }
+            return result
 
     def stats(self):
         """Get cache statistics"""
@@ -184,17 +429,24 @@ class QueryCache:
             'hits': self.hits,
             'misses': self.misses,
             'hit_rate': f"{hit_rate:.1f}%",
-            'entries': len(self._cache)
+            'entries': len(self._cache),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions
         }
 
-# Global cache instance - limited to 100 entries to control memory
-query_cache = QueryCache(default_ttl=3600, max_entries=100)
+# Global cache instance - bounded by entry count and estimated memory
+query_cache = QueryCache(
+    default_ttl=3600,
+    max_entries=int(os.environ.get('QUERY_CACHE_MAX_ENTRIES', 2000)),
+    max_bytes=int(os.environ.get('QUERY_CACHE_MAX_MB', 128)) * 1024 * 1024
+)
 
 # ============================================================
 # CACHED QUERY EXECUTION
 # ============================================================
 
-def execute_query(query, params=None, fetch=True, use_cache=True, cache_ttl=None):
+def execute_query(query, params=None, fetch=True, use_cache=True, cache_ttl=None, cache_tags=None):
     """
     Execute query dengan optional caching.
 
@@ -204,23 +456,48 @@ def execute_query(query, params=None, fetch=True, use_cache=True, cache_ttl=None
         fetch: Whether to fetch results
         use_cache: Enable/disable caching (default: True)
         cache_ttl: Custom TTL in seconds (default: 1 hour)
+        cache_tags: Extra invalidation tags (default: tables + stock codes detected from query)
+
+    Write queries (INSERT/UPDATE/DELETE) invalidate cached entries of the
+    tables they touch, scoped to the stock codes in params when present.
     """
+    statement = query.strip().upper()
+    is_select = statement.startswith('SELECT')
+    tags = None
+
     # Check cache first (only for SELECT queries)
-    if use_cache and fetch and query.strip().upper().startswith('SELECT'):
-        cached = query_cache.get(query, params)
+    if use_cache and fetch and is_select:
+        tags = QueryCache.make_tags(query, params, cache_tags)
+        cached = query_cache.get(query, params, tags)
         if cached is not None:
             return cached
 
     # Execute query
     with get_cursor() as cursor:
         cursor.execute(query, params)
-        if fetch:
-            result = cursor.fetchall()
-            # Cache the result
-            if use_cache and query.strip().upper().startswith('SELECT'):
-                query_cache.set(query, params, result, cache_ttl)
-            return result
-        return None
+        result = cursor.fetchall() if fetch else None
+
+    if statement.startswith(_WRITE_PREFIXES):
+        _invalidate_for_write(query, params)
+
+    if fetch:
+        # Cache the result
+        if use_cache and is_select:
+            query_cache.set(query, params, result, cache_ttl, tags)
+        return result
+    return None
+
+def _invalidate_for_write(query, params):
+    """Invalidate cached reads affected by a write query"""
+    tables = extract_tables(query)
+    if not tables:
+        return
+    stock_codes = extract_stock_codes(query, params)
+    if stock_codes:
+        for code in stock_codes:
+            query_cache.invalidate_stock(code, tables)
+    else:
+        query_cache.invalidate_tags(f"table:{t}" for t in tables)
 
 def execute_query_no_cache(query, params=None, fetch=True):
     """Execute query without caching - for real-time needs"""
@@ -230,6 +507,7 @@ def execute_many(query, params_list):
     """Execute many untuk batch insert"""
     with get_cursor() as cursor:
         cursor.executemany(query, params_list)
+    query_cache.invalidate_tags(f"table:{t}" for t in extract_tables(query))
 
 # ============================================================
 # CACHE MANAGEMENT
@@ -239,21 +517,29 @@ def clear_cache():
     """Clear all query cache - call after data update"""
     query_cache.clear()
 
-def clear_stock_cache(stock_code):
-    """Clear cache for specific stock"""
-    query_cache.clear_pattern(stock_code)
+def clear_stock_cache(stock_code, tables=None):
+    """
+    Clear cache for specific stock.
+    If tables is given, only entries reading those tables are cleared
+    (plus cross-stock entries on those tables).
+    """
+    return query_cache.invalidate_stock(stock_code, tables)
 
 def get_cache_stats():
     """Get cache statistics for monitoring"""
     return query_cache.stats()
 
-def refresh_cache_for_stock(stock_code):
+def get_cache_tag_stats(prefix=None):
+    """Get per-tag (table:/stock:) hit/miss metrics"""
+    return query_cache.tag_stats(prefix)
+
+def refresh_cache_for_stock(stock_code, tables=None):
     """
     Refresh cache for a specific stock after data import.
     Call this after importing new data for a stock.
     """
-    clear_stock_cache(stock_code)
-    print(f"Cache cleared for stock: {stock_code}")
+    removed = clear_stock_cache(stock_code, tables)
+    print(f"Cache cleared for stock: {stock_code} ({removed} entries)")
 
 # ============================================================
 # PRELOAD COMMON QUERIES
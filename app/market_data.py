@@ -0,0 +1,95 @@
+"""
+Market Data Bundle - load data harga & broker sekali per analisis
+
+Setiap komponen composite_analyzer sebelumnya memanggil get_price_data /
+get_broker_data sendiri-sendiri, sehingga satu halaman analisis membangun
+ulang DataFrame (plus pd.to_numeric) puluhan kali. MarketData memuat kedua
+frame sekali, dengan tipe float64 dan urutan tanggal yang sudah pasti,
+lalu diteruskan ke setiap komponen.
+
+Frame di dalam bundle dipakai bersama (shared) - komponen yang perlu
+menambah kolom harus .copy() dulu. Frame broker di-load lazy, sehingga
+cache hit di get_comprehensive_analysis hanya butuh fetch harga.
+"""
+import pandas as pd
+from typing import Optional
+from analyzer import get_price_data, get_broker_data
+
+PRICE_NUMERIC_COLS = ['open_price', 'high_price', 'low_price', 'close_price', 'volume', 'value', 'net_foreign']
+BROKER_NUMERIC_COLS = ['buy_value', 'sell_value', 'net_value', 'buy_lot', 'sell_lot', 'net_lot']
+
+
+class MarketData:
+    """
+    Bundle data pasar untuk satu saham.
+
+    Attributes:
+        stock_code: Kode saham
+        price: DataFrame harga (float64), urut berdasarkan date, RangeIndex
+        broker: DataFrame broker (float64), urut berdasarkan date lalu net_value DESC
+        version: String versi data - berubah jika ada data harga baru untuk saham ini
+    """
+    def __init__(self, stock_code: str, price_df: pd.DataFrame, broker_df: pd.DataFrame = None):
+        self.stock_code = stock_code
+        self.price = _normalize_frame(price_df, PRICE_NUMERIC_COLS, ['date'])
+        self._broker = None
+        if broker_df is not None:
+            self._broker = _normalize_frame(broker_df, BROKER_NUMERIC_COLS, ['date', 'net_value'], [True, False])
+        self._price_by_date = None
+        self._broker_by_date = None
+
+    @property
+    def broker(self) -> pd.DataFrame:
+        """Frame broker (di-load saat pertama kali diakses)"""
+        if self._broker is None:
+            self._broker = _normalize_frame(get_broker_data(self.stock_code), BROKER_NUMERIC_COLS,
+                                            ['date', 'net_value'], [True, False])
+        return self._broker
+
+    @property
+    def latest_date(self) -> Optional[pd.Timestamp]:
+        """Tanggal harga terakhir (None jika data kosong)"""
+        if self.price.empty:
+            return None
+        return self.price['date'].iloc[-1]
+
+    @property
+    def version(self) -> str:
+        """Versi data: tanggal terakhir + jumlah baris harga"""
+        if self.latest_date is None:
+            return f"{self.stock_code}_default"
+        return f"{self.stock_code}_{self.latest_date.strftime('%Y%m%d')}_{len(self.price)}"
+
+    @property
+    def price_by_date(self) -> pd.DataFrame:
+        """Frame harga dengan DatetimeIndex (dibuat sekali, lazy)"""
+        if self._price_by_date is None:
+            self._price_by_date = self.price.set_index('date', drop=False)
+        return self._price_by_date
+
+    @property
+    def broker_by_date(self) -> pd.DataFrame:
+        """Frame broker dengan DatetimeIndex (dibuat sekali, lazy)"""
+        if self._broker_by_date is None:
+            self._broker_by_date = self.broker.set_index('date', drop=False)
+        return self._broker_by_date
+
+    def __repr__(self):
+        return f"MarketData({self.version})"
+
+
+def _normalize_frame(df: pd.DataFrame, numeric_cols, sort_cols, ascending=True) -> pd.DataFrame:
+    """Pastikan kolom numerik float64 dan frame sudah terurut"""
+    if df.empty:
+        return df
+    df = df.copy()
+    df['date'] = pd.to_datetime(df['date'])
+    for col in numeric_cols:
+        if col in df.columns:
+            df[col] = df[col].astype('float64')
+    return df.sort_values(sort_cols, ascending=ascending, kind='mergesort').reset_index(drop=True)
+
+
+def load_market_data(stock_code: str) -> MarketData:
+    """Load bundle data pasar (1x fetch harga, broker menyusul 1x saat dibutuhkan)"""
+    return MarketData(stock_code, get_price_data(stock_code))
@@ -6,7 +6,15 @@ import pandas as pd
 import re
 from datetime import datetime
 from typing import Tuple, List, Dict
-from database import get_cursor, execute_query
+from database import get_cursor, execute_query, refresh_cache_for_stock
+from snapshot_store import refresh_snapshot
+from data_version import bump_data_version
+from broker_flow import refresh_broker_flow
+from broker_sheet import parse_broker_rows, parse_broker_rows_vectorized
+from bulk_import import (
+    PRICE_COLUMNS, PRICE_KEY, BROKER_COLUMNS, BROKER_KEY,
+    price_records, broker_records, bulk_upsert, diff_upsert, format_diff_report
+)
 
 def safe_float(val) -> float:
     """
@@ -66,9 +74,11 @@ def parse_change_string(change_str) -> Tuple[float, float]:
     except:
         return 0.0, 0.0
 
-def read_excel_data(file_path: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+def read_excel_data(file_path: str, vectorized: bool = True) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
     Baca file Excel dan return dataframe untuk broker summary dan price data
+
+    vectorized: klasifikasi baris broker dengan operasi pandas (False = loop per baris)
     """
     print(f"Reading Excel file: {file_path}")
 
@@ -90,115 +100,46 @@ def read_excel_data(file_path: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
     print(f"Found {len(price_df)} price records")
 
     # ===== PARSE BROKER SUMMARY DATA (Kolom A-H, index 0-7) =====
-    broker_data = []
-    current_date = None
-
-    for idx, row in df.iterrows():
-        col0 = row[0]
-        col4 = row[4]
-
-        # Cek apakah ini baris tanggal (format: "30 des" atau datetime)
-        if pd.notna(col0):
-            # Cek apakah datetime
-            if isinstance(col0, datetime):
-                current_date = col0.date()
-                continue
-
-            col0_str = str(col0).strip().lower()
-
-            # Skip header row
-            if col0_str == 'buy' or col0_str == 'buy_val':
-                continue
-
-            # Cek apakah tanggal format "30 des" atau similar
-            date_patterns = [
-                r'(\d{1,2})\s*(jan|feb|mar|apr|mei|jun|jul|agu|sep|okt|nov|des)',
-                r'(\d{4}-\d{2}-\d{2})'
-            ]
-
-            is_date_row = False
-            for pattern in date_patterns:
-                if re.search(pattern, col0_str, re.IGNORECASE):
-                    is_date_row = True
-                    break
-
-            if is_date_row and pd.isna(row[1]):
-                # Ini baris tanggal separator
-                # Parse tanggal
-                if isinstance(col0, datetime):
-                    current_date = col0.date()
-                else:
-                    # Parse manual dari string
-                    month_map = {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'mei': 5, 'jun': 6,
-                                'jul': 7, 'agu': 8, 'sep': 9, 'okt': 10, 'nov': 11, 'des': 12}
-                    match = re.search(r'(\d{1,2})\s*(jan|feb|mar|apr|mei|jun|jul|agu|sep|okt|nov|des)',
-                                     col0_str, re.IGNORECASE)
-                    if match:
-                        day = int(match.group(1))
-                        month = month_map.get(match.group(2).lower(), 12)
-                        # Asumsi tahun 2025
-                        current_date = datetime(2025, month, day).date()
-                continue
-
-            # Ini baris data broker (bukan tanggal, bukan header)
-            if current_date and col0_str not in ['buy', '-', '']:
-                buy_broker = col0_str.upper()
-                buy_val = parse_value_string(row[1])
-                buy_lot = parse_value_string(row[2])
-                buy_avg = safe_float(row[3])
-
-                # Tambahkan data buy
-                if buy_broker and buy_broker != '-':
-                    broker_data.append({
-                        'date': current_date,
-                        'broker_code': buy_broker,
-                        'buy_value': buy_val,
-                        'buy_lot': int(buy_lot),
-                        'buy_avg': buy_avg,
-                        'sell_value': 0,
-                        'sell_lot': 0,
-                        'sell_avg': 0
-                    })
-
-        # Process sell side (kolom 4-7)
-        if current_date and pd.notna(col4):
-            col4_str = str(col4).strip().upper()
-            if col4_str not in ['SL', 'SELL', '-', '']:
-                sell_broker = col4_str
-                sell_val = parse_value_string(row[5])
-                sell_lot = parse_value_string(row[6])
-                sell_avg = safe_float(row[7])
-
-                # Cari apakah broker sudah ada untuk tanggal ini
-                found = False
-                for item in broker_data:
-                    if item['date'] == current_date and item['broker_code'] == sell_broker:
-                        item['sell_value'] = sell_val
-                        item['sell_lot'] = int(sell_lot)
-                        item['sell_avg'] = sell_avg
-                        found = True
-                        break
-
-                if not found:
-                    broker_data.append({
-                        'date': current_date,
-                        'broker_code': sell_broker,
-                        'buy_value': 0,
-                        'buy_lot': 0,
-                        'buy_avg': 0,
-                        'sell_value': sell_val,
-                        'sell_lot': int(sell_lot),
-                        'sell_avg': sell_avg
-                    })
+    # Buy & sell digabung per (tanggal, broker) - linear, lihat broker_sheet.py
+    parse_rows = parse_broker_rows_vectorized if vectorized else parse_broker_rows
+    broker_data = parse_rows(
+        df, parse_value_string, safe_float,
+        year_for_month=lambda month: 2025,  # Asumsi tahun 2025 untuk tanggal "30 des"
+    )
 
     broker_df = pd.DataFrame(broker_data)
     print(f"Found {len(broker_df)} broker records")
 
     return broker_df, price_df
 
-def import_price_data(price_df: pd.DataFrame, stock_code: str = 'CDIA'):
-    """Import data harga ke database (replace mode: delete all lalu insert fresh)"""
-    print(f"Importing {len(price_df)} price records (replace mode)...")
+def _import_diff(table: str, columns, key_columns, records, insert_query: str,
+                 stock_code: str, source: str) -> int:
+    """
+    Diff import: hanya tanggal baru / berubah yang ditulis.
+    Cache, snapshot & watermark hanya disentuh jika ada perubahan (snapshot dari tanggal pertama yang berubah).
+    """
+    with get_cursor() as cursor:
+        report = diff_upsert(cursor, table, columns, key_columns, records, insert_query)
+        if table == 'broker_summary' and report['changed_dates']:
+            refresh_broker_flow(stock_code, since=report['first_changed'], cursor=cursor)
+
+    print(f"  {table} diff import {stock_code}: {format_diff_report(report)}")
+    if report['changed_dates']:
+        refresh_cache_for_stock(stock_code, tables=[table])
+        # Bump dulu: snapshot menyimpan versi watermark yang baru di stamp-nya
+        bump_data_version(stock_code, source=source, changed_from=report['first_changed'])
+        refresh_snapshot(stock_code, tables=[table], since=report['first_changed'])
+    return report['rows']
+
+
+def import_price_data(price_df: pd.DataFrame, stock_code: str = 'CDIA', mode: str = 'replace'):
+    """
+    Import data harga ke database.
+
+    mode='replace': delete all lalu insert fresh
+    mode='diff': hanya tanggal yang baru / berubah yang di-upsert (append-only)
+    """
+    print(f"Importing {len(price_df)} price records ({mode} mode)...")
 
     insert_query = """
         INSERT INTO stock_daily
@@ -222,54 +163,37 @@ def import_price_data(price_df: pd.DataFrame, stock_code: str = 'CDIA'):
             change_percent = EXCLUDED.change_percent
     """
 
-    records_imported = 0
+    # Parse kolom sekali (baris yang gagal di-parse dilewati)
+    records = price_records(price_df, stock_code, parse_value_string, parse_change_string)
+
+    if mode == 'diff':
+        return _import_diff('stock_daily', PRICE_COLUMNS, PRICE_KEY, records, insert_query,
+                            stock_code, 'import_price')
+
     with get_cursor() as cursor:
         # Replace mode: hapus semua data price untuk stock ini, lalu insert fresh
         cursor.execute("DELETE FROM stock_daily WHERE stock_code = %s", (stock_code,))
         deleted = cursor.rowcount
         print(f"  Deleted {deleted} old price records for {stock_code}")
-        for _, row in price_df.iterrows():
-            try:
-                # Parse date
-                if isinstance(row['date'], datetime):
-                    date = row['date'].date()
-                elif isinstance(row['date'], str):
-                    date = datetime.strptime(row['date'], '%Y-%m-%d').date()
-                else:
-                    date = pd.to_datetime(row['date']).date()
-
-                # Parse change
-                change_val, change_pct = parse_change_string(row['change'])
-
-                cursor.execute(insert_query, (
-                    stock_code,
-                    date,
-                    float(row['open']) if pd.notna(row['open']) else None,
-                    float(row['high']) if pd.notna(row['high']) else None,
-                    float(row['low']) if pd.notna(row['low']) else None,
-                    float(row['close']) if pd.notna(row['close']) else None,
-                    float(row['avg']) if pd.notna(row['avg']) else None,
-                    int(parse_value_string(row['volume'])),
-                    parse_value_string(row['value']),
-                    int(parse_value_string(row['freq'])),
-                    parse_value_string(row['f_buy']),
-                    parse_value_string(row['f_sell']),
-                    parse_value_string(row['n_foreign']),
-                    change_val,
-                    change_pct
-                ))
-                records_imported += 1
-            except Exception as e:
-                print(f"Error importing row: {row['date']} - {e}")
 
-    print(f"Imported {records_imported} price records")
+        # COPY ke staging + merge (fallback ke row insert jika gagal)
+        records_imported, mode = bulk_upsert(cursor, 'stock_daily', PRICE_COLUMNS, PRICE_KEY,
+                                             records, insert_query)
+
+    print(f"Imported {records_imported} price records ({mode})")
+    refresh_cache_for_stock(stock_code, tables=['stock_daily'])
+    bump_data_version(stock_code, source='import_price')
+    refresh_snapshot(stock_code, tables=['stock_daily'])
     return records_imported
 
-def import_broker_data(broker_df: pd.DataFrame, stock_code: str = 'CDIA'):
-    """Import data broker ke database (replace mode: delete all lalu insert fresh)"""
-    from psycopg2.extras import execute_batch
+def import_broker_data(broker_df: pd.DataFrame, stock_code: str = 'CDIA', mode: str = 'replace'):
+    """
+    Import data broker ke database.
 
-    print(f"Importing {len(broker_df)} broker records (replace mode)...")
+    mode='replace': delete all lalu insert fresh
+    mode='diff': hanya tanggal yang baru / berubah yang ditulis ulang (append-only)
+    """
+    print(f"Importing {len(broker_df)} broker records ({mode} mode)...")
 
     insert_query = """
         INSERT INTO broker_summary
@@ -287,24 +211,12 @@ def import_broker_data(broker_df: pd.DataFrame, stock_code: str = 'CDIA'):
             net_lot = EXCLUDED.net_lot
     """
 
-    # Prepare batch data
-    batch_data = []
-    for _, row in broker_df.iterrows():
-        net_value = row['buy_value'] - row['sell_value']
-        net_lot = row['buy_lot'] - row['sell_lot']
-        batch_data.append((
-            stock_code,
-            row['date'],
-            row['broker_code'],
-            row['buy_value'],
-            row['buy_lot'],
-            row['buy_avg'],
-            row['sell_value'],
-            row['sell_lot'],
-            row['sell_avg'],
-            net_value,
-            net_lot
-        ))
+    # Prepare batch data (konversi per kolom)
+    batch_data = broker_records(broker_df, stock_code)
+
+    if mode == 'diff':
+        return _import_diff('broker_summary', BROKER_COLUMNS, BROKER_KEY, batch_data, insert_query,
+                            stock_code, 'import_broker')
 
     records_imported = 0
     try:
@@ -314,12 +226,14 @@ def import_broker_data(broker_df: pd.DataFrame, stock_code: str = 'CDIA'):
             deleted = cursor.rowcount
             print(f"  Deleted {deleted} old broker records for {stock_code}")
 
-            execute_batch(cursor, insert_query, batch_data, page_size=500)
-            records_imported = len(batch_data)
-            print(f"Batch import successful: {records_imported} records")
+            # COPY ke staging + merge (fallback ke execute_batch jika gagal)
+            records_imported, mode = bulk_upsert(cursor, 'broker_summary', BROKER_COLUMNS, BROKER_KEY,
+                                                 batch_data, insert_query, page_size=500)
+            print(f"Batch import successful ({mode}): {records_imported} records")
     except Exception as e:
         print(f"Batch import error: {e}")
         print("Falling back to individual inserts...")
+        records_imported = 0
         with get_cursor() as cursor:
             cursor.execute("DELETE FROM broker_summary WHERE stock_code = %s", (stock_code,))
             for data in batch_data:
@@ -330,6 +244,10 @@ def import_broker_data(broker_df: pd.DataFrame, stock_code: str = 'CDIA'):
                     print(f"Error: {inner_e}")
 
     print(f"Imported {records_imported} broker records")
+    refresh_cache_for_stock(stock_code, tables=['broker_summary'])
+    refresh_broker_flow(stock_code)
+    bump_data_version(stock_code, source='import_broker')
+    refresh_snapshot(stock_code, tables=['broker_summary'])
     return records_imported
 
 def read_ipo_position_data(file_path: str) -> Tuple[pd.DataFrame, str]:
@@ -495,8 +413,8 @@ def import_ipo_position(ipo_df: pd.DataFrame, stock_code: str, period_str: str =
     return records_imported
 
 
-def import_excel(file_path: str, stock_code: str = 'CDIA'):
-    """Main function untuk import semua data dari Excel"""
+def import_excel(file_path: str, stock_code: str = 'CDIA', mode: str = 'replace'):
+    """Main function untuk import semua data dari Excel (mode: 'replace' / 'diff')"""
     print("=" * 60)
     print(f"Importing data from: {file_path}")
     print(f"Stock code: {stock_code}")
@@ -506,10 +424,10 @@ def import_excel(file_path: str, stock_code: str = 'CDIA'):
     broker_df, price_df = read_excel_data(file_path)
 
     # Import price data
-    price_count = import_price_data(price_df, stock_code)
+    price_count = import_price_data(price_df, stock_code, mode)
 
     # Import broker data
-    broker_count = import_broker_data(broker_df, stock_code)
+    broker_count = import_broker_data(broker_df, stock_code, mode)
 
     # Read and import IPO position data (if exists)
     ipo_df, period_str = read_ipo_position_data(file_path)
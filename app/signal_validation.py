@@ -27,6 +27,7 @@ import pandas as pd
 import numpy as np
 from datetime import timedelta
 from database import execute_query
+from broker_flow import get_broker_flow_daily
 from composite_analyzer import analyze_support_resistance
 from momentum_engine import detect_impulse_signal
 
@@ -137,27 +138,16 @@ def get_daily_flow_timeline(stock_code: str, days: int = 20) -> list:
     - Jumlah broker tidak relevan (banyak broker kecil = retail)
     - Threshold 52% untuk menghindari noise
     """
-    query = """
-        SELECT
-            date,
-            SUM(net_value) as net_flow,
-            SUM(net_lot) as net_lot,
-            SUM(CASE WHEN net_lot > 0 THEN net_lot ELSE 0 END) as buy_lot,
-            SUM(CASE WHEN net_lot < 0 THEN ABS(net_lot) ELSE 0 END) as sell_lot
-        FROM broker_summary
-        WHERE stock_code = %s
-        GROUP BY date
-        ORDER BY date DESC
-        LIMIT %s
-    """
     try:
-        result = execute_query(query, (stock_code, days), use_cache=False)
+        # Agregat harian dari broker_flow_daily (range scan, tanpa GROUP BY)
+        result = get_broker_flow_daily(stock_code, limit=days,
+                                       columns=['net_value', 'net_lot', 'net_buy_lot', 'net_sell_lot'])
         timeline = []
         for row in result:
-            net_flow = float(row.get('net_flow', 0) or 0)
+            net_flow = float(row.get('net_value', 0) or 0)
             net_lot = float(row.get('net_lot', 0) or 0)
-            buy_lot = float(row.get('buy_lot', 0) or 0)
-            sell_lot = float(row.get('sell_lot', 0) or 0)
+            buy_lot = float(row.get('net_buy_lot', 0) or 0)
+            sell_lot = float(row.get('net_sell_lot', 0) or 0)
 
             # BANDARMOLOGY: Pure volume-based dominance
             # Only volume matters - follow the big money
@@ -184,8 +174,8 @@ def get_daily_flow_timeline(stock_code: str, days: int = 20) -> list:
                 'status': status
             })
 
-        # Reverse to show oldest first
-        return list(reversed(timeline))
+        # Sudah urut dari yang terlama
+        return timeline
     except Exception:
         return []
 
@@ -1319,9 +1309,8 @@ def get_comprehensive_validation(stock_code: str, analysis_days: int = 30, param
         params = DEFAULT_PARAMS.copy()
         params['analysis_days'] = analysis_days
 
-    # Fetch data
-    price_df = get_price_data(stock_code)
-    broker_df = get_broker_data(stock_code)
+    # Fetch data (hanya jendela analisis, di-push down ke SQL / snapshot)
+    price_df = get_price_data(stock_code, days=analysis_days)
     stock_info = get_stock_info(stock_code)
 
     if price_df.empty:
@@ -1337,7 +1326,7 @@ def get_comprehensive_validation(stock_code: str, analysis_days: int = 30, param
     start_date = end_date - timedelta(days=analysis_days)
 
     price_filtered = price_df[price_df['date'] >= start_date].copy()
-    broker_filtered = broker_df[broker_df['date'] >= start_date].copy() if not broker_df.empty else broker_df
+    broker_filtered = get_broker_data(stock_code, start_date=start_date)
 
     current_price = price_filtered.iloc[-1]['close_price'] if not price_filtered.empty else 0
     current_date = price_filtered.iloc[-1]['date'] if not price_filtered.empty else None
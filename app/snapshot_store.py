@@ -0,0 +1,371 @@
+"""
+Columnar Snapshot Store untuk stock_daily & broker_summary
+
+Menyimpan histori per saham sebagai file NumPy (.npy) per kolom yang bisa
+di-memory-map, sehingga engine analisis / backtest tidak perlu membaca ulang
+seluruh histori dari Postgres (RealDict rows + konversi NUMERIC -> Decimal)
+setiap kali dipanggil.
+
+Layout:
+    SNAPSHOT_DIR/<STOCK>/<table>/<build>/<kolom>.npy
+    SNAPSHOT_DIR/<STOCK>/<table>/meta.json   (stamp + build + built_at)
+
+Build baru ditulis ke direktori sendiri lalu meta.json (penunjuk build aktif)
+diganti atomik lewat os.replace: crash di tengah build tidak pernah
+menghilangkan snapshot lama. Build sebelumnya disimpan satu generasi untuk
+pembaca yang masih memakainya, sisanya dibersihkan di build berikutnya.
+
+Freshness: snapshot hanya dipakai jika stamp-nya sama dengan stamp di database:
+- jumlah baris + tanggal terakhir (data baru / dihapus)
+- versi watermark saham (data_version; di-bump parser, gdrive_sync, upload_to_web)
+- checksum isi SNAPSHOT_TAIL_DAYS hari terakhir (nilai final menimpa data
+  intraday di tanggal yang sama, juga oleh importer yang tidak bump watermark)
+Query stamp (index range per saham) jauh lebih ringan daripada transfer seluruh
+histori, dan hasil cek di-cache SNAPSHOT_STAMP_TTL detik per proses. Jika stamp
+berbeda, snapshot di-rebuild otomatis dari database.
+"""
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+from datetime import datetime, date
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import RealDictCursor
+from database import get_cursor
+
+# Set SNAPSHOT_ENABLED=0 untuk mematikan snapshot (semua query langsung ke database)
+SNAPSHOT_ENABLED = os.environ.get('SNAPSHOT_ENABLED', '1') != '0'
+SNAPSHOT_DIR = os.environ.get(
+    'SNAPSHOT_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'snapshots')
+)
+
+# Kolom yang disimpan per tabel (urutan = urutan ORDER BY di query asli)
+SNAPSHOT_TABLES = {
+    'stock_daily': {
+        'columns': ['date', 'open_price', 'high_price', 'low_price', 'close_price',
+                    'volume', 'value', 'net_foreign'],
+        'order_by': 'date',
+    },
+    'broker_summary': {
+        'columns': ['date', 'broker_code', 'buy_value', 'sell_value', 'net_value',
+                    'buy_lot', 'sell_lot', 'net_lot'],
+        'order_by': 'date, net_value DESC',
+    },
+}
+
+# Jendela checksum isi data terakhir (hari kalender dari tanggal terakhir)
+SNAPSHOT_TAIL_DAYS = 10
+# Field meta.json yang dibandingkan dengan stamp database
+STAMP_FIELDS = ('rows', 'last_date', 'version', 'tail_hash')
+# Snapshot yang lolos cek stamp dipakai tanpa query stamp ulang selama interval ini (detik).
+# Perubahan dari proses lain terdeteksi paling lambat setelah interval ini (seperti poll watermark).
+SNAPSHOT_STAMP_TTL = 30
+# Direktori build tak terpakai (crash / build lama) dihapus setelah umur ini (detik);
+# build yang sedang ditulis proses lain tidak ikut terhapus
+SNAPSHOT_GC_SECONDS = 300
+
+_build_lock = threading.Lock()
+_stamp_checked: Dict[tuple, float] = {}   # (stock, table) -> time.time() cek stamp terakhir yang lolos
+
+
+# ============================================================
+# PATH & META
+# ============================================================
+
+def _table_dir(stock_code: str, table: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, stock_code.upper(), table)
+
+
+def read_meta(stock_code: str, table: str) -> Optional[Dict]:
+    """Baca meta.json snapshot (None jika belum ada)"""
+    path = os.path.join(_table_dir(stock_code, table), 'meta.json')
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _stamp_query(table: str) -> str:
+    # Baris tail diurutkan berdasarkan teksnya sendiri: checksum tidak bergantung
+    # pada urutan baris yang nilainya sama (mis. net_value broker yang kembar)
+    row_text = "concat_ws(',', " + ", ".join(SNAPSHOT_TABLES[table]['columns']) + ")"
+    return f"""
+        WITH s AS (
+            SELECT COUNT(*) AS rows, MAX(date) AS last_date
+            FROM {table} WHERE stock_code = %(code)s
+        )
+        SELECT s.rows, s.last_date,
+               (SELECT md5(string_agg(r, '|' ORDER BY r)) FROM (
+                    SELECT {row_text} AS r FROM {table}
+                    WHERE stock_code = %(code)s AND date > s.last_date - %(tail_days)s
+               ) t) AS tail_hash
+        FROM s
+    """
+
+
+def _read_stamp(cur, stock_code: str, table: str) -> Dict:
+    cur.execute(_stamp_query(table), {'code': stock_code, 'tail_days': SNAPSHOT_TAIL_DAYS})
+    row = cur.fetchone()
+    last_date = row['last_date'] if row else None
+    stamp = {
+        'rows': int(row['rows']) if row else 0,
+        'last_date': last_date.isoformat() if last_date else None,
+        'tail_hash': row['tail_hash'] if row else None,
+        'version': None,
+    }
+    # Tabel watermark belum tentu ada (database lokal / belum pernah import)
+    cur.execute("SELECT to_regclass('data_watermark') IS NOT NULL AS ready")
+    if cur.fetchone()['ready']:
+        cur.execute("SELECT version FROM data_watermark WHERE stock_code = %s", (stock_code,))
+        wm = cur.fetchone()
+        stamp['version'] = int(wm['version']) if wm else 0
+    return stamp
+
+
+def get_db_stamp(stock_code: str, table: str, conn=None) -> Dict:
+    """
+    Stamp data di database: jumlah baris, tanggal terakhir, versi watermark
+    dan checksum isi hari-hari terakhir. Tidak lewat query cache.
+    """
+    if conn is not None:
+        return _read_stamp(conn.cursor(cursor_factory=RealDictCursor), stock_code, table)
+    with get_cursor(commit=False) as cur:
+        return _read_stamp(cur, stock_code, table)
+
+
+def is_stamp_fresh(meta: Optional[Dict], db_stamp: Dict) -> bool:
+    """Snapshot sesuai database jika semua field stamp sama"""
+    return meta is not None and all(meta.get(k) == db_stamp.get(k) for k in STAMP_FIELDS)
+
+
+# ============================================================
+# BUILD
+# ============================================================
+
+def _rows_to_arrays(rows: List[Dict], columns: List[str]) -> Dict[str, np.ndarray]:
+    """Konversi RealDict rows ke array kolom (date -> datetime64[D], angka -> float64)"""
+    arrays = {}
+    for col in columns:
+        values = [r[col] for r in rows]
+        if col == 'date':
+            arrays[col] = np.array(values, dtype='datetime64[D]')
+        elif col == 'broker_code':
+            arrays[col] = np.array(values, dtype='U8')
+        else:
+            arrays[col] = np.array([np.nan if v is None else float(v) for v in values], dtype='float64')
+    return arrays
+
+
+def _write_meta(tdir: str, meta: Dict):
+    """Ganti meta.json secara atomik (tulis file temp lalu os.replace)"""
+    fd, tmp_path = tempfile.mkstemp(prefix='.meta_', suffix='.json', dir=tdir)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(tdir, 'meta.json'))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _remove_unused_builds(tdir: str, keep):
+    """Hapus build lama / sisa crash (best effort: file yang masih di-mmap bisa gagal dihapus)"""
+    cutoff = time.time() - SNAPSHOT_GC_SECONDS
+    for name in os.listdir(tdir):
+        if name == 'meta.json' or name in keep:
+            continue
+        path = os.path.join(tdir, name)
+        try:
+            if os.path.getmtime(path) > cutoff:
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.unlink(path)
+        except OSError:
+            pass
+
+
+def _write_arrays(stock_code: str, table: str, arrays: Dict[str, np.ndarray], stamp: Dict = None):
+    """
+    Tulis snapshot ke direktori build baru lalu aktifkan dengan mengganti meta.json.
+    stamp: stamp database yang dibaca sebelum data (version + tail_hash disimpan di meta)
+    """
+    tdir = _table_dir(stock_code, table)
+    os.makedirs(tdir, exist_ok=True)
+    previous = read_meta(stock_code, table) or {}
+
+    # Nama build diawali waktu: urut kronologis, unik antar proses
+    build_dir = tempfile.mkdtemp(prefix=datetime.now().strftime('%Y%m%d%H%M%S%f_'), dir=tdir)
+    for col, arr in arrays.items():
+        np.save(os.path.join(build_dir, f'{col}.npy'), arr, allow_pickle=False)
+
+    dates = arrays['date']
+    build = os.path.basename(build_dir)
+    meta = {
+        'rows': int(len(dates)),
+        'last_date': str(dates.max()) if len(dates) else None,
+        'version': (stamp or {}).get('version'),
+        'tail_hash': (stamp or {}).get('tail_hash'),
+        'build': build,
+        'built_at': datetime.now().isoformat(),
+    }
+    _write_meta(tdir, meta)
+    _remove_unused_builds(tdir, keep={build, previous.get('build')})
+
+
+def build_snapshot(stock_code: str, table: str, since: date = None, conn=None) -> int:
+    """
+    Build / rebuild snapshot satu tabel untuk satu saham.
+
+    Args:
+        stock_code: Kode saham
+        table: 'stock_daily' atau 'broker_summary'
+        since: Jika diisi dan snapshot sudah ada, hanya baris dengan date >= since
+               yang diambil ulang dari database (incremental)
+        conn: Koneksi psycopg2 opsional (default: pool dari database.py)
+
+    Returns:
+        Jumlah baris di snapshot
+    """
+    spec = SNAPSHOT_TABLES[table]
+    columns = spec['columns']
+    query = f"SELECT {', '.join(columns)} FROM {table} WHERE stock_code = %s"
+    params = [stock_code]
+
+    existing = load_arrays(stock_code, table) if since is not None else None
+    if existing is not None:
+        query += " AND date >= %s"
+        params.append(since)
+    query += f" ORDER BY {spec['order_by']}"
+
+    # Stamp dibaca sebelum data: jika data berubah di antaranya, stamp di meta
+    # sudah usang dan snapshot di-rebuild pada load berikutnya (tidak pernah sebaliknya)
+    if conn is not None:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        stamp = _read_stamp(cur, stock_code, table)
+        cur.execute(query, params)
+        rows = cur.fetchall()
+    else:
+        with get_cursor(commit=False) as cur:
+            stamp = _read_stamp(cur, stock_code, table)
+            cur.execute(query, params)
+            rows = cur.fetchall()
+
+    arrays = _rows_to_arrays(rows, columns)
+    if existing is not None:
+        keep = existing['date'] < np.datetime64(since, 'D')
+        arrays = {col: np.concatenate([np.asarray(existing[col][keep]), arrays[col]]) for col in columns}
+
+    with _build_lock:
+        _write_arrays(stock_code, table, arrays, stamp)
+        _stamp_checked[(stock_code.upper(), table)] = time.time()
+    return len(arrays['date'])
+
+
+def refresh_snapshot(stock_code: str, tables=None, since: date = None, conn=None):
+    """
+    Rebuild snapshot setelah import (default: harga & broker).
+    Error hanya di-log - snapshot yang gagal akan di-rebuild saat load berikutnya.
+    """
+    if not SNAPSHOT_ENABLED:
+        return
+    for table in (tables or SNAPSHOT_TABLES):
+        try:
+            build_snapshot(stock_code, table, since=since, conn=conn)
+        except Exception as e:
+            _stamp_checked.pop((stock_code.upper(), table), None)
+            print(f"Snapshot refresh failed for {stock_code}/{table}: {e}")
+
+
+# ============================================================
+# LOAD
+# ============================================================
+
+def load_arrays(stock_code: str, table: str) -> Optional[Dict[str, np.ndarray]]:
+    """Load snapshot sebagai dict kolom -> array (memory-mapped, read-only)"""
+    spec = SNAPSHOT_TABLES[table]
+    meta = read_meta(stock_code, table)
+    if not meta or not meta.get('build'):
+        return None
+    build_dir = os.path.join(_table_dir(stock_code, table), meta['build'])
+    try:
+        return {col: np.load(os.path.join(build_dir, f'{col}.npy'), mmap_mode='r') for col in spec['columns']}
+    except (OSError, ValueError):
+        return None
+
+
+def get_fresh_arrays(stock_code: str, table: str, conn=None) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Load snapshot yang sesuai dengan database.
+    Rebuild otomatis jika snapshot belum ada atau stamp berbeda; stamp yang
+    lolos cek tidak di-query ulang selama SNAPSHOT_STAMP_TTL.
+    Returns None jika snapshot tidak bisa dibuat (caller fallback ke query biasa).
+    """
+    if not SNAPSHOT_ENABLED:
+        return None
+    key = (stock_code.upper(), table)
+    try:
+        checked_at = _stamp_checked.get(key)
+        if checked_at is None or time.time() - checked_at > SNAPSHOT_STAMP_TTL:
+            db_stamp = get_db_stamp(stock_code, table, conn)
+            if not is_stamp_fresh(read_meta(stock_code, table), db_stamp):
+                build_snapshot(stock_code, table, conn=conn)
+            _stamp_checked[key] = time.time()
+        arrays = load_arrays(stock_code, table)
+        if arrays is None:
+            _stamp_checked.pop(key, None)
+        return arrays
+    except Exception as e:
+        _stamp_checked.pop(key, None)
+        print(f"Snapshot unavailable for {stock_code}/{table}: {e}")
+        return None
+
+
+def arrays_to_frame(arrays: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """Bangun DataFrame dari array snapshot (kolom numerik NaN -> 0 seperti get_price_data)"""
+    df = pd.DataFrame({col: np.asarray(arr) for col, arr in arrays.items()})
+    df['date'] = pd.to_datetime(df['date'])
+    numeric_cols = [c for c in df.columns if c not in ('date', 'broker_code')]
+    df[numeric_cols] = df[numeric_cols].fillna(0)
+    return df
+
+
+def get_ohlcv_rows(stock_code: str, conn=None, require_open_close: bool = True) -> Optional[List[Dict]]:
+    """
+    Rows OHLCV format engine backtest (date/open/high/low/close/volume).
+    Nilai NULL di database dikembalikan sebagai None.
+
+    Args:
+        require_open_close: Buang baris dengan open/close NULL
+                            (sama dengan filter IS NOT NULL di get_stock_data)
+    """
+    arrays = get_fresh_arrays(stock_code, 'stock_daily', conn)
+    if arrays is None:
+        return None
+
+    dates = np.asarray(arrays['date']).tolist()
+    cols = {
+        'open': np.asarray(arrays['open_price']),
+        'high': np.asarray(arrays['high_price']),
+        'low': np.asarray(arrays['low_price']),
+        'close': np.asarray(arrays['close_price']),
+        'volume': np.asarray(arrays['volume']),
+    }
+    mask = np.ones(len(dates), dtype=bool)
+    if require_open_close:
+        mask = ~np.isnan(cols['open']) & ~np.isnan(cols['close'])
+    lists = {k: np.where(np.isnan(v), None, v).tolist() for k, v in cols.items()}
+
+    return [
+        {'date': dates[i], 'open': lists['open'][i], 'high': lists['high'][i], 'low': lists['low'][i],
+         'close': lists['close'][i], 'volume': lists['volume'][i]}
+        for i in np.flatnonzero(mask)
+    ]
@@ -14,6 +14,7 @@ import sys
 import psycopg2
 from psycopg2.extras import RealDictCursor
 import statistics
+from rolling_range_index import RollingRangeIndex, percentile_value
 
 try:
     sys.stdout.reconfigure(encoding='utf-8')
@@ -150,25 +151,14 @@ def atr_based_sideways(data, lookback_window=10, atr_period=14, atr_multiplier=1
 # ============================================================
 # METODE 2: PERCENTILE-BASED
 # ============================================================
-def calculate_historical_ranges(data, window_size=10, history_periods=50):
-    """Hitung range historis untuk berbagai window"""
-    ranges = []
+def calculate_historical_ranges(data, window_size=10, history_periods=50, index=None):
+    """Hitung range historis untuk berbagai window (index: RollingRangeIndex dari data, opsional)"""
+    if index is None:
+        index = RollingRangeIndex(data, [window_size])
+    return index.ranges(window_size, history_periods, len(data)).tolist()
 
-    start_idx = max(0, len(data) - history_periods - window_size)
-    end_idx = len(data) - window_size
 
-    for i in range(start_idx, end_idx):
-        window = data[i:i+window_size]
-        high = max(d['high'] for d in window)
-        low = min(d['low'] for d in window)
-        avg = sum(d['close'] for d in window) / len(window)
-        range_pct = (high - low) / avg * 100
-        ranges.append(range_pct)
-
-    return ranges
-
-
-def percentile_based_sideways(data, lookback_window=10, history_periods=50, percentile=30):
+def percentile_based_sideways(data, lookback_window=10, history_periods=50, percentile=30, index=None):
     """
     Sideways jika range dalam window < percentile tertentu dari history
 
@@ -181,27 +171,26 @@ def percentile_based_sideways(data, lookback_window=10, history_periods=50, perc
     - lookback_window: periode untuk cek sideways
     - history_periods: berapa banyak periode historis untuk referensi
     - percentile: di bawah percentile berapa dianggap sideways (default 30)
+    - index: RollingRangeIndex dari data (opsional, dibangun otomatis)
     """
     if len(data) < history_periods + lookback_window:
         return None
 
-    # Hitung historical ranges
-    hist_ranges = calculate_historical_ranges(data[:-lookback_window], lookback_window, history_periods)
+    if index is None:
+        index = RollingRangeIndex(data, [lookback_window])
+    end = len(data)
 
-    if len(hist_ranges) < 10:
+    # Historical ranges (terurut) dari index
+    sorted_ranges = index.sorted_ranges(lookback_window, history_periods, end - lookback_window)
+
+    if len(sorted_ranges) < 10:
         return None
 
-    # Hitung percentile threshold
-    sorted_ranges = sorted(hist_ranges)
-    idx = int(len(sorted_ranges) * percentile / 100)
-    threshold_pct = sorted_ranges[idx]
+    hist_ranges = sorted_ranges.tolist()
+    threshold_pct = percentile_value(sorted_ranges, percentile)
 
     # Hitung current range
-    window = data[-lookback_window:]
-    window_high = max(d['high'] for d in window)
-    window_low = min(d['low'] for d in window)
-    avg_price = sum(d['close'] for d in window) / len(window)
-    current_range_pct = (window_high - window_low) / avg_price * 100
+    window_high, window_low, current_range_pct = index.window(lookback_window, end - lookback_window)
 
     is_sideways = current_range_pct < threshold_pct
 
@@ -224,7 +213,7 @@ def percentile_based_sideways(data, lookback_window=10, history_periods=50, perc
 # ============================================================
 # METODE 3: STANDARD DEVIATION BASED
 # ============================================================
-def stdev_based_sideways(data, lookback_window=10, history_periods=50, num_stdev=1.0):
+def stdev_based_sideways(data, lookback_window=10, history_periods=50, num_stdev=1.0, index=None):
     """
     Sideways jika range < (mean - num_stdev × stdev) dari historical ranges
 
@@ -237,12 +226,17 @@ def stdev_based_sideways(data, lookback_window=10, history_periods=50, num_stdev
     - lookback_window: periode untuk cek sideways
     - history_periods: berapa banyak periode historis
     - num_stdev: berapa stdev di bawah mean (default 1.0)
+    - index: RollingRangeIndex dari data (opsional, dibangun otomatis)
     """
     if len(data) < history_periods + lookback_window:
         return None
 
+    if index is None:
+        index = RollingRangeIndex(data, [lookback_window])
+    end = len(data)
+
     # Hitung historical ranges
-    hist_ranges = calculate_historical_ranges(data[:-lookback_window], lookback_window, history_periods)
+    hist_ranges = index.ranges(lookback_window, history_periods, end - lookback_window).tolist()
 
     if len(hist_ranges) < 10:
         return None
@@ -256,11 +250,7 @@ def stdev_based_sideways(data, lookback_window=10, history_periods=50, num_stdev
     threshold_pct = max(threshold_pct, 0)  # Tidak boleh negatif
 
     # Hitung current range
-    window = data[-lookback_window:]
-    window_high = max(d['high'] for d in window)
-    window_low = min(d['low'] for d in window)
-    avg_price = sum(d['close'] for d in window) / len(window)
-    current_range_pct = (window_high - window_low) / avg_price * 100
+    window_high, window_low, current_range_pct = index.window(lookback_window, end - lookback_window)
 
     is_sideways = current_range_pct < threshold_pct
 
@@ -288,6 +278,7 @@ def adaptive_sideways_detection(data, lookback_window=10):
     Returns sideways jika minimal 2 dari 3 metode setuju
     """
     results = {}
+    index = RollingRangeIndex(data, [lookback_window])
 
     # Metode 1: ATR
     atr_result = atr_based_sideways(data, lookback_window)
@@ -295,12 +286,12 @@ def adaptive_sideways_detection(data, lookback_window=10):
         results['atr'] = atr_result
 
     # Metode 2: Percentile
-    pct_result = percentile_based_sideways(data, lookback_window)
+    pct_result = percentile_based_sideways(data, lookback_window, index=index)
     if pct_result:
         results['percentile'] = pct_result
 
     # Metode 3: StdDev
-    std_result = stdev_based_sideways(data, lookback_window)
+    std_result = stdev_based_sideways(data, lookback_window, index=index)
     if std_result:
         results['stdev'] = std_result
 
@@ -353,9 +344,10 @@ def analyze_stock_volatility(stock_code):
     print(f"   Interpretasi: Volatilitas harian rata-rata {atr_pct:.2f}%")
 
     # Hitung historical range distribution
-    ranges_5d = calculate_historical_ranges(data, 5, 100)
-    ranges_10d = calculate_historical_ranges(data, 10, 100)
-    ranges_15d = calculate_historical_ranges(data, 15, 100)
+    index = RollingRangeIndex(data, (5, 10, 15))
+    ranges_5d = calculate_historical_ranges(data, 5, 100, index)
+    ranges_10d = calculate_historical_ranges(data, 10, 100, index)
+    ranges_15d = calculate_historical_ranges(data, 15, 100, index)
 
     print(f"\n2. Distribusi Range Historis:")
     print(f"   {'Window':<10} {'Min':>8} {'P25':>8} {'Median':>8} {'P75':>8} {'Max':>8}")
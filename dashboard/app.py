@@ -23,11 +23,19 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
-from database import execute_query, get_cursor, clear_cache, clear_stock_cache, get_cache_stats, preload_stock_data
+from database import execute_query, get_cursor, clear_stock_cache, get_cache_stats, preload_stock_data
 from zones_config import STOCK_ZONES, get_zones, DEFAULT_PARAMS, STOCK_FORMULA
+from v11b1_snapshot import (
+    get_snapshot, get_snapshot_status, refresh_snapshot, trigger_recompute,
+    register_snapshot_part, set_snapshot_stocks
+)
+# Operasi admin berat (import, sync GDrive, recalc V11b1) berjalan sebagai background job
+from job_manager import (
+    background_callback, cancel_button, running_outputs,
+    job_effects_components, register_job_effects
+)
 try:
     from backtest_v11b1_universal import (
-        run_backtest as run_v11b1_backtest,
         ZoneHelper,
         support_touch,
         support_hold,
@@ -36,145 +44,58 @@ try:
     )
     BACKTEST_FUNCTIONS_AVAILABLE = True
 except ImportError:
-    run_v11b1_backtest = None
     BACKTEST_FUNCTIONS_AVAILABLE = False
 
 def get_v10_open_position(stock_code):
     """Get current open V11b1 position if any (only 2026 trades)
-    Uses pre-computed tables if available, otherwise falls back to on-the-fly calculation.
+    Reads pre-computed tables only - backtest tidak dijalankan di web request;
+    jika hasil precomputed belum ada, recompute dipicu di background.
     """
-    # Try pre-computed table first
-    try:
-        result = get_v11b1_precomputed_result(stock_code)
-        if result and result.get('has_open_position'):
-            entry_date = str(result.get('position_entry_date', ''))
-            if entry_date.startswith('2026'):
-                # Get trade details from trade_history
-                trade_history = result.get('trade_history', [])
-                open_trade = None
-                for trade in trade_history:
-                    if trade.get('exit_reason') == 'OPEN':
-                        open_trade = trade
-                        break
-
-                # Convert Decimal to float for compatibility
-                # Use open_trade data for entry-time values (type, vol_ratio, entry_conditions)
-                return {
-                    'type': open_trade.get('type', 'UNKNOWN') if open_trade else 'UNKNOWN',
-                    'entry_date': entry_date,
-                    'entry_price': float(result.get('position_entry_price') or 0),
-                    'sl': float(result.get('position_sl') or 0),
-                    'tp': float(result.get('position_tp') or 0),
-                    'zone_num': int(result.get('support_zone_num') or 0),
-                    'current_pnl': float(result.get('position_current_pnl') or 0),
-                    'entry_conditions': open_trade.get('entry_conditions') if open_trade else None,
-                    'vol_ratio': float(open_trade.get('vol_ratio') or 0) if open_trade else 0,
-                }
-    except Exception:
-        pass
-
-    # Fallback: Calculate from backtest
-    if not run_v11b1_backtest or not get_zones(stock_code):
-        return None
-    try:
-        result = run_v11b1_backtest(stock_code)
-        if result and result.get('trades'):
-            # Find open position - only for 2026 trades
-            for trade in result['trades']:
-                entry_date = trade.get('entry_date', '')
-                if trade.get('exit_reason') == 'OPEN' and entry_date.startswith('2026'):
-                    return {
-                        'type': trade.get('type', 'UNKNOWN'),
-                        'entry_date': entry_date,
-                        'entry_price': trade.get('entry_price', 0),
-                        'sl': trade.get('sl', 0),
-                        'tp': trade.get('tp', 0),
-                        'zone_num': trade.get('zone_num', 0),
-                        'current_pnl': trade.get('pnl', 0),
-                        'entry_conditions': trade.get('entry_conditions'),  # V10 checklist at entry
-                        'vol_ratio': trade.get('vol_ratio', 0),  # V11b1: volume ratio at entry
-                    }
-        return None
-    except Exception:
+    result = get_v11b1_precomputed_result(stock_code)
+    if result is None:
+        if get_zones(stock_code):
+            trigger_recompute([stock_code])
         return None
 
-# Cache for V10 running stocks (to avoid repeated backtests)
-_v10_running_cache = {}
-_v10_cache_time = None
+    if result.get('has_open_position'):
+        entry_date = str(result.get('position_entry_date', ''))
+        if entry_date.startswith('2026'):
+            # Get trade details from trade_history
+            trade_history = result.get('trade_history') or []
+            open_trade = None
+            for trade in trade_history:
+                if trade.get('exit_reason') == 'OPEN':
+                    open_trade = trade
+                    break
+
+            # Convert Decimal to float for compatibility
+            # Use open_trade data for entry-time values (type, vol_ratio, entry_conditions)
+            return {
+                'type': open_trade.get('type', 'UNKNOWN') if open_trade else 'UNKNOWN',
+                'entry_date': entry_date,
+                'entry_price': float(result.get('position_entry_price') or 0),
+                'sl': float(result.get('position_sl') or 0),
+                'tp': float(result.get('position_tp') or 0),
+                'zone_num': int(result.get('support_zone_num') or 0),
+                'current_pnl': float(result.get('position_current_pnl') or 0),
+                'entry_conditions': open_trade.get('entry_conditions') if open_trade else None,
+                'vol_ratio': float(open_trade.get('vol_ratio') or 0) if open_trade else 0,
+            }
+    return None
 
 def get_all_v10_running_stocks():
-    """Get all stocks with V11b1 running positions for 2026 only (cached for 5 minutes)
+    """Get all stocks with V11b1 running positions for 2026 only
     Returns dict with stock_code -> position data (entry_price, current_pnl, etc.)
-    Uses pre-computed tables if available, otherwise falls back to on-the-fly calculation.
+    Served from the V11b1 snapshot (last good precomputed data, refreshed in background).
     """
-    global _v10_running_cache, _v10_cache_time
-    from datetime import datetime, timedelta
-
-    # Check cache validity (5 minutes)
-    if _v10_cache_time and datetime.now() - _v10_cache_time < timedelta(minutes=5):
-        return _v10_running_cache
-
-    # Try pre-computed tables first (much faster)
-    try:
-        precomputed = get_v11b1_running_from_precomputed()
-        if precomputed:
-            _v10_running_cache = precomputed
-            _v10_cache_time = datetime.now()
-            return _v10_running_cache
-    except Exception:
-        pass
-
-    # Fallback: Rebuild cache from backtest - only 2026 trades
-    _v10_running_cache = {}
-    if run_v11b1_backtest:
-        for stock_code in STOCK_ZONES.keys():
-            try:
-                result = run_v11b1_backtest(stock_code)
-                if result and result.get('trades'):
-                    for trade in result['trades']:
-                        entry_date = trade.get('entry_date', '')
-                        if trade.get('exit_reason') == 'OPEN' and entry_date.startswith('2026'):
-                            _v10_running_cache[stock_code] = {
-                                'entry_price': trade.get('entry_price', 0),
-                                'current_pnl': trade.get('pnl', 0),
-                                'type': trade.get('type', ''),
-                                'zone_num': trade.get('zone_num', 0),
-                                'entry_date': entry_date,
-                            }
-                            break
-            except:
-                pass
-    _v10_cache_time = datetime.now()
-    return _v10_running_cache
-
-# Cache for 2026 trade stats
-_v11b1_2026_stats_cache = None
-_v11b1_2026_stats_time = None
+    return get_snapshot('running', {})
 
 def get_v11b1_2026_stats():
     """Get V11b1 trade statistics for 2026
     Returns dict with profit_count, loss_count, running_count and percentages
-    Uses pre-computed tables if available, otherwise falls back to on-the-fly calculation.
+    Served from the V11b1 snapshot (last good precomputed data, refreshed in background).
     """
-    global _v11b1_2026_stats_cache, _v11b1_2026_stats_time
-    from datetime import datetime, timedelta
-
-    # Check cache validity (2 minutes for fresher data)
-    if _v11b1_2026_stats_time and datetime.now() - _v11b1_2026_stats_time < timedelta(minutes=2):
-        return _v11b1_2026_stats_cache
-
-    # Try pre-computed tables first (much faster)
-    try:
-        precomputed_stats = get_v11b1_all_precomputed_stats()
-        if precomputed_stats and precomputed_stats.get('total_trades', 0) > 0:
-            _v11b1_2026_stats_cache = precomputed_stats
-            _v11b1_2026_stats_time = datetime.now()
-            return _v11b1_2026_stats_cache
-    except Exception:
-        pass
-
-    # Fallback: Calculate from backtest
-    stats = {
+    return get_snapshot('stats', {
         'profit_count': 0,
         'loss_count': 0,
         'running_count': 0,
@@ -184,45 +105,7 @@ def get_v11b1_2026_stats():
         'floating_pnl': 0,        # Sum of running positions P&L %
         'avg_profit_pnl': 0,      # Average profit per winning trade
         'avg_loss_pnl': 0,        # Average loss per losing trade
-    }
-
-    if not run_v11b1_backtest:
-        return stats
-
-    for stock_code in STOCK_ZONES.keys():
-        try:
-            result = run_v11b1_backtest(stock_code)
-            if result and result.get('trades'):
-                for trade in result['trades']:
-                    entry_date = trade.get('entry_date', '')
-                    # Filter for 2026 trades only
-                    if entry_date and entry_date.startswith('2026'):
-                        stats['total_trades'] += 1
-                        exit_reason = trade.get('exit_reason', '')
-                        pnl = trade.get('pnl', 0)
-
-                        if exit_reason == 'OPEN':
-                            stats['running_count'] += 1
-                            stats['floating_pnl'] += pnl
-                        elif pnl > 0:
-                            stats['profit_count'] += 1
-                            stats['total_profit_pnl'] += pnl
-                        elif pnl < 0:
-                            stats['loss_count'] += 1
-                            stats['total_loss_pnl'] += pnl
-                        # pnl == 0 is ignored (break-even)
-        except:
-            pass
-
-    # Calculate averages
-    if stats['profit_count'] > 0:
-        stats['avg_profit_pnl'] = stats['total_profit_pnl'] / stats['profit_count']
-    if stats['loss_count'] > 0:
-        stats['avg_loss_pnl'] = stats['total_loss_pnl'] / stats['loss_count']
-
-    _v11b1_2026_stats_cache = stats
-    _v11b1_2026_stats_time = datetime.now()
-    return stats
+    })
 
 # ============================================================
 # PRE-COMPUTED V11B1 FUNCTIONS - Read from database tables
@@ -230,15 +113,12 @@ def get_v11b1_2026_stats():
 
 def get_v11b1_precomputed_result(stock_code):
     """Get latest pre-computed V11b1 result for a stock from database"""
-    table_name = f'v11b1_results_{stock_code.lower()}'
     try:
-        query = f"""
-            SELECT * FROM {table_name}
-            WHERE has_error = FALSE
-            ORDER BY calc_date DESC
-            LIMIT 1
+        query = """
+            SELECT * FROM v11b1_results_latest
+            WHERE stock_code = %s
         """
-        results = execute_query(query)
+        results = execute_query(query, (stock_code.upper(),))
         if results and len(results) > 0:
             return dict(results[0])
         return None
@@ -266,16 +146,26 @@ def get_backtest_result_for_display(stock_code):
             'total_pnl': precomputed.get('total_pnl', 0),
         }
 
-    # Fallback: run live backtest if no precomputed data
-    if run_v11b1_backtest and get_zones(stock_code):
-        return run_v11b1_backtest(stock_code)
+    # Belum ada hasil precomputed: recompute di background, kartu backtest disembunyikan
+    if precomputed is None and get_zones(stock_code):
+        trigger_recompute([stock_code])
     return None
 
 
+# Trade 2026 dari hasil terakhir tiap emiten (v11b1_results_latest x v11b1_trades)
+_V11B1_LATEST_TRADES_2026 = """
+    FROM v11b1_results_latest r
+    JOIN v11b1_trades t ON t.stock_code = r.stock_code AND t.calc_date = r.calc_date
+    WHERE r.stock_code = ANY(%s)
+    AND t.entry_date >= '2026-01-01' AND t.entry_date < '2027-01-01'
+"""
+
+
 def get_v11b1_all_precomputed_stats():
     """Get V11b1 stats from all pre-computed tables for 2026
     Returns dict with profit_count, loss_count, running_count, etc.
-    Much faster than running backtests on-the-fly.
+    Satu query agregat atas v11b1_trades (bukan parse trade_history per emiten).
+    Raise jika query gagal (snapshot service mempertahankan snapshot lama).
     """
     stats = {
         'profit_count': 0,
@@ -289,30 +179,24 @@ def get_v11b1_all_precomputed_stats():
         'avg_loss_pnl': 0,
     }
 
-    for stock_code in STOCK_ZONES.keys():
-        try:
-            result = get_v11b1_precomputed_result(stock_code)
-            if result:
-                trade_history = result.get('trade_history', [])
-                if trade_history:
-                    for trade in trade_history:
-                        entry_date = trade.get('entry_date', '')
-                        if entry_date and entry_date.startswith('2026'):
-                            stats['total_trades'] += 1
-                            exit_reason = trade.get('exit_reason', '')
-                            pnl = float(trade.get('pnl') or 0)  # Convert to float
-
-                            if exit_reason == 'OPEN':
-                                stats['running_count'] += 1
-                                stats['floating_pnl'] += pnl
-                            elif pnl > 0:
-                                stats['profit_count'] += 1
-                                stats['total_profit_pnl'] += pnl
-                            elif pnl < 0:
-                                stats['loss_count'] += 1
-                                stats['total_loss_pnl'] += pnl
-        except Exception:
-            pass
+    query = f"""
+        SELECT
+            COUNT(*) AS total_trades,
+            COUNT(*) FILTER (WHERE t.exit_reason = 'OPEN') AS running_count,
+            COUNT(*) FILTER (WHERE t.exit_reason <> 'OPEN' AND t.pnl > 0) AS profit_count,
+            COUNT(*) FILTER (WHERE t.exit_reason <> 'OPEN' AND t.pnl < 0) AS loss_count,
+            COALESCE(SUM(t.pnl) FILTER (WHERE t.exit_reason = 'OPEN'), 0) AS floating_pnl,
+            COALESCE(SUM(t.pnl) FILTER (WHERE t.exit_reason <> 'OPEN' AND t.pnl > 0), 0) AS total_profit_pnl,
+            COALESCE(SUM(t.pnl) FILTER (WHERE t.exit_reason <> 'OPEN' AND t.pnl < 0), 0) AS total_loss_pnl
+        {_V11B1_LATEST_TRADES_2026}
+    """
+    results = execute_query(query, (list(STOCK_ZONES.keys()),), use_cache=False)
+    if results:
+        row = results[0]
+        for key in ('total_trades', 'running_count', 'profit_count', 'loss_count'):
+            stats[key] = int(row[key] or 0)
+        for key in ('floating_pnl', 'total_profit_pnl', 'total_loss_pnl'):
+            stats[key] = float(row[key] or 0)  # Convert Decimal to float
 
     # Calculate averages
     if stats['profit_count'] > 0:
@@ -326,86 +210,73 @@ def get_v11b1_all_precomputed_stats():
 def get_v11b1_running_from_precomputed():
     """Get all running V11b1 positions from pre-computed tables (2026 only)
     Returns dict with stock_code -> position data
-    Much faster than running backtests on-the-fly.
+    Satu query atas v11b1_results_latest untuk semua emiten.
     """
     running_stocks = {}
 
-    for stock_code in STOCK_ZONES.keys():
-        try:
-            result = get_v11b1_precomputed_result(stock_code)
-            if result and result.get('has_open_position'):
-                # Verify it's 2026
-                entry_date = result.get('position_entry_date', '')
-                if entry_date:
-                    entry_date_str = str(entry_date)
-                    if entry_date_str.startswith('2026'):
-                        # Convert Decimal to float for compatibility
-                        running_stocks[stock_code] = {
-                            'entry_price': float(result.get('position_entry_price') or 0),
-                            'current_pnl': float(result.get('position_current_pnl') or 0),
-                            'type': result.get('confirm_type', ''),
-                            'zone_num': int(result.get('support_zone_num') or 0),
-                            'entry_date': entry_date_str,
-                        }
-        except Exception:
-            pass
+    results = execute_query("""
+        SELECT stock_code, position_entry_date, position_entry_price,
+               position_current_pnl, confirm_type, support_zone_num
+        FROM v11b1_results_latest
+        WHERE stock_code = ANY(%s)
+        AND has_open_position = TRUE
+        AND position_entry_date >= '2026-01-01' AND position_entry_date < '2027-01-01'
+    """, (list(STOCK_ZONES.keys()),), use_cache=False)
+
+    for row in results or []:
+        # Convert Decimal to float for compatibility
+        running_stocks[row['stock_code']] = {
+            'entry_price': float(row.get('position_entry_price') or 0),
+            'current_pnl': float(row.get('position_current_pnl') or 0),
+            'type': row.get('confirm_type', ''),
+            'zone_num': int(row.get('support_zone_num') or 0),
+            'entry_date': str(row['position_entry_date']),
+        }
 
     return running_stocks
 
 
 def get_v11b1_per_stock_backtest_summary():
     """Get backtest summary per stock: profit, loss, nett, open positions
-    Returns list of dicts sorted by stock_code.
+    Returns list of dicts sorted by stock_code (satu query GROUP BY stock_code).
     """
-    results = []
-    for stock_code in sorted(STOCK_ZONES.keys()):
-        try:
-            precomputed = get_v11b1_precomputed_result(stock_code)
-            if not precomputed:
-                continue
-
-            trade_history = precomputed.get('trade_history', [])
-            if not trade_history:
-                continue
-
-            profit_count = 0
-            loss_count = 0
-            profit_pnl = 0.0
-            loss_pnl = 0.0
-            open_count = 0
-            floating_pnl = 0.0
+    rows = execute_query("""
+        SELECT
+            t.stock_code,
+            COUNT(*) FILTER (WHERE t.exit_reason <> 'OPEN' AND t.pnl > 0) AS profit_count,
+            COUNT(*) FILTER (WHERE t.exit_reason <> 'OPEN' AND t.pnl < 0) AS loss_count,
+            COALESCE(SUM(t.pnl) FILTER (WHERE t.exit_reason <> 'OPEN' AND t.pnl > 0), 0) AS profit_pnl,
+            COALESCE(SUM(t.pnl) FILTER (WHERE t.exit_reason <> 'OPEN' AND t.pnl < 0), 0) AS loss_pnl,
+            COUNT(*) FILTER (WHERE t.exit_reason = 'OPEN') AS open_count,
+            COALESCE(SUM(t.pnl) FILTER (WHERE t.exit_reason = 'OPEN'), 0) AS floating_pnl
+        FROM v11b1_results_latest r
+        JOIN v11b1_trades t ON t.stock_code = r.stock_code AND t.calc_date = r.calc_date
+        WHERE r.stock_code = ANY(%s)
+        GROUP BY t.stock_code
+        ORDER BY t.stock_code
+    """, (list(STOCK_ZONES.keys()),), use_cache=False)
 
-            for trade in trade_history:
-                exit_reason = trade.get('exit_reason', '')
-                pnl = float(trade.get('pnl') or 0)
-
-                if exit_reason == 'OPEN':
-                    open_count += 1
-                    floating_pnl += pnl
-                elif pnl > 0:
-                    profit_count += 1
-                    profit_pnl += pnl
-                elif pnl < 0:
-                    loss_count += 1
-                    loss_pnl += pnl
-
-            nett_pnl = profit_pnl + loss_pnl
-            total_trades = profit_count + loss_count + open_count
-
-            if total_trades > 0:
-                results.append({
-                    'stock_code': stock_code,
-                    'profit_count': profit_count,
-                    'loss_count': loss_count,
-                    'profit_pnl': profit_pnl,
-                    'loss_pnl': loss_pnl,
-                    'nett_pnl': nett_pnl,
-                    'open_count': open_count,
-                    'floating_pnl': floating_pnl,
-                    'total_trades': total_trades,
-                })
-        except Exception:
-            pass
+    results = []
+    for row in rows or []:
+        profit_count = int(row['profit_count'] or 0)
+        loss_count = int(row['loss_count'] or 0)
+        open_count = int(row['open_count'] or 0)
+        profit_pnl = float(row['profit_pnl'] or 0)
+        loss_pnl = float(row['loss_pnl'] or 0)
+        total_trades = profit_count + loss_count + open_count
+
+        if total_trades > 0:
+            results.append({
+                'stock_code': row['stock_code'],
+                'profit_count': profit_count,
+                'loss_count': loss_count,
+                'profit_pnl': profit_pnl,
+                'loss_pnl': loss_pnl,
+                'nett_pnl': profit_pnl + loss_pnl,
+                'open_count': open_count,
+                'floating_pnl': float(row['floating_pnl'] or 0),
+                'total_trades': total_trades,
+            })
 
     return results
 
@@ -414,12 +285,11 @@ def check_precomputed_tables_exist():
     """Check if pre-computed tables exist in database"""
     try:
         query = """
-            SELECT table_name FROM information_schema.tables
-            WHERE table_name LIKE 'v11b1_results_%'
-            LIMIT 1
+            SELECT to_regclass('v11b1_results_latest') IS NOT NULL
+               AND to_regclass('v11b1_trades') IS NOT NULL AS ready
         """
-        results = execute_query(query)
-        return results and len(results) > 0
+        results = execute_query(query, use_cache=False)
+        return bool(results and results[0]['ready'])
     except Exception:
         return False
 
@@ -435,6 +305,14 @@ def should_use_precomputed():
     return USE_PRECOMPUTED_V11B1
 
 
+# V11b1 snapshot: landing page membaca snapshot terakhir yang valid,
+# reload & recompute berjalan di background (lihat v11b1_snapshot.py)
+set_snapshot_stocks(STOCK_ZONES.keys())
+register_snapshot_part('stats', get_v11b1_all_precomputed_stats)
+register_snapshot_part('running', get_v11b1_running_from_precomputed)
+register_snapshot_part('per_stock', get_v11b1_per_stock_backtest_summary)
+
+
 from analyzer import (
     get_price_data, get_broker_data, run_full_analysis,
     get_top_accumulators, get_top_distributors,
@@ -468,6 +346,8 @@ from broker_config import (
     FOREIGN_BROKER_CODES, is_foreign_broker
 )
 from parser import read_excel_data, import_price_data, import_broker_data, read_profile_data, import_profile_data, read_fundamental_data, import_fundamental_data
+from broker_flow import get_broker_flow_daily
+from broker_cube import get_broker_cube
 from signal_validation import (
     get_comprehensive_validation, get_company_profile, get_daily_flow_timeline,
     get_market_status, get_risk_events, get_all_broker_details, DEFAULT_PARAMS,
@@ -503,6 +383,25 @@ except Exception as e:
     print(f'Warning: strong_sr_v8_atr error - {e}')
     def get_strong_sr_analysis(stock_code): return {'error': 'Module not loaded'}
 
+# Data-version caching: heavy analyses stay cached until the stock's import
+# watermark moves, and are precomputed in background right after an import
+from data_version import (
+    sync_data_version, cached_by_data_version, register_invalidation_hook,
+    register_warm_task, after_external_import
+)
+get_comprehensive_analysis = cached_by_data_version(get_comprehensive_analysis)
+get_comprehensive_validation = cached_by_data_version(get_comprehensive_validation)
+analyze_support_resistance = cached_by_data_version(analyze_support_resistance)
+get_v6_analysis = cached_by_data_version(get_v6_analysis)
+get_strong_sr_analysis = cached_by_data_version(get_strong_sr_analysis)
+register_invalidation_hook(clear_analysis_cache)
+register_warm_task('comprehensive_analysis', get_comprehensive_analysis)
+register_warm_task('comprehensive_validation', get_comprehensive_validation, 30)
+register_warm_task('support_resistance', analyze_support_resistance)
+register_warm_task('broker_cube', get_broker_cube)
+register_warm_task('v6_sideways', get_v6_analysis)
+register_warm_task('strong_sr', get_strong_sr_analysis)
+
 # News service for stock news
 try:
     from news_service import get_news_with_sentiment, get_all_stocks_news, get_latest_news_summary, get_cache_info
@@ -1182,25 +1081,52 @@ server.config['COMPRESS_LEVEL'] = 6
 server.config['COMPRESS_MIN_SIZE'] = 500
 
 # Flask route for PDF download from forum
-from flask import Response, send_file
+from flask import Response, request, stream_with_context
+from forum_attachments import (
+    THREAD_LIST_COLUMNS, ensure_attachment_table, get_thread_attachment, iter_attachment,
+    store_attachment, delete_thread_attachment
+)
 @server.route('/download-pdf/<int:thread_id>')
 def download_thread_pdf(thread_id):
-    """Download PDF attachment from a forum thread"""
+    """Download PDF attachment from a forum thread (streamed, Range & ETag)"""
     try:
-        query = "SELECT pdf_data, pdf_filename FROM forum_threads WHERE id = %s"
-        result = execute_query(query, (thread_id,))
-        if result and result[0].get('pdf_data'):
-            pdf_data = result[0]['pdf_data']
-            filename = result[0].get('pdf_filename', f'attachment_{thread_id}.pdf')
-            # Handle bytea/memoryview from PostgreSQL
-            if isinstance(pdf_data, memoryview):
-                pdf_data = bytes(pdf_data)
-            return Response(
-                pdf_data,
-                mimetype='application/pdf',
-                headers={'Content-Disposition': f'attachment; filename="{filename}"'}
-            )
-        return "PDF not found", 404
+        attachment = get_thread_attachment(thread_id)
+        if not attachment:
+            return "PDF not found", 404
+
+        content_hash = attachment['content_hash'].strip()
+        size = attachment['size_bytes']
+        filename = attachment.get('filename') or f'attachment_{thread_id}.pdf'
+        headers = {
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Accept-Ranges': 'bytes',
+            'ETag': f'"{content_hash}"',
+            'Cache-Control': 'private, max-age=86400',
+        }
+
+        # Isi file tidak berubah untuk hash yang sama -> revalidasi cukup lewat ETag
+        if content_hash in request.if_none_match:
+            return Response(status=304, headers=headers)
+
+        start, stop, status = 0, size, 200
+        # If-Range dengan ETag lain = file berubah, kirim utuh
+        if request.range and (not request.if_range.etag or request.if_range.etag == content_hash):
+            byte_range = request.range.range_for_length(size)
+            if byte_range is None:
+                headers['Content-Range'] = f'bytes */{size}'
+                return Response(status=416, headers=headers)
+            start, stop = byte_range
+            status = 206
+            headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+        headers['Content-Length'] = str(stop - start)
+
+        return Response(
+            stream_with_context(iter_attachment(content_hash, start, stop)),
+            status=status,
+            mimetype=attachment.get('mime_type') or 'application/pdf',
+            headers=headers,
+            direct_passthrough=True
+        )
     except Exception as e:
         return f"Error: {str(e)}", 500
 
@@ -1408,34 +1334,20 @@ def calculate_broker_position_from_daily(stock_code: str, days: int = 90) -> pd.
     Returns DataFrame with broker positions based on net accumulation over the period.
     """
     # Get current price
-    price_df = get_price_data(stock_code)
+    price_df = get_price_data(stock_code, limit=1, columns=['close_price'])
     current_price = price_df['close_price'].iloc[-1] if not price_df.empty and 'close_price' in price_df.columns else 0
 
-    # Query broker summary data
-    # Note: buy_value is in Rupiah, buy_lot is in lots (100 shares)
-    # weighted_avg_buy = buy_value / buy_lot / 100 = price per share
-    query = """
-        SELECT
-            broker_code,
-            SUM(buy_lot) as total_buy_lot,
-            SUM(sell_lot) as total_sell_lot,
-            SUM(buy_value) as total_buy_value,
-            SUM(sell_value) as total_sell_value,
-            SUM(net_lot) as net_lot,
-            CASE WHEN SUM(buy_lot) > 0
-                 THEN SUM(buy_value) / SUM(buy_lot) / 100
-                 ELSE 0 END as weighted_avg_buy,
-            COUNT(DISTINCT date) as active_days,
-            MIN(date) as first_date,
-            MAX(date) as last_date
-        FROM broker_summary
-        WHERE stock_code = %s
-        AND date >= CURRENT_DATE - INTERVAL '%s days'
-        GROUP BY broker_code
-        HAVING SUM(net_lot) != 0
-        ORDER BY SUM(net_lot) DESC
-    """
-    results = execute_query(query, (stock_code, days))
+    # Total per broker dari prefix-sum cube (buy_value Rupiah, buy_lot lot = 100 lembar)
+    # weighted_avg_buy = buy_value / buy_lot / 100 = harga per lembar
+    cube = get_broker_cube(stock_code)
+    lo, hi = cube.since_days(days)
+    window = cube.window_frame(lo, hi, with_dates=True)
+    window = window[window['net_lot'] != 0].sort_values('net_lot', ascending=False, kind='mergesort')
+    results = window.rename(columns={
+        'buy_lot': 'total_buy_lot', 'sell_lot': 'total_sell_lot',
+        'buy_value': 'total_buy_value', 'sell_value': 'total_sell_value',
+        'avg_buy_price': 'weighted_avg_buy',
+    }).to_dict('records')
 
     if not results:
         return pd.DataFrame()
@@ -1470,7 +1382,7 @@ def calculate_broker_position_from_daily(stock_code: str, days: int = 90) -> pd.
             'current_price': current_price,
             'floating_pnl_pct': floating_pnl_pct,
             'floating_pnl_value': floating_pnl_value,
-            'active_days': row['active_days'],
+            'active_days': int(row['active_days']),
             'first_date': row['first_date'],
             'last_date': row['last_date']
         })
@@ -1549,23 +1461,10 @@ def get_recent_price_data(stock_code: str, days: int = 60) -> pd.DataFrame:
 
 def get_recent_broker_flow(stock_code: str, days: int = 30) -> dict:
     """Get recent broker flow analysis (30 days)"""
-    query = """
-        SELECT
-            date,
-            SUM(CASE WHEN net_value > 0 THEN net_value ELSE 0 END) as total_buy_value,
-            SUM(CASE WHEN net_value < 0 THEN ABS(net_value) ELSE 0 END) as total_sell_value,
-            SUM(net_value) as net_value,
-            SUM(CASE WHEN net_lot > 0 THEN net_lot ELSE 0 END) as total_buy_lot,
-            SUM(CASE WHEN net_lot < 0 THEN ABS(net_lot) ELSE 0 END) as total_sell_lot,
-            SUM(net_lot) as net_lot,
-            COUNT(DISTINCT CASE WHEN net_lot > 0 THEN broker_code END) as buyer_count,
-            COUNT(DISTINCT CASE WHEN net_lot < 0 THEN broker_code END) as seller_count
-        FROM broker_summary
-        WHERE stock_code = %s AND date >= CURRENT_DATE - INTERVAL '%s days'
-        GROUP BY date
-        ORDER BY date
-    """
-    results = execute_query(query, (stock_code, days))
+    results = get_broker_flow_daily(stock_code, days=days, columns=[
+        'net_buy_value', 'net_sell_value', 'net_value', 'net_buy_lot', 'net_sell_lot',
+        'net_lot', 'buyer_count', 'seller_count'
+    ])
 
     if not results:
         return {
@@ -1575,7 +1474,10 @@ def get_recent_broker_flow(stock_code: str, days: int = 30) -> dict:
             'trend': 'NEUTRAL', 'daily_data': []
         }
 
-    df = pd.DataFrame(results)
+    df = pd.DataFrame(results).rename(columns={
+        'net_buy_value': 'total_buy_value', 'net_sell_value': 'total_sell_value',
+        'net_buy_lot': 'total_buy_lot', 'net_sell_lot': 'total_sell_lot',
+    })
 
     net_buy_days = len(df[df['net_lot'] > 0])
     net_sell_days = len(df[df['net_lot'] < 0])
@@ -1606,27 +1508,13 @@ def get_recent_broker_flow(stock_code: str, days: int = 30) -> dict:
 
 def get_foreign_flow(stock_code: str, days: int = 30) -> dict:
     """Get foreign investor flow"""
-    # Use correct foreign broker codes from broker_config
-    # These are brokers with ACTUAL foreign parent companies
-    # NOT including BUMN (CC=Mandiri, NI=BNI) which are local government-owned
-    foreign_codes = list(FOREIGN_BROKER_CODES)  # From broker_config.py
-
-    placeholders = ','.join(['%s'] * len(foreign_codes))
-    query = f"""
-        SELECT
-            date,
-            SUM(net_value) as foreign_net_value,
-            SUM(net_lot) as foreign_net_lot
-        FROM broker_summary
-        WHERE stock_code = %s
-          AND date >= CURRENT_DATE - INTERVAL '{days} days'
-          AND broker_code IN ({placeholders})
-        GROUP BY date
-        ORDER BY date
-    """
-
-    params = [stock_code] + foreign_codes
-    results = execute_query(query, tuple(params))
+    # Foreign split per broker_config (FOREIGN_BROKER_CODES, tanpa BUMN seperti CC/NI)
+    # sudah dimaterialisasi di broker_flow_daily
+    results = get_broker_flow_daily(stock_code, days=days, columns=[
+        'foreign_net_value', 'foreign_net_lot', 'foreign_buy_value', 'foreign_sell_value'
+    ])
+    # Hanya tanggal dengan aktivitas broker asing
+    results = [r for r in results if r['foreign_buy_value'] or r['foreign_sell_value']]
 
     if not results:
         return {'total_net_lot': 0, 'total_net_value': 0, 'trend': 'NEUTRAL', 'consecutive_days': 0}
@@ -2194,28 +2082,20 @@ def calculate_accumulation_score(stock_code: str, lookback_days: int = 30) -> di
         # 6. FOREIGN FLOW STARTING (15 points)
         # Foreign starting to enter after domestic accumulation
         # Use correct FOREIGN_BROKER_CODES list
-        foreign_query = f"""
-            WITH weekly_foreign AS (
-                SELECT
-                    DATE_TRUNC('week', date) as week,
-                    SUM(CASE WHEN broker_code IN ({foreign_placeholders})
-                             THEN net_lot ELSE 0 END) as foreign_net
-                FROM broker_summary
-                WHERE stock_code = %s
-                AND date >= CURRENT_DATE - INTERVAL '{lookback_days} days'
-                GROUP BY DATE_TRUNC('week', date)
-                ORDER BY week
-            )
-            SELECT
-                COUNT(*) as weeks,
-                SUM(CASE WHEN foreign_net > 0 THEN 1 ELSE 0 END) as positive_weeks,
-                (array_agg(foreign_net ORDER BY week DESC))[1] as last_week_net,
-                (array_agg(foreign_net ORDER BY week DESC))[2] as prev_week_net,
-                SUM(foreign_net) as total_foreign
-            FROM weekly_foreign
-        """
-        foreign_params = tuple(foreign_codes_list + [stock_code])
-        foreign_results = execute_query(foreign_query, foreign_params)
+        # Net lot asing per minggu dari agregat harian broker_flow_daily
+        foreign_daily = get_broker_flow_daily(stock_code, days=lookback_days, columns=['foreign_net_lot'])
+        foreign_results = None
+        if foreign_daily:
+            fdf = pd.DataFrame(foreign_daily)
+            fdf['week'] = pd.to_datetime(fdf['date']).dt.to_period('W-SUN')
+            weekly = fdf.groupby('week')['foreign_net_lot'].sum().sort_index().astype(float)
+            foreign_results = [{
+                'weeks': len(weekly),
+                'positive_weeks': int((weekly > 0).sum()),
+                'last_week_net': weekly.iloc[-1],
+                'prev_week_net': weekly.iloc[-2] if len(weekly) > 1 else None,
+                'total_foreign': weekly.sum(),
+            }]
 
         if foreign_results and foreign_results[0]['weeks']:
             r = foreign_results[0]
@@ -2415,15 +2295,18 @@ def calculate_distribution_score(stock_code: str, lookback_days: int = 30) -> di
     }
 
     try:
-        price_df = get_price_data(stock_code)
-        broker_df = get_broker_data(stock_code)
+        price_df = get_price_data(stock_code, limit=lookback_days * 2)
 
         if price_df.empty:
             result['error'] = 'No price data'
             return result
 
-        # Sort and get recent data
-        price_df = price_df.sort_values('date').tail(lookback_days * 2).reset_index(drop=True)
+        # Komponen broker hanya memakai 5 tanggal broker terakhir
+        recent_flow = get_broker_flow_daily(stock_code, limit=5, columns=['net_value'])
+        if recent_flow:
+            broker_df = get_broker_data(stock_code, start_date=recent_flow[0]['date'])
+        else:
+            broker_df = pd.DataFrame()
 
         # Convert Decimal to float
         for col in ['close_price', 'open_price', 'high_price', 'low_price', 'volume', 'value']:
@@ -3225,10 +3108,27 @@ def create_navbar():
 # PAGE: LANDING / HOME
 # ============================================================
 
+def _build_snapshot_status_badge():
+    """Badge status snapshot V11b1: tanggal data + indikator stale / sedang diperbarui"""
+    status = get_snapshot_status()
+    items = []
+    if status['as_of']:
+        items.append(html.Small(f"Data per {status['as_of'].strftime('%d %b %Y')}", className="text-muted me-2"))
+    if status['recomputing']:
+        items.append(dbc.Badge([html.I(className="fas fa-sync fa-spin me-1"), "Memperbarui..."],
+                               color="info", className="small"))
+    elif status['is_stale']:
+        stale = status['stale_stocks']
+        label = f"Belum terbaru: {', '.join(stale[:5])}{'...' if len(stale) > 5 else ''}" if stale else "Belum terbaru"
+        items.append(dbc.Badge([html.I(className="fas fa-clock me-1"), label],
+                               color="warning", className="small", title=status['error'] or ''))
+    return html.Span(items, className="d-inline-flex align-items-center") if items else None
+
+
 def _build_backtest_summary_table():
     """Build backtest summary table for Home page - 20 emiten with colors and links"""
     try:
-        stock_stats = get_v11b1_per_stock_backtest_summary()
+        stock_stats = get_snapshot('per_stock', [])
         if not stock_stats:
             return html.Div("Data backtest belum tersedia.", className="text-muted p-3")
 
@@ -3641,7 +3541,8 @@ def create_landing_page(is_admin: bool = False, is_logged_in: bool = False, is_e
                             html.I(className="fas fa-play me-1"),
                             f"Running {stats['running_count']} ({'+' if stats['floating_pnl'] >= 0 else ''}{stats['floating_pnl']:.1f}%)"
                         ], color="success" if stats['floating_pnl'] >= 0 else "danger", className="small"),
-                    ], className="d-inline-flex align-items-center") if stats['total_trades'] > 0 else html.Div())(get_v11b1_2026_stats())
+                    ], className="d-inline-flex align-items-center") if stats['total_trades'] > 0 else html.Div())(get_v11b1_2026_stats()),
+                    _build_snapshot_status_badge(),
                 ], className="d-flex align-items-center flex-wrap gap-2"),
             ], className="mb-4"),
 
@@ -3655,7 +3556,9 @@ def create_landing_page(is_admin: bool = False, is_logged_in: bool = False, is_e
                         html.I(className="fas fa-chart-line me-2"),
                         "Ringkasan Backtest V11b1 - 20 Emiten"
                     ], className="text-start mb-0 fw-bold text-white"),
-                ], style={"background": "linear-gradient(135deg, #1a1a2e 0%, #16213e 100%)"}),
+                    _build_snapshot_status_badge(),
+                ], className="d-flex justify-content-between align-items-center",
+                   style={"background": "linear-gradient(135deg, #1a1a2e 0%, #16213e 100%)"}),
                 dbc.CardBody([
                     _build_backtest_summary_table(),
                 ], className="p-0"),
@@ -4489,18 +4392,19 @@ def get_member_history_data():
     return execute_query(query, use_cache=False) or []
 
 def get_forum_threads(stock_code: str = None, limit: int = 50):
-    """Get forum threads, pinned first, then by score"""
+    """Get forum threads, pinned first, then by score (metadata lampiran saja, tanpa isi PDF)"""
+    ensure_attachment_table()  # kolom pdf_hash / pdf_size
     if stock_code:
-        query = """
-            SELECT * FROM forum_threads
+        query = f"""
+            SELECT {THREAD_LIST_COLUMNS} FROM forum_threads
             WHERE (stock_code = %s OR stock_code IS NULL) AND is_hidden = FALSE
             ORDER BY is_pinned DESC, score DESC, created_at DESC
             LIMIT %s
         """
         results = execute_query(query, (stock_code, limit), use_cache=False)  # No cache for real-time forum
     else:
-        query = """
-            SELECT * FROM forum_threads
+        query = f"""
+            SELECT {THREAD_LIST_COLUMNS} FROM forum_threads
             WHERE is_hidden = FALSE
             ORDER BY is_pinned DESC, score DESC, created_at DESC
             LIMIT %s
@@ -5155,11 +5059,9 @@ def create_upload_page():
                                             ], width=4),
                                         ]),
 
-                                        # File Upload with Loading
-                                        dcc.Loading(
+                                        # File Upload (progress bar diisi background job import)
+                                        html.Div(
                                             id="upload-loading",
-                                            type="circle",
-                                            color="#0d6efd",
                                             children=[
                                                 dcc.Upload(
                                                     id='upload-data',
@@ -5185,6 +5087,8 @@ def create_upload_page():
                                                     multiple=False,
                                                     accept='.xlsx,.xls'
                                                 ),
+                                                html.Div(id='upload-progress'),
+                                                cancel_button('upload-cancel-btn'),
                                                 html.Div(id='upload-status', className="mt-3"),
                                             ]
                                         ),
@@ -5325,13 +5229,19 @@ def create_upload_page():
                                             ], md=5),
                                         ]),
 
+                                        # Cancel buttons (tampil selama job berjalan)
+                                        html.Div([
+                                            cancel_button('gdrive-sync-cancel-btn'),
+                                            cancel_button('recalc-v11b1-cancel-btn'),
+                                        ]),
+
                                         # V11b1 Recalc Status
+                                        html.Div(id='v11b1-recalc-progress'),
                                         html.Div(id='v11b1-recalc-status', className="mt-2"),
 
                                         # Progress & Log
                                         html.Div([
-                                            dbc.Progress(id='gdrive-progress', value=0, striped=True, animated=True,
-                                                        className="mt-3", style={'display': 'none'}),
+                                            html.Div(id='gdrive-progress'),
                                             html.Div(id='gdrive-log', className="mt-3",
                                                     style={'maxHeight': '300px', 'overflowY': 'auto'})
                                         ])
@@ -5742,6 +5652,12 @@ def create_upload_page():
                                         html.Div(id='dm-upload-status', className="mt-2")
                                     ], md=4),
                                 ]),
+                                html.Div([
+                                    cancel_button('dm-upload-cancel-btn'),
+                                    cancel_button('dm-recalc-v11b1-cancel-btn'),
+                                ]),
+                                html.Div(id='dm-upload-progress'),
+                                html.Div(id='dm-v11b1-progress'),
                                 html.Div(id='dm-v11b1-status', className="mt-2"),
                                 html.Div(id='dm-upload-log', className="mt-3",
                                          style={'maxHeight': '300px', 'overflowY': 'auto'}),
@@ -6839,155 +6755,7 @@ def create_validation_card(stock_code: str):
             ], className="mb-3", color="dark", outline=True),
 
             # === 5. VOLUME VS PRICE RANGE (MULTI-HORIZON) ===
-            dbc.Card([
-                dbc.CardHeader([
-                    html.H6([html.I(className="fas fa-balance-scale me-2"), "Volume vs Price (Multi-Horizon Analysis)"], className="mb-0 text-info d-inline"),
-                    html.Small(" - Absorption detection dengan validasi multi-waktu", className="text-muted ms-2")
-                ]),
-                dbc.CardBody([
-                    html.Small([
-                        html.I(className="fas fa-lightbulb me-1 text-warning"),
-                        "Volume dinilai signifikan jika peningkatan bertahan minimal 3-5 hari tanpa diikuti pelebaran range harga. "
-                        "Lonjakan volume satu hari belum tentu akumulasi - sistem mencari konsistensi, bukan kebetulan."
-                    ], className="text-muted d-block mb-3 fst-italic"),
-
-                    # Significance Badge
-                    html.Div([
-                        dbc.Badge(
-                            vol_price_multi.get('significance', 'NONE'),
-                            color="success" if vol_price_multi.get('significance') == 'SIGNIFICANT' else
-                                  "info" if vol_price_multi.get('significance') == 'MODERATE' else
-                                  "warning" if vol_price_multi.get('significance') == 'EARLY' else "secondary",
-                            className="px-3 py-2 fs-6"
-                        ),
-                    ], className="text-center mb-3"),
-
-                    # Multi-Horizon Breakdown Table
-                    html.Table([
-                        html.Thead([
-                            html.Tr([
-                                html.Th("Horizon", className="text-center", style={"width": "20%"}),
-                                html.Th("Volume D", className="text-center", style={"width": "20%"}),
-                                html.Th("Price D", className="text-center", style={"width": "20%"}),
-                                html.Th("Range", className="text-center", style={"width": "20%"}),
-                                html.Th("AKSI?", className="text-center", style={"width": "20%"}, title="Akumulasi/Distribusi"),
-                            ])
-                        ]),
-                        html.Tbody([
-                            # 1 Day (Micro)
-                            html.Tr([
-                                html.Td([html.Strong("1 Hari"), html.Br(), html.Small("(Micro)", className="text-muted")], className="text-center"),
-                                html.Td(
-                                    f"{vol_price_multi.get('horizons', {}).get('1d', {}).get('volume_change_pct', 0):+.0f}%"
-                                    if vol_price_multi.get('horizons', {}).get('1d') else "-",
-                                    className=f"text-center text-{'success' if vol_price_multi.get('horizons', {}).get('1d', {}).get('volume_change_pct', 0) > 0 else 'danger'}"
-                                ),
-                                html.Td(
-                                    f"{vol_price_multi.get('horizons', {}).get('1d', {}).get('price_change_pct', 0):+.1f}%"
-                                    if vol_price_multi.get('horizons', {}).get('1d') else "-",
-                                    className=f"text-center text-{'success' if vol_price_multi.get('horizons', {}).get('1d', {}).get('price_change_pct', 0) > 0 else 'danger'}"
-                                ),
-                                html.Td(
-                                    f"{vol_price_multi.get('horizons', {}).get('1d', {}).get('price_range_pct', 0):.1f}%"
-                                    if vol_price_multi.get('horizons', {}).get('1d') else "-",
-                                    className="text-center"
-                                ),
-                                html.Td(
-                                    dbc.Badge(
-                                        vol_price_multi.get('horizons', {}).get('1d', {}).get('absorption_type', 'Ya'),
-                                        color="success" if vol_price_multi.get('horizons', {}).get('1d', {}).get('absorption_type') == 'AKUMULASI' else "danger"
-                                    ) if vol_price_multi.get('horizons', {}).get('1d', {}).get('is_absorption') else
-                                    dbc.Badge("Tidak", color="secondary"),
-                                    className="text-center"
-                                ),
-                            ], style={"backgroundColor": "rgba(255,193,7,0.1)" if vol_price_multi.get('micro_absorption') else "transparent"}),
-
-                            # 5 Day (Core) - MOST IMPORTANT
-                            html.Tr([
-                                html.Td([html.Strong("5 Hari", className="text-warning"), html.Br(), html.Small("(Core)", className="text-warning")], className="text-center"),
-                                html.Td(
-                                    f"{vol_price_multi.get('horizons', {}).get('5d', {}).get('volume_change_pct', 0):+.0f}%"
-                                    if vol_price_multi.get('horizons', {}).get('5d') else "-",
-                                    className=f"text-center fw-bold text-{'success' if vol_price_multi.get('horizons', {}).get('5d', {}).get('volume_change_pct', 0) > 0 else 'danger'}"
-                                ),
-                                html.Td(
-                                    f"{vol_price_multi.get('horizons', {}).get('5d', {}).get('price_change_pct', 0):+.1f}%"
-                                    if vol_price_multi.get('horizons', {}).get('5d') else "-",
-                                    className=f"text-center fw-bold text-{'success' if vol_price_multi.get('horizons', {}).get('5d', {}).get('price_change_pct', 0) > 0 else 'danger'}"
-                                ),
-                                html.Td(
-                                    f"{vol_price_multi.get('horizons', {}).get('5d', {}).get('price_range_pct', 0):.1f}%"
-                                    if vol_price_multi.get('horizons', {}).get('5d') else "-",
-                                    className="text-center fw-bold"
-                                ),
-                                html.Td(
-                                    dbc.Badge(
-                                        vol_price_multi.get('horizons', {}).get('5d', {}).get('absorption_type', 'Ya'),
-                                        color="success" if vol_price_multi.get('horizons', {}).get('5d', {}).get('absorption_type') == 'AKUMULASI' else "danger"
-                                    ) if vol_price_multi.get('horizons', {}).get('5d', {}).get('is_absorption') else
-                                    dbc.Badge("Tidak", color="secondary"),
-                                    className="text-center fw-bold"
-                                ),
-                            ], style={"backgroundColor": "rgba(23,162,184,0.15)" if vol_price_multi.get('core_absorption') else "rgba(255,193,7,0.05)", "borderLeft": "3px solid #ffc107"}),
-
-                            # 10 Day (Structural)
-                            html.Tr([
-                                html.Td([html.Strong("10 Hari"), html.Br(), html.Small("(Structural)", className="text-muted")], className="text-center"),
-                                html.Td(
-                                    f"{vol_price_multi.get('horizons', {}).get('10d', {}).get('volume_change_pct', 0):+.0f}%"
-                                    if vol_price_multi.get('horizons', {}).get('10d') else "-",
-                                    className=f"text-center text-{'success' if vol_price_multi.get('horizons', {}).get('10d', {}).get('volume_change_pct', 0) > 0 else 'danger'}"
-                                ),
-                                html.Td(
-                                    f"{vol_price_multi.get('horizons', {}).get('10d', {}).get('price_change_pct', 0):+.1f}%"
-                                    if vol_price_multi.get('horizons', {}).get('10d') else "-",
-                                    className=f"text-center text-{'success' if vol_price_multi.get('horizons', {}).get('10d', {}).get('price_change_pct', 0) > 0 else 'danger'}"
-                                ),
-                                html.Td(
-                                    f"{vol_price_multi.get('horizons', {}).get('10d', {}).get('price_range_pct', 0):.1f}%"
-                                    if vol_price_multi.get('horizons', {}).get('10d') else "-",
-                                    className="text-center"
-                                ),
-                                html.Td(
-                                    dbc.Badge(
-                                        vol_price_multi.get('horizons', {}).get('10d', {}).get('absorption_type', 'Ya'),
-                                        color="success" if vol_price_multi.get('horizons', {}).get('10d', {}).get('absorption_type') == 'AKUMULASI' else "danger"
-                                    ) if vol_price_multi.get('horizons', {}).get('10d', {}).get('is_absorption') else
-                                    dbc.Badge("Tidak", color="secondary"),
-                                    className="text-center"
-                                ),
-                            ], style={"backgroundColor": "rgba(40,167,69,0.1)" if vol_price_multi.get('structural_absorption') else "transparent"}),
-                        ])
-                    ], className="table table-sm table-dark", style={"fontSize": "12px"}),
-
-                    # Legend
-                    html.Small([
-                        html.I(className="fas fa-info-circle me-1"),
-                        "Volume D = perubahan volume vs periode sebelumnya | ",
-                        "Price D = perubahan harga close-to-close | ",
-                        "Range = high-low sebagai % dari mid price"
-                    ], className="text-muted d-block mb-2"),
-                    html.Small([
-                        html.I(className="fas fa-lightbulb me-1 text-warning"),
-                        html.Strong("AKUMULASI", className="text-success"), " = Volume naik + Harga turun (smart money beli) | ",
-                        html.Strong("DISTRIBUSI", className="text-danger"), " = Volume naik + Harga naik (smart money jual)"
-                    ], className="text-muted d-block mb-3"),
-
-                    # KESIMPULAN
-                    html.Hr(className="my-3"),
-                    html.Div([
-                        html.Strong([html.I(className="fas fa-clipboard-check me-2"), "Kesimpulan: "], className="text-info"),
-                        html.Span(
-                            vol_price_multi.get('conclusion', 'Tidak ada data'),
-                            className="fw-bold " + (
-                                "text-success" if vol_price_multi.get('significance') in ['SIGNIFICANT', 'MODERATE'] else
-                                "text-warning" if vol_price_multi.get('significance') == 'EARLY' else
-                                "text-info"
-                            )
-                        )
-                    ], className="p-2 rounded", style={"backgroundColor": "rgba(255,255,255,0.05)"})
-                ])
-            ], className="mb-3", color="dark", outline=True),
+            create_volume_price_multi_card(vol_price_multi),
 
             # === 6. TOP BROKER FLOW ===
             dbc.Card([
@@ -7269,37 +7037,190 @@ def create_validation_card(stock_code: str):
     ], className="mb-4", style={"background": "linear-gradient(180deg, #1a1a2e 0%, #0f0f1a 100%)", "border": "1px solid #0f3460"})
 
 
-# ============================================================
-# HELPER: SIGNAL EDUCATION CARD (Dinamis - Bukan Template)
-# ============================================================
-
-def generate_signal_education_data(validation_data: dict, broker_data: dict = None) -> dict:
-    """
-    Generate dynamic educational explanation based on actual data.
-    Bukan template - analisis berdasarkan kondisi real.
-    """
-    validations = validation_data.get('validations', {})
-    decision_rule = validation_data.get('decision_rule', {})
-    summary = validation_data.get('summary', {})
-    detection = validation_data.get('detection', {})
+def create_volume_price_multi_card(vol_price_multi: dict, class_name: str = "mb-3"):
+    """Card Volume vs Price multi-horizon (hasil calculate_volume_price_multi_horizon)"""
+    return dbc.Card([
+        dbc.CardHeader([
+            html.H6([html.I(className="fas fa-balance-scale me-2"), "Volume vs Price (Multi-Horizon Analysis)"], className="mb-0 text-info d-inline"),
+            html.Small(" - Absorption detection dengan validasi multi-waktu", className="text-muted ms-2")
+        ]),
+        dbc.CardBody([
+            html.Small([
+                html.I(className="fas fa-lightbulb me-1 text-warning"),
+                "Volume dinilai signifikan jika peningkatan bertahan minimal 3-5 hari tanpa diikuti pelebaran range harga. "
+                "Lonjakan volume satu hari belum tentu akumulasi - sistem mencari konsistensi, bukan kebetulan."
+            ], className="text-muted d-block mb-3 fst-italic"),
 
-    signal = summary.get('overall_signal', 'NETRAL')
-    decision = decision_rule.get('decision', 'WAIT')
+            # Significance Badge
+            html.Div([
+                dbc.Badge(
+                    vol_price_multi.get('significance', 'NONE'),
+                    color="success" if vol_price_multi.get('significance') == 'SIGNIFICANT' else
+                          "info" if vol_price_multi.get('significance') == 'MODERATE' else
+                          "warning" if vol_price_multi.get('significance') == 'EARLY' else "secondary",
+                    className="px-3 py-2 fs-6"
+                ),
+            ], className="text-center mb-3"),
 
-    # Get CPR
-    cpr_data = validations.get('cpr', {})
-    cpr_pct = int(cpr_data.get('avg_cpr', 0.5) * 100)
+            # Multi-Horizon Breakdown Table
+            html.Table([
+                html.Thead([
+                    html.Tr([
+                        html.Th("Horizon", className="text-center", style={"width": "20%"}),
+                        html.Th("Volume D", className="text-center", style={"width": "20%"}),
+                        html.Th("Price D", className="text-center", style={"width": "20%"}),
+                        html.Th("Range", className="text-center", style={"width": "20%"}),
+                        html.Th("AKSI?", className="text-center", style={"width": "20%"}, title="Akumulasi/Distribusi"),
+                    ])
+                ]),
+                html.Tbody([
+                    # 1 Day (Micro)
+                    html.Tr([
+                        html.Td([html.Strong("1 Hari"), html.Br(), html.Small("(Micro)", className="text-muted")], className="text-center"),
+                        html.Td(
+                            f"{vol_price_multi.get('horizons', {}).get('1d', {}).get('volume_change_pct', 0):+.0f}%"
+                            if vol_price_multi.get('horizons', {}).get('1d') else "-",
+                            className=f"text-center text-{'success' if vol_price_multi.get('horizons', {}).get('1d', {}).get('volume_change_pct', 0) > 0 else 'danger'}"
+                        ),
+                        html.Td(
+                            f"{vol_price_multi.get('horizons', {}).get('1d', {}).get('price_change_pct', 0):+.1f}%"
+                            if vol_price_multi.get('horizons', {}).get('1d') else "-",
+                            className=f"text-center text-{'success' if vol_price_multi.get('horizons', {}).get('1d', {}).get('price_change_pct', 0) > 0 else 'danger'}"
+                        ),
+                        html.Td(
+                            f"{vol_price_multi.get('horizons', {}).get('1d', {}).get('price_range_pct', 0):.1f}%"
+                            if vol_price_multi.get('horizons', {}).get('1d') else "-",
+                            className="text-center"
+                        ),
+                        html.Td(
+                            dbc.Badge(
+                                vol_price_multi.get('horizons', {}).get('1d', {}).get('absorption_type', 'Ya'),
+                                color="success" if vol_price_multi.get('horizons', {}).get('1d', {}).get('absorption_type') == 'AKUMULASI' else "danger"
+                            ) if vol_price_multi.get('horizons', {}).get('1d', {}).get('is_absorption') else
+                            dbc.Badge("Tidak", color="secondary"),
+                            className="text-center"
+                        ),
+                    ], style={"backgroundColor": "rgba(255,193,7,0.1)" if vol_price_multi.get('micro_absorption') else "transparent"}),
 
-    education = {
-        'signal_explanation': '',
-        'why_not_buy': [],
-        'wait_for_confirmation': [],
-        'positive_factors': [],
-        'warning_factors': []
-    }
+                    # 5 Day (Core) - MOST IMPORTANT
+                    html.Tr([
+                        html.Td([html.Strong("5 Hari", className="text-warning"), html.Br(), html.Small("(Core)", className="text-warning")], className="text-center"),
+                        html.Td(
+                            f"{vol_price_multi.get('horizons', {}).get('5d', {}).get('volume_change_pct', 0):+.0f}%"
+                            if vol_price_multi.get('horizons', {}).get('5d') else "-",
+                            className=f"text-center fw-bold text-{'success' if vol_price_multi.get('horizons', {}).get('5d', {}).get('volume_change_pct', 0) > 0 else 'danger'}"
+                        ),
+                        html.Td(
+                            f"{vol_price_multi.get('horizons', {}).get('5d', {}).get('price_change_pct', 0):+.1f}%"
+                            if vol_price_multi.get('horizons', {}).get('5d') else "-",
+                            className=f"text-center fw-bold text-{'success' if vol_price_multi.get('horizons', {}).get('5d', {}).get('price_change_pct', 0) > 0 else 'danger'}"
+                        ),
+                        html.Td(
+                            f"{vol_price_multi.get('horizons', {}).get('5d', {}).get('price_range_pct', 0):.1f}%"
+                            if vol_price_multi.get('horizons', {}).get('5d') else "-",
+                            className="text-center fw-bold"
+                        ),
+                        html.Td(
+                            dbc.Badge(
+                                vol_price_multi.get('horizons', {}).get('5d', {}).get('absorption_type', 'Ya'),
+                                color="success" if vol_price_multi.get('horizons', {}).get('5d', {}).get('absorption_type') == 'AKUMULASI' else "danger"
+                            ) if vol_price_multi.get('horizons', {}).get('5d', {}).get('is_absorption') else
+                            dbc.Badge("Tidak", color="secondary"),
+                            className="text-center fw-bold"
+                        ),
+                    ], style={"backgroundColor": "rgba(23,162,184,0.15)" if vol_price_multi.get('core_absorption') else "rgba(255,193,7,0.05)", "borderLeft": "3px solid #ffc107"}),
 
-    # ==============================================================
-    # ANALISIS KONDISI AKTUAL (bukan template)
+                    # 10 Day (Structural)
+                    html.Tr([
+                        html.Td([html.Strong("10 Hari"), html.Br(), html.Small("(Structural)", className="text-muted")], className="text-center"),
+                        html.Td(
+                            f"{vol_price_multi.get('horizons', {}).get('10d', {}).get('volume_change_pct', 0):+.0f}%"
+                            if vol_price_multi.get('horizons', {}).get('10d') else "-",
+                            className=f"text-center text-{'success' if vol_price_multi.get('horizons', {}).get('10d', {}).get('volume_change_pct', 0) > 0 else 'danger'}"
+                        ),
+                        html.Td(
+                            f"{vol_price_multi.get('horizons', {}).get('10d', {}).get('price_change_pct', 0):+.1f}%"
+                            if vol_price_multi.get('horizons', {}).get('10d') else "-",
+                            className=f"text-center text-{'success' if vol_price_multi.get('horizons', {}).get('10d', {}).get('price_change_pct', 0) > 0 else 'danger'}"
+                        ),
+                        html.Td(
+                            f"{vol_price_multi.get('horizons', {}).get('10d', {}).get('price_range_pct', 0):.1f}%"
+                            if vol_price_multi.get('horizons', {}).get('10d') else "-",
+                            className="text-center"
+                        ),
+                        html.Td(
+                            dbc.Badge(
+                                vol_price_multi.get('horizons', {}).get('10d', {}).get('absorption_type', 'Ya'),
+                                color="success" if vol_price_multi.get('horizons', {}).get('10d', {}).get('absorption_type') == 'AKUMULASI' else "danger"
+                            ) if vol_price_multi.get('horizons', {}).get('10d', {}).get('is_absorption') else
+                            dbc.Badge("Tidak", color="secondary"),
+                            className="text-center"
+                        ),
+                    ], style={"backgroundColor": "rgba(40,167,69,0.1)" if vol_price_multi.get('structural_absorption') else "transparent"}),
+                ])
+            ], className="table table-sm table-dark", style={"fontSize": "12px"}),
+
+            # Legend
+            html.Small([
+                html.I(className="fas fa-info-circle me-1"),
+                "Volume D = perubahan volume vs periode sebelumnya | ",
+                "Price D = perubahan harga close-to-close | ",
+                "Range = high-low sebagai % dari mid price"
+            ], className="text-muted d-block mb-2"),
+            html.Small([
+                html.I(className="fas fa-lightbulb me-1 text-warning"),
+                html.Strong("AKUMULASI", className="text-success"), " = Volume naik + Harga turun (smart money beli) | ",
+                html.Strong("DISTRIBUSI", className="text-danger"), " = Volume naik + Harga naik (smart money jual)"
+            ], className="text-muted d-block mb-3"),
+
+            # KESIMPULAN
+            html.Hr(className="my-3"),
+            html.Div([
+                html.Strong([html.I(className="fas fa-clipboard-check me-2"), "Kesimpulan: "], className="text-info"),
+                html.Span(
+                    vol_price_multi.get('conclusion', 'Tidak ada data'),
+                    className="fw-bold " + (
+                        "text-success" if vol_price_multi.get('significance') in ['SIGNIFICANT', 'MODERATE'] else
+                        "text-warning" if vol_price_multi.get('significance') == 'EARLY' else
+                        "text-info"
+                    )
+                )
+            ], className="p-2 rounded", style={"backgroundColor": "rgba(255,255,255,0.05)"})
+        ])
+    ], className=class_name, color="dark", outline=True)
+
+
+# ============================================================
+# HELPER: SIGNAL EDUCATION CARD (Dinamis - Bukan Template)
+# ============================================================
+
+def generate_signal_education_data(validation_data: dict, broker_data: dict = None) -> dict:
+    """
+    Generate dynamic educational explanation based on actual data.
+    Bukan template - analisis berdasarkan kondisi real.
+    """
+    validations = validation_data.get('validations', {})
+    decision_rule = validation_data.get('decision_rule', {})
+    summary = validation_data.get('summary', {})
+    detection = validation_data.get('detection', {})
+
+    signal = summary.get('overall_signal', 'NETRAL')
+    decision = decision_rule.get('decision', 'WAIT')
+
+    # Get CPR
+    cpr_data = validations.get('cpr', {})
+    cpr_pct = int(cpr_data.get('avg_cpr', 0.5) * 100)
+
+    education = {
+        'signal_explanation': '',
+        'why_not_buy': [],
+        'wait_for_confirmation': [],
+        'positive_factors': [],
+        'warning_factors': []
+    }
+
+    # ==============================================================
+    # ANALISIS KONDISI AKTUAL (bukan template)
     # ==============================================================
 
     # 1. Analisis CPR
@@ -14976,38 +14897,15 @@ def create_fundamental_page(stock_code='CDIA'):
 # PAGE: COMPREHENSIVE ANALYSIS (Unified from 3 Submenus)
 # ============================================================
 
-def create_analysis_page(stock_code='CDIA'):
+def _build_analysis_decision_section(stock_code):
     """
-    Create unified analysis page combining data from 3 submenus:
-    1. Fundamental (PER, PBV, ROE)
-    2. Support & Resistance (Key levels)
-    3. Accumulation (Decision rule, signals)
+    Section utama halaman analisis: decision hero (V6/Strong S/R/V11b1), S/R Fix
+    dan checklist Konfirmasi V11b1. Hanya butuh data harga + zona, tanpa
+    get_unified_analysis_summary (diisi section 'summary').
     """
     try:
-        # Get unified analysis from all 3 submenus
-        unified = get_unified_analysis_summary(stock_code)
-        decision = unified.get('decision', {})
-        accum = unified.get('accumulation', {})
-        fundamental = unified.get('fundamental', {})
-        sr = unified.get('support_resistance', {})
-        key_points = unified.get('key_points', [])
-        warnings = unified.get('warnings', [])
-
-        # Extract nested data
-        summary = accum.get('summary', {})
-        confidence = accum.get('confidence', {})
-        validations = accum.get('validations', {})
-        detection = accum.get('detection', {})
-        markup_trigger = accum.get('markup_trigger', {})
-        impulse_signal = accum.get('impulse_signal', {})
-
-        current_price = sr.get('current_price', 0) or accum.get('current_price', 0)
-
-        # Multi-horizon Volume vs Price analysis
         price_df = get_price_data(stock_code)
-        vol_price_multi = calculate_volume_price_multi_horizon(price_df) if not price_df.empty else {
-            'status': 'NO_DATA', 'significance': 'INSUFFICIENT', 'horizons': {}, 'conclusion': 'Data tidak tersedia'
-        }
+        current_price = float(price_df.sort_values('date')['close_price'].iloc[-1]) if not price_df.empty else 0
 
         # V11b Volume Ratio Calculation (today volume / 20-day avg)
         v11b_vol_ratio = 1.0  # Default
@@ -15038,6 +14936,14 @@ def create_analysis_page(stock_code='CDIA'):
                     prev_month = price_df_sorted['close_price'].iloc[20]
                     change_1m = ((current - prev_month) / prev_month * 100) if prev_month else 0
 
+        # Net foreign 1 minggu (5 hari bursa terakhir, dalam lot) - sama dengan minggu ke-1 section weekly
+        foreign_1w_lot = 0
+        if not price_df.empty:
+            last_week = price_df.sort_values('date').tail(5)
+            avg_close_1w = pd.to_numeric(last_week['close_price'], errors='coerce').mean()
+            if avg_close_1w > 0:
+                foreign_1w_lot = pd.to_numeric(last_week['net_foreign'], errors='coerce').fillna(0).sum() / avg_close_1w / 100
+
         # V6 Sideways Analysis for accurate Support/Resistance levels
         v6_data = get_v6_analysis(stock_code)
         v6_sideways = v6_data.get('sideways', {}) if not v6_data.get('error') else {}
@@ -15048,17 +14954,6 @@ def create_analysis_page(stock_code='CDIA'):
         if has_custom_formula(stock_code):
             strong_sr_data = get_strong_sr_analysis(stock_code)
             if strong_sr_data and not strong_sr_data.get('error'):
-                # Override sr values with Strong S/R
-                sr['support_20d'] = strong_sr_data.get('support', sr.get('support_20d', 0))
-                sr['resistance_20d'] = strong_sr_data.get('resistance', sr.get('resistance_20d', 0))
-                sr['strong_sr'] = True
-                sr['support_touches'] = strong_sr_data.get('support_touches', 0)
-                sr['resistance_touches'] = strong_sr_data.get('resistance_touches', 0)
-                # Recalculate distances
-                if current_price and sr['support_20d']:
-                    sr['dist_from_support'] = (current_price - sr['support_20d']) / current_price * 100
-                if current_price and sr['resistance_20d']:
-                    sr['dist_from_resistance'] = (sr['resistance_20d'] - current_price) / current_price * 100
                 # Override v6_entry with Strong S/R values
                 v6_entry['stop_loss'] = strong_sr_data.get('stop_loss')
                 v6_entry['target'] = strong_sr_data.get('target')
@@ -15076,48 +14971,12 @@ def create_analysis_page(stock_code='CDIA'):
                 v6_sideways['low'] = strong_sr_data.get('support', v6_sideways.get('low', 0))
                 v6_sideways['high'] = strong_sr_data.get('resistance', v6_sideways.get('high', 0))
 
-        # Weekly Analysis for 4-week accumulation data
-        weekly_data = get_weekly_analysis(stock_code)
-        weeks = weekly_data.get('weeks', {})
-
     except Exception as e:
         return html.Div([
             dbc.Alert(f"Error loading analysis for {stock_code}: {str(e)}", color="danger"),
             html.P("Pastikan data sudah diupload dengan benar")
         ])
 
-    # Generate one-line insight based on analysis
-    overall_signal = summary.get('overall_signal', 'NETRAL')
-    conf_level = confidence.get('level', 'LOW')
-    pass_rate = confidence.get('pass_rate', 0)
-    action = decision.get('action', 'WAIT')
-
-    # Check impulse signal first (highest priority)
-    if impulse_signal.get('impulse_detected'):
-        imp_strength = impulse_signal.get('strength', 'WEAK')
-        vol_ratio = impulse_signal.get('metrics', {}).get('volume_ratio', 0)
-        insight_text = f"[!] {stock_code} IMPULSE BREAKOUT ({imp_strength})! Volume {vol_ratio:.1f}x rata-rata. Momentum tinggi, risiko tinggi."
-        insight_color = "danger"
-    elif impulse_signal.get('near_impulse'):
-        conds_met = impulse_signal.get('trigger_conditions', {}).get('conditions_met', 0)
-        insight_text = f"[+] {stock_code} hampir memenuhi kriteria impulse ({conds_met}/3). Pantau volume dan breakout."
-        insight_color = "info"
-    elif overall_signal == 'AKUMULASI' and conf_level in ['HIGH', 'VERY_HIGH']:
-        insight_text = f"[G] {stock_code} menunjukkan pola akumulasi kuat ({pass_rate:.0f}% validasi lolos). Perhatikan zona entry."
-        insight_color = "success"
-    elif overall_signal == 'AKUMULASI':
-        insight_text = f"[Y] {stock_code} menunjukkan sinyal akumulasi awal. Pantau konsistensi broker flow."
-        insight_color = "info"
-    elif overall_signal == 'DISTRIBUSI' and conf_level in ['HIGH', 'VERY_HIGH']:
-        insight_text = f"[R] {stock_code} dalam fase distribusi kuat ({pass_rate:.0f}% validasi). Hati-hati posisi beli baru."
-        insight_color = "danger"
-    elif overall_signal == 'DISTRIBUSI':
-        insight_text = f"[ ] {stock_code} menunjukkan sinyal distribusi. Pertimbangkan pengurangan posisi."
-        insight_color = "warning"
-    else:
-        insight_text = f"[~] {stock_code} dalam fase netral. Tidak ada sinyal kuat - observasi dulu."
-        insight_color = "secondary"
-
     # === V6 SYSTEM VARIABLES (BEFORE RETURN) ===
     v6_action = v6_entry.get('action', 'WAIT') if v6_entry else 'WAIT'
     v6_action_reason = v6_entry.get('action_reason', '') if v6_entry else ''
@@ -15444,16 +15303,11 @@ def create_analysis_page(stock_code='CDIA'):
     }
     v6_style = v6_action_map.get(v6_action, v6_action_map['WAIT'])
 
-    # === SIGNAL HISTORY FOR CUSTOM FORMULA STOCKS (PANI, BREN, MBMA) ===
-    use_custom_formula = has_custom_formula(stock_code)
-    signal_history = None
-    if use_custom_formula:
-        try:
-            # Auto-select V8 or V9 based on custom S/R zones
-            signal_history = get_signal_history_auto(stock_code, '2025-01-02')
-        except Exception as e:
-            print(f"Error loading signal history: {e}")
-            signal_history = {'error': str(e), 'signals': []}
+    # Posisi harga vs zona: zona V11b1 jika ada, selain itu range sideways V6
+    zone_status = v11b1_zone_status
+    if not zone_status and v6_sideways.get('low') and v6_sideways.get('high'):
+        zone_status = ('ABOVE' if current_price > v6_sideways['high'] else
+                       'IN_ZONE' if current_price >= v6_sideways['low'] else 'BELOW')
 
     # === ENTRY CALCULATIONS FOR ENTRY STATUS ONLY (V11b1 Format) ===
     entry_calc = None
@@ -15551,32 +15405,6 @@ def create_analysis_page(stock_code='CDIA'):
 
     # ========== BUILD THE PAGE ==========
     return html.Div([
-        # === ONE-LINE INSIGHT BAR (TOP HEADLINE) - INDONESIAN ===
-        dbc.Alert([
-            html.Div([
-                html.I(className="fas fa-lightbulb me-2 text-warning"),
-                html.Strong("Insight Hari Ini: ", className="me-1"),
-                html.Span(insight_text),
-            ], className="d-flex align-items-center flex-wrap")
-        ], color=insight_color, className="mb-3 py-2", style={
-            "borderLeft": f"4px solid var(--bs-{insight_color})",
-            "backgroundColor": f"rgba(var(--bs-{insight_color}-rgb), 0.1)"
-        }),
-
-        # === PAGE HEADER WITH SUBMENU NAVIGATION ===
-        # Title and submenu - stacked on mobile, inline on desktop
-        html.Div([
-            html.H4([
-                html.I(className="fas fa-chart-pie me-2"),
-                f"Analisis Detail - {stock_code}"
-            ], className="mb-2 mb-lg-0"),
-        ], className="mb-2"),
-        html.Div([
-            dcc.Link(dbc.Button([html.I(className="fas fa-chart-line me-2"), "Fundamental"], color="success", size="sm", className="me-2 mb-2 mb-lg-0"), href="/fundamental"),
-            dcc.Link(dbc.Button([html.I(className="fas fa-layer-group me-2"), "Support & Resistance"], color="info", size="sm", className="me-2 mb-2 mb-lg-0"), href="/support-resistance"),
-            dcc.Link(dbc.Button([html.I(className="fas fa-cubes me-2"), "Accumulation"], color="warning", size="sm", className="mb-2 mb-lg-0"), href="/accumulation"),
-        ], className="d-flex flex-wrap mb-3"),
-
         # === 1. DECISION HERO CARD (V6 SYSTEM) ===
         dbc.Card([
             dbc.CardBody([
@@ -15768,9 +15596,8 @@ def create_analysis_page(stock_code='CDIA'):
                             html.H2([
                                 html.Span(f"Rp {current_price:,.0f}", className="text-warning me-3"),
                                 dbc.Badge(
-                                    # Use V11b1 zone status for V11b1 stocks, otherwise use accum logic
-                                    v11b1_zone_status if v11b1_zone_status else accum.get('decision_rule', {}).get('current_vs_entry', 'N/A'),
-                                    color="success" if (v11b1_zone_status or accum.get('decision_rule', {}).get('current_vs_entry')) == 'IN_ZONE' else "warning" if (v11b1_zone_status or accum.get('decision_rule', {}).get('current_vs_entry')) == 'ABOVE' else "danger"
+                                    zone_status or 'N/A',
+                                    color="success" if zone_status == 'IN_ZONE' else "warning" if zone_status == 'ABOVE' else "danger"
                                 )
                             ], className="mb-2"),
                             # Price changes: Today, 1W, 1M
@@ -15788,7 +15615,7 @@ def create_analysis_page(stock_code='CDIA'):
                                     html.Span(f"{change_1m:+.2f}%", className=f"fw-bold text-{'success' if change_1m > 0 else 'danger' if change_1m < 0 else 'secondary'}")
                                 ]),
                             ], className="mb-2"),
-                            html.P(v6_action_reason if v6_action_reason else decision.get('reason', ''), className="mb-2"),
+                            html.P(v6_action_reason, className="mb-2"),
                         ]),
 
                         # V10 Metrics Row - Konfirmasi V11b1 based on price direction
@@ -15831,8 +15658,8 @@ def create_analysis_page(stock_code='CDIA'):
                                     html.Small("Foreign 1 Minggu", className="text-muted"),
                                     html.Div([
                                         html.Strong(
-                                            f"{'BUY' if weeks.get(1, {}).get('net_foreign_lot', 0) > 0 else 'SELL'} {abs(weeks.get(1, {}).get('net_foreign_lot', 0))/1000:.0f}K",
-                                            className='text-' + ('success' if weeks.get(1, {}).get('net_foreign_lot', 0) > 0 else 'danger')
+                                            f"{'BUY' if foreign_1w_lot > 0 else 'SELL'} {abs(foreign_1w_lot)/1000:.0f}K",
+                                            className='text-' + ('success' if foreign_1w_lot > 0 else 'danger')
                                         )
                                     ])
                                 ], className="text-center")
@@ -15944,124 +15771,8 @@ def create_analysis_page(stock_code='CDIA'):
             "border": "1px dashed rgba(255,193,7,0.3)"
         }),
 
-        # === IMPULSE/MOMENTUM ALERT (tertinggi prioritas) - INDONESIAN ===
-        dbc.Alert([
-            dbc.Row([
-                dbc.Col([
-                    html.Div([
-                        html.Span("[!]", style={"fontSize": "32px"}),
-                        html.Strong(f" MOMENTUM TERDETEKSI ({impulse_signal.get('strength', '')})", className="text-danger fs-5 ms-2"),
-                    ], className="d-flex align-items-center"),
-                    html.P([
-                        html.Strong("Pergerakan agresif tanpa fase akumulasi. "),
-                        "Volume ", html.Strong(f"{impulse_signal.get('metrics', {}).get('volume_ratio', 0):.1f}x"),
-                        " rata-rata dengan breakout ", html.Strong(f"+{impulse_signal.get('metrics', {}).get('breakout_pct', 0):.1f}%"),
-                        " dari high terdekat."
-                    ], className="mb-0 small"),
-                ], md=8),
-                dbc.Col([
-                    html.Div([
-                        html.Small("Kondisi Pemicu", className="text-muted d-block"),
-                        html.Div([
-                            dbc.Badge("[v] Vol 2x" if impulse_signal.get('metrics', {}).get('is_volume_spike') else "o Vol 2x",
-                                      color="success" if impulse_signal.get('metrics', {}).get('is_volume_spike') else "secondary", className="me-1"),
-                            dbc.Badge("[v] Breakout" if impulse_signal.get('metrics', {}).get('is_breakout') else "o Breakout",
-                                      color="success" if impulse_signal.get('metrics', {}).get('is_breakout') else "secondary", className="me-1"),
-                            dbc.Badge(f"[v] CPR {impulse_signal.get('metrics', {}).get('today_cpr_pct', 0):.0f}%" if impulse_signal.get('metrics', {}).get('is_cpr_bullish') else f"o CPR {impulse_signal.get('metrics', {}).get('today_cpr_pct', 0):.0f}%",
-                                      color="success" if impulse_signal.get('metrics', {}).get('is_cpr_bullish') else "secondary"),
-                        ])
-                    ]),
-                ], md=4, className="text-end"),
-            ]),
-        ], color="danger", className="mb-3", style={"backgroundColor": "rgba(220,53,69,0.15)", "border": "2px solid #dc3545"})
-        if impulse_signal.get('impulse_detected') else html.Div(),
-
-        # === NEAR IMPULSE ALERT (hampir impulse) - INDONESIAN ===
-        dbc.Alert([
-            dbc.Row([
-                dbc.Col([
-                    html.Div([
-                        html.Span("[+]", style={"fontSize": "28px"}),
-                        html.Strong(f" HAMPIR IMPULSE ({impulse_signal.get('trigger_conditions', {}).get('conditions_met', 0)}/3 kondisi)", className="text-info fs-6 ms-2"),
-                    ], className="d-flex align-items-center"),
-                    html.P("Satu atau dua kondisi belum terpenuhi. Pantau volume dan pergerakan harga besok.", className="mb-0 small"),
-                ], md=12),
-            ]),
-        ], color="info", className="mb-3", style={"backgroundColor": "rgba(23,162,184,0.15)", "border": "1px solid #17a2b8"})
-        if impulse_signal.get('near_impulse') and not impulse_signal.get('impulse_detected') else html.Div(),
-
-        # === MARKUP TRIGGER ALERT (setelah akumulasi) - INDONESIAN ===
-        dbc.Alert([
-            dbc.Row([
-                dbc.Col([
-                    html.Div([
-                        html.Span("[FIRE]", style={"fontSize": "28px"}),
-                        html.Strong(" MARKUP TERDETEKSI", className="text-warning fs-5 ms-2"),
-                    ], className="d-flex align-items-center"),
-                    html.P([
-                        "Harga breakout ", html.Strong(f"+{markup_trigger.get('breakout_pct', 0):.1f}%"),
-                        " dari resistance terdekat setelah akumulasi terdeteksi sebelumnya."
-                    ], className="mb-0 small"),
-                ], md=9),
-                dbc.Col([
-                    html.Div([
-                        html.Small("Lonjakan Volume", className="text-muted d-block"),
-                        dbc.Badge(f"+{markup_trigger.get('volume_spike_pct', 0):.0f}%" if markup_trigger.get('volume_spike') else "Normal",
-                                  color="success" if markup_trigger.get('volume_spike') else "secondary"),
-                    ]),
-                ], md=3, className="text-end"),
-            ]),
-        ], color="warning", className="mb-3", style={"backgroundColor": "rgba(255,193,7,0.15)", "border": "2px solid #ffc107"})
-        if markup_trigger.get('markup_triggered') and not impulse_signal.get('impulse_detected') else html.Div(),
-
-        # === 2. QUICK SUMMARY FROM 3 SUBMENUS (Cards) ===
+        # === 2. S/R FIX & KONFIRMASI V11b1 (Cards) ===
         dbc.Row([
-            # FUNDAMENTAL CARD
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardHeader([
-                        html.H6([html.I(className="fas fa-chart-line me-2 text-success"), "Fundamental"], className="mb-0 d-inline"),
-                        dcc.Link(html.Small("Detail ^", className="float-end text-info"), href="/fundamental")
-                    ]),
-                    dbc.CardBody([
-                        dbc.Row([
-                            dbc.Col([
-                                html.Div([
-                                    html.Small([
-                                        html.Span("PER", style={'borderBottom': '1px dotted #6c757d', 'cursor': 'help'}, title=TERM_DEFINITIONS['per']),
-                                        html.I(className="fas fa-info-circle ms-1", style={'fontSize': '8px', 'opacity': '0.6'})
-                                    ], className="text-muted d-block"),
-                                    html.H4(f"{fundamental.get('per', 0):.1f}x" if fundamental.get('has_data') else "N/A", className="mb-0 text-info"),
-                                ], className="text-center")
-                            ], width=4),
-                            dbc.Col([
-                                html.Div([
-                                    html.Small([
-                                        html.Span("PBV", style={'borderBottom': '1px dotted #6c757d', 'cursor': 'help'}, title=TERM_DEFINITIONS['pbv']),
-                                        html.I(className="fas fa-info-circle ms-1", style={'fontSize': '8px', 'opacity': '0.6'})
-                                    ], className="text-muted d-block"),
-                                    html.H4(f"{fundamental.get('pbvr', 0):.1f}x" if fundamental.get('has_data') else "N/A", className="mb-0 text-info"),
-                                ], className="text-center")
-                            ], width=4),
-                            dbc.Col([
-                                html.Div([
-                                    html.Small([
-                                        html.Span("ROE", style={'borderBottom': '1px dotted #6c757d', 'cursor': 'help'}, title=TERM_DEFINITIONS['roe']),
-                                        html.I(className="fas fa-info-circle ms-1", style={'fontSize': '8px', 'opacity': '0.6'})
-                                    ], className="text-muted d-block"),
-                                    html.H4(f"{fundamental.get('roe', 0)*100:.1f}%" if fundamental.get('has_data') else "N/A", className="mb-0 text-info"),
-                                ], className="text-center")
-                            ], width=4),
-                        ], className="mb-2"),
-                        html.Hr(className="my-2"),
-                        html.Div([
-                            html.Small("Valuasi: ", className="text-muted"),
-                            dbc.Badge(fundamental.get('valuation', 'N/A'), color=fundamental.get('valuation_color', 'secondary'))
-                        ], className="text-center")
-                    ])
-                ], color="dark", outline=True, className="h-100")
-            ], md=4),
-
             # SUPPORT & RESISTANCE FIX CARD
             dbc.Col([
                 dbc.Card([
@@ -16115,7 +15826,7 @@ def create_analysis_page(stock_code='CDIA'):
                         ], className="text-center") if get_zones(stock_code) else None
                     ])
                 ], color="dark", outline=True, className="h-100")
-            ], md=4),
+            ], md=6),
 
             # KONFIRMASI V11b1 CARD
             dbc.Col([
@@ -16244,234 +15955,583 @@ def create_analysis_page(stock_code='CDIA'):
                         ))
                     ])
                 ], color="dark", outline=True, className="h-100")
-            ], md=4),
+            ], md=6),
         ], className="mb-4"),
+    ])
 
-        # === 5.5 BACKTEST HISTORY V11b1 ===
-        (lambda bt_result: dbc.Card([
-            dbc.CardHeader([
-                html.H5([
-                    html.I(className="fas fa-history me-2 text-info"),
-                    "Backtest V11b1 History"
-                ], className="mb-0 d-inline"),
-                dbc.Badge(
-                    f"{len(bt_result.get('trades', []))} trades" if bt_result else "No data",
-                    color="info",
-                    className="ms-2"
-                ),
-                dbc.Badge(
-                    f"Win Rate: {bt_result.get('win_rate', 0):.0f}%" if bt_result else "",
-                    color="success" if bt_result and bt_result.get('win_rate', 0) >= 70 else "warning" if bt_result and bt_result.get('win_rate', 0) >= 50 else "danger",
-                    className="ms-2"
-                ) if bt_result and bt_result.get('trades') else None,
-                dbc.Badge(
-                    f"Total: {bt_result.get('total_pnl', 0):+.1f}%" if bt_result else "",
-                    color="success" if bt_result and bt_result.get('total_pnl', 0) > 0 else "danger",
-                    className="ms-2"
-                ) if bt_result and bt_result.get('trades') else None,
+
+def _build_analysis_summary_section(stock_code):
+    """
+    Section ringkasan 3 submenu (get_unified_analysis_summary): insight hari ini,
+    alert momentum/markup dan kartu Fundamental.
+    """
+    unified = get_unified_analysis_summary(stock_code)
+    accum = unified.get('accumulation', {})
+    fundamental = unified.get('fundamental', {})
+    summary = accum.get('summary', {})
+    confidence = accum.get('confidence', {})
+    markup_trigger = accum.get('markup_trigger', {})
+    impulse_signal = accum.get('impulse_signal', {})
+
+    # Generate one-line insight based on analysis
+    overall_signal = summary.get('overall_signal', 'NETRAL')
+    conf_level = confidence.get('level', 'LOW')
+    pass_rate = confidence.get('pass_rate', 0)
+
+    # Check impulse signal first (highest priority)
+    if impulse_signal.get('impulse_detected'):
+        imp_strength = impulse_signal.get('strength', 'WEAK')
+        vol_ratio = impulse_signal.get('metrics', {}).get('volume_ratio', 0)
+        insight_text = f"[!] {stock_code} IMPULSE BREAKOUT ({imp_strength})! Volume {vol_ratio:.1f}x rata-rata. Momentum tinggi, risiko tinggi."
+        insight_color = "danger"
+    elif impulse_signal.get('near_impulse'):
+        conds_met = impulse_signal.get('trigger_conditions', {}).get('conditions_met', 0)
+        insight_text = f"[+] {stock_code} hampir memenuhi kriteria impulse ({conds_met}/3). Pantau volume dan breakout."
+        insight_color = "info"
+    elif overall_signal == 'AKUMULASI' and conf_level in ['HIGH', 'VERY_HIGH']:
+        insight_text = f"[G] {stock_code} menunjukkan pola akumulasi kuat ({pass_rate:.0f}% validasi lolos). Perhatikan zona entry."
+        insight_color = "success"
+    elif overall_signal == 'AKUMULASI':
+        insight_text = f"[Y] {stock_code} menunjukkan sinyal akumulasi awal. Pantau konsistensi broker flow."
+        insight_color = "info"
+    elif overall_signal == 'DISTRIBUSI' and conf_level in ['HIGH', 'VERY_HIGH']:
+        insight_text = f"[R] {stock_code} dalam fase distribusi kuat ({pass_rate:.0f}% validasi). Hati-hati posisi beli baru."
+        insight_color = "danger"
+    elif overall_signal == 'DISTRIBUSI':
+        insight_text = f"[ ] {stock_code} menunjukkan sinyal distribusi. Pertimbangkan pengurangan posisi."
+        insight_color = "warning"
+    else:
+        insight_text = f"[~] {stock_code} dalam fase netral. Tidak ada sinyal kuat - observasi dulu."
+        insight_color = "secondary"
+
+    return html.Div([
+        # === ONE-LINE INSIGHT BAR - INDONESIAN ===
+        dbc.Alert([
+            html.Div([
+                html.I(className="fas fa-lightbulb me-2 text-warning"),
+                html.Strong("Insight Hari Ini: ", className="me-1"),
+                html.Span(insight_text),
+            ], className="d-flex align-items-center flex-wrap")
+        ], color=insight_color, className="mb-3 py-2", style={
+            "borderLeft": f"4px solid var(--bs-{insight_color})",
+            "backgroundColor": f"rgba(var(--bs-{insight_color}-rgb), 0.1)"
+        }),
+
+        # === IMPULSE/MOMENTUM ALERT (tertinggi prioritas) - INDONESIAN ===
+        dbc.Alert([
+            dbc.Row([
+                dbc.Col([
+                    html.Div([
+                        html.Span("[!]", style={"fontSize": "32px"}),
+                        html.Strong(f" MOMENTUM TERDETEKSI ({impulse_signal.get('strength', '')})", className="text-danger fs-5 ms-2"),
+                    ], className="d-flex align-items-center"),
+                    html.P([
+                        html.Strong("Pergerakan agresif tanpa fase akumulasi. "),
+                        "Volume ", html.Strong(f"{impulse_signal.get('metrics', {}).get('volume_ratio', 0):.1f}x"),
+                        " rata-rata dengan breakout ", html.Strong(f"+{impulse_signal.get('metrics', {}).get('breakout_pct', 0):.1f}%"),
+                        " dari high terdekat."
+                    ], className="mb-0 small"),
+                ], md=8),
+                dbc.Col([
+                    html.Div([
+                        html.Small("Kondisi Pemicu", className="text-muted d-block"),
+                        html.Div([
+                            dbc.Badge("[v] Vol 2x" if impulse_signal.get('metrics', {}).get('is_volume_spike') else "o Vol 2x",
+                                      color="success" if impulse_signal.get('metrics', {}).get('is_volume_spike') else "secondary", className="me-1"),
+                            dbc.Badge("[v] Breakout" if impulse_signal.get('metrics', {}).get('is_breakout') else "o Breakout",
+                                      color="success" if impulse_signal.get('metrics', {}).get('is_breakout') else "secondary", className="me-1"),
+                            dbc.Badge(f"[v] CPR {impulse_signal.get('metrics', {}).get('today_cpr_pct', 0):.0f}%" if impulse_signal.get('metrics', {}).get('is_cpr_bullish') else f"o CPR {impulse_signal.get('metrics', {}).get('today_cpr_pct', 0):.0f}%",
+                                      color="success" if impulse_signal.get('metrics', {}).get('is_cpr_bullish') else "secondary"),
+                        ])
+                    ]),
+                ], md=4, className="text-end"),
             ]),
-            dbc.CardBody([
-                # Trade list
-                html.Div([
+        ], color="danger", className="mb-3", style={"backgroundColor": "rgba(220,53,69,0.15)", "border": "2px solid #dc3545"})
+        if impulse_signal.get('impulse_detected') else html.Div(),
+
+        # === NEAR IMPULSE ALERT (hampir impulse) - INDONESIAN ===
+        dbc.Alert([
+            dbc.Row([
+                dbc.Col([
+                    html.Div([
+                        html.Span("[+]", style={"fontSize": "28px"}),
+                        html.Strong(f" HAMPIR IMPULSE ({impulse_signal.get('trigger_conditions', {}).get('conditions_met', 0)}/3 kondisi)", className="text-info fs-6 ms-2"),
+                    ], className="d-flex align-items-center"),
+                    html.P("Satu atau dua kondisi belum terpenuhi. Pantau volume dan pergerakan harga besok.", className="mb-0 small"),
+                ], md=12),
+            ]),
+        ], color="info", className="mb-3", style={"backgroundColor": "rgba(23,162,184,0.15)", "border": "1px solid #17a2b8"})
+        if impulse_signal.get('near_impulse') and not impulse_signal.get('impulse_detected') else html.Div(),
+
+        # === MARKUP TRIGGER ALERT (setelah akumulasi) - INDONESIAN ===
+        dbc.Alert([
+            dbc.Row([
+                dbc.Col([
                     html.Div([
+                        html.Span("[FIRE]", style={"fontSize": "28px"}),
+                        html.Strong(" MARKUP TERDETEKSI", className="text-warning fs-5 ms-2"),
+                    ], className="d-flex align-items-center"),
+                    html.P([
+                        "Harga breakout ", html.Strong(f"+{markup_trigger.get('breakout_pct', 0):.1f}%"),
+                        " dari resistance terdekat setelah akumulasi terdeteksi sebelumnya."
+                    ], className="mb-0 small"),
+                ], md=9),
+                dbc.Col([
+                    html.Div([
+                        html.Small("Lonjakan Volume", className="text-muted d-block"),
+                        dbc.Badge(f"+{markup_trigger.get('volume_spike_pct', 0):.0f}%" if markup_trigger.get('volume_spike') else "Normal",
+                                  color="success" if markup_trigger.get('volume_spike') else "secondary"),
+                    ]),
+                ], md=3, className="text-end"),
+            ]),
+        ], color="warning", className="mb-3", style={"backgroundColor": "rgba(255,193,7,0.15)", "border": "2px solid #ffc107"})
+        if markup_trigger.get('markup_triggered') and not impulse_signal.get('impulse_detected') else html.Div(),
+
+        # === QUICK SUMMARY: FUNDAMENTAL ===
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader([
+                        html.H6([html.I(className="fas fa-chart-line me-2 text-success"), "Fundamental"], className="mb-0 d-inline"),
+                        dcc.Link(html.Small("Detail ^", className="float-end text-info"), href="/fundamental")
+                    ]),
+                    dbc.CardBody([
                         dbc.Row([
                             dbc.Col([
                                 html.Div([
-                                    # Trade number and type badge
-                                    html.Span(f"#{idx}", className="fw-bold text-muted me-2"),
-                                    dbc.Badge(
-                                        t.get('type', 'UNKNOWN'),
-                                        color="warning" if 'RETEST' in t.get('type', '') else "info",
-                                        className="me-2 text-dark" if 'RETEST' in t.get('type', '') else "me-2"
-                                    ),
-                                    dbc.Badge(
-                                        f"Z{t.get('zone_num', '?')}",
-                                        color="secondary",
-                                        className="me-2"
-                                    ),
-                                ], className="mb-1"),
-                                # Dates
-                                html.Div([
-                                    html.I(className="fas fa-sign-in-alt text-success me-1"),
-                                    html.Small(t.get('entry_date', '-'), className="text-success me-3"),
-                                    html.I(className="fas fa-sign-out-alt text-danger me-1"),
-                                    html.Small(t.get('exit_date', '-'), className="text-danger me-2"),
-                                    html.Small(f"({t.get('exit_reason', '-')})", className="text-muted"),
-                                ], className="mb-1"),
-                            ], width=6),
+                                    html.Small([
+                                        html.Span("PER", style={'borderBottom': '1px dotted #6c757d', 'cursor': 'help'}, title=TERM_DEFINITIONS['per']),
+                                        html.I(className="fas fa-info-circle ms-1", style={'fontSize': '8px', 'opacity': '0.6'})
+                                    ], className="text-muted d-block"),
+                                    html.H4(f"{fundamental.get('per', 0):.1f}x" if fundamental.get('has_data') else "N/A", className="mb-0 text-info"),
+                                ], className="text-center")
+                            ], width=4),
                             dbc.Col([
-                                # Prices
                                 html.Div([
-                                    html.Small("Entry: ", className="text-muted"),
-                                    html.Span(f"Rp {t.get('entry_price', 0):,.0f}", className="text-info me-3"),
-                                    html.Small("Exit: ", className="text-muted"),
-                                    html.Span(f"Rp {t.get('exit_price', 0):,.0f}", className="text-warning"),
-                                ], className="mb-1"),
-                                # P/L
+                                    html.Small([
+                                        html.Span("PBV", style={'borderBottom': '1px dotted #6c757d', 'cursor': 'help'}, title=TERM_DEFINITIONS['pbv']),
+                                        html.I(className="fas fa-info-circle ms-1", style={'fontSize': '8px', 'opacity': '0.6'})
+                                    ], className="text-muted d-block"),
+                                    html.H4(f"{fundamental.get('pbvr', 0):.1f}x" if fundamental.get('has_data') else "N/A", className="mb-0 text-info"),
+                                ], className="text-center")
+                            ], width=4),
+                            dbc.Col([
                                 html.Div([
-                                    html.Small("SL: ", className="text-muted"),
-                                    html.Span(f"{t.get('sl', 0):,.0f}", className="text-danger small me-3"),
-                                    html.Small("TP: ", className="text-muted"),
-                                    html.Span(f"{t.get('tp', 0):,.0f}", className="text-success small me-3"),
-                                    dbc.Badge(
-                                        f"{t.get('pnl', 0):+.1f}%",
-                                        color="success" if t.get('pnl', 0) > 0 else "danger",
-                                        className="ms-2 fs-6"
-                                    ),
-                                ]),
-                            ], width=6, className="text-end"),
-                        ], className="align-items-center"),
-                        html.Hr(className="my-2") if idx < len(bt_result.get('trades', [])) else None,
-                    ]) for idx, t in enumerate(bt_result.get('trades', []), 1)
-                ], style={"maxHeight": "400px", "overflowY": "auto"}) if bt_result and bt_result.get('trades') else html.Div([
-                    html.I(className="fas fa-info-circle text-muted me-2"),
-                    html.Span("Tidak ada data backtest untuk saham ini", className="text-muted")
-                ], className="text-center py-3"),
-                # Summary footer
+                                    html.Small([
+                                        html.Span("ROE", style={'borderBottom': '1px dotted #6c757d', 'cursor': 'help'}, title=TERM_DEFINITIONS['roe']),
+                                        html.I(className="fas fa-info-circle ms-1", style={'fontSize': '8px', 'opacity': '0.6'})
+                                    ], className="text-muted d-block"),
+                                    html.H4(f"{fundamental.get('roe', 0)*100:.1f}%" if fundamental.get('has_data') else "N/A", className="mb-0 text-info"),
+                                ], className="text-center")
+                            ], width=4),
+                        ], className="mb-2"),
+                        html.Hr(className="my-2"),
+                        html.Div([
+                            html.Small("Valuasi: ", className="text-muted"),
+                            dbc.Badge(fundamental.get('valuation', 'N/A'), color=fundamental.get('valuation_color', 'secondary'))
+                        ], className="text-center")
+                    ])
+                ], color="dark", outline=True, className="h-100")
+            ], md=12),
+        ], className="mb-4"),
+    ])
+
+
+def _build_analysis_volume_section(stock_code):
+    """Section Volume vs Price multi-horizon (absorption 1/5/10 hari)"""
+    price_df = get_price_data(stock_code)
+    vol_price_multi = calculate_volume_price_multi_horizon(price_df) if not price_df.empty else {
+        'status': 'NO_DATA', 'significance': 'INSUFFICIENT', 'horizons': {}, 'conclusion': 'Data tidak tersedia'
+    }
+    return create_volume_price_multi_card(vol_price_multi, class_name="mb-4")
+
+
+def _build_analysis_signal_history_section(stock_code):
+    """Section riwayat sinyal Strong S/R (V8/V9) - hanya saham custom formula"""
+    if not has_custom_formula(stock_code):
+        return html.Div()
+    # Auto-select V8 or V9 based on custom S/R zones
+    history = get_signal_history_auto(stock_code, '2025-01-02')
+    signals = history.get('signals', [])
+    hs = history.get('summary', {})
+    error = history.get('error') or hs.get('error')
+
+    return dbc.Card([
+        dbc.CardHeader([
+            html.H5([
+                html.I(className="fas fa-signal me-2 text-info"),
+                "Riwayat Sinyal Strong S/R"
+            ], className="mb-0 d-inline"),
+            dbc.Badge(hs.get('method', '-'), color="secondary", className="ms-2") if hs else None,
+            dbc.Badge(f"{len(signals)} sinyal", color="info", className="ms-2"),
+            dbc.Badge(
+                f"Win Rate: {hs.get('win_rate', 0):.0f}%",
+                color="success" if hs.get('win_rate', 0) >= 70 else "warning" if hs.get('win_rate', 0) >= 50 else "danger",
+                className="ms-2"
+            ) if hs.get('closed_trades') else None,
+            dbc.Badge(
+                f"Total: {hs.get('total_pnl', 0):+.1f}%",
+                color="success" if hs.get('total_pnl', 0) > 0 else "danger",
+                className="ms-2"
+            ) if hs.get('closed_trades') else None,
+        ]),
+        dbc.CardBody([
+            html.Div([
                 html.Div([
-                    html.Hr(className="my-2"),
                     dbc.Row([
                         dbc.Col([
-                            html.Small("Total Trades", className="text-muted d-block"),
-                            html.Strong(f"{len(bt_result.get('trades', []))}", className="text-info"),
-                        ], className="text-center"),
-                        dbc.Col([
-                            html.Small("Wins", className="text-muted d-block"),
-                            html.Strong(f"{bt_result.get('wins', 0)}", className="text-success"),
-                        ], className="text-center"),
-                        dbc.Col([
-                            html.Small("Losses", className="text-muted d-block"),
-                            html.Strong(f"{bt_result.get('losses', 0)}", className="text-danger"),
-                        ], className="text-center"),
-                        dbc.Col([
-                            html.Small("Win Rate", className="text-muted d-block"),
-                            html.Strong(f"{bt_result.get('win_rate', 0):.0f}%",
-                                       className=f"text-{'success' if bt_result.get('win_rate', 0) >= 70 else 'warning' if bt_result.get('win_rate', 0) >= 50 else 'danger'}"),
-                        ], className="text-center"),
-                        dbc.Col([
-                            html.Small("Total P/L", className="text-muted d-block"),
-                            html.Strong(f"{bt_result.get('total_pnl', 0):+.1f}%",
-                                       className=f"text-{'success' if bt_result.get('total_pnl', 0) > 0 else 'danger'}"),
-                        ], className="text-center"),
-                    ])
-                ]) if bt_result and bt_result.get('trades') else None,
-            ])
-        ], color="dark", outline=True, className="mb-4") if get_zones(stock_code) else html.Div())(
-            get_backtest_result_for_display(stock_code)
-        ),
-
-        # === 6. WEEKLY ACCUMULATION ANALYSIS (Key Point dari Accumulation) ===
-        dbc.Card([
-            dbc.CardHeader([
-                html.H5([html.I(className="fas fa-layer-group me-2"), "Akumulasi 4 Minggu Terakhir"], className="mb-0 d-inline"),
-                dbc.Badge(
-                    f"Avg VR: {sum(weeks.get(w, {}).get('vol_ratio', 1) for w in range(1, 5)) / 4:.2f}x",
-                    color="success" if sum(weeks.get(w, {}).get('vol_ratio', 1) for w in range(1, 5)) / 4 > 4.0 else
-                          "warning" if sum(weeks.get(w, {}).get('vol_ratio', 1) for w in range(1, 5)) / 4 > 1.5 else
-                          "danger" if sum(weeks.get(w, {}).get('vol_ratio', 1) for w in range(1, 5)) / 4 < 0.8 else "secondary",
-                    className="ms-2"
-                ),
-            ]),
-            dbc.CardBody([
-                # Weekly Vol Ratio Cards - Compact
-                dbc.Row([
-                    dbc.Col([
-                        html.Div([
-                            html.Small(f"{'Minggu Ini' if w == 1 else f'{w}W Lalu'}", className="text-muted d-block text-center"),
                             html.Div([
-                                html.Span(weeks.get(w, {}).get('phase_icon', '?'), style={"fontSize": "18px"}),
-                                html.Strong(f" {weeks.get(w, {}).get('vol_ratio', 0):.1f}x",
-                                           className=f"text-{weeks.get(w, {}).get('phase_color', 'secondary')}")
-                            ], className="text-center"),
-                            # Vol Lower vs Upper bar
-                            dbc.Progress([
-                                dbc.Progress(
-                                    value=weeks.get(w, {}).get('vol_lower', 0) / max(1, weeks.get(w, {}).get('vol_lower', 0) + weeks.get(w, {}).get('vol_upper', 0)) * 100,
-                                    color="success", bar=True
-                                ),
-                                dbc.Progress(
-                                    value=weeks.get(w, {}).get('vol_upper', 0) / max(1, weeks.get(w, {}).get('vol_lower', 0) + weeks.get(w, {}).get('vol_upper', 0)) * 100,
-                                    color="danger", bar=True
-                                ),
-                            ], style={"height": "8px"}, className="mt-1"),
-                            # Net Market & Foreign compact
-                            html.Small([
-                                html.Span(
-                                    f"{'B' if weeks.get(w, {}).get('vol_lower', 0) > weeks.get(w, {}).get('vol_upper', 0) else 'S'} ",
-                                    className=f"text-{'success' if weeks.get(w, {}).get('vol_lower', 0) > weeks.get(w, {}).get('vol_upper', 0) else 'danger'} fw-bold"
+                                html.Span(f"#{idx}", className="fw-bold text-muted me-2"),
+                                dbc.Badge(
+                                    s.get('result', '-'),
+                                    color="success" if s.get('result') == 'WIN' else "primary" if s.get('result') == 'OPEN' else "danger",
+                                    className="me-2"
                                 ),
-                                html.Span(f"{abs(weeks.get(w, {}).get('vol_lower', 0) - weeks.get(w, {}).get('vol_upper', 0))/100/1000:.0f}K", className="text-muted")
-                            ], className="d-block text-center"),
-                            html.Small([
-                                html.Span("F:", className="text-muted"),
-                                html.Span(
-                                    f"{'B' if weeks.get(w, {}).get('net_foreign_lot', 0) > 0 else 'S'}",
-                                    className=f"text-{'success' if weeks.get(w, {}).get('net_foreign_lot', 0) > 0 else 'danger'} fw-bold"
+                                dbc.Badge(s.get('phase') or '-', color="secondary", className="me-2"),
+                            ], className="mb-1"),
+                            html.Div([
+                                html.I(className="fas fa-sign-in-alt text-success me-1"),
+                                html.Small(str(s.get('entry_date', '-')), className="text-success me-3"),
+                                html.I(className="fas fa-sign-out-alt text-danger me-1"),
+                                html.Small(str(s.get('exit_date', '-')), className="text-danger me-2"),
+                                html.Small(f"({s.get('exit_reason', '-')})", className="text-muted"),
+                            ], className="mb-1"),
+                        ], width=6),
+                        dbc.Col([
+                            html.Div([
+                                html.Small("Entry: ", className="text-muted"),
+                                html.Span(f"Rp {s.get('entry_price') or 0:,.0f}", className="text-info me-3"),
+                                html.Small("Exit: ", className="text-muted"),
+                                html.Span(f"Rp {s.get('exit_price') or 0:,.0f}", className="text-warning"),
+                            ], className="mb-1"),
+                            html.Div([
+                                html.Small("SL: ", className="text-muted"),
+                                html.Span(f"{s.get('stop_loss') or 0:,.0f}", className="text-danger small me-3"),
+                                html.Small("TP: ", className="text-muted"),
+                                html.Span(f"{s.get('target') or 0:,.0f}", className="text-success small me-3"),
+                                dbc.Badge(
+                                    f"{s.get('pnl') or 0:+.1f}%",
+                                    color="success" if (s.get('pnl') or 0) > 0 else "danger",
+                                    className="ms-2 fs-6"
                                 ),
-                                html.Span(f"{abs(weeks.get(w, {}).get('net_foreign_lot', 0))/1000:.0f}K", className="text-muted")
-                            ], className="d-block text-center"),
-                        ], className="p-2 rounded", style={"backgroundColor": f"rgba({'40,167,69' if weeks.get(w, {}).get('phase') == 'ACCUMULATION' else '220,53,69' if weeks.get(w, {}).get('phase') == 'DISTRIBUTION' else '108,117,125'}, 0.15)"})
-                    ], width=3) for w in [1, 2, 3, 4]
-                ], className="mb-3"),
+                            ]),
+                        ], width=6, className="text-end"),
+                    ], className="align-items-center"),
+                    html.Hr(className="my-2") if idx < len(signals) else None,
+                ]) for idx, s in enumerate(reversed(signals), 1)  # terbaru di atas
+            ], style={"maxHeight": "400px", "overflowY": "auto"}) if signals else html.Div([
+                html.I(className="fas fa-info-circle text-muted me-2"),
+                html.Span(error or "Belum ada sinyal sejak 2025-01-02", className="text-muted")
+            ], className="text-center py-3"),
+        ])
+    ], color="dark", outline=True, className="mb-4")
+
 
-                # Phase Progression & Summary
+def _build_analysis_backtest_section(stock_code):
+    """Section 5.5: riwayat backtest V11b1 (hanya saham dengan zona V11b1)"""
+    if not get_zones(stock_code):
+        return html.Div()
+    bt_result = get_backtest_result_for_display(stock_code)
+
+    return dbc.Card([
+        dbc.CardHeader([
+            html.H5([
+                html.I(className="fas fa-history me-2 text-info"),
+                "Backtest V11b1 History"
+            ], className="mb-0 d-inline"),
+            dbc.Badge(
+                f"{len(bt_result.get('trades', []))} trades" if bt_result else "No data",
+                color="info",
+                className="ms-2"
+            ),
+            dbc.Badge(
+                f"Win Rate: {bt_result.get('win_rate', 0):.0f}%" if bt_result else "",
+                color="success" if bt_result and bt_result.get('win_rate', 0) >= 70 else "warning" if bt_result and bt_result.get('win_rate', 0) >= 50 else "danger",
+                className="ms-2"
+            ) if bt_result and bt_result.get('trades') else None,
+            dbc.Badge(
+                f"Total: {bt_result.get('total_pnl', 0):+.1f}%" if bt_result else "",
+                color="success" if bt_result and bt_result.get('total_pnl', 0) > 0 else "danger",
+                className="ms-2"
+            ) if bt_result and bt_result.get('trades') else None,
+        ]),
+        dbc.CardBody([
+            # Trade list
+            html.Div([
                 html.Div([
-                    # Phase progression icons
-                    html.Div([
-                        html.Span(weeks.get(4, {}).get('phase_icon', '?'), style={"fontSize": "20px"}),
-                        html.I(className="fas fa-arrow-right mx-1 text-muted small"),
-                        html.Span(weeks.get(3, {}).get('phase_icon', '?'), style={"fontSize": "20px"}),
-                        html.I(className="fas fa-arrow-right mx-1 text-muted small"),
-                        html.Span(weeks.get(2, {}).get('phase_icon', '?'), style={"fontSize": "20px"}),
-                        html.I(className="fas fa-arrow-right mx-1 text-muted small"),
-                        html.Span(weeks.get(1, {}).get('phase_icon', '?'), style={"fontSize": "20px"}),
-                    ], className="text-center mb-2"),
-
-                    # Summary stats
                     dbc.Row([
                         dbc.Col([
-                            html.Small("Net Market 4W", className="text-muted d-block text-center"),
-                            html.Strong([
-                                html.Span(
-                                    f"{'BUY' if sum(weeks.get(w, {}).get('vol_lower', 0) - weeks.get(w, {}).get('vol_upper', 0) for w in range(1, 5)) > 0 else 'SELL'} ",
-                                    className=f"text-{'success' if sum(weeks.get(w, {}).get('vol_lower', 0) - weeks.get(w, {}).get('vol_upper', 0) for w in range(1, 5)) > 0 else 'danger'}"
+                            html.Div([
+                                # Trade number and type badge
+                                html.Span(f"#{idx}", className="fw-bold text-muted me-2"),
+                                dbc.Badge(
+                                    t.get('type', 'UNKNOWN'),
+                                    color="warning" if 'RETEST' in t.get('type', '') else "info",
+                                    className="me-2 text-dark" if 'RETEST' in t.get('type', '') else "me-2"
                                 ),
-                                html.Span(f"{abs(sum(weeks.get(w, {}).get('vol_lower', 0) - weeks.get(w, {}).get('vol_upper', 0) for w in range(1, 5)))/100/1e6:.2f}M Lot")
-                            ], className="d-block text-center small")
-                        ], width=4),
-                        dbc.Col([
-                            html.Small("Net Foreign 4W", className="text-muted d-block text-center"),
-                            html.Strong([
-                                html.Span(
-                                    f"{'BUY' if sum(weeks.get(w, {}).get('net_foreign_lot', 0) for w in range(1, 5)) > 0 else 'SELL'} ",
-                                    className=f"text-{'success' if sum(weeks.get(w, {}).get('net_foreign_lot', 0) for w in range(1, 5)) > 0 else 'danger'}"
+                                dbc.Badge(
+                                    f"Z{t.get('zone_num', '?')}",
+                                    color="secondary",
+                                    className="me-2"
                                 ),
-                                html.Span(f"{abs(sum(weeks.get(w, {}).get('net_foreign_lot', 0) for w in range(1, 5)))/1e6:.2f}M Lot")
-                            ], className="d-block text-center small")
-                        ], width=4),
+                            ], className="mb-1"),
+                            # Dates
+                            html.Div([
+                                html.I(className="fas fa-sign-in-alt text-success me-1"),
+                                html.Small(t.get('entry_date', '-'), className="text-success me-3"),
+                                html.I(className="fas fa-sign-out-alt text-danger me-1"),
+                                html.Small(t.get('exit_date', '-'), className="text-danger me-2"),
+                                html.Small(f"({t.get('exit_reason', '-')})", className="text-muted"),
+                            ], className="mb-1"),
+                        ], width=6),
                         dbc.Col([
-                            html.Small("Minggu Akumulasi", className="text-muted d-block text-center"),
-                            html.Strong([
-                                html.Span(f"{sum(1 for w in range(1, 5) if weeks.get(w, {}).get('phase') == 'ACCUMULATION')}/4",
-                                         className=f"text-{'success' if sum(1 for w in range(1, 5) if weeks.get(w, {}).get('phase') == 'ACCUMULATION') >= 3 else 'warning' if sum(1 for w in range(1, 5) if weeks.get(w, {}).get('phase') == 'ACCUMULATION') >= 2 else 'danger'}")
-                            ], className="d-block text-center")
-                        ], width=4),
-                    ])
-                ], className="p-2 rounded", style={"backgroundColor": "rgba(255,255,255,0.03)"}),
-
-                # Vol Ratio Threshold Guide
+                            # Prices
+                            html.Div([
+                                html.Small("Entry: ", className="text-muted"),
+                                html.Span(f"Rp {t.get('entry_price', 0):,.0f}", className="text-info me-3"),
+                                html.Small("Exit: ", className="text-muted"),
+                                html.Span(f"Rp {t.get('exit_price', 0):,.0f}", className="text-warning"),
+                            ], className="mb-1"),
+                            # P/L
+                            html.Div([
+                                html.Small("SL: ", className="text-muted"),
+                                html.Span(f"{t.get('sl', 0):,.0f}", className="text-danger small me-3"),
+                                html.Small("TP: ", className="text-muted"),
+                                html.Span(f"{t.get('tp', 0):,.0f}", className="text-success small me-3"),
+                                dbc.Badge(
+                                    f"{t.get('pnl', 0):+.1f}%",
+                                    color="success" if t.get('pnl', 0) > 0 else "danger",
+                                    className="ms-2 fs-6"
+                                ),
+                            ]),
+                        ], width=6, className="text-end"),
+                    ], className="align-items-center"),
+                    html.Hr(className="my-2") if idx < len(bt_result.get('trades', [])) else None,
+                ]) for idx, t in enumerate(bt_result.get('trades', []), 1)
+            ], style={"maxHeight": "400px", "overflowY": "auto"}) if bt_result and bt_result.get('trades') else html.Div([
+                html.I(className="fas fa-info-circle text-muted me-2"),
+                html.Span("Tidak ada data backtest untuk saham ini", className="text-muted")
+            ], className="text-center py-3"),
+            # Summary footer
+            html.Div([
                 html.Hr(className="my-2"),
-                html.Small([
-                    html.I(className="fas fa-info-circle me-1"),
-                    html.Span("VR>4.0", className="text-success fw-bold"), "=Akumulasi Kuat | ",
-                    html.Span("VR 1.5-4.0", className="text-warning fw-bold"), "=Weak Acc | ",
-                    html.Span("VR<0.8", className="text-danger fw-bold"), "=Distribusi"
-                ], className="text-muted text-center d-block")
-            ])
-        ], className="mb-4", color="dark", outline=True),
+                dbc.Row([
+                    dbc.Col([
+                        html.Small("Total Trades", className="text-muted d-block"),
+                        html.Strong(f"{len(bt_result.get('trades', []))}", className="text-info"),
+                    ], className="text-center"),
+                    dbc.Col([
+                        html.Small("Wins", className="text-muted d-block"),
+                        html.Strong(f"{bt_result.get('wins', 0)}", className="text-success"),
+                    ], className="text-center"),
+                    dbc.Col([
+                        html.Small("Losses", className="text-muted d-block"),
+                        html.Strong(f"{bt_result.get('losses', 0)}", className="text-danger"),
+                    ], className="text-center"),
+                    dbc.Col([
+                        html.Small("Win Rate", className="text-muted d-block"),
+                        html.Strong(f"{bt_result.get('win_rate', 0):.0f}%",
+                                   className=f"text-{'success' if bt_result.get('win_rate', 0) >= 70 else 'warning' if bt_result.get('win_rate', 0) >= 50 else 'danger'}"),
+                    ], className="text-center"),
+                    dbc.Col([
+                        html.Small("Total P/L", className="text-muted d-block"),
+                        html.Strong(f"{bt_result.get('total_pnl', 0):+.1f}%",
+                                   className=f"text-{'success' if bt_result.get('total_pnl', 0) > 0 else 'danger'}"),
+                    ], className="text-center"),
+                ])
+            ]) if bt_result and bt_result.get('trades') else None,
+        ])
+    ], color="dark", outline=True, className="mb-4")
+
+
+def _build_analysis_weekly_section(stock_code):
+    """Section 6: akumulasi 4 minggu terakhir (key point dari Accumulation)"""
+    weeks = get_weekly_analysis(stock_code).get('weeks', {})
+
+    return dbc.Card([
+        dbc.CardHeader([
+            html.H5([html.I(className="fas fa-layer-group me-2"), "Akumulasi 4 Minggu Terakhir"], className="mb-0 d-inline"),
+            dbc.Badge(
+                f"Avg VR: {sum(weeks.get(w, {}).get('vol_ratio', 1) for w in range(1, 5)) / 4:.2f}x",
+                color="success" if sum(weeks.get(w, {}).get('vol_ratio', 1) for w in range(1, 5)) / 4 > 4.0 else
+                      "warning" if sum(weeks.get(w, {}).get('vol_ratio', 1) for w in range(1, 5)) / 4 > 1.5 else
+                      "danger" if sum(weeks.get(w, {}).get('vol_ratio', 1) for w in range(1, 5)) / 4 < 0.8 else "secondary",
+                className="ms-2"
+            ),
+        ]),
+        dbc.CardBody([
+            # Weekly Vol Ratio Cards - Compact
+            dbc.Row([
+                dbc.Col([
+                    html.Div([
+                        html.Small(f"{'Minggu Ini' if w == 1 else f'{w}W Lalu'}", className="text-muted d-block text-center"),
+                        html.Div([
+                            html.Span(weeks.get(w, {}).get('phase_icon', '?'), style={"fontSize": "18px"}),
+                            html.Strong(f" {weeks.get(w, {}).get('vol_ratio', 0):.1f}x",
+                                       className=f"text-{weeks.get(w, {}).get('phase_color', 'secondary')}")
+                        ], className="text-center"),
+                        # Vol Lower vs Upper bar
+                        dbc.Progress([
+                            dbc.Progress(
+                                value=weeks.get(w, {}).get('vol_lower', 0) / max(1, weeks.get(w, {}).get('vol_lower', 0) + weeks.get(w, {}).get('vol_upper', 0)) * 100,
+                                color="success", bar=True
+                            ),
+                            dbc.Progress(
+                                value=weeks.get(w, {}).get('vol_upper', 0) / max(1, weeks.get(w, {}).get('vol_lower', 0) + weeks.get(w, {}).get('vol_upper', 0)) * 100,
+                                color="danger", bar=True
+                            ),
+                        ], style={"height": "8px"}, className="mt-1"),
+                        # Net Market & Foreign compact
+                        html.Small([
+                            html.Span(
+                                f"{'B' if weeks.get(w, {}).get('vol_lower', 0) > weeks.get(w, {}).get('vol_upper', 0) else 'S'} ",
+                                className=f"text-{'success' if weeks.get(w, {}).get('vol_lower', 0) > weeks.get(w, {}).get('vol_upper', 0) else 'danger'} fw-bold"
+                            ),
+                            html.Span(f"{abs(weeks.get(w, {}).get('vol_lower', 0) - weeks.get(w, {}).get('vol_upper', 0))/100/1000:.0f}K", className="text-muted")
+                        ], className="d-block text-center"),
+                        html.Small([
+                            html.Span("F:", className="text-muted"),
+                            html.Span(
+                                f"{'B' if weeks.get(w, {}).get('net_foreign_lot', 0) > 0 else 'S'}",
+                                className=f"text-{'success' if weeks.get(w, {}).get('net_foreign_lot', 0) > 0 else 'danger'} fw-bold"
+                            ),
+                            html.Span(f"{abs(weeks.get(w, {}).get('net_foreign_lot', 0))/1000:.0f}K", className="text-muted")
+                        ], className="d-block text-center"),
+                    ], className="p-2 rounded", style={"backgroundColor": f"rgba({'40,167,69' if weeks.get(w, {}).get('phase') == 'ACCUMULATION' else '220,53,69' if weeks.get(w, {}).get('phase') == 'DISTRIBUTION' else '108,117,125'}, 0.15)"})
+                ], width=3) for w in [1, 2, 3, 4]
+            ], className="mb-3"),
+
+            # Phase Progression & Summary
+            html.Div([
+                # Phase progression icons
+                html.Div([
+                    html.Span(weeks.get(4, {}).get('phase_icon', '?'), style={"fontSize": "20px"}),
+                    html.I(className="fas fa-arrow-right mx-1 text-muted small"),
+                    html.Span(weeks.get(3, {}).get('phase_icon', '?'), style={"fontSize": "20px"}),
+                    html.I(className="fas fa-arrow-right mx-1 text-muted small"),
+                    html.Span(weeks.get(2, {}).get('phase_icon', '?'), style={"fontSize": "20px"}),
+                    html.I(className="fas fa-arrow-right mx-1 text-muted small"),
+                    html.Span(weeks.get(1, {}).get('phase_icon', '?'), style={"fontSize": "20px"}),
+                ], className="text-center mb-2"),
+
+                # Summary stats
+                dbc.Row([
+                    dbc.Col([
+                        html.Small("Net Market 4W", className="text-muted d-block text-center"),
+                        html.Strong([
+                            html.Span(
+                                f"{'BUY' if sum(weeks.get(w, {}).get('vol_lower', 0) - weeks.get(w, {}).get('vol_upper', 0) for w in range(1, 5)) > 0 else 'SELL'} ",
+                                className=f"text-{'success' if sum(weeks.get(w, {}).get('vol_lower', 0) - weeks.get(w, {}).get('vol_upper', 0) for w in range(1, 5)) > 0 else 'danger'}"
+                            ),
+                            html.Span(f"{abs(sum(weeks.get(w, {}).get('vol_lower', 0) - weeks.get(w, {}).get('vol_upper', 0) for w in range(1, 5)))/100/1e6:.2f}M Lot")
+                        ], className="d-block text-center small")
+                    ], width=4),
+                    dbc.Col([
+                        html.Small("Net Foreign 4W", className="text-muted d-block text-center"),
+                        html.Strong([
+                            html.Span(
+                                f"{'BUY' if sum(weeks.get(w, {}).get('net_foreign_lot', 0) for w in range(1, 5)) > 0 else 'SELL'} ",
+                                className=f"text-{'success' if sum(weeks.get(w, {}).get('net_foreign_lot', 0) for w in range(1, 5)) > 0 else 'danger'}"
+                            ),
+                            html.Span(f"{abs(sum(weeks.get(w, {}).get('net_foreign_lot', 0) for w in range(1, 5)))/1e6:.2f}M Lot")
+                        ], className="d-block text-center small")
+                    ], width=4),
+                    dbc.Col([
+                        html.Small("Minggu Akumulasi", className="text-muted d-block text-center"),
+                        html.Strong([
+                            html.Span(f"{sum(1 for w in range(1, 5) if weeks.get(w, {}).get('phase') == 'ACCUMULATION')}/4",
+                                     className=f"text-{'success' if sum(1 for w in range(1, 5) if weeks.get(w, {}).get('phase') == 'ACCUMULATION') >= 3 else 'warning' if sum(1 for w in range(1, 5) if weeks.get(w, {}).get('phase') == 'ACCUMULATION') >= 2 else 'danger'}")
+                        ], className="d-block text-center")
+                    ], width=4),
+                ])
+            ], className="p-2 rounded", style={"backgroundColor": "rgba(255,255,255,0.03)"}),
+
+            # Vol Ratio Threshold Guide
+            html.Hr(className="my-2"),
+            html.Small([
+                html.I(className="fas fa-info-circle me-1"),
+                html.Span("VR>4.0", className="text-success fw-bold"), "=Akumulasi Kuat | ",
+                html.Span("VR 1.5-4.0", className="text-warning fw-bold"), "=Weak Acc | ",
+                html.Span("VR<0.8", className="text-danger fw-bold"), "=Distribusi"
+            ], className="text-muted text-center d-block")
+        ])
+    ], className="mb-4", color="dark", outline=True)
+
+
+def create_analysis_page(stock_code='CDIA'):
+    """
+    Create unified analysis page combining data from 3 submenus:
+    1. Fundamental (PER, PBV, ROE)
+    2. Support & Resistance (Key levels)
+    3. Accumulation (Decision rule, signals)
+
+    Layout langsung dikirim dengan skeleton; tiap section diisi callback
+    load_analysis_section sendiri (request paralel), sehingga section cepat
+    tidak menunggu section yang lambat.
+    """
+    return html.Div([
+        # === PAGE HEADER WITH SUBMENU NAVIGATION ===
+        # Title and submenu - stacked on mobile, inline on desktop
+        html.Div([
+            html.H4([
+                html.I(className="fas fa-chart-pie me-2"),
+                f"Analisis Detail - {stock_code}"
+            ], className="mb-2 mb-lg-0"),
+        ], className="mb-2"),
+        html.Div([
+            dcc.Link(dbc.Button([html.I(className="fas fa-chart-line me-2"), "Fundamental"], color="success", size="sm", className="me-2 mb-2 mb-lg-0"), href="/fundamental"),
+            dcc.Link(dbc.Button([html.I(className="fas fa-layer-group me-2"), "Support & Resistance"], color="info", size="sm", className="me-2 mb-2 mb-lg-0"), href="/support-resistance"),
+            dcc.Link(dbc.Button([html.I(className="fas fa-cubes me-2"), "Accumulation"], color="warning", size="sm", className="mb-2 mb-lg-0"), href="/accumulation"),
+        ], className="d-flex flex-wrap mb-3"),
+
+        # === SECTIONS (diisi load_analysis_section) ===
+        _analysis_section_placeholder(stock_code, 'decision',
+                                      html.Div([create_skeleton_metrics(), create_skeleton_card("Memuat keputusan V11b1...", rows=5)])),
+        _analysis_section_placeholder(stock_code, 'summary',
+                                      create_skeleton_card("Memuat ringkasan Fundamental & Akumulasi...", rows=3)),
+        _analysis_section_placeholder(stock_code, 'volume',
+                                      create_skeleton_card("Memuat Volume vs Price...", rows=3)),
+        _analysis_section_placeholder(stock_code, 'signal_history',
+                                      create_skeleton_card("Memuat riwayat sinyal...", rows=4) if has_custom_formula(stock_code) else html.Div()),
+        _analysis_section_placeholder(stock_code, 'backtest',
+                                      create_skeleton_card("Memuat backtest V11b1...", rows=4) if get_zones(stock_code) else html.Div()),
+        _analysis_section_placeholder(stock_code, 'weekly',
+                                      create_skeleton_card("Memuat akumulasi 4 minggu...", rows=3)),
     ])
 
 
+# Section halaman analisis -> builder(stock_code); urutan = urutan tampil
+ANALYSIS_SECTIONS = {
+    'decision': _build_analysis_decision_section,
+    'summary': _build_analysis_summary_section,
+    'volume': _build_analysis_volume_section,
+    'signal_history': _build_analysis_signal_history_section,
+    'backtest': _build_analysis_backtest_section,
+    'weekly': _build_analysis_weekly_section,
+}
+
+
+def _analysis_section_placeholder(stock_code, section, skeleton):
+    return html.Div(skeleton, id={'type': 'analysis-section', 'section': section, 'stock': stock_code})
+
+
+@app.callback(
+    Output({'type': 'analysis-section', 'section': MATCH, 'stock': MATCH}, 'children'),
+    Input({'type': 'analysis-section', 'section': MATCH, 'stock': MATCH}, 'id')
+)
+def load_analysis_section(section_id):
+    """Isi satu section halaman analisis (satu request per section, berjalan paralel)"""
+    stock_code = section_id['stock']
+    builder = ANALYSIS_SECTIONS.get(section_id['section'])
+    if builder is None:
+        raise dash.exceptions.PreventUpdate
+    try:
+        return builder(stock_code)
+    except Exception as e:
+        print(f"[ANALYSIS] Section {section_id['section']} failed for {stock_code}: {e}")
+        return dbc.Alert(f"Error loading {section_id['section']} for {stock_code}: {str(e)}", color="danger")
+
+
 def create_enhanced_alerts_list(alerts):
     """Create enhanced alerts list with priority indicators and broker type info - Mobile Responsive"""
     if not alerts:
@@ -18862,6 +18922,7 @@ def create_app_layout():
         dcc.Store(id='user-session', storage_type='session', data=None),  # User login session
         dcc.Store(id='superadmin-session', storage_type='local', data=None),  # Super admin persistent login
         dcc.Store(id='selected-stock-store', storage_type='local', data=None),  # Persist selected stock across pages
+        *job_effects_components(),  # Efek background job (warm-up, reload snapshot) di web process
 
         # Hidden dummy components to prevent callback errors when page components don't exist
         # Wrapped in visible container to ensure IDs are registered
@@ -19147,8 +19208,8 @@ def display_page(pathname, search, selected_stock, user_session, superadmin_sess
         stocks = get_available_stocks()
         selected_stock = stocks[0] if stocks else 'PANI'
 
-    # Clear cache for selected stock to ensure fresh data on stock change
-    clear_stock_cache(selected_stock)
+    # Invalidate caches only if this stock's import watermark moved
+    sync_data_version(selected_stock)
 
     # Check if user is logged in and get member type
     is_logged_in = False
@@ -19390,17 +19451,8 @@ def validate_upload_password(n_clicks, session_data, user_session, password):
 # V11B1 RECALC CALLBACK
 # ============================================================
 
-@app.callback(
-    Output('v11b1-recalc-status', 'children'),
-    [Input('recalc-v11b1-btn', 'n_clicks')],
-    [State('gdrive-stock-select', 'value')],
-    prevent_initial_call=True
-)
-def recalc_v11b1(n_clicks, selected_stocks):
-    """Recalculate V11b1 for selected stocks"""
-    if not n_clicks:
-        raise dash.exceptions.PreventUpdate
-
+def _recalc_v11b1_stocks(report, selected_stocks):
+    """Recalculate V11b1 per emiten dengan progress (dipakai tab GDrive & Data Management)"""
     from datetime import datetime
     from zones_config import STOCK_ZONES
 
@@ -19423,11 +19475,13 @@ def recalc_v11b1(n_clicks, selected_stocks):
     results = []
     success_count = 0
     fail_count = 0
+    total = len(stocks_to_process)
 
     try:
         conn = get_db_connection()
 
-        for stock in stocks_to_process:
+        for i, stock in enumerate(stocks_to_process):
+            report(i, total, f"{stock}: menghitung V11b1...")
             try:
                 success = process_stock(stock, conn)
                 if success:
@@ -19451,6 +19505,8 @@ def recalc_v11b1(n_clicks, selected_stocks):
 
         conn.commit()
         conn.close()
+        report(total, total, f"Selesai: {success_count} OK, {fail_count} gagal")
+        report.after_job(v11b1_snapshot=True)
 
     except Exception as e:
         return dbc.Alert(f"Database connection error: {e}", color="danger")
@@ -19469,19 +19525,59 @@ def recalc_v11b1(n_clicks, selected_stocks):
     ], color=color, dismissable=True)
 
 
+def _apply_job_effects(effects):
+    """Efek background job di web process: invalidate cache + warm-up, reload snapshot V11b1"""
+    if effects.get('stocks'):
+        after_external_import(effects['stocks'], warm=effects.get('warm'))
+    if effects.get('v11b1_snapshot'):
+        refresh_snapshot()
+
+
+register_job_effects(_apply_job_effects)
+
+
+def _job_rejected_alert(message):
+    return dbc.Alert([html.I(className="fas fa-hourglass-half me-2"), message], color="warning")
+
+
+@background_callback(
+    Output('v11b1-recalc-status', 'children'),
+    [Input('recalc-v11b1-btn', 'n_clicks')],
+    [State('gdrive-stock-select', 'value')],
+    job_name='recalc-v11b1',
+    effects=True,
+    progress=Output('v11b1-recalc-progress', 'children'),
+    cancel=[Input('recalc-v11b1-cancel-btn', 'n_clicks')],
+    running=running_outputs('recalc-v11b1-btn', cancel_id='recalc-v11b1-cancel-btn'),
+    on_rejected=_job_rejected_alert,
+    prevent_initial_call=True
+)
+def recalc_v11b1(report, n_clicks, selected_stocks):
+    """Recalculate V11b1 for selected stocks"""
+    if not n_clicks:
+        raise dash.exceptions.PreventUpdate
+    return _recalc_v11b1_stocks(report, selected_stocks)
+
+
 # ============================================================
 # DATA MANAGEMENT TAB - UPLOAD & RECALC CALLBACKS
 # ============================================================
 
-@app.callback(
+@background_callback(
     [Output('dm-upload-status', 'children'),
      Output('dm-upload-log', 'children')],
     [Input('dm-upload-btn', 'n_clicks')],
     [State('dm-stock-select', 'value'),
      State('dm-data-type', 'value')],
+    job_name='gdrive-sync',
+    effects=True,
+    progress=Output('dm-upload-progress', 'children'),
+    cancel=[Input('dm-upload-cancel-btn', 'n_clicks')],
+    running=running_outputs('dm-upload-btn', cancel_id='dm-upload-cancel-btn'),
+    on_rejected=lambda message: (_job_rejected_alert(message), dash.no_update),
     prevent_initial_call=True
 )
-def dm_upload_data(n_clicks, selected_stocks, data_types):
+def dm_upload_data(report, n_clicks, selected_stocks, data_types):
     """Upload data from Google Drive to database (Data Management tab)"""
     if not n_clicks:
         raise dash.exceptions.PreventUpdate
@@ -19525,7 +19621,10 @@ def dm_upload_data(n_clicks, selected_stocks, data_types):
         stocks_to_sync = [s for s in selected_stocks if s and s != 'ALL']
 
     try:
-        result = sync_stock_data(stocks=stocks_to_sync, data_types=data_types, folder_id=GDRIVE_FOLDER_EMITEN_UPDATE)
+        result = sync_stock_data(stocks=stocks_to_sync, data_types=data_types,
+                                 folder_id=GDRIVE_FOLDER_EMITEN_UPDATE, progress_callback=report)
+        # Invalidate cache + warm-up di web process setelah job selesai
+        report.after_job(stocks=result.stocks_processed)
 
         log_items = []
         for log in result.logs:
@@ -19582,96 +19681,45 @@ def dm_upload_data(n_clicks, selected_stocks, data_types):
         )
 
 
-@app.callback(
+@background_callback(
     Output('dm-v11b1-status', 'children'),
     [Input('dm-recalc-v11b1-btn', 'n_clicks')],
     [State('dm-stock-select', 'value')],
+    job_name='recalc-v11b1',
+    effects=True,
+    progress=Output('dm-v11b1-progress', 'children'),
+    cancel=[Input('dm-recalc-v11b1-cancel-btn', 'n_clicks')],
+    running=running_outputs('dm-recalc-v11b1-btn', cancel_id='dm-recalc-v11b1-cancel-btn'),
+    on_rejected=_job_rejected_alert,
     prevent_initial_call=True
 )
-def dm_recalc_v11b1(n_clicks, selected_stocks):
+def dm_recalc_v11b1(report, n_clicks, selected_stocks):
     """Recalculate V11b1 for selected stocks (Data Management tab)"""
     if not n_clicks:
         raise dash.exceptions.PreventUpdate
-
-    from datetime import datetime
-    from zones_config import STOCK_ZONES
-
-    if not selected_stocks or 'ALL' in selected_stocks:
-        stocks_to_process = list(STOCK_ZONES.keys())
-    else:
-        stocks_to_process = [s for s in selected_stocks if s in STOCK_ZONES]
-
-    if not stocks_to_process:
-        return dbc.Alert("Tidak ada emiten V11b1 yang dipilih", color="warning")
-
-    try:
-        from calculate_daily_v11b1 import process_stock
-        from backtest_v11b1_universal import get_db_connection
-    except ImportError as e:
-        return dbc.Alert(f"Error import module: {e}", color="danger")
-
-    results = []
-    success_count = 0
-    fail_count = 0
-
-    try:
-        conn = get_db_connection()
-
-        for stock in stocks_to_process:
-            try:
-                success = process_stock(stock, conn)
-                if success:
-                    success_count += 1
-                    results.append(html.Div([
-                        html.I(className="fas fa-check text-success me-2"),
-                        f"{stock}: OK"
-                    ], className="small"))
-                else:
-                    fail_count += 1
-                    results.append(html.Div([
-                        html.I(className="fas fa-times text-danger me-2"),
-                        f"{stock}: Failed"
-                    ], className="small"))
-            except Exception as e:
-                fail_count += 1
-                results.append(html.Div([
-                    html.I(className="fas fa-times text-danger me-2"),
-                    f"{stock}: {str(e)[:50]}"
-                ], className="small"))
-
-        conn.commit()
-        conn.close()
-
-    except Exception as e:
-        return dbc.Alert(f"Database connection error: {e}", color="danger")
-
-    timestamp = datetime.now().strftime('%H:%M:%S')
-    color = "success" if fail_count == 0 else ("warning" if success_count > 0 else "danger")
-
-    return dbc.Alert([
-        html.H6([
-            html.I(className="fas fa-calculator me-2"),
-            f"V11b1 Recalc Complete - {timestamp}"
-        ]),
-        html.P(f"Success: {success_count}, Failed: {fail_count}", className="mb-2"),
-        html.Div(results, style={'maxHeight': '150px', 'overflowY': 'auto'})
-    ], color=color, dismissable=True)
+    return _recalc_v11b1_stocks(report, selected_stocks)
 
 
 # ============================================================
 # GOOGLE DRIVE SYNC CALLBACKS
 # ============================================================
 
-@app.callback(
+@background_callback(
     [Output('gdrive-sync-status', 'children'),
      Output('gdrive-log', 'children'),
      Output('gdrive-last-sync', 'children')],
     [Input('gdrive-sync-btn', 'n_clicks')],
     [State('gdrive-stock-select', 'value'),
      State('gdrive-data-type', 'value')],
+    job_name='gdrive-sync',
+    effects=True,
+    progress=Output('gdrive-progress', 'children'),
+    cancel=[Input('gdrive-sync-cancel-btn', 'n_clicks')],
+    running=running_outputs('gdrive-sync-btn', cancel_id='gdrive-sync-cancel-btn'),
+    on_rejected=lambda message: (_job_rejected_alert(message), dash.no_update, dash.no_update),
     prevent_initial_call=True
 )
-def sync_from_gdrive(n_clicks, selected_stocks, data_types):
+def sync_from_gdrive(report, n_clicks, selected_stocks, data_types):
     """Sync data from Google Drive folder"""
     if not n_clicks:
         raise dash.exceptions.PreventUpdate
@@ -19761,7 +19809,9 @@ def sync_from_gdrive(n_clicks, selected_stocks, data_types):
 
     # Run the sync
     try:
-        result = sync_stock_data(stocks=stocks_to_sync, data_types=data_types)
+        result = sync_stock_data(stocks=stocks_to_sync, data_types=data_types, progress_callback=report)
+        # Invalidate cache + warm-up di web process setelah job selesai
+        report.after_job(stocks=result.stocks_processed)
 
         # Build log display
         log_items = []
@@ -21484,13 +21534,19 @@ def refresh_sensitive_page(n_clicks, stock_code):
     )
 
 # Upload callbacks
-@app.callback(
+@background_callback(
     [Output('upload-status', 'children'), Output('available-stocks-list', 'children'), Output('import-log', 'children')],
     [Input('upload-data', 'contents')],
     [State('upload-data', 'filename'), State('upload-stock-code', 'value')],
+    job_name='excel-import',
+    effects=True,
+    progress=Output('upload-progress', 'children'),
+    cancel=[Input('upload-cancel-btn', 'n_clicks')],
+    running=running_outputs('upload-data', cancel_id='upload-cancel-btn'),
+    on_rejected=lambda message: (_job_rejected_alert(message), dash.no_update, dash.no_update),
     prevent_initial_call=True
 )
-def handle_upload(contents, filename, stock_code):
+def handle_upload(report, contents, filename, stock_code):
     import tempfile
     import traceback
 
@@ -21503,9 +21559,11 @@ def handle_upload(contents, filename, stock_code):
         return dbc.Alert("Masukkan kode saham terlebih dahulu (min 2 karakter)", color="danger"), stocks_list, html.Div()
 
     stock_code = stock_code.upper().strip()
+    total_steps = 6
 
     try:
         print(f"[UPLOAD] Starting upload for {stock_code}, file: {filename}")
+        report(0, total_steps, f"{stock_code}: menyimpan file...")
 
         content_type, content_string = contents.split(',')
         decoded = base64.b64decode(content_string)
@@ -21522,11 +21580,13 @@ def handle_upload(contents, filename, stock_code):
             f.write(decoded)
 
         print(f"[UPLOAD] File saved, parsing...")
+        report(1, total_steps, f"{stock_code}: membaca Excel...")
 
         # Parse and import
         broker_df, price_df = read_excel_data(temp_path)
 
         print(f"[UPLOAD] Parsed - Price: {len(price_df)} rows, Broker: {len(broker_df)} rows")
+        report(2, total_steps, f"{stock_code}: import {len(price_df)} harga, {len(broker_df)} broker...")
 
         price_count = import_price_data(price_df, stock_code)
         print(f"[UPLOAD] Price imported: {price_count} records")
@@ -21535,6 +21595,7 @@ def handle_upload(contents, filename, stock_code):
         print(f"[UPLOAD] Broker imported: {broker_count} records")
 
         # Import profile data if exists
+        report(3, total_steps, f"{stock_code}: import profil & fundamental...")
         profile_data = read_profile_data(temp_path)
         profile_imported = False
         if profile_data:
@@ -21556,12 +21617,14 @@ def handle_upload(contents, filename, stock_code):
         except:
             pass  # Ignore cleanup errors
 
-        # Clear cache so new stock appears immediately
-        clear_cache()
+        # Import functions bump the data watermark (invalidates this stock's caches);
+        # clear remaining query cache entries for this stock (profile/fundamental tables)
+        clear_stock_cache(stock_code)
         clear_analysis_cache(stock_code)  # Clear analysis cache for this stock
         print(f"[UPLOAD] Cache cleared after import")
 
         # Auto-update V11b1 calculation for this stock
+        report(4, total_steps, f"{stock_code}: update V11b1...")
         v11b1_updated = False
         try:
             from zones_config import STOCK_ZONES
@@ -21592,6 +21655,10 @@ def handle_upload(contents, filename, stock_code):
         except Exception as v11b1_error:
             print(f"[UPLOAD] V11b1 auto-update failed (non-critical): {v11b1_error}")
 
+        # Invalidate + precompute di web process setelah job selesai (imported stock first)
+        report.after_job(stocks=[stock_code], warm=[stock_code] + [s for s in STOCK_ZONES if s != stock_code],
+                         v11b1_snapshot=v11b1_updated)
+
         # Build status message
         status_items = [
             f"Stock: {stock_code}", html.Br(),
@@ -21627,6 +21694,7 @@ def handle_upload(contents, filename, stock_code):
         print(f"[UPLOAD] SUCCESS - {stock_code}: {price_count} price, {broker_count} broker records, profile: {profile_imported}, v11b1: {v11b1_updated}")
 
         # Auto backup to GitHub after successful import
+        report(5, total_steps, f"{stock_code}: backup...")
         try:
             from auto_backup import auto_backup_and_push
             backup_msg = f"Auto backup after import: {stock_code} ({price_count} price, {broker_count} broker)"
@@ -21635,6 +21703,7 @@ def handle_upload(contents, filename, stock_code):
         except Exception as backup_error:
             print(f"[UPLOAD] Auto backup failed (non-critical): {backup_error}")
 
+        report(total_steps, total_steps, f"{stock_code}: selesai")
         return status, create_stocks_list(), log  # Dropdown options refreshed by separate callback
 
     except Exception as e:
@@ -21839,6 +21908,8 @@ def submit_new_thread(n_clicks, author, title, content, stock_code, admin_pwd, a
         # Process PDF if uploaded
         pdf_data = None
         pdf_name = None
+        pdf_hash = None
+        pdf_size = None
         if pdf_contents and pdf_filename:
             if not pdf_filename.lower().endswith('.pdf'):
                 return dbc.Alert("Hanya file PDF yang diperbolehkan!", color="danger"), dash.no_update, dash.no_update, dash.no_update
@@ -21854,16 +21925,20 @@ def submit_new_thread(n_clicks, author, title, content, stock_code, admin_pwd, a
         # Insert to database
         insert_query = """
             INSERT INTO forum_threads
-            (stock_code, title, content, author_name, author_type, is_pinned, is_frozen, flag, collapsed, score, pdf_data, pdf_filename)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            (stock_code, title, content, author_name, author_type, is_pinned, is_frozen, flag, collapsed, score, pdf_filename, pdf_hash, pdf_size)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             RETURNING id
         """
         stock_val = stock_code if stock_code else None
-        result = execute_query(insert_query, (
-            stock_val, title, content, author, author_type,
-            is_pinned, is_frozen, flag, collapsed, initial_score,
-            pdf_data, pdf_name
-        ))
+        # Lampiran & thread satu transaksi: lampiran tidak bisa dihapus di antaranya
+        with get_cursor() as cursor:
+            if pdf_data is not None:
+                pdf_hash, pdf_size = store_attachment(pdf_data, cursor=cursor)
+            cursor.execute(insert_query, (
+                stock_val, title, content, author, author_type,
+                is_pinned, is_frozen, flag, collapsed, initial_score,
+                pdf_name, pdf_hash, pdf_size
+            ))
 
         # Refresh threads
         threads = get_forum_threads(stock_val)
@@ -21999,8 +22074,10 @@ def handle_delete_thread(delete_clicks, cancel_click, confirm_click, is_open, pa
             return True, thread_id, dbc.Alert("Password salah!", color="danger")
 
         try:
-            query = "DELETE FROM forum_threads WHERE id = %s"
-            execute_query(query, (thread_id,), fetch=False)
+            query = "DELETE FROM forum_threads WHERE id = %s RETURNING pdf_hash"
+            deleted = execute_query(query, (thread_id,), use_cache=False)
+            if deleted:
+                delete_thread_attachment(deleted[0]['pdf_hash'])
             return False, None, ""
         except Exception as e:
             return True, thread_id, dbc.Alert(f"Error: {str(e)}", color="danger")
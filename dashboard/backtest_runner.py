@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+PARALLEL BACKTEST RUNNER
+========================
+Orkestrasi backtest multi-saham untuk formula V10 / V11 / V11b1.
+
+- OHLCV semua saham di-load SEKALI (1 koneksi, 1 query)
+- Setiap task (saham x formula x param set) dijalankan di ProcessPoolExecutor,
+  data OHLCV dikirim sekali per worker (initializer), bukan per task
+- Hasil dikembalikan sesuai urutan task lalu di-merge menjadi ringkasan
+
+Usage:
+    python backtest_runner.py                       # semua saham, V10 + V11 + V11b1
+    python backtest_runner.py --formulas V10,V11b1 --workers 4
+"""
+import os
+import sys
+import time
+import importlib
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    sys.stdout.reconfigure(encoding='utf-8')
+except (AttributeError, OSError):
+    pass
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from zones_config import STOCK_ZONES
+
+# Formula -> (module backtest, nama argumen param formula di run_backtest)
+FORMULA_RUNNERS = {
+    'V10': ('backtest_v10_universal', None),
+    'V11': ('backtest_v11_universal', 'v11_params'),
+    'V11b1': ('backtest_v11b1_universal', 'v11b1_params'),
+}
+
+
+def get_db_connection():
+    database_url = os.environ.get('DATABASE_URL')
+    if database_url:
+        return psycopg2.connect(database_url)
+    else:
+        return psycopg2.connect(
+            host='localhost',
+            database='stock_analysis',
+            user='postgres',
+            password='postgres'
+        )
+
+
+def load_ohlcv_bulk(stock_codes, conn=None):
+    """
+    Load OHLCV (+ net_foreign) untuk banyak saham dalam 1 query.
+    Returns: {STOCK_CODE: [rows]} dengan format rows sama dengan get_stock_data di modul backtest.
+    """
+    codes = sorted({code.upper() for code in stock_codes})
+    data = {code: [] for code in codes}
+    if not codes:
+        return data
+
+    close_conn = False
+    if conn is None:
+        conn = get_db_connection()
+        close_conn = True
+
+    try:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute('''
+            SELECT stock_code, date, open_price as open, high_price as high,
+                   low_price as low, close_price as close, volume,
+                   net_foreign
+            FROM stock_daily WHERE stock_code = ANY(%s)
+            AND open_price IS NOT NULL AND close_price IS NOT NULL
+            ORDER BY stock_code, date ASC
+        ''', (codes,))
+        for row in cur.fetchall():
+            row = dict(row)
+            data[row.pop('stock_code')].append(row)
+    finally:
+        if close_conn:
+            conn.close()
+
+    return data
+
+
+def make_tasks(stock_codes, formula, formula_params=None, label=None, **kwargs):
+    """
+    Buat task backtest untuk beberapa saham dengan satu formula + param set.
+
+    Args:
+        formula: 'V10', 'V11' atau 'V11b1'
+        formula_params: dict param formula (v11_params / v11b1_params), None = default
+        label: Nama param set untuk ringkasan (default: nama formula)
+        **kwargs: Argumen tambahan run_backtest (params, start_date, ...)
+    """
+    if formula not in FORMULA_RUNNERS:
+        raise ValueError(f"Unknown formula {formula}, pilih dari {list(FORMULA_RUNNERS)}")
+    return [{
+        'formula': formula,
+        'label': label or formula,
+        'stock_code': stock_code,
+        'formula_params': formula_params,
+        'kwargs': kwargs,
+    } for stock_code in stock_codes]
+
+
+# Data OHLCV per worker process (diisi oleh initializer pool)
+_worker_data = {}
+
+
+def _init_worker(data_by_stock):
+    global _worker_data
+    _worker_data = data_by_stock
+
+
+def _run_task(task):
+    module_name, formula_arg = FORMULA_RUNNERS[task['formula']]
+    module = importlib.import_module(module_name)
+
+    kwargs = dict(task['kwargs'])
+    if formula_arg and task['formula_params'] is not None:
+        kwargs[formula_arg] = task['formula_params']
+
+    data = _worker_data.get(task['stock_code'].upper(), [])
+    return module.run_backtest(task['stock_code'], data=data, **kwargs)
+
+
+def run_backtests(tasks, max_workers=None, data=None):
+    """
+    Jalankan task backtest secara paralel.
+
+    Args:
+        tasks: list task dari make_tasks()
+        max_workers: Jumlah process (default: semua core, 1 = serial in-process)
+        data: Hasil load_ohlcv_bulk() (default: di-load otomatis untuk semua saham di tasks)
+
+    Returns:
+        list (task, result) sesuai urutan tasks (result None jika saham di-skip)
+    """
+    if not tasks:
+        return []
+    if data is None:
+        data = load_ohlcv_bulk(task['stock_code'] for task in tasks)
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+    if max_workers <= 1:
+        _init_worker(data)
+        results = [_run_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(data,)) as pool:
+            results = list(pool.map(_run_task, tasks, chunksize=max(1, len(tasks) // (max_workers * 4))))
+
+    return list(zip(tasks, results))
+
+
+def summarize_result(result):
+    """Ringkasan trade tertutup untuk 1 hasil run_backtest"""
+    closed = [t for t in result['trades'] if t['exit_reason'] != 'OPEN']
+    wins = len([t for t in closed if t['pnl'] > 0])
+    return {
+        'stock_code': result['stock_code'],
+        'trades': len(closed),
+        'wins': wins,
+        'losses': len(closed) - wins,
+        'win_rate': wins / len(closed) * 100 if closed else 0,
+        'total_pnl': sum(t['pnl'] for t in closed),
+        'filtered': len(result.get('filtered_entries', [])),
+    }
+
+
+def merge_summaries(task_results):
+    """
+    Gabungkan hasil run_backtests() per label (formula / param set).
+    Returns: {label: {'stocks': [summary per saham], 'trades', 'wins', 'losses', 'win_rate', 'total_pnl'}}
+    """
+    merged = {}
+    for task, result in task_results:
+        entry = merged.setdefault(task['label'], {
+            'stocks': [], 'trades': 0, 'wins': 0, 'losses': 0, 'win_rate': 0, 'total_pnl': 0,
+        })
+        if not result:
+            continue
+        summary = summarize_result(result)
+        entry['stocks'].append(summary)
+        entry['trades'] += summary['trades']
+        entry['wins'] += summary['wins']
+        entry['losses'] += summary['losses']
+        entry['total_pnl'] += summary['total_pnl']
+
+    for entry in merged.values():
+        entry['win_rate'] = entry['wins'] / entry['trades'] * 100 if entry['trades'] else 0
+    return merged
+
+
+def compare_all(formulas=('V10', 'V11', 'V11b1'), stock_codes=None, max_workers=None):
+    """Backtest semua saham x formula secara paralel lalu cetak perbandingan"""
+    stock_codes = sorted(stock_codes or STOCK_ZONES.keys())
+    tasks = []
+    for formula in formulas:
+        tasks.extend(make_tasks(stock_codes, formula))
+
+    started = time.time()
+    merged = merge_summaries(run_backtests(tasks, max_workers=max_workers))
+    elapsed = time.time() - started
+
+    print("=" * 100)
+    print(f"PERBANDINGAN FORMULA: {' vs '.join(formulas)}")
+    print(f"{len(stock_codes)} saham x {len(formulas)} formula = {len(tasks)} task ({elapsed:.1f}s)")
+    print("=" * 100)
+
+    header = f"{'Stock':<8}" + "".join(f" {label:>10} {'WR':>7} {'PnL':>9}" for label in merged)
+    print(header)
+    print("-" * len(header))
+    for stock in stock_codes:
+        line = f"{stock:<8}"
+        for entry in merged.values():
+            s = next((s for s in entry['stocks'] if s['stock_code'] == stock), None)
+            if s:
+                line += f" {s['trades']:>10} {s['win_rate']:>6.1f}% {s['total_pnl']:>+8.1f}%"
+            else:
+                line += f" {'-':>10} {'-':>7} {'-':>9}"
+        print(line)
+    print("-" * len(header))
+    line = f"{'TOTAL':<8}"
+    for entry in merged.values():
+        line += f" {entry['trades']:>10} {entry['win_rate']:>6.1f}% {entry['total_pnl']:>+8.1f}%"
+    print(line)
+
+    return merged
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Parallel backtest V10 / V11 / V11b1')
+    parser.add_argument('--formulas', default='V10,V11,V11b1', help='Daftar formula dipisah koma')
+    parser.add_argument('--stocks', default='ALL', help='Daftar saham dipisah koma atau ALL')
+    parser.add_argument('--workers', type=int, default=None, help='Jumlah process (default: semua core)')
+    args = parser.parse_args()
+
+    stocks = None if args.stocks.upper() == 'ALL' else [s.strip().upper() for s in args.stocks.split(',')]
+    compare_all([f.strip() for f in args.formulas.split(',')], stocks, args.workers)
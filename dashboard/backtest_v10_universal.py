@@ -190,7 +190,7 @@ def calculate_sl_tp(zh, entry_type, zone_low, zone_high, zone_num, entry_price,
     return sl, tp
 
 
-def run_backtest(stock_code, params=None, start_date='2024-01-01', verbose=False):
+def run_backtest(stock_code, params=None, start_date='2024-01-01', verbose=False, data=None):
     if params is None:
         params = DEFAULT_PARAMS.copy()
 
@@ -201,13 +201,17 @@ def run_backtest(stock_code, params=None, start_date='2024-01-01', verbose=False
 
     zh = ZoneHelper(zones)
 
-    try:
-        conn = get_db_connection()
-        all_data = get_stock_data(stock_code, conn)
-        conn.close()
-    except Exception as e:
-        print(f"Database error for {stock_code}: {e}")
-        return None
+    if data is not None:
+        # Data sudah di-load (mis. bulk load dari backtest_runner)
+        all_data = data
+    else:
+        try:
+            conn = get_db_connection()
+            all_data = get_stock_data(stock_code, conn)
+            conn.close()
+        except Exception as e:
+            print(f"Database error for {stock_code}: {e}")
+            return None
 
     if not all_data or len(all_data) < 30:
         print(f"Insufficient data for {stock_code}")
@@ -577,8 +581,9 @@ def run_all_backtests():
     print("FORMULA V10 - BACKTEST ALL STOCKS")
     print("=" * 90)
 
-    for stock_code in sorted(STOCK_ZONES.keys()):
-        result = run_backtest(stock_code)
+    # Semua saham paralel (1 bulk load OHLCV + process pool)
+    from backtest_runner import run_backtests, make_tasks
+    for _, result in run_backtests(make_tasks(sorted(STOCK_ZONES.keys()), 'V10')):
         if result:
             results.append(result)
             print_report(result)
@@ -17,6 +17,9 @@ Logic:
 
 import sys
 import os
+from bisect import bisect_left
+
+import numpy as np
 
 try:
     sys.stdout.reconfigure(encoding='utf-8')
@@ -26,6 +29,10 @@ except (AttributeError, OSError):
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from zones_config import STOCK_ZONES, DEFAULT_PARAMS, STOCK_FORMULA
+try:
+    from snapshot_store import get_ohlcv_rows
+except ImportError:
+    get_ohlcv_rows = None
 
 
 def get_db_connection():
@@ -85,6 +92,12 @@ STATE_WAITING_VOLUME = 4  # NEW: Waiting for volume confirmation
 
 
 def get_stock_data(stock_code, conn):
+    # Columnar snapshot (tanpa transfer histori penuh) jika tersedia
+    if get_ohlcv_rows is not None:
+        rows = get_ohlcv_rows(stock_code, conn)
+        if rows is not None:
+            return rows
+
     cur = conn.cursor(cursor_factory=RealDictCursor)
     cur.execute('''
         SELECT date, open_price as open, high_price as high,
@@ -140,16 +153,56 @@ def get_buffer(data, idx, atr_list, params):
 
 
 class ZoneHelper:
+    """
+    Lookup zona S/R.
+
+    Jawaban get_active_support / get_active_resistance / get_next_resistance_zone
+    hanya bergantung pada posisi harga terhadap batas zona (low/high). Jawaban per
+    region (di antara dua batas, atau tepat di batas) dihitung sekali saat init,
+    lalu setiap lookup cukup bisect di array batas zona yang terurut.
+    """
     def __init__(self, zones):
         self.zones = zones
+        self._keys = sorted(zones.keys())
+        self._bounds = sorted({z[k] for z in zones.values() for k in ('low', 'high')})
+
+        # Titik representatif per region: (< b0), b0, (b0..b1), b1, ..., (> b_last)
+        points = []
+        for idx, bound in enumerate(self._bounds):
+            if idx == 0:
+                points.append(bound - max(1, abs(bound)))
+            else:
+                points.append((self._bounds[idx - 1] + bound) / 2)
+            points.append(bound)
+        points.append(self._bounds[-1] + max(1, abs(self._bounds[-1])) if self._bounds else 0)
+
+        self._support_table = [self._scan_support(p) for p in points]
+        self._resistance_table = [self._scan_resistance(p) for p in points]
+        self._next_resistance_table = [self._scan_next_resistance(p) for p in points]
+
+    def region(self, price):
+        """Index region harga terhadap batas zona (untuk tabel lookup)"""
+        pos = bisect_left(self._bounds, price)
+        if pos < len(self._bounds) and self._bounds[pos] == price:
+            return 2 * pos + 1
+        return 2 * pos
 
     def get_active_support(self, close):
-        for znum in sorted(self.zones.keys()):
+        return self._support_table[self.region(close)]
+
+    def get_active_resistance(self, close):
+        return self._resistance_table[self.region(close)]
+
+    def get_next_resistance_zone(self, price):
+        return self._next_resistance_table[self.region(price)]
+
+    def _scan_support(self, close):
+        for znum in self._keys:
             if self.zones[znum]['low'] <= close <= self.zones[znum]['high']:
                 return self.zones[znum]['low'], self.zones[znum]['high'], znum
         best_zone = None
         best_dist = float('inf')
-        for znum in sorted(self.zones.keys()):
+        for znum in self._keys:
             if close > self.zones[znum]['high']:
                 dist = close - self.zones[znum]['high']
                 if dist < best_dist:
@@ -159,13 +212,13 @@ class ZoneHelper:
             return best_zone
         return None, None, 0
 
-    def get_active_resistance(self, close):
-        for znum in sorted(self.zones.keys()):
+    def _scan_resistance(self, close):
+        for znum in self._keys:
             if self.zones[znum]['low'] <= close <= self.zones[znum]['high']:
                 return self.zones[znum]['low'], self.zones[znum]['high'], znum
         best_zone = None
         best_dist = float('inf')
-        for znum in sorted(self.zones.keys()):
+        for znum in self._keys:
             if close < self.zones[znum]['low']:
                 dist = self.zones[znum]['low'] - close
                 if dist < best_dist:
@@ -175,10 +228,10 @@ class ZoneHelper:
             return best_zone
         return None, None, 0
 
-    def get_next_resistance_zone(self, price):
+    def _scan_next_resistance(self, price):
         best_zone = None
         best_dist = float('inf')
-        for znum in sorted(self.zones.keys()):
+        for znum in self._keys:
             if price < self.zones[znum]['low']:
                 dist = self.zones[znum]['low'] - price
                 if dist < best_dist:
@@ -209,7 +262,7 @@ class ZoneHelper:
 
         close = float(data[idx]['close'])
 
-        for znum in sorted(self.zones.keys()):
+        for znum in self._keys:
             z_high = self.zones[znum]['high']
             z_low = self.zones[znum]['low']
 
@@ -282,7 +335,167 @@ def calculate_sl_tp(zh, entry_type, zone_low, zone_high, zone_num, entry_price,
     return sl, tp
 
 
-def run_backtest(stock_code, params=None, v11b1_params=None, start_date='2024-01-01', verbose=False):
+def _window_sums(values, period):
+    """
+    sums[j] = sum(values[j:j + period]) untuk semua j.
+    Prefix sum jika semua nilai bulat (exact, bit-identik dengan sum() berurutan);
+    selain itu dijumlah berurutan per posisi window (urutan sama dengan sum()).
+    """
+    count = len(values) - period + 1
+    if period <= 0 or count <= 0:
+        return np.empty(0, dtype='float64')
+    if np.isfinite(values).all() and (values == np.floor(values)).all() and np.abs(values).sum() < 2 ** 52:
+        csum = np.concatenate(([0.0], np.cumsum(values)))
+        return csum[period:] - csum[:count]
+    total = values[:count].copy()
+    for k in range(1, period):
+        total += values[k:k + count]
+    return total
+
+
+def load_price_arrays(all_data):
+    """
+    Konversi rows OHLCV (Decimal/float) ke float SEKALI.
+    Hasilnya bisa dipakai ulang untuk banyak run_backtest pada saham yang sama
+    (mis. parameter sweep) lewat argumen prices.
+
+    Returns dict: open/high/low/close (list float) + highs/lows/closes/volumes (ndarray)
+    """
+    close_list = [float(d['close']) for d in all_data]
+    high_list = [float(d['high']) for d in all_data]
+    low_list = [float(d['low']) for d in all_data]
+    return {
+        'open': [float(d['open']) for d in all_data],
+        'high': high_list,
+        'low': low_list,
+        'close': close_list,
+        'highs': np.array(high_list),
+        'lows': np.array(low_list),
+        'closes': np.array(close_list),
+        'volumes': np.array([float(d['volume']) for d in all_data]),
+    }
+
+
+def prepare_bars(prices, zh, params, v11b1_params, use_ma_filter=False):
+    """
+    Indikator per bar dari hasil load_price_arrays(), dihitung sekali dengan NumPy.
+    Sebelumnya semua ini dihitung ulang setiap bar di loop run_backtest:
+    - vol_ratio  : prefix-sum rata-rata volume (calculate_volume_ratio)
+    - buffer     : ATR buffer (get_buffer)
+    - region     : posisi close terhadap batas zona -> tabel support/resistance ZoneHelper
+    - bo_zone    : zona breakout dengan akumulasi N hari (detect_breakout_zone)
+    - prev_min   : min close N hari sebelumnya (cek came_from_below)
+    - ma_up      : MA short > MA long (check_ma_uptrend, hanya jika filter V11b2 aktif)
+    - next_event : bar berikutnya (>= i) yang bisa memicu breakout / retest saat state IDLE
+    - next_breakout : bar berikutnya (>= i) dengan zona breakout
+    - last_touch : bar terakhir (<= i) yang menyentuh resistance aktif (-1 jika belum ada)
+
+    Returns dict kolom -> list Python (akses elemen list lebih cepat dari ndarray di loop).
+    """
+    highs = prices['highs']
+    lows = prices['lows']
+    closes = prices['closes']
+    volumes = prices['volumes']
+    n = len(closes)
+
+    # Buffer (ATR dari true range, sama dengan calculate_true_range + calculate_atr)
+    if params['buffer_method'] == 'ATR':
+        tr = highs - lows
+        prev_closes = closes[:-1]
+        tr[1:] = np.maximum(np.maximum(tr[1:], np.abs(highs[1:] - prev_closes)), np.abs(lows[1:] - prev_closes))
+        atr_len = params['atr_len']
+        atr = np.full(n, 10.0)
+        if n >= atr_len:
+            atr[atr_len - 1:] = _window_sums(tr, atr_len) / atr_len
+        buffer = atr * params['atr_mult']
+    else:
+        buffer = closes * params['pct_buffer']
+
+    # Volume ratio: volume hari ini / rata-rata lookback hari sebelumnya
+    lookback = v11b1_params['vol_lookback']
+    vol_ratio = [None] * n
+    if n > lookback:
+        avg_vol = _window_sums(volumes, lookback)[:n - lookback] / lookback
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vol_ratio[lookback:] = (volumes[lookback:] / avg_vol).tolist()
+        for k in np.flatnonzero(avg_vol == 0).tolist():
+            vol_ratio[lookback + k] = None
+
+    # Min close N hari sebelumnya (N = min(bo_accumulation_days, idx))
+    acc_days = v11b1_params.get('bo_accumulation_days', 7)
+    prev_min = np.full(n, np.inf)
+    if n > 1 and acc_days > 0:
+        head = min(acc_days, n - 1)
+        prev_min[1:head + 1] = np.minimum.accumulate(closes[:head])
+        if n > acc_days:
+            count = n - acc_days
+            window_min = closes[:count].copy()
+            for k in range(1, acc_days):
+                np.minimum(window_min, closes[k:k + count], out=window_min)
+            prev_min[acc_days:] = window_min
+
+    # Zona breakout: zona pertama (urutan nomor zona) dengan close > high dan prev_min <= high
+    bo_zone = np.zeros(n, dtype=int)
+    for znum in reversed(zh._keys):
+        z_high = zh.zones[znum]['high']
+        bo_zone[(closes > z_high) & (prev_min <= z_high)] = znum
+    bo_zone[0] = 0
+
+    # Region close terhadap batas zona (sama dengan ZoneHelper.region)
+    bounds = np.array(zh._bounds, dtype='float64')
+    pos = np.searchsorted(bounds, closes, side='left')
+    on_bound = np.zeros(n, dtype=bool)
+    inside = pos < len(bounds)
+    on_bound[inside] = bounds[pos[inside]] == closes[inside]
+    regions = 2 * pos + on_bound
+
+    # Kandidat event saat IDLE: breakout, atau support touch + hold + dari atas
+    # (superset trigger retest; syarat lain dicek ulang di loop)
+    s_low = np.array([np.nan if z[1] is None else z[0] for z in zh._support_table], dtype='float64')[regions]
+    s_high = np.array([np.nan if z[1] is None else z[1] for z in zh._support_table], dtype='float64')[regions]
+    r_low = np.array([np.nan if z[1] is None else z[0] for z in zh._resistance_table], dtype='float64')[regions]
+    prev_closes = np.concatenate((closes[:1], closes[:-1]))
+    event = (bo_zone > 0) | ((lows <= s_high) & (closes >= s_low) & (prev_closes > s_high))
+    index = np.arange(n)
+    next_event = np.minimum.accumulate(np.where(event, index, n)[::-1])[::-1]
+    next_breakout = np.minimum.accumulate(np.where(bo_zone > 0, index, n)[::-1])[::-1]
+    last_touch = np.maximum.accumulate(np.where(highs >= r_low - buffer, index, -1))
+
+    ma_up = None
+    if use_ma_filter:
+        ma_short = v11b1_params.get('ma_short', 30)
+        ma_long = v11b1_params.get('ma_long', 100)
+        warmup = max(ma_short, ma_long) - 1
+        ma_up = [True] * n
+        if n > warmup:
+            ma_s = _window_sums(closes, ma_short) / ma_short
+            ma_l = _window_sums(closes, ma_long) / ma_long
+            ma_up[warmup:] = (ma_s[warmup - ma_short + 1:] > ma_l[warmup - ma_long + 1:]).tolist()
+
+    return {
+        'buffer': buffer.tolist(),
+        'vol_ratio': vol_ratio,
+        'prev_min': prev_min.tolist(),
+        'bo_zone': bo_zone.tolist(),
+        'region': regions.tolist(),
+        'ma_up': ma_up,
+        'next_event': next_event.tolist(),
+        'next_breakout': next_breakout.tolist(),
+        'last_touch': last_touch.tolist(),
+    }
+
+
+def _bars_key(params, v11b1_params, use_ma_filter):
+    """Parameter yang mempengaruhi prepare_bars (key cache indikator untuk sweep)"""
+    return (
+        params['buffer_method'], params['atr_len'], params['atr_mult'], params['pct_buffer'],
+        v11b1_params['vol_lookback'], v11b1_params.get('bo_accumulation_days', 7), use_ma_filter,
+        v11b1_params.get('ma_short', 30), v11b1_params.get('ma_long', 100),
+    )
+
+
+def run_backtest(stock_code, params=None, v11b1_params=None, start_date='2024-01-01', verbose=False, data=None,
+                 prices=None, bars_cache=None):
     if params is None:
         params = DEFAULT_PARAMS.copy()
 
@@ -295,23 +508,52 @@ def run_backtest(stock_code, params=None, v11b1_params=None, start_date='2024-01
 
     # Check if stock uses V11b2 (MA filter)
     stock_formula = STOCK_FORMULA.get(stock_code.upper(), 'V11b1')
-    use_ma_filter = stock_formula == 'V11b2'
+    use_ma_filter = v11b1_params.get('use_ma_filter', stock_formula == 'V11b2')
+    ma_label = f"MA{v11b1_params.get('ma_short', 30)} <= MA{v11b1_params.get('ma_long', 100)}"
 
     zh = ZoneHelper(zones)
 
-    try:
-        conn = get_db_connection()
-        all_data = get_stock_data(stock_code, conn)
-        conn.close()
-    except Exception as e:
-        print(f"Database error for {stock_code}: {e}")
-        return None
+    if data is not None:
+        # Data sudah di-load (mis. bulk load dari backtest_runner)
+        all_data = data
+    else:
+        try:
+            conn = get_db_connection()
+            all_data = get_stock_data(stock_code, conn)
+            conn.close()
+        except Exception as e:
+            print(f"Database error for {stock_code}: {e}")
+            return None
 
     if not all_data or len(all_data) < 30:
         return None
 
-    tr_list = calculate_true_range(all_data)
-    atr_list = calculate_atr(tr_list, params['atr_len'])
+    # Kernel: semua harga & indikator per bar dihitung sekali di awal
+    # (prices dari load_price_arrays & bars_cache bisa di-pass ulang untuk saham yang sama)
+    if prices is None:
+        prices = load_price_arrays(all_data)
+    if bars_cache is None:
+        bars = prepare_bars(prices, zh, params, v11b1_params, use_ma_filter)
+    else:
+        bars_key = _bars_key(params, v11b1_params, use_ma_filter)
+        bars = bars_cache.get(bars_key)
+        if bars is None:
+            bars = bars_cache[bars_key] = prepare_bars(prices, zh, params, v11b1_params, use_ma_filter)
+    opens = prices['open']
+    highs = prices['high']
+    lows = prices['low']
+    closes = prices['close']
+    buffers = bars['buffer']
+    vol_ratios = bars['vol_ratio']
+    prev_mins = bars['prev_min']
+    bo_zones = bars['bo_zone']
+    regions = bars['region']
+    support_table = zh._support_table
+    resistance_table = zh._resistance_table
+    ma_up = bars['ma_up']
+    next_event = bars['next_event']
+    next_breakout = bars['next_breakout']
+    last_touch = bars['last_touch']
 
     # State tracking
     state = STATE_IDLE
@@ -347,32 +589,94 @@ def run_backtest(stock_code, params=None, v11b1_params=None, start_date='2024-01
             start_idx = i
             break
 
-    # Initialize prior_resistance_touched
-    for i in range(start_idx):
-        close = float(all_data[i]['close'])
-        high = float(all_data[i]['high'])
-        r_low, r_high, r_zone_num = zh.get_active_resistance(close)
+    # Initialize prior_resistance_touched (touch terakhir sebelum start_idx)
+    for i in range(start_idx - 1, -1, -1):
+        close = closes[i]
+        high = highs[i]
+        r_low, r_high, r_zone_num = resistance_table[regions[i]]
         if r_high is not None:
             approx_buffer = close * 0.01
             if high >= r_low - approx_buffer:
                 prior_resistance_touched = True
                 prior_resistance_zone = r_zone_num
+                break
+
+    n = len(all_data)
+    resume_idx = start_idx
+    for i in range(start_idx, n):
+        if i < resume_idx:
+            continue
+
+        # IDLE tanpa posisi/waiting/breakout: lompat ke bar kandidat event berikutnya,
+        # bar yang dilewati hanya meng-update resistance touch
+        if state == STATE_IDLE and not breakout_locked and position is None and waiting_entry is None:
+            resume_idx = next_event[i]
+            if resume_idx > i:
+                touch_idx = last_touch[resume_idx - 1]
+                if touch_idx >= i:
+                    prior_resistance_touched = True
+                    prior_resistance_zone = resistance_table[regions[touch_idx]][2]
+                continue
+
+        # Posisi terbuka: lompat ke bar exit (SL/TP/max hold) atau bar yang bisa mengubah
+        # state breakout (IDLE: kandidat breakout; ARMED: zona breakout lain / close kembali ke zona)
+        if position is not None:
+            sl = position['sl']
+            tp = position['tp']
+            stop = min(position['entry_idx'] + params['max_hold_bars'], n)
+            resume_idx = i
+            if state == STATE_IDLE and not breakout_locked:
+                stop = min(stop, next_breakout[i])
+                while resume_idx < stop and lows[resume_idx] > sl and highs[resume_idx] < tp:
+                    resume_idx += 1
+                if resume_idx > i:
+                    touch_idx = last_touch[resume_idx - 1]
+                    if touch_idx >= i:
+                        prior_resistance_touched = True
+                        prior_resistance_zone = resistance_table[regions[touch_idx]][2]
+                    continue
+            elif state == STATE_BREAKOUT_ARMED:
+                while (resume_idx < stop and lows[resume_idx] > sl and highs[resume_idx] < tp
+                       and closes[resume_idx] > locked_zone_high
+                       and bo_zones[resume_idx] in (0, locked_zone_num)):
+                    resume_idx += 1
+                if resume_idx > i:
+                    continue
+
+        # Breakout gate dengan close tetap di dalam zona: setiap bar hanya reset count,
+        # lompat sampai close keluar zona / zona breakout lain / exit posisi
+        if state == STATE_BREAKOUT_GATE and waiting_entry is None and i > breakout_start_idx:
+            stop = n
+            if position is not None:
+                sl = position['sl']
+                tp = position['tp']
+                stop = min(position['entry_idx'] + params['max_hold_bars'], n)
+            resume_idx = i
+            while (resume_idx < stop and locked_zone_low <= closes[resume_idx] <= locked_zone_high
+                   and bo_zones[resume_idx] in (0, locked_zone_num)
+                   and (position is None or (lows[resume_idx] > sl and highs[resume_idx] < tp))):
+                resume_idx += 1
+            if resume_idx > i:
+                breakout_count = 0
+                breakout_start_idx = resume_idx - 1
+                if verbose:
+                    for k in range(i, resume_idx):
+                        events_log.append(f"{str(all_data[k]['date'])[:10]}: GATE_RESET Z{locked_zone_num} (dalam zona)")
+                continue
 
-    for i in range(start_idx, len(all_data)):
-        d = all_data[i]
-        date_str = str(d['date'])[:10]
+        date_str = str(all_data[i]['date'])[:10]
 
-        close = float(d['close'])
-        low = float(d['low'])
-        high = float(d['high'])
-        open_price = float(d['open'])
-        prev_close = float(all_data[i-1]['close']) if i > 0 else close
+        close = closes[i]
+        low = lows[i]
+        high = highs[i]
+        open_price = opens[i]
+        prev_close = closes[i-1] if i > 0 else close
 
-        buffer = get_buffer(all_data, i, atr_list, params)
-        vol_ratio = calculate_volume_ratio(all_data, i, v11b1_params['vol_lookback'])
+        buffer = buffers[i]
+        vol_ratio = vol_ratios[i]
 
-        s_low, s_high, s_zone_num = zh.get_active_support(close)
-        r_low, r_high, r_zone_num = zh.get_active_resistance(close)
+        s_low, s_high, s_zone_num = support_table[regions[i]]
+        r_low, r_high, r_zone_num = resistance_table[regions[i]]
 
         frozen = breakout_locked and breakout_count < 3
 
@@ -420,9 +724,9 @@ def run_backtest(stock_code, params=None, v11b1_params=None, start_date='2024-01
                 # V11b2: Check MA filter before entry
                 ma_ok = True
                 if use_ma_filter:
-                    ma_ok = check_ma_uptrend(all_data, i, ma_short=30, ma_long=100)
+                    ma_ok = ma_up[i]
                     if not ma_ok and verbose:
-                        events_log.append(f"{date_str}: MA_FILTER_BLOCKED {waiting_entry['type']} (MA30 <= MA100 = downtrend)")
+                        events_log.append(f"{date_str}: MA_FILTER_BLOCKED {waiting_entry['type']} ({ma_label} = downtrend)")
 
                 if not ma_ok:
                     # Downtrend - cancel waiting entry
@@ -525,10 +829,10 @@ def run_backtest(stock_code, params=None, v11b1_params=None, start_date='2024-01
                 continue
 
         # Breakout detection (dengan akumulasi 7 hari)
-        bo_zone_low, bo_zone_high, bo_zone_num = zh.detect_breakout_zone(
-            all_data, i, v11b1_params.get('bo_accumulation_days', 7)
-        )
+        bo_zone_num = bo_zones[i]
         if bo_zone_num > 0:
+            bo_zone_low = zones[bo_zone_num]['low']
+            bo_zone_high = zones[bo_zone_num]['high']
             is_different_zone = (locked_zone_num != bo_zone_num)
             if not breakout_locked or (is_different_zone and state in [STATE_BREAKOUT_ARMED, STATE_BREAKOUT_GATE]):
                 if state == STATE_RETEST_PENDING:
@@ -585,14 +889,14 @@ def run_backtest(stock_code, params=None, v11b1_params=None, start_date='2024-01
         if breakout_gate_passed and state == STATE_BREAKOUT_ARMED and position is None and waiting_entry is None:
             # Re-check came_from_below before entry (V11b1 spec requirement)
             # This prevents late entries when original accumulation is no longer valid
-            current_came_from_below = False
-            lookback = min(v11b1_params.get('bo_accumulation_days', 7), i)
-            for j in range(1, lookback + 1):
-                if i - j >= 0:
-                    prev_close = float(all_data[i - j]['close'])
-                    if prev_close <= locked_zone_high:
-                        current_came_from_below = True
-                        break
+            current_came_from_below = prev_mins[i] <= locked_zone_high
+            if current_came_from_below:
+                # Loop lama menimpa prev_close dengan close terakhir <= zone_high
+                # (dipakai cek retest di bar yang sama) - dipertahankan agar hasil identik
+                j = i - 1
+                while closes[j] > locked_zone_high:
+                    j -= 1
+                prev_close = closes[j]
 
             if not current_came_from_below:
                 # Accumulation no longer valid - reset breakout state
@@ -620,9 +924,9 @@ def run_backtest(stock_code, params=None, v11b1_params=None, start_date='2024-01
                 # V11b2: Check MA filter before entry
                 ma_ok = True
                 if use_ma_filter:
-                    ma_ok = check_ma_uptrend(all_data, i, ma_short=30, ma_long=100)
+                    ma_ok = ma_up[i]
                     if not ma_ok and verbose:
-                        events_log.append(f"{date_str}: MA_FILTER_BLOCKED BREAKOUT Z{locked_zone_num} (MA30 <= MA100 = downtrend)")
+                        events_log.append(f"{date_str}: MA_FILTER_BLOCKED BREAKOUT Z{locked_zone_num} ({ma_label} = downtrend)")
 
                 # V11b1: Check volume
                 if ma_ok and vol_ratio and vol_ratio >= v11b1_params['min_vol_ratio']:
@@ -752,9 +1056,9 @@ def run_backtest(stock_code, params=None, v11b1_params=None, start_date='2024-01
                         # V11b2: Check MA filter before entry
                         ma_ok = True
                         if use_ma_filter:
-                            ma_ok = check_ma_uptrend(all_data, i, ma_short=30, ma_long=100)
+                            ma_ok = ma_up[i]
                             if not ma_ok and verbose:
-                                events_log.append(f"{date_str}: MA_FILTER_BLOCKED RETEST Z{locked_zone_num} (MA30 <= MA100 = downtrend)")
+                                events_log.append(f"{date_str}: MA_FILTER_BLOCKED RETEST Z{locked_zone_num} ({ma_label} = downtrend)")
 
                         # V11b1: Check volume
                         if ma_ok and vol_ratio and vol_ratio >= v11b1_params['min_vol_ratio']:
@@ -912,8 +1216,9 @@ def run_all_backtests():
     print("V10 + Volume Wait (entry saat vol >= 1.0x, harga masih valid)")
     print("=" * 100)
 
-    for stock_code in sorted(STOCK_ZONES.keys()):
-        result = run_backtest(stock_code)
+    # Semua saham paralel (1 bulk load OHLCV + process pool)
+    from backtest_runner import run_backtests, make_tasks
+    for _, result in run_backtests(make_tasks(sorted(STOCK_ZONES.keys()), 'V11b1')):
         if result:
             results.append(result)
             print_report(result)
@@ -5,14 +5,25 @@ CALCULATE DAILY V11B1 - Pre-compute Results per Emiten
 Jalankan setelah update data harian.
 Setiap emiten diproses independen - error di satu emiten tidak mempengaruhi yang lain.
 
+Pipeline mode (default): watermark data dicek dalam 1 query (saham yang datanya
+tidak berubah di-skip), OHLCV di-load dalam 1 query, status dihitung paralel di
+process pool, lalu semua hasil disimpan dengan 1 batched upsert.
+
 Usage:
     python calculate_daily_v11b1.py              # Process all stocks
     python calculate_daily_v11b1.py CUAN MBMA   # Process specific stocks
+    python calculate_daily_v11b1.py --force      # Abaikan watermark, hitung ulang semua
+    python calculate_daily_v11b1.py --workers 4  # Batasi jumlah process
+    python calculate_daily_v11b1.py --sequential # Mode lama: per saham, simpan per saham
 """
 
 import sys
 import os
 import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, date
 from decimal import Decimal
 
@@ -20,7 +31,7 @@ from decimal import Decimal
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 import psycopg2
-from psycopg2.extras import RealDictCursor, Json
+from psycopg2.extras import RealDictCursor, Json, execute_values
 
 # Import V11b1 components
 from zones_config import STOCK_ZONES, get_zones, DEFAULT_PARAMS, STOCK_FORMULA
@@ -36,6 +47,7 @@ from backtest_v11b1_universal import (
     calculate_ma,
     check_ma_uptrend
 )
+from backtest_runner import load_ohlcv_bulk
 
 # ============================================================
 # CONFIGURATION
@@ -51,6 +63,90 @@ V11B1_STOCKS = [
 
 FORMULA_VERSION = 'V11b1'
 
+# Skema hasil pre-compute (sama dengan create_v11b1_tables.sql):
+# satu tabel induk LIST-partitioned per emiten + trade ter-normalisasi + view latest
+SCHEMA_DDL = [
+    '''
+    CREATE TABLE IF NOT EXISTS v11b1_results (
+        stock_code VARCHAR(10) NOT NULL,
+        calc_date DATE NOT NULL,
+        calc_timestamp TIMESTAMP DEFAULT NOW(),
+        current_price DECIMAL(12,2),
+        price_change_pct DECIMAL(8,2),
+        status VARCHAR(50),
+        action VARCHAR(50),
+        action_reason TEXT,
+        support_zone_num INTEGER,
+        support_zone_low DECIMAL(12,2),
+        support_zone_high DECIMAL(12,2),
+        resistance_zone_num INTEGER,
+        resistance_zone_low DECIMAL(12,2),
+        resistance_zone_high DECIMAL(12,2),
+        confirm_type VARCHAR(50),
+        days_above_zone INTEGER DEFAULT 0,
+        came_from_below BOOLEAN DEFAULT FALSE,
+        vol_ratio DECIMAL(8,2),
+        vol_status VARCHAR(20),
+        has_open_position BOOLEAN DEFAULT FALSE,
+        position_entry_date DATE,
+        position_entry_price DECIMAL(12,2),
+        position_current_pnl DECIMAL(8,2),
+        position_sl DECIMAL(12,2),
+        position_tp DECIMAL(12,2),
+        trade_history JSONB,
+        total_trades INTEGER DEFAULT 0,
+        wins INTEGER DEFAULT 0,
+        losses INTEGER DEFAULT 0,
+        win_rate DECIMAL(5,2),
+        total_pnl DECIMAL(8,2),
+        checklist JSONB,
+        pullback_entry_price DECIMAL(12,2),
+        pullback_sl DECIMAL(12,2),
+        pullback_tp DECIMAL(12,2),
+        pullback_rr_ratio DECIMAL(5,2),
+        has_error BOOLEAN DEFAULT FALSE,
+        error_message TEXT,
+        formula_version VARCHAR(20) DEFAULT 'V11b1',
+        data_watermark VARCHAR(100),
+        created_at TIMESTAMP DEFAULT NOW(),
+        PRIMARY KEY (stock_code, calc_date)
+    ) PARTITION BY LIST (stock_code)
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS v11b1_trades (
+        stock_code VARCHAR(10) NOT NULL,
+        calc_date DATE NOT NULL,
+        trade_no INTEGER NOT NULL,
+        trade_type VARCHAR(20),
+        zone_num INTEGER,
+        entry_date DATE,
+        entry_price DECIMAL(12,2),
+        exit_date DATE,
+        exit_price DECIMAL(12,2),
+        exit_reason VARCHAR(20),
+        pnl DECIMAL(8,2),
+        sl DECIMAL(12,2),
+        tp DECIMAL(12,2),
+        vol_ratio DECIMAL(8,2),
+        entry_conditions JSONB,
+        PRIMARY KEY (stock_code, calc_date, trade_no)
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_v11b1_trades_entry
+    ON v11b1_trades(entry_date, exit_reason)
+    ''',
+    '''
+    CREATE OR REPLACE VIEW v11b1_results_latest AS
+    SELECT DISTINCT ON (stock_code) *
+    FROM v11b1_results
+    WHERE has_error = FALSE
+    ORDER BY stock_code, calc_date DESC
+    ''',
+]
+
+_schema_ready = False
+
 # ============================================================
 # HELPER FUNCTIONS
 # ============================================================
@@ -72,10 +168,12 @@ def get_latest_price_data(conn, stock_code, days=120):
     return list(reversed(rows)) if rows else []
 
 
-def calculate_stock_status(stock_code, conn):
+def calculate_stock_status(stock_code, conn=None, data=None):
     """
     Calculate V11b1 status for a single stock.
     Returns dict with all calculated values.
+
+    data: OHLCV lengkap dari load_ohlcv_bulk (pipeline mode) - tanpa query ke database
     """
     result = {
         'stock_code': stock_code,
@@ -95,7 +193,10 @@ def calculate_stock_status(stock_code, conn):
         zh = ZoneHelper(zones)
 
         # Get price data (120 days for MA100 calculation)
-        price_data = get_latest_price_data(conn, stock_code, days=120)
+        if data is not None:
+            price_data = data[-120:]
+        else:
+            price_data = get_latest_price_data(conn, stock_code, days=120)
         if not price_data or len(price_data) < 5:
             result['has_error'] = True
             result['error_message'] = f'Insufficient price data for {stock_code}'
@@ -321,7 +422,7 @@ def calculate_stock_status(stock_code, conn):
         result['checklist'] = checklist
 
         # Run backtest
-        backtest_result = run_backtest(stock_code, start_date='2024-01-01')
+        backtest_result = run_backtest(stock_code, start_date='2024-01-01', data=data)
         if backtest_result:
             trades = backtest_result.get('trades', [])
             result['trade_history'] = trades
@@ -356,114 +457,119 @@ def calculate_stock_status(stock_code, conn):
     return result
 
 
-def save_result_to_db(conn, stock_code, result):
-    """Save calculated result to stock's own table"""
-    table_name = f'v11b1_results_{stock_code.lower()}'
+# ============================================================
+# SAVE - batched upsert
+# ============================================================
+
+# Kolom v11b1_results yang diisi dari result (selain stock_code)
+RESULT_COLUMNS = [
+    'calc_date', 'current_price', 'price_change_pct',
+    'status', 'action', 'action_reason',
+    'support_zone_num', 'support_zone_low', 'support_zone_high',
+    'resistance_zone_num', 'resistance_zone_low', 'resistance_zone_high',
+    'confirm_type', 'days_above_zone', 'came_from_below',
+    'vol_ratio', 'vol_status',
+    'has_open_position', 'position_entry_date', 'position_entry_price',
+    'position_current_pnl', 'position_sl', 'position_tp',
+    'trade_history', 'total_trades', 'wins', 'losses', 'win_rate', 'total_pnl',
+    'checklist',
+    'pullback_entry_price', 'pullback_sl', 'pullback_tp', 'pullback_rr_ratio',
+    'has_error', 'error_message', 'formula_version', 'data_watermark',
+]
+
+# Nilai default jika kolom tidak ada di result
+RESULT_DEFAULTS = {
+    'has_open_position': False,
+    'total_trades': 0,
+    'wins': 0,
+    'losses': 0,
+    'win_rate': 0,
+    'total_pnl': 0,
+    'has_error': False,
+    'formula_version': FORMULA_VERSION,
+}
+
+TRADE_COLUMNS = [
+    'stock_code', 'calc_date', 'trade_no', 'trade_type', 'zone_num',
+    'entry_date', 'entry_price', 'exit_date', 'exit_price', 'exit_reason',
+    'pnl', 'sl', 'tp', 'vol_ratio', 'entry_conditions',
+]
 
-    # Convert trade_history and checklist to JSON
-    trade_history_json = Json(result.get('trade_history')) if result.get('trade_history') else None
-    checklist_json = Json(result.get('checklist')) if result.get('checklist') else None
+
+def _result_row(stock_code, result):
+    """Tuple nilai v11b1_results (urutan: stock_code + RESULT_COLUMNS)"""
+    row = [stock_code]
+    for col in RESULT_COLUMNS:
+        value = result.get(col, RESULT_DEFAULTS.get(col))
+        if col in ('trade_history', 'checklist'):
+            # Convert trade_history and checklist to JSON
+            value = Json(value) if value else None
+        row.append(value)
+    return tuple(row)
+
+
+def _trade_rows(stock_code, calc_date, trades):
+    """Baris v11b1_trades dari trade_history backtest (trade_no = urutan 1..n)"""
+    rows = []
+    for no, t in enumerate(trades or [], start=1):
+        rows.append((
+            stock_code, calc_date, no,
+            t.get('type'), t.get('zone_num'),
+            t.get('entry_date') or None, t.get('entry_price'),
+            t.get('exit_date') or None, t.get('exit_price'),
+            t.get('exit_reason'), t.get('pnl'),
+            t.get('sl'), t.get('tp'), t.get('vol_ratio'),
+            Json(t['entry_conditions']) if t.get('entry_conditions') else None,
+        ))
+    return rows
+
+
+def save_results_batch(conn, results):
+    """
+    Simpan banyak hasil dalam satu transaksi: satu upsert v11b1_results,
+    satu DELETE + satu INSERT v11b1_trades, satu commit.
+
+    Args:
+        results: list (stock_code, result)
+
+    Returns:
+        True jika semua tersimpan (rollback seluruh batch jika gagal)
+    """
+    if not results:
+        return True
 
     cur = conn.cursor()
 
     try:
-        # Upsert - insert or update if date exists
-        cur.execute(f'''
-            INSERT INTO {table_name} (
-                calc_date, current_price, price_change_pct,
-                status, action, action_reason,
-                support_zone_num, support_zone_low, support_zone_high,
-                resistance_zone_num, resistance_zone_low, resistance_zone_high,
-                confirm_type, days_above_zone, came_from_below,
-                vol_ratio, vol_status,
-                has_open_position, position_entry_date, position_entry_price,
-                position_current_pnl, position_sl, position_tp,
-                trade_history, total_trades, wins, losses, win_rate, total_pnl,
-                checklist,
-                pullback_entry_price, pullback_sl, pullback_tp, pullback_rr_ratio,
-                has_error, error_message, formula_version
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, %s, %s, %s, %s
-            )
-            ON CONFLICT (calc_date) DO UPDATE SET
-                current_price = EXCLUDED.current_price,
-                price_change_pct = EXCLUDED.price_change_pct,
-                status = EXCLUDED.status,
-                action = EXCLUDED.action,
-                action_reason = EXCLUDED.action_reason,
-                support_zone_num = EXCLUDED.support_zone_num,
-                support_zone_low = EXCLUDED.support_zone_low,
-                support_zone_high = EXCLUDED.support_zone_high,
-                resistance_zone_num = EXCLUDED.resistance_zone_num,
-                resistance_zone_low = EXCLUDED.resistance_zone_low,
-                resistance_zone_high = EXCLUDED.resistance_zone_high,
-                confirm_type = EXCLUDED.confirm_type,
-                days_above_zone = EXCLUDED.days_above_zone,
-                came_from_below = EXCLUDED.came_from_below,
-                vol_ratio = EXCLUDED.vol_ratio,
-                vol_status = EXCLUDED.vol_status,
-                has_open_position = EXCLUDED.has_open_position,
-                position_entry_date = EXCLUDED.position_entry_date,
-                position_entry_price = EXCLUDED.position_entry_price,
-                position_current_pnl = EXCLUDED.position_current_pnl,
-                position_sl = EXCLUDED.position_sl,
-                position_tp = EXCLUDED.position_tp,
-                trade_history = EXCLUDED.trade_history,
-                total_trades = EXCLUDED.total_trades,
-                wins = EXCLUDED.wins,
-                losses = EXCLUDED.losses,
-                win_rate = EXCLUDED.win_rate,
-                total_pnl = EXCLUDED.total_pnl,
-                checklist = EXCLUDED.checklist,
-                pullback_entry_price = EXCLUDED.pullback_entry_price,
-                pullback_sl = EXCLUDED.pullback_sl,
-                pullback_tp = EXCLUDED.pullback_tp,
-                pullback_rr_ratio = EXCLUDED.pullback_rr_ratio,
-                has_error = EXCLUDED.has_error,
-                error_message = EXCLUDED.error_message,
-                formula_version = EXCLUDED.formula_version,
+        # Upsert - insert or update if (stock, date) exists
+        update_cols = ',\n                '.join(
+            f'{col} = EXCLUDED.{col}' for col in RESULT_COLUMNS if col != 'calc_date'
+        )
+        execute_values(cur, f'''
+            INSERT INTO v11b1_results (stock_code, {', '.join(RESULT_COLUMNS)})
+            VALUES %s
+            ON CONFLICT (stock_code, calc_date) DO UPDATE SET
+                {update_cols},
                 calc_timestamp = NOW()
-        ''', (
-            result.get('calc_date'),
-            result.get('current_price'),
-            result.get('price_change_pct'),
-            result.get('status'),
-            result.get('action'),
-            result.get('action_reason'),
-            result.get('support_zone_num'),
-            result.get('support_zone_low'),
-            result.get('support_zone_high'),
-            result.get('resistance_zone_num'),
-            result.get('resistance_zone_low'),
-            result.get('resistance_zone_high'),
-            result.get('confirm_type'),
-            result.get('days_above_zone'),
-            result.get('came_from_below'),
-            result.get('vol_ratio'),
-            result.get('vol_status'),
-            result.get('has_open_position', False),
-            result.get('position_entry_date'),
-            result.get('position_entry_price'),
-            result.get('position_current_pnl'),
-            result.get('position_sl'),
-            result.get('position_tp'),
-            trade_history_json,
-            result.get('total_trades', 0),
-            result.get('wins', 0),
-            result.get('losses', 0),
-            result.get('win_rate', 0),
-            result.get('total_pnl', 0),
-            checklist_json,
-            result.get('pullback_entry_price'),
-            result.get('pullback_sl'),
-            result.get('pullback_tp'),
-            result.get('pullback_rr_ratio'),
-            result.get('has_error', False),
-            result.get('error_message'),
-            result.get('formula_version', FORMULA_VERSION)
-        ))
+        ''', [_result_row(code, result) for code, result in results], page_size=1000)
+
+        # Trade ter-normalisasi: ganti seluruh trade hasil kalkulasi tanggal ini.
+        # Baris error tidak menyentuh trade (view latest melewati baris error).
+        valid = [(code, result) for code, result in results if not result.get('has_error')]
+        if valid:
+            execute_values(cur, '''
+                DELETE FROM v11b1_trades t
+                USING (VALUES %s) AS k(stock_code, calc_date)
+                WHERE t.stock_code = k.stock_code AND t.calc_date = k.calc_date
+            ''', [(code, result.get('calc_date')) for code, result in valid], page_size=1000)
+
+            rows = []
+            for code, result in valid:
+                rows.extend(_trade_rows(code, result.get('calc_date'), result.get('trade_history')))
+            if rows:
+                execute_values(cur, f'''
+                    INSERT INTO v11b1_trades ({', '.join(TRADE_COLUMNS)}) VALUES %s
+                ''', rows, page_size=1000)
 
         conn.commit()
         return True
@@ -477,67 +583,226 @@ def save_result_to_db(conn, stock_code, result):
         cur.close()
 
 
-def ensure_table_exists(conn, stock_code):
-    """Create table for stock if not exists"""
-    table_name = f'v11b1_results_{stock_code.lower()}'
+def save_result_to_db(conn, stock_code, result):
+    """Save calculated result ke partisi emiten di v11b1_results + trade ke v11b1_trades
+    (satu transaksi)"""
+    return save_results_batch(conn, [(stock_code, result)])
+
+
+# ============================================================
+# SCHEMA
+# ============================================================
+
+def ensure_schema(conn):
+    """Create tabel induk v11b1_results, v11b1_trades dan view latest (sekali per proses)"""
+    global _schema_ready
+    if _schema_ready:
+        return
     cur = conn.cursor()
+    try:
+        for ddl in SCHEMA_DDL:
+            cur.execute(ddl)
+        conn.commit()
+        _schema_ready = True
+    finally:
+        cur.close()
+
 
+def ensure_partitions(conn, stock_codes):
+    """Create partisi v11b1_results_p_<code> yang belum ada (cek pg_inherits sekali)"""
+    ensure_schema(conn)
+    cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
-        cur.execute(f'''
-            CREATE TABLE IF NOT EXISTS {table_name} (
-                id SERIAL PRIMARY KEY,
-                calc_date DATE NOT NULL,
-                calc_timestamp TIMESTAMP DEFAULT NOW(),
-                current_price DECIMAL(12,2),
-                price_change_pct DECIMAL(8,2),
-                status VARCHAR(50),
-                action VARCHAR(50),
-                action_reason TEXT,
-                support_zone_num INTEGER,
-                support_zone_low DECIMAL(12,2),
-                support_zone_high DECIMAL(12,2),
-                resistance_zone_num INTEGER,
-                resistance_zone_low DECIMAL(12,2),
-                resistance_zone_high DECIMAL(12,2),
-                confirm_type VARCHAR(50),
-                days_above_zone INTEGER DEFAULT 0,
-                came_from_below BOOLEAN DEFAULT FALSE,
-                vol_ratio DECIMAL(8,2),
-                vol_status VARCHAR(20),
-                has_open_position BOOLEAN DEFAULT FALSE,
-                position_entry_date DATE,
-                position_entry_price DECIMAL(12,2),
-                position_current_pnl DECIMAL(8,2),
-                position_sl DECIMAL(12,2),
-                position_tp DECIMAL(12,2),
-                trade_history JSONB,
-                total_trades INTEGER DEFAULT 0,
-                wins INTEGER DEFAULT 0,
-                losses INTEGER DEFAULT 0,
-                win_rate DECIMAL(5,2),
-                total_pnl DECIMAL(8,2),
-                checklist JSONB,
-                pullback_entry_price DECIMAL(12,2),
-                pullback_sl DECIMAL(12,2),
-                pullback_tp DECIMAL(12,2),
-                pullback_rr_ratio DECIMAL(5,2),
-                has_error BOOLEAN DEFAULT FALSE,
-                error_message TEXT,
-                formula_version VARCHAR(20) DEFAULT 'V11b1',
-                created_at TIMESTAMP DEFAULT NOW(),
-                UNIQUE(calc_date)
-            )
+        cur.execute('''
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'v11b1_results'::regclass
         ''')
+        existing = {row['relname'] for row in cur.fetchall()}
+        for stock_code in stock_codes:
+            partition = f'v11b1_results_p_{stock_code.lower()}'
+            if partition not in existing:
+                cur.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {partition}
+                    PARTITION OF v11b1_results FOR VALUES IN (%s)
+                ''', (stock_code.upper(),))
         conn.commit()
+    finally:
+        cur.close()
+
+
+def ensure_table_exists(conn, stock_code):
+    """Create skema dan partisi untuk stock jika belum ada"""
+    try:
+        ensure_partitions(conn, [stock_code])
         return True
     except Exception as e:
         conn.rollback()
         print(f'    [ERROR] Failed to create table: {e}')
         return False
+
+
+# ============================================================
+# DATA WATERMARK
+# ============================================================
+
+def _config_hash(stock_code):
+    """Hash konfigurasi zona/formula - perubahan zones_config juga memicu recompute"""
+    code = stock_code.upper()
+    payload = repr((
+        STOCK_ZONES.get(code), STOCK_FORMULA.get(code, 'V11b1'),
+        sorted(DEFAULT_PARAMS.items()), FORMULA_VERSION,
+    ))
+    return hashlib.md5(payload.encode()).hexdigest()[:12]
+
+
+def get_data_watermarks(conn, stock_codes):
+    """
+    Watermark data per saham dalam satu query:
+    '<version data_watermark>:<tanggal terakhir>:<jumlah baris>:<hash konfigurasi>'
+
+    version di-bump oleh pipeline import; tanggal terakhir & jumlah baris menangkap
+    import lewat script lama yang tidak menaikkan version.
+    """
+    codes = sorted({code.upper() for code in stock_codes})
+    if not codes:
+        return {}
+
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute("SELECT to_regclass('data_watermark') IS NOT NULL AS ready")
+        has_versions = cur.fetchone()['ready']
+        cur.execute(f'''
+            SELECT s.stock_code,
+                   {'COALESCE(MAX(w.version), 0)' if has_versions else '0'} AS version,
+                   MAX(s.date) AS last_date, COUNT(*) AS row_count
+            FROM stock_daily s
+            {'LEFT JOIN data_watermark w ON w.stock_code = s.stock_code' if has_versions else ''}
+            WHERE s.stock_code = ANY(%s)
+            GROUP BY s.stock_code
+        ''', (codes,))
+        return {
+            row['stock_code']: (
+                f"{row['version']}:{row['last_date']}:{row['row_count']}:"
+                f"{_config_hash(row['stock_code'])}"
+            )
+            for row in cur.fetchall()
+        }
+    finally:
+        cur.close()
+
+
+def get_last_watermarks(conn, stock_codes):
+    """
+    Watermark hasil terakhir per saham, termasuk hasil error: error yang sudah
+    tercatat pada watermark data yang sama tidak dihitung ulang sampai data /
+    konfigurasi berubah (atau --force).
+    """
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute('''
+            SELECT DISTINCT ON (stock_code) stock_code, data_watermark
+            FROM v11b1_results
+            WHERE stock_code = ANY(%s)
+            ORDER BY stock_code, calc_date DESC
+        ''', (sorted({code.upper() for code in stock_codes}),))
+        return {
+            row['stock_code']: row['data_watermark']
+            for row in cur.fetchall()
+        }
     finally:
         cur.close()
 
 
+# ============================================================
+# PIPELINE MODE
+# ============================================================
+
+# Data OHLCV per worker process (diisi oleh initializer pool)
+_worker_data = {}
+
+
+def _init_worker(data_by_stock):
+    global _worker_data
+    _worker_data = data_by_stock
+
+
+def _compute_status(stock_code):
+    return calculate_stock_status(stock_code, data=_worker_data.get(stock_code.upper(), []))
+
+
+def run_pipeline(stock_codes, max_workers=None, force=False):
+    """
+    Pre-compute banyak saham sekaligus:
+    1. watermark - 1 query watermark data, saham yang datanya tidak berubah di-skip
+    2. load      - OHLCV saham yang berubah di-load dalam 1 query (load_ohlcv_bulk)
+    3. compute   - calculate_stock_status paralel di ProcessPoolExecutor
+    4. save      - 1 batched upsert (results + trades) dalam 1 transaksi
+
+    Args:
+        max_workers: Jumlah process (default: semua core, 1 = serial in-process)
+        force: Hitung ulang semua saham walau watermark tidak berubah
+
+    Returns:
+        dict success, failed, errors, skipped, timings (detik per tahap)
+    """
+    timings = {}
+    summary = {'success': 0, 'failed': 0, 'errors': [], 'skipped': [], 'timings': timings}
+    results = []
+    unsaved = set()
+
+    run_started = time.perf_counter()
+    conn = get_db_connection()
+    try:
+        started = time.perf_counter()
+        ensure_partitions(conn, stock_codes)
+        watermarks = get_data_watermarks(conn, stock_codes)
+        last_watermarks = {} if force else get_last_watermarks(conn, stock_codes)
+        todo = [code for code in stock_codes
+                if force or watermarks.get(code) is None or last_watermarks.get(code) != watermarks[code]]
+        summary['skipped'] = [code for code in stock_codes if code not in todo]
+        timings['watermark'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        data = load_ohlcv_bulk(todo, conn) if todo else {}
+        timings['load'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        if todo:
+            workers = min(max_workers or os.cpu_count() or 1, len(todo))
+            if workers <= 1:
+                _init_worker(data)
+                statuses = [_compute_status(code) for code in todo]
+            else:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                         initargs=(data,)) as pool:
+                    statuses = list(pool.map(_compute_status, todo,
+                                             chunksize=max(1, len(todo) // (workers * 4))))
+            for code, result in zip(todo, statuses):
+                result['data_watermark'] = watermarks.get(code)
+                results.append((code, result))
+        timings['compute'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        if not save_results_batch(conn, results):
+            # Isolasi error: simpan ulang per saham agar satu baris buruk tidak menggagalkan semua
+            unsaved = {code for code, result in results if not save_result_to_db(conn, code, result)}
+        timings['save'] = time.perf_counter() - started
+    finally:
+        conn.close()
+    timings['total'] = time.perf_counter() - run_started
+
+    for code, result in results:
+        if code not in unsaved and not result.get('has_error'):
+            summary['success'] += 1
+        else:
+            summary['failed'] += 1
+            summary['errors'].append(code)
+            if result.get('has_error'):
+                print(f'\n[{code}] [ERROR] {result.get("error_message")}')
+    return summary
+
+
 # ============================================================
 # MAIN EXECUTION
 # ============================================================
@@ -552,8 +817,12 @@ def process_stock(stock_code, conn):
             print(f'    [FAIL] Could not create table')
             return False
 
+        # Watermark dicatat sebelum kalkulasi (data yang berubah setelahnya terdeteksi run berikutnya)
+        watermark = get_data_watermarks(conn, [stock_code]).get(stock_code.upper())
+
         # Calculate status
         result = calculate_stock_status(stock_code, conn)
+        result['data_watermark'] = watermark
 
         if result.get('has_error'):
             print(f'    [ERROR] {result.get("error_message")}')
@@ -572,12 +841,23 @@ def process_stock(stock_code, conn):
             return False
 
     except Exception as e:
+        conn.rollback()
         print(f'    [EXCEPTION] {e}')
         return False
 
 
 def main():
     """Main execution - process all or specific stocks"""
+    parser = argparse.ArgumentParser(description='Pre-compute hasil V11b1 harian')
+    parser.add_argument('stocks', nargs='*', help='Kode saham (default: semua V11B1_STOCKS)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Jumlah process pipeline (default: semua core, 1 = serial)')
+    parser.add_argument('--force', action='store_true',
+                        help='Hitung ulang walau watermark data tidak berubah')
+    parser.add_argument('--sequential', action='store_true',
+                        help='Mode lama: satu saham per satu, simpan per saham')
+    args = parser.parse_args()
+
     print('=' * 60)
     print('  CALCULATE DAILY V11B1 - Pre-compute Results')
     print('=' * 60)
@@ -585,47 +865,58 @@ def main():
     print('=' * 60)
 
     # Determine which stocks to process
-    if len(sys.argv) > 1:
-        stocks_to_process = [s.upper() for s in sys.argv[1:]]
+    if args.stocks:
+        stocks_to_process = [s.upper() for s in args.stocks]
         print(f'\nProcessing specific stocks: {", ".join(stocks_to_process)}')
     else:
         stocks_to_process = V11B1_STOCKS
         print(f'\nProcessing all {len(stocks_to_process)} stocks')
 
-    # Connect to database
-    try:
-        conn = get_db_connection()
-        print('\n[DB] Connected successfully')
-    except Exception as e:
-        print(f'\n[DB ERROR] {e}')
-        return
-
-    # Process each stock independently
-    success = 0
-    failed = 0
-    errors = []
-
     for stock_code in stocks_to_process:
         if stock_code not in STOCK_ZONES:
             print(f'\n[{stock_code}] SKIP - Not in STOCK_ZONES config')
-            continue
-
-        if process_stock(stock_code, conn):
-            success += 1
-        else:
-            failed += 1
-            errors.append(stock_code)
-
-    conn.close()
+    stocks_to_process = [s for s in stocks_to_process if s in STOCK_ZONES]
+
+    if args.sequential:
+        # Connect to database
+        try:
+            conn = get_db_connection()
+            print('\n[DB] Connected successfully')
+        except Exception as e:
+            print(f'\n[DB ERROR] {e}')
+            return
+
+        # Process each stock independently
+        summary = {'success': 0, 'failed': 0, 'errors': [], 'skipped': [], 'timings': {}}
+        started = time.perf_counter()
+        for stock_code in stocks_to_process:
+            if process_stock(stock_code, conn):
+                summary['success'] += 1
+            else:
+                summary['failed'] += 1
+                summary['errors'].append(stock_code)
+        summary['timings']['total'] = time.perf_counter() - started
+
+        conn.close()
+    else:
+        try:
+            summary = run_pipeline(stocks_to_process, max_workers=args.workers, force=args.force)
+        except Exception as e:
+            print(f'\n[PIPELINE ERROR] {e}')
+            return
 
     # Summary
     print('\n' + '=' * 60)
     print('  SUMMARY')
     print('=' * 60)
-    print(f'  Success: {success}')
-    print(f'  Failed:  {failed}')
-    if errors:
-        print(f'  Errors:  {", ".join(errors)}')
+    print(f'  Success: {summary["success"]}')
+    print(f'  Failed:  {summary["failed"]}')
+    if summary['skipped']:
+        print(f'  Skipped: {len(summary["skipped"])} (data tidak berubah)')
+    if summary['errors']:
+        print(f'  Errors:  {", ".join(summary["errors"])}')
+    if summary['timings']:
+        print('  Timings: ' + ' | '.join(f'{stage} {secs:.2f}s' for stage, secs in summary['timings'].items()))
     print('=' * 60)
 
 
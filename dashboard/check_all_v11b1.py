@@ -15,30 +15,46 @@ print('=' * 80)
 stocks = sorted(STOCK_ZONES.keys())
 issues = []
 
+# Get precomputed data - satu query untuk semua emiten (+ trade OPEN dari v11b1_trades)
+try:
+    rows = execute_query('''
+        SELECT r.stock_code, r.calc_date, r.status, r.action, r.confirm_type, r.current_price,
+               r.support_zone_low, r.support_zone_high, r.support_zone_num,
+               r.has_open_position, r.vol_ratio,
+               t.trade_type AS open_trade_type, t.entry_conditions AS open_entry_conditions,
+               t.vol_ratio AS open_vol_ratio, t.trade_no AS open_trade_no
+        FROM v11b1_results_latest r
+        -- Satu baris per emiten: trade OPEN pertama (sama dengan loop trade_history lama)
+        LEFT JOIN LATERAL (
+            SELECT trade_type, entry_conditions, vol_ratio, trade_no
+            FROM v11b1_trades
+            WHERE stock_code = r.stock_code AND calc_date = r.calc_date
+              AND exit_reason = 'OPEN'
+            ORDER BY trade_no
+            LIMIT 1
+        ) t ON TRUE
+        WHERE r.stock_code = ANY(%s)
+    ''', (stocks,), use_cache=False)
+    latest = {row['stock_code']: row for row in rows}
+    query_error = None
+except Exception as e:
+    latest = {}
+    query_error = e
+
 for stock in stocks:
     print(f'\n--- {stock} ---')
 
-    # Get precomputed data
-    try:
-        result = execute_query(f'''
-            SELECT calc_date, status, action, confirm_type, current_price,
-                   support_zone_low, support_zone_high, support_zone_num,
-                   has_open_position, vol_ratio, trade_history
-            FROM v11b1_results_{stock.lower()}
-            ORDER BY calc_date DESC
-            LIMIT 1
-        ''')
-    except Exception as e:
-        print(f'  ERROR: Could not query table - {e}')
+    if query_error is not None:
+        print(f'  ERROR: Could not query table - {query_error}')
         issues.append(f'{stock}: Table query error')
         continue
 
-    if not result:
+    if stock not in latest:
         print(f'  WARNING: No data in table')
         issues.append(f'{stock}: No data')
         continue
 
-    r = dict(result[0])
+    r = dict(latest[stock])
     price = float(r.get('current_price') or 0)
     s_low = float(r.get('support_zone_low') or 0)
     s_high = float(r.get('support_zone_high') or 0)
@@ -69,12 +85,13 @@ for stock in stocks:
     # Check open position
     if has_pos:
         print(f'  ** HAS OPEN POSITION **')
-        trade_history = r.get('trade_history', [])
         open_trade = None
-        for t in (trade_history or []):
-            if t.get('exit_reason') == 'OPEN':
-                open_trade = t
-                break
+        if r.get('open_trade_no') is not None:
+            open_trade = {
+                'type': r.get('open_trade_type'),
+                'entry_conditions': r.get('open_entry_conditions'),
+                'vol_ratio': float(r.get('open_vol_ratio') or 0),
+            }
 
         if open_trade:
             trade_type = open_trade.get('type', 'UNKNOWN')
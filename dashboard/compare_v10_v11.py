@@ -9,8 +9,8 @@ try:
 except (AttributeError, OSError):
     pass
 
-from backtest_v10_universal import run_backtest as run_v10, STOCK_ZONES
-from backtest_v11_universal import run_backtest as run_v11, V11_PARAMS
+from backtest_v10_universal import STOCK_ZONES
+from backtest_runner import run_backtests, make_tasks
 
 
 def compare_formulas():
@@ -24,14 +24,12 @@ def compare_formulas():
     v10_results = []
     v11_results = []
 
-    for stock_code in sorted(STOCK_ZONES.keys()):
-        v10 = run_v10(stock_code)
-        v11 = run_v11(stock_code)
-
-        if v10:
-            v10_results.append(v10)
-        if v11:
-            v11_results.append(v11)
+    # V10 & V11 untuk semua saham dijalankan paralel
+    stocks = sorted(STOCK_ZONES.keys())
+    tasks = make_tasks(stocks, 'V10') + make_tasks(stocks, 'V11')
+    for task, result in run_backtests(tasks):
+        if result:
+            (v10_results if task['formula'] == 'V10' else v11_results).append(result)
 
     # Per-stock comparison
     print("\n" + "=" * 100)
@@ -9,8 +9,9 @@ try:
 except:
     pass
 
-from backtest_v10_universal import run_backtest as run_v10, STOCK_ZONES
-from backtest_v11_universal import run_backtest as run_v11, V11_PARAMS
+from backtest_v10_universal import STOCK_ZONES
+from backtest_v11_universal import V11_PARAMS
+from backtest_runner import run_backtests, make_tasks
 
 
 def compare():
@@ -25,13 +26,12 @@ def compare():
     v10_results = []
     v11b_results = []
 
-    for stock_code in sorted(STOCK_ZONES.keys()):
-        v10 = run_v10(stock_code)
-        v11b = run_v11(stock_code, v11_params=v11b_params)
-        if v10:
-            v10_results.append(v10)
-        if v11b:
-            v11b_results.append(v11b)
+    # V10 & V11b untuk semua saham dijalankan paralel
+    stocks = sorted(STOCK_ZONES.keys())
+    tasks = make_tasks(stocks, 'V10') + make_tasks(stocks, 'V11', v11b_params, label='V11b')
+    for task, result in run_backtests(tasks):
+        if result:
+            (v10_results if task['label'] == 'V10' else v11b_results).append(result)
 
     # Collect all trades for detailed comparison
     all_v10_trades = []
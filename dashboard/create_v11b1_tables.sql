@@ -1,115 +1,218 @@
 -- ============================================================
 -- V11B1 PRE-COMPUTED RESULTS TABLES
--- Setiap emiten punya tabel sendiri untuk isolasi error
+-- Satu tabel v11b1_results (LIST partition per emiten) + view latest
+-- + tabel trade ter-normalisasi v11b1_trades
 -- ============================================================
-
--- Template untuk membuat tabel per emiten
--- Jalankan untuk setiap emiten: CUAN, MBMA, MDKA, etc.
-
--- Function untuk create table per stock
-CREATE OR REPLACE FUNCTION create_v11b1_table(stock_code TEXT)
+--
+-- Sebelumnya setiap emiten punya tabel v11b1_results_<code> sendiri, sehingga
+-- landing page menjalankan satu query per emiten dan mem-parse trade_history
+-- JSONB di Python. Dengan satu tabel induk:
+-- - partisi per emiten tetap mengisolasi data (DELETE/VACUUM per emiten)
+-- - v11b1_results_latest = baris terakhir (tanpa error) per emiten
+-- - statistik 2026 & posisi running cukup satu query agregat atas v11b1_trades
+
+-- Tabel induk (partisi per stock_code)
+CREATE TABLE IF NOT EXISTS v11b1_results (
+    stock_code VARCHAR(10) NOT NULL,
+    calc_date DATE NOT NULL,
+    calc_timestamp TIMESTAMP DEFAULT NOW(),
+
+    -- Current Price Info
+    current_price DECIMAL(12,2),
+    price_change_pct DECIMAL(8,2),
+
+    -- Status V11b1
+    status VARCHAR(50),              -- BREAKOUT, RETEST, WATCH, NEUTRAL, RUNNING, AVOID
+    action VARCHAR(50),              -- ENTRY, WAIT_PULLBACK, WATCH, EXIT, HOLD
+    action_reason TEXT,
+
+    -- Active Zones
+    support_zone_num INTEGER,
+    support_zone_low DECIMAL(12,2),
+    support_zone_high DECIMAL(12,2),
+    resistance_zone_num INTEGER,
+    resistance_zone_low DECIMAL(12,2),
+    resistance_zone_high DECIMAL(12,2),
+
+    -- Breakout/Retest Tracking
+    confirm_type VARCHAR(50),        -- BREAKOUT_OK, BREAKOUT (x/3), RETEST_OK, etc.
+    days_above_zone INTEGER DEFAULT 0,
+    came_from_below BOOLEAN DEFAULT FALSE,
+
+    -- Volume Info
+    vol_ratio DECIMAL(8,2),
+    vol_status VARCHAR(20),          -- OK, LOW, HIGH
+
+    -- Position Info (if RUNNING)
+    has_open_position BOOLEAN DEFAULT FALSE,
+    position_entry_date DATE,
+    position_entry_price DECIMAL(12,2),
+    position_current_pnl DECIMAL(8,2),
+    position_sl DECIMAL(12,2),
+    position_tp DECIMAL(12,2),
+
+    -- Trade History (JSON array lengkap untuk tampilan detail; agregat pakai v11b1_trades)
+    trade_history JSONB,
+    total_trades INTEGER DEFAULT 0,
+    wins INTEGER DEFAULT 0,
+    losses INTEGER DEFAULT 0,
+    win_rate DECIMAL(5,2),
+    total_pnl DECIMAL(8,2),
+
+    -- Checklist Items (JSON)
+    checklist JSONB,
+
+    -- Pullback Calculation (if WAIT_PULLBACK)
+    pullback_entry_price DECIMAL(12,2),
+    pullback_sl DECIMAL(12,2),
+    pullback_tp DECIMAL(12,2),
+    pullback_rr_ratio DECIMAL(5,2),
+
+    -- Error Handling
+    has_error BOOLEAN DEFAULT FALSE,
+    error_message TEXT,
+
+    -- Metadata
+    formula_version VARCHAR(20) DEFAULT 'V11b1',
+    data_watermark VARCHAR(100),     -- watermark data saat dihitung (skip recompute jika sama)
+    created_at TIMESTAMP DEFAULT NOW(),
+
+    PRIMARY KEY (stock_code, calc_date)
+) PARTITION BY LIST (stock_code);
+
+-- Trade per hasil kalkulasi (satu baris per trade di trade_history)
+CREATE TABLE IF NOT EXISTS v11b1_trades (
+    stock_code VARCHAR(10) NOT NULL,
+    calc_date DATE NOT NULL,
+    trade_no INTEGER NOT NULL,
+    trade_type VARCHAR(20),          -- BREAKOUT, RETEST
+    zone_num INTEGER,
+    entry_date DATE,
+    entry_price DECIMAL(12,2),
+    exit_date DATE,
+    exit_price DECIMAL(12,2),
+    exit_reason VARCHAR(20),         -- TP Hit, SL Hit, Max Hold, OPEN
+    pnl DECIMAL(8,2),
+    sl DECIMAL(12,2),
+    tp DECIMAL(12,2),
+    vol_ratio DECIMAL(8,2),
+    entry_conditions JSONB,
+    PRIMARY KEY (stock_code, calc_date, trade_no)
+);
+
+CREATE INDEX IF NOT EXISTS idx_v11b1_trades_entry
+ON v11b1_trades(entry_date, exit_reason);
+
+-- Baris terakhir (tanpa error) per emiten
+CREATE OR REPLACE VIEW v11b1_results_latest AS
+SELECT DISTINCT ON (stock_code) *
+FROM v11b1_results
+WHERE has_error = FALSE
+ORDER BY stock_code, calc_date DESC;
+
+-- Function untuk create partisi per stock
+-- (nama partisi v11b1_results_p_<code> agar tidak bentrok dengan tabel lama)
+CREATE OR REPLACE FUNCTION create_v11b1_partition(stock_code TEXT)
 RETURNS VOID AS $$
 BEGIN
     EXECUTE format('
-        CREATE TABLE IF NOT EXISTS v11b1_results_%s (
-            id SERIAL PRIMARY KEY,
-            calc_date DATE NOT NULL,
-            calc_timestamp TIMESTAMP DEFAULT NOW(),
-
-            -- Current Price Info
-            current_price DECIMAL(12,2),
-            price_change_pct DECIMAL(8,2),
-
-            -- Status V11b1
-            status VARCHAR(50),              -- BREAKOUT, RETEST, WATCH, NEUTRAL, RUNNING, AVOID
-            action VARCHAR(50),              -- ENTRY, WAIT_PULLBACK, WATCH, EXIT, HOLD
-            action_reason TEXT,
-
-            -- Active Zones
-            support_zone_num INTEGER,
-            support_zone_low DECIMAL(12,2),
-            support_zone_high DECIMAL(12,2),
-            resistance_zone_num INTEGER,
-            resistance_zone_low DECIMAL(12,2),
-            resistance_zone_high DECIMAL(12,2),
-
-            -- Breakout/Retest Tracking
-            confirm_type VARCHAR(50),        -- BREAKOUT_OK, BREAKOUT (x/3), RETEST_OK, etc.
-            days_above_zone INTEGER DEFAULT 0,
-            came_from_below BOOLEAN DEFAULT FALSE,
-
-            -- Volume Info
-            vol_ratio DECIMAL(8,2),
-            vol_status VARCHAR(20),          -- OK, LOW, HIGH
-
-            -- Position Info (if RUNNING)
-            has_open_position BOOLEAN DEFAULT FALSE,
-            position_entry_date DATE,
-            position_entry_price DECIMAL(12,2),
-            position_current_pnl DECIMAL(8,2),
-            position_sl DECIMAL(12,2),
-            position_tp DECIMAL(12,2),
-
-            -- Trade History (JSON array)
-            trade_history JSONB,
-            total_trades INTEGER DEFAULT 0,
-            wins INTEGER DEFAULT 0,
-            losses INTEGER DEFAULT 0,
-            win_rate DECIMAL(5,2),
-            total_pnl DECIMAL(8,2),
-
-            -- Checklist Items (JSON)
-            checklist JSONB,
-
-            -- Pullback Calculation (if WAIT_PULLBACK)
-            pullback_entry_price DECIMAL(12,2),
-            pullback_sl DECIMAL(12,2),
-            pullback_tp DECIMAL(12,2),
-            pullback_rr_ratio DECIMAL(5,2),
-
-            -- Error Handling
-            has_error BOOLEAN DEFAULT FALSE,
-            error_message TEXT,
-
-            -- Metadata
-            formula_version VARCHAR(20) DEFAULT ''V11b1'',
-            created_at TIMESTAMP DEFAULT NOW(),
-
-            UNIQUE(calc_date)
-        )', lower(stock_code));
-
-    -- Create index for faster lookups
-    EXECUTE format('
-        CREATE INDEX IF NOT EXISTS idx_v11b1_%s_date
-        ON v11b1_results_%s(calc_date DESC)', lower(stock_code), lower(stock_code));
-
+        CREATE TABLE IF NOT EXISTS %I PARTITION OF v11b1_results
+        FOR VALUES IN (%L)',
+        'v11b1_results_p_' || lower(stock_code), upper(stock_code));
 END;
 $$ LANGUAGE plpgsql;
 
--- Create tables for all V11b1 stocks
-SELECT create_v11b1_table('ADMR');
-SELECT create_v11b1_table('BBCA');
-SELECT create_v11b1_table('BMRI');
-SELECT create_v11b1_table('BREN');
-SELECT create_v11b1_table('BRPT');
-SELECT create_v11b1_table('CBDK');
-SELECT create_v11b1_table('CBRE');
-SELECT create_v11b1_table('CDIA');
-SELECT create_v11b1_table('CUAN');
-SELECT create_v11b1_table('DSNG');
-SELECT create_v11b1_table('FUTR');
-SELECT create_v11b1_table('HRUM');
-SELECT create_v11b1_table('MBMA');
-SELECT create_v11b1_table('MDKA');
-SELECT create_v11b1_table('NCKL');
-SELECT create_v11b1_table('PANI');
-SELECT create_v11b1_table('PTRO');
-SELECT create_v11b1_table('RATU');
-SELECT create_v11b1_table('TINS');
-SELECT create_v11b1_table('WIFI');
-
--- Verify tables created
-SELECT table_name
-FROM information_schema.tables
-WHERE table_name LIKE 'v11b1_results_%'
-ORDER BY table_name;
+-- Create partisi untuk semua V11b1 stocks
+SELECT create_v11b1_partition('ADMR');
+SELECT create_v11b1_partition('BBCA');
+SELECT create_v11b1_partition('BMRI');
+SELECT create_v11b1_partition('BREN');
+SELECT create_v11b1_partition('BRPT');
+SELECT create_v11b1_partition('CBDK');
+SELECT create_v11b1_partition('CBRE');
+SELECT create_v11b1_partition('CDIA');
+SELECT create_v11b1_partition('CUAN');
+SELECT create_v11b1_partition('DSNG');
+SELECT create_v11b1_partition('FUTR');
+SELECT create_v11b1_partition('HRUM');
+SELECT create_v11b1_partition('MBMA');
+SELECT create_v11b1_partition('MDKA');
+SELECT create_v11b1_partition('NCKL');
+SELECT create_v11b1_partition('PANI');
+SELECT create_v11b1_partition('PTRO');
+SELECT create_v11b1_partition('RATU');
+SELECT create_v11b1_partition('TINS');
+SELECT create_v11b1_partition('WIFI');
+
+-- ============================================================
+-- MIGRASI dari tabel lama v11b1_results_<code>
+-- Salin baris terakhir tiap emiten + pecah trade_history ke v11b1_trades.
+-- Tabel lama tidak dihapus; DROP manual setelah diverifikasi.
+-- ============================================================
+DO $$
+DECLARE
+    legacy RECORD;
+    code TEXT;
+BEGIN
+    FOR legacy IN
+        SELECT table_name FROM information_schema.tables
+        WHERE table_name ~ '^v11b1_results_[a-z0-9]+$'
+          AND table_name <> 'v11b1_results_latest'
+    LOOP
+        code := upper(substring(legacy.table_name FROM 15));
+        PERFORM create_v11b1_partition(code);
+
+        EXECUTE format('
+            INSERT INTO v11b1_results (
+                stock_code, calc_date, calc_timestamp, current_price, price_change_pct,
+                status, action, action_reason,
+                support_zone_num, support_zone_low, support_zone_high,
+                resistance_zone_num, resistance_zone_low, resistance_zone_high,
+                confirm_type, days_above_zone, came_from_below, vol_ratio, vol_status,
+                has_open_position, position_entry_date, position_entry_price,
+                position_current_pnl, position_sl, position_tp,
+                trade_history, total_trades, wins, losses, win_rate, total_pnl, checklist,
+                pullback_entry_price, pullback_sl, pullback_tp, pullback_rr_ratio,
+                has_error, error_message, formula_version, created_at
+            )
+            SELECT %L, calc_date, calc_timestamp, current_price, price_change_pct,
+                status, action, action_reason,
+                support_zone_num, support_zone_low, support_zone_high,
+                resistance_zone_num, resistance_zone_low, resistance_zone_high,
+                confirm_type, days_above_zone, came_from_below, vol_ratio, vol_status,
+                has_open_position, position_entry_date, position_entry_price,
+                position_current_pnl, position_sl, position_tp,
+                trade_history, total_trades, wins, losses, win_rate, total_pnl, checklist,
+                pullback_entry_price, pullback_sl, pullback_tp, pullback_rr_ratio,
+                has_error, error_message, formula_version, created_at
+            FROM %I
+            ORDER BY calc_date DESC
+            LIMIT 1
+            ON CONFLICT (stock_code, calc_date) DO NOTHING',
+            code, legacy.table_name);
+    END LOOP;
+
+    INSERT INTO v11b1_trades (
+        stock_code, calc_date, trade_no, trade_type, zone_num,
+        entry_date, entry_price, exit_date, exit_price, exit_reason,
+        pnl, sl, tp, vol_ratio, entry_conditions
+    )
+    SELECT r.stock_code, r.calc_date, t.ord::int,
+           t.trade->>'type', (t.trade->>'zone_num')::int,
+           NULLIF(t.trade->>'entry_date', '')::date, (t.trade->>'entry_price')::numeric,
+           NULLIF(t.trade->>'exit_date', '')::date, (t.trade->>'exit_price')::numeric,
+           t.trade->>'exit_reason',
+           (t.trade->>'pnl')::numeric, (t.trade->>'sl')::numeric, (t.trade->>'tp')::numeric,
+           (t.trade->>'vol_ratio')::numeric, t.trade->'entry_conditions'
+    FROM v11b1_results r
+    CROSS JOIN LATERAL jsonb_array_elements(r.trade_history) WITH ORDINALITY AS t(trade, ord)
+    WHERE jsonb_typeof(r.trade_history) = 'array'
+    ON CONFLICT (stock_code, calc_date, trade_no) DO NOTHING;
+END;
+$$;
+
+-- Verify partisi
+SELECT inhrelid::regclass AS partition_name
+FROM pg_inherits
+WHERE inhparent = 'v11b1_results'::regclass
+ORDER BY 1;
@@ -0,0 +1,188 @@
+"""
+Forum Attachments - lampiran PDF forum di tabel terpisah (content-addressed)
+
+Sebelumnya PDF disimpan di kolom forum_threads.pdf_data (bytea), sehingga
+SELECT * listing forum ikut menarik blob hingga 50 thread per render, dan
+download lewat execute_query ikut masuk QueryCache (100 entri, multi-MB).
+
+Sekarang:
+- isi file di forum_attachments, key = SHA-256 isi file (file sama = satu baris)
+- forum_threads hanya menyimpan metadata: pdf_filename, pdf_hash, pdf_size
+- download dibaca per potongan (substring bytea, STORAGE EXTERNAL sehingga
+  Postgres hanya membaca chunk TOAST yang diminta) -> streaming + HTTP Range
+- ETag = hash isi file; tidak pernah lewat query cache
+- thread & lampirannya ditulis dalam satu transaksi; forum_threads.pdf_hash
+  foreign key ke forum_attachments, sehingga hapus lampiran yang (kembali)
+  dipakai thread lain selalu gagal alih-alih meninggalkan thread tanpa file
+"""
+import hashlib
+import threading
+from typing import Dict, Iterator, Optional, Tuple
+
+from psycopg2 import errors
+from database import execute_query, get_cursor
+
+ATTACHMENT_CHUNK_SIZE = 256 * 1024
+
+ATTACHMENT_DDL = """
+    CREATE TABLE IF NOT EXISTS forum_attachments (
+        content_hash CHAR(64) PRIMARY KEY,
+        data BYTEA NOT NULL,
+        size_bytes INTEGER NOT NULL,
+        mime_type VARCHAR(100) DEFAULT 'application/pdf',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    -- PDF sudah terkompresi: simpan tanpa kompresi agar substring() tidak men-decompress seluruh file
+    ALTER TABLE forum_attachments ALTER COLUMN data SET STORAGE EXTERNAL;
+    ALTER TABLE forum_threads ADD COLUMN IF NOT EXISTS pdf_hash CHAR(64);
+    ALTER TABLE forum_threads ADD COLUMN IF NOT EXISTS pdf_size INTEGER;
+"""
+
+# Pindahkan blob lama forum_threads.pdf_data -> forum_attachments (idempotent)
+MIGRATE_SQL = """
+    INSERT INTO forum_attachments (content_hash, data, size_bytes)
+    SELECT DISTINCT ON (h) h, pdf_data, length(pdf_data)
+    FROM (
+        SELECT encode(sha256(pdf_data), 'hex') AS h, pdf_data
+        FROM forum_threads
+        WHERE pdf_data IS NOT NULL AND pdf_hash IS NULL
+    ) s
+    ON CONFLICT (content_hash) DO NOTHING;
+
+    UPDATE forum_threads
+    SET pdf_hash = encode(sha256(pdf_data), 'hex'),
+        pdf_size = length(pdf_data),
+        pdf_data = NULL
+    WHERE pdf_data IS NOT NULL AND pdf_hash IS NULL;
+"""
+
+# FK dibuat NOT VALID: baris lama tidak dicek ulang, insert/update baru tetap dicek
+FOREIGN_KEY_SQL = """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'forum_threads_pdf_hash_fkey') THEN
+            ALTER TABLE forum_threads ADD CONSTRAINT forum_threads_pdf_hash_fkey
+                FOREIGN KEY (pdf_hash) REFERENCES forum_attachments (content_hash) NOT VALID;
+        END IF;
+    END $$;
+"""
+
+# Kolom listing thread (tanpa pdf_data)
+THREAD_LIST_COLUMNS = """
+    id, stock_code, title, content, author_name, author_type,
+    is_pinned, is_frozen, is_hidden, flag, collapsed, score,
+    view_count, comment_count, created_at, updated_at,
+    pdf_filename, pdf_hash, pdf_size
+"""
+
+_table_ready = False
+_table_lock = threading.Lock()
+
+
+def ensure_attachment_table() -> bool:
+    """Create forum_attachments + kolom metadata, migrasi blob lama (sekali per process)"""
+    global _table_ready
+    if _table_ready:
+        return True
+    with _table_lock:
+        if _table_ready:
+            return True
+        try:
+            with get_cursor() as cursor:
+                cursor.execute(ATTACHMENT_DDL)
+                cursor.execute(MIGRATE_SQL)
+                cursor.execute(FOREIGN_KEY_SQL)
+            _table_ready = True
+        except Exception as e:
+            print(f"Error preparing forum_attachments table: {e}")
+    return _table_ready
+
+
+def store_attachment(data: bytes, mime_type: str = 'application/pdf', cursor=None) -> Tuple[str, int]:
+    """
+    Simpan isi file (dedup berdasarkan hash).
+
+    Args:
+        cursor: Cursor transaksi insert thread (disarankan) - baris lampiran
+                terkunci sampai commit, sehingga delete_thread_attachment paralel
+                untuk hash yang sama menunggu lalu gagal karena FK.
+                Default: transaksi sendiri.
+
+    Returns:
+        (content_hash, size_bytes)
+    """
+    ensure_attachment_table()
+    content_hash = hashlib.sha256(data).hexdigest()
+    # DO UPDATE (bukan DO NOTHING) agar baris yang sudah ada ikut dikunci transaksi ini
+    query = """
+        INSERT INTO forum_attachments (content_hash, data, size_bytes, mime_type)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (content_hash) DO UPDATE SET size_bytes = EXCLUDED.size_bytes
+    """
+    params = (content_hash, data, len(data), mime_type)
+    if cursor is not None:
+        cursor.execute(query, params)
+    else:
+        execute_query(query, params, fetch=False, use_cache=False)
+    return content_hash, len(data)
+
+
+def get_thread_attachment(thread_id: int) -> Optional[Dict]:
+    """Metadata lampiran thread: content_hash, filename, size_bytes, mime_type (None jika tidak ada)"""
+    ensure_attachment_table()
+    rows = execute_query("""
+        SELECT a.content_hash, t.pdf_filename AS filename, a.size_bytes, a.mime_type
+        FROM forum_threads t
+        JOIN forum_attachments a ON a.content_hash = t.pdf_hash
+        WHERE t.id = %s
+    """, (thread_id,), use_cache=False)
+    return rows[0] if rows else None
+
+
+def iter_attachment(content_hash: str, start: int, stop: int,
+                    chunk_size: int = ATTACHMENT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Baca byte [start, stop) per potongan chunk_size (tanpa memuat seluruh file).
+    Koneksi pool dipinjam per potongan, tidak selama klien mengunduh.
+    """
+    pos = start
+    while pos < stop:
+        length = min(chunk_size, stop - pos)
+        with get_cursor() as cursor:
+            # substring bytea 1-based
+            cursor.execute(
+                "SELECT substring(data FROM %s FOR %s) AS chunk FROM forum_attachments WHERE content_hash = %s",
+                (pos + 1, length, content_hash)
+            )
+            row = cursor.fetchone()
+        if not row or row['chunk'] is None:
+            return
+        chunk = bytes(row['chunk'])
+        if not chunk:
+            return
+        yield chunk
+        pos += len(chunk)
+
+
+def delete_thread_attachment(content_hash: Optional[str]) -> bool:
+    """
+    Hapus lampiran thread yang baru dihapus jika tidak dipakai thread lain.
+    Hanya hash ini yang disentuh (bukan sapu semua orphan), dan thread baru
+    yang sedang memakai hash yang sama membuat delete gagal lewat FK.
+
+    Returns:
+        True jika lampiran dihapus
+    """
+    if not content_hash:
+        return False
+    try:
+        with get_cursor() as cursor:
+            cursor.execute("""
+                DELETE FROM forum_attachments a
+                WHERE a.content_hash = %s
+                  AND NOT EXISTS (SELECT 1 FROM forum_threads t WHERE t.pdf_hash = a.content_hash)
+            """, (content_hash,))
+            return cursor.rowcount > 0
+    except errors.ForeignKeyViolation:
+        # Dipakai thread yang di-commit bersamaan - lampiran tetap disimpan
+        return False
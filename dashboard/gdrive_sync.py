@@ -14,7 +14,7 @@ import io
 import json
 import tempfile
 from datetime import datetime
-from typing import List, Dict, Tuple, Optional
+from typing import Callable, List, Dict, Tuple, Optional
 
 # Add app directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
@@ -36,6 +36,7 @@ try:
         read_fundamental_data, import_fundamental_data,
         read_ipo_position_data, import_ipo_position
     )
+    from data_version import bump_data_version
     PARSER_AVAILABLE = True
 except ImportError as e:
     PARSER_AVAILABLE = False
@@ -211,7 +212,9 @@ def get_stock_code_from_filename(filename: str) -> Optional[str]:
 def sync_stock_data(
     stocks: List[str] = None,
     data_types: List[str] = None,
-    folder_id: str = GDRIVE_FOLDER_ID
+    folder_id: str = GDRIVE_FOLDER_ID,
+    import_mode: str = 'diff',
+    progress_callback: Callable[[int, int, str], None] = None
 ) -> GDriveSyncResult:
     """
     Sync data from Google Drive for specified stocks
@@ -220,9 +223,13 @@ def sync_stock_data(
         stocks: List of stock codes to sync, or None for all
         data_types: List of data types ('price', 'broker', 'fundamental'), or None for all
         folder_id: Google Drive folder ID
+        import_mode: 'diff' (hanya tanggal baru / berubah) atau 'replace' (hapus lalu insert ulang)
+        progress_callback: fungsi(done, total, message) dipanggil per emiten (progress bar UI)
 
     Returns:
-        GDriveSyncResult object with sync status and logs
+        GDriveSyncResult object with sync status and logs.
+        Warm-up result.stocks_processed dilakukan caller di web process
+        (sync berjalan di process background job).
     """
     result = GDriveSyncResult()
 
@@ -279,7 +286,9 @@ def sync_stock_data(
         result.add_log(f"Using temp directory: {temp_dir}")
 
         # Process each stock
-        for stock in stocks:
+        for i, stock in enumerate(stocks):
+            if progress_callback:
+                progress_callback(i, len(stocks), f"{stock}: Processing...")
             if stock not in stock_files:
                 result.add_log(f"{stock}: No files found in Google Drive", 'warning')
                 continue
@@ -314,14 +323,14 @@ def sync_stock_data(
                             broker_df, price_df = read_excel_data(file_path)
 
                             if 'price' in data_types and len(price_df) > 0:
-                                count = import_price_data(price_df, stock)
+                                count = import_price_data(price_df, stock, import_mode)
                                 result.stats['price_records'] += count
-                                result.add_log(f"{stock}: Imported {count} price records")
+                                result.add_log(f"{stock}: Imported {count} price records ({import_mode})")
 
                             if 'broker' in data_types and len(broker_df) > 0:
-                                count = import_broker_data(broker_df, stock)
+                                count = import_broker_data(broker_df, stock, import_mode)
                                 result.stats['broker_records'] += count
-                                result.add_log(f"{stock}: Imported {count} broker records")
+                                result.add_log(f"{stock}: Imported {count} broker records ({import_mode})")
 
                             # Try IPO position (optional, don't fail if error)
                             try:
@@ -344,11 +353,15 @@ def sync_stock_data(
                                 result.add_log(f"{stock}: Profile skipped ({str(e)[:50]})", 'warning')
 
                 result.stocks_processed.append(stock)
+                bump_data_version(stock, source='gdrive_sync')
                 result.add_log(f"{stock}: Completed successfully", 'success')
 
             except Exception as e:
                 result.add_error(stock, str(e))
 
+    if progress_callback:
+        progress_callback(len(stocks), len(stocks), f"{len(result.stocks_processed)}/{len(stocks)} emiten diproses")
+
     # Summary
     result.success = len(result.stocks_processed) > 0
     result.add_log(f"Sync completed: {len(result.stocks_processed)}/{len(stocks)} stocks processed")
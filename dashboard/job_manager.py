@@ -0,0 +1,302 @@
+"""
+Background Job Manager - operasi admin berat di luar thread request gunicorn
+
+Import Excel, sync Google Drive dan recalc V11b1 bisa berjalan beberapa menit.
+Dengan gunicorn --workers 1 --threads 4 --timeout 120, callback biasa menahan
+satu thread selama itu (kena timeout, trafik user tersendat). Modul ini:
+- menjalankan callback admin sebagai Dash background callback (DiskcacheManager:
+  tiap job di process terpisah, status & progress di diskcache lokal)
+- progress streaming lewat report(done, total, message) -> komponen progress bar
+- cancellation lewat tombol Batal (Dash menghentikan process job). Job memakai
+  koneksi DB sendiri (pool warisan web process di-reset saat job mulai), sehingga
+  saat process mati socket-nya tertutup dan Postgres me-rollback transaksi yang
+  belum commit. Yang sudah di-commit (mis. recalc per emiten) tetap tersimpan.
+- antrian job terbatas: MAX_RUNNING_JOBS berjalan, MAX_QUEUED_JOBS menunggu,
+  sisanya ditolak; job yang sama tidak bisa berjalan dua kali bersamaan
+- efek yang harus terjadi di web process (invalidate cache + warm-up setelah
+  import, reload snapshot V11b1) dicatat job lewat report.after_job(...) dan
+  dijalankan callback biasa di web process (register_job_effects). Thread /
+  cache yang dibuat di process job ikut hilang saat job selesai.
+
+Tanpa diskcache (dash[diskcache] belum terpasang) callback berjalan sinkron
+seperti sebelumnya, antrian memakai lock in-process.
+"""
+import os
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Optional
+
+import dash
+from dash import dcc, html, Input, Output
+import dash_bootstrap_components as dbc
+
+try:
+    import diskcache
+    from dash import DiskcacheManager
+    BACKGROUND_AVAILABLE = True
+except ImportError:
+    diskcache = None
+    DiskcacheManager = None
+    BACKGROUND_AVAILABLE = False
+
+# Job berat yang boleh berjalan bersamaan (1 worker gunicorn -> 1 job CPU/IO berat)
+MAX_RUNNING_JOBS = int(os.environ.get('ADMIN_MAX_RUNNING_JOBS', 1))
+# Job yang boleh menunggu giliran; job berikutnya ditolak
+MAX_QUEUED_JOBS = int(os.environ.get('ADMIN_MAX_QUEUED_JOBS', 3))
+# Batas umur slot; slot process yang sudah mati diambil alih lebih awal (lihat _claim)
+JOB_MAX_SECONDS = 1800
+JOB_POLL_SECONDS = 2
+
+# Store output job -> callback efek di web process
+JOB_EFFECTS_STORE = 'job-effects-store'
+JOB_EFFECTS_APPLIED = 'job-effects-applied'
+
+JOB_CACHE_DIR = os.environ.get('JOB_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'stock-analysis-jobs'))
+
+
+class JobRejected(Exception):
+    """Job ditolak: job yang sama sedang berjalan atau antrian penuh"""
+
+
+class _LocalStore:
+    """Pengganti diskcache.Cache (add/get/delete/transact) untuk mode sinkron in-process"""
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._data = {}
+
+    def add(self, key, value, expire=None):
+        with self._lock:
+            if key in self._data:
+                return False
+            self._data[key] = value
+            return True
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._data.get(key, default)
+
+    def delete(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def transact(self):
+        return self._lock
+
+
+if BACKGROUND_AVAILABLE:
+    _store = diskcache.Cache(JOB_CACHE_DIR)
+    background_callback_manager = DiskcacheManager(_store)
+else:
+    _store = _LocalStore()
+    background_callback_manager = None
+
+
+# ============================================================
+# ANTRIAN JOB
+# ============================================================
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _claim(key: str, job_name: str) -> bool:
+    """
+    Klaim slot secara atomik (lintas process lewat diskcache).
+    Slot milik process yang sudah mati (job di-cancel / crash) diambil alih.
+    """
+    with _store.transact():
+        if _store.add(key, (job_name, os.getpid()), expire=JOB_MAX_SECONDS):
+            return True
+        holder = _store.get(key)
+        if holder and not _pid_alive(holder[1]):
+            _store.delete(key)
+            return _store.add(key, (job_name, os.getpid()), expire=JOB_MAX_SECONDS)
+    return False
+
+
+def _acquire(prefix: str, slots: int, job_name: str) -> Optional[str]:
+    """Ambil satu slot bebas prefix-0..slots-1"""
+    for i in range(slots):
+        key = f"{prefix}-{i}"
+        if _claim(key, job_name):
+            return key
+    return None
+
+
+@contextmanager
+def job_slot(job_name: str, on_wait: Callable[[str], None] = None):
+    """
+    Tunggu giliran menjalankan job berat.
+
+    Raises:
+        JobRejected: job_name sedang berjalan / antrian penuh
+    """
+    name_key = f"job-name-{job_name}"
+    if not _claim(name_key, job_name):
+        raise JobRejected(f"{job_name} masih berjalan, tunggu sampai selesai")
+    try:
+        wait_key = _acquire('job-wait', MAX_QUEUED_JOBS, job_name)
+        if wait_key is None:
+            raise JobRejected("Antrian job penuh, coba lagi beberapa saat lagi")
+        try:
+            while True:
+                run_key = _acquire('job-run', MAX_RUNNING_JOBS, job_name)
+                if run_key:
+                    break
+                if on_wait:
+                    on_wait("Menunggu job lain selesai...")
+                time.sleep(JOB_POLL_SECONDS)
+        finally:
+            _store.delete(wait_key)
+        try:
+            yield
+        finally:
+            _store.delete(run_key)
+    finally:
+        _store.delete(name_key)
+
+
+# ============================================================
+# PROGRESS & CALLBACK
+# ============================================================
+
+class JobReport:
+    """
+    Argumen report job: report(done, total, message) untuk progress, dan
+    after_job(...) untuk efek yang dijalankan di web process setelah job selesai.
+    """
+    def __init__(self, set_progress=None):
+        self._set_progress = set_progress
+        self.effects = {}
+
+    def __call__(self, done, total, message=''):
+        if self._set_progress is not None:
+            self._set_progress(render_progress(done, total, message))
+
+    def after_job(self, stocks=(), warm=None, v11b1_snapshot=False):
+        """
+        Args:
+            stocks: Saham yang datanya berubah (cache web process di-invalidate)
+            warm: Urutan saham untuk warm-up (default: stocks)
+            v11b1_snapshot: Reload snapshot V11b1 (hasil precomputed berubah)
+        """
+        if stocks:
+            self.effects.setdefault('stocks', []).extend(stocks)
+        if warm:
+            self.effects.setdefault('warm', []).extend(warm)
+        if v11b1_snapshot:
+            self.effects['v11b1_snapshot'] = True
+
+
+def job_effects_components():
+    """Store efek job - taruh di layout root (selalu ada di semua halaman)"""
+    return [dcc.Store(id=JOB_EFFECTS_STORE), dcc.Store(id=JOB_EFFECTS_APPLIED)]
+
+
+def register_job_effects(handler: Callable[[dict], None]):
+    """Jalankan handler(effects) di web process setiap kali job mengirim efek"""
+    @dash.callback(
+        Output(JOB_EFFECTS_APPLIED, 'data'),
+        Input(JOB_EFFECTS_STORE, 'data'),
+        prevent_initial_call=True
+    )
+    def apply_job_effects(effects):
+        if not effects:
+            raise dash.exceptions.PreventUpdate
+        handler(effects)
+        return effects.get('finished')
+
+
+def render_progress(done: int, total: int, message: str = ''):
+    """Komponen progress bar untuk output progress background callback"""
+    pct = int(done / total * 100) if total else 0
+    return html.Div([
+        dbc.Progress(value=pct, label=f"{pct}%", striped=True, animated=done < total,
+                     className="mb-1", style={"height": "18px"}),
+        html.Small(message, className="text-muted"),
+    ], className="mt-2")
+
+
+def cancel_button(component_id: str):
+    """Tombol Batal job (tersembunyi, ditampilkan selama job berjalan)"""
+    return dbc.Button([html.I(className="fas fa-stop me-2"), "Batal"], id=component_id,
+                      color="danger", size="sm", outline=True, className="mt-2 me-2",
+                      style={'display': 'none'})
+
+
+def running_outputs(start_id: str, start_prop: str = 'disabled', cancel_id: str = None):
+    """
+    Nilai running standar: tombol/komponen start dinonaktifkan,
+    tombol batal ditampilkan selama job berjalan
+    """
+    running = [(Output(start_id, start_prop), True, False)]
+    if cancel_id:
+        running.append((Output(cancel_id, 'style'), {'display': 'inline-block'}, {'display': 'none'}))
+    return running
+
+
+def background_callback(*args, job_name: str, progress, cancel=None, running=None,
+                        on_rejected: Callable[[str], object], effects: bool = False, **kwargs):
+    """
+    Pengganti @app.callback untuk operasi admin berat.
+
+    Fungsi yang didekorasi menerima JobReport sebagai argumen pertama
+    (report(done, total, message) + report.after_job(...)), lalu argumen callback biasa.
+
+    Args:
+        job_name: Nama job (job yang sama tidak berjalan dua kali bersamaan)
+        progress: Output komponen progress (children diisi render_progress)
+        cancel: Input tombol batal
+        running: List (Output, nilai saat berjalan, nilai setelah selesai)
+        on_rejected: fungsi(message) -> nilai output jika job ditolak antrian
+        effects: Tambahkan output JOB_EFFECTS_STORE (efek report.after_job
+                 dijalankan di web process, lihat register_job_effects)
+    """
+    single_output = not isinstance(args[0], (list, tuple))
+    if effects:
+        outputs = [args[0]] if single_output else list(args[0])
+        outputs.append(Output(JOB_EFFECTS_STORE, 'data', allow_duplicate=True))
+        args = (outputs,) + args[1:]
+
+    def decorator(func):
+        def run(set_progress, *cb_args):
+            report = JobReport(set_progress)
+            try:
+                with job_slot(job_name, on_wait=lambda msg: report(0, 1, msg)):
+                    result = func(report, *cb_args)
+            except JobRejected as e:
+                result = on_rejected(str(e))
+            if not effects:
+                return result
+            job_effects = dict(report.effects, finished=time.time()) if report.effects else dash.no_update
+            return ([result] if single_output else list(result)) + [job_effects]
+
+        if background_callback_manager is not None:
+            @wraps(func)
+            def background_run(set_progress, *cb_args):
+                # Process job hasil fork: jangan pakai koneksi pool milik web process
+                from database import reset_connection_pool
+                reset_connection_pool()
+                return run(set_progress, *cb_args)
+
+            return dash.callback(
+                *args, background=True, manager=background_callback_manager,
+                progress=progress, cancel=cancel, running=running, **kwargs
+            )(background_run)
+
+        @wraps(func)
+        def sync_run(*cb_args):
+            return run(None, *cb_args)
+
+        return dash.callback(*args, **kwargs)(sync_run)
+
+    return decorator
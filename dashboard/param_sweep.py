@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+PARAMETER SWEEP V11b1 / V11b2
+=============================
+Grid search parameter formula V11b1 / V11b2 per saham secara batch.
+
+- OHLCV semua saham di-load SEKALI (load_ohlcv_bulk), dikirim sekali per worker
+- Per task (saham x potongan grid) harga dikonversi sekali (load_price_arrays) dan
+  indikator (ATR, volume ratio, MA, zona) di-cache antar kombinasi (bars_cache),
+  sehingga setiap kombinasi hanya menjalankan state machine
+- Task dijalankan di ProcessPoolExecutor, hasil di-ranking per saham
+  (total PnL / win rate / drawdown) lalu disimpan ke tabel param_sweep_results
+
+Usage:
+    python param_sweep.py                                  # semua saham, grid default
+    python param_sweep.py --stocks BBCA,PANI --workers 4 --top 5
+    python param_sweep.py --rank-by win_rate --no-save
+"""
+import os
+import sys
+import json
+import time
+import itertools
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    sys.stdout.reconfigure(encoding='utf-8')
+except (AttributeError, OSError):
+    pass
+
+from psycopg2.extras import execute_values
+from zones_config import STOCK_ZONES, DEFAULT_PARAMS, STOCK_FORMULA
+from backtest_runner import get_db_connection, load_ohlcv_bulk
+from backtest_v11b1_universal import run_backtest, load_price_arrays, V11B1_PARAMS, V11B2_PARAMS
+
+# Grid default (ma_short / ma_long hanya di-sweep untuk saham V11b2)
+SWEEP_GRID = {
+    'min_vol_ratio': [0.8, 1.0, 1.2, 1.5, 2.0],
+    'max_wait_days': [3, 6, 9],
+    'not_late_pct': [0.30, 0.40, 0.50],
+    'sl_pct': [0.03, 0.05, 0.07],
+    'ma_short': [20, 30, 50],
+    'ma_long': [100, 150, 200],
+}
+
+MA_KEYS = ('ma_short', 'ma_long')
+RANK_KEYS = ('total_pnl', 'win_rate', 'max_drawdown', 'avg_pnl')
+
+
+def get_base_params(stock_code, formula=None):
+    """(formula, v11b1_params dasar) sesuai assignment STOCK_FORMULA atau override formula"""
+    formula = formula or STOCK_FORMULA.get(stock_code.upper(), 'V11b1')
+    if formula == 'V11b2':
+        return formula, dict(V11B2_PARAMS)
+    return formula, {**V11B1_PARAMS, 'use_ma_filter': False}
+
+
+def expand_grid(grid, use_ma_filter):
+    """
+    Semua kombinasi grid sebagai list dict.
+    Tanpa MA filter, key MA di-drop (tidak berpengaruh ke hasil);
+    kombinasi ma_short >= ma_long di-skip.
+    """
+    keys = [k for k in grid if use_ma_filter or k not in MA_KEYS]
+    combos = []
+    for values in itertools.product(*(grid[k] for k in keys)):
+        combo = dict(zip(keys, values))
+        if combo.get('ma_short', 0) >= combo.get('ma_long', float('inf')):
+            continue
+        combos.append(combo)
+    return combos
+
+
+def split_params(combo, v11b1_base):
+    """
+    Pisah kombinasi ke (params, v11b1_params).
+
+    Key V11b1 (mis. not_late_pct, juga ada di DEFAULT_PARAMS) dibaca run_backtest
+    dari v11b1_params, jadi key yang ada di v11b1_base masuk ke sana lebih dulu;
+    key DEFAULT_PARAMS lain -> params; sisanya (ma_short/ma_long) -> v11b1_params.
+    Key yang ada di keduanya diisi di keduanya agar tidak ada nilai basi.
+    """
+    params = dict(DEFAULT_PARAMS)
+    v11b1_params = dict(v11b1_base)
+    for key, value in combo.items():
+        if key in v11b1_base or key not in DEFAULT_PARAMS:
+            v11b1_params[key] = value
+        if key in DEFAULT_PARAMS:
+            params[key] = value
+    return params, v11b1_params
+
+
+def max_drawdown(pnls):
+    """Drawdown maksimum (%) dari kurva PnL kumulatif trade tertutup"""
+    peak = equity = drawdown = 0.0
+    for pnl in pnls:
+        equity += pnl
+        peak = max(peak, equity)
+        drawdown = max(drawdown, peak - equity)
+    return drawdown
+
+
+def summarize_combo(result):
+    """Metrik ranking untuk 1 hasil run_backtest"""
+    trades = result['trades'] if result else []
+    closed = [t for t in trades if t['exit_reason'] != 'OPEN']
+    pnls = [t['pnl'] for t in closed]
+    wins = len([p for p in pnls if p > 0])
+    return {
+        'trades': len(closed),
+        'open_trades': len(trades) - len(closed),
+        'wins': wins,
+        'losses': len(closed) - wins,
+        'win_rate': wins / len(closed) * 100 if closed else 0,
+        'total_pnl': sum(pnls),
+        'avg_pnl': sum(pnls) / len(pnls) if pnls else 0,
+        'max_drawdown': max_drawdown(pnls),
+    }
+
+
+def make_sweep_tasks(stock_codes, grid=None, formula=None, start_date='2024-01-01', chunk_size=50):
+    """Task sweep: (saham x potongan kombinasi grid) agar beban terbagi rata ke worker"""
+    grid = grid or SWEEP_GRID
+    tasks = []
+    for stock_code in stock_codes:
+        stock_formula, v11b1_base = get_base_params(stock_code, formula)
+        combos = expand_grid(grid, v11b1_base.get('use_ma_filter', False))
+        for start in range(0, len(combos), chunk_size):
+            tasks.append({
+                'stock_code': stock_code,
+                'formula': stock_formula,
+                'v11b1_base': v11b1_base,
+                'combos': combos[start:start + chunk_size],
+                'start_date': start_date,
+            })
+    return tasks
+
+
+# Data OHLCV per worker process (diisi oleh initializer pool)
+_worker_data = {}
+
+
+def _init_worker(data_by_stock):
+    global _worker_data
+    _worker_data = data_by_stock
+
+
+def _run_sweep_task(task):
+    rows = _worker_data.get(task['stock_code'].upper(), [])
+    if not rows:
+        return []
+    prices = load_price_arrays(rows)
+    bars_cache = {}
+    results = []
+    for combo in task['combos']:
+        params, v11b1_params = split_params(combo, task['v11b1_base'])
+        result = run_backtest(task['stock_code'], params=params, v11b1_params=v11b1_params,
+                              start_date=task['start_date'], data=rows,
+                              prices=prices, bars_cache=bars_cache)
+        if result:
+            results.append({'params': combo, **summarize_combo(result)})
+    return results
+
+
+def rank_results(rows, rank_by='total_pnl'):
+    """Urutkan hasil kombinasi (drawdown: kecil lebih baik), tie-break win rate lalu total PnL"""
+    if rank_by not in RANK_KEYS:
+        raise ValueError(f"Unknown rank_by {rank_by}, pilih dari {list(RANK_KEYS)}")
+    sign = 1 if rank_by == 'max_drawdown' else -1
+    ranked = sorted(rows, key=lambda r: (sign * r[rank_by], -r['win_rate'], -r['total_pnl']))
+    for rank, row in enumerate(ranked, 1):
+        row['rank'] = rank
+    return ranked
+
+
+def run_sweep(stock_codes=None, grid=None, formula=None, start_date='2024-01-01',
+              rank_by='total_pnl', max_workers=None, chunk_size=50, data=None):
+    """
+    Jalankan grid search untuk banyak saham.
+
+    Args:
+        stock_codes: list saham (default: semua saham di STOCK_ZONES)
+        grid: dict param -> list nilai (default SWEEP_GRID). Key DEFAULT_PARAMS
+              (mis. sl_pct) masuk ke params, sisanya ke v11b1_params
+        formula: 'V11b1' / 'V11b2' untuk semua saham (default: sesuai STOCK_FORMULA)
+        rank_by: 'total_pnl', 'win_rate', 'max_drawdown' atau 'avg_pnl'
+        max_workers: Jumlah process (default: semua core, 1 = serial in-process)
+        data: Hasil load_ohlcv_bulk() (default: di-load otomatis)
+
+    Returns:
+        {stock_code: {'formula': ..., 'results': [hasil per kombinasi, urut ranking]}}
+    """
+    stock_codes = sorted(stock_codes or STOCK_ZONES.keys())
+    tasks = make_sweep_tasks(stock_codes, grid, formula, start_date, chunk_size)
+    if not tasks:
+        return {}
+    if data is None:
+        data = load_ohlcv_bulk(stock_codes)
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+    if max_workers <= 1:
+        _init_worker(data)
+        task_results = [_run_sweep_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(data,)) as pool:
+            task_results = list(pool.map(_run_sweep_task, tasks))
+
+    sweep = {}
+    for task, rows in zip(tasks, task_results):
+        entry = sweep.setdefault(task['stock_code'], {'formula': task['formula'], 'results': []})
+        entry['results'].extend(rows)
+    for entry in sweep.values():
+        entry['results'] = rank_results(entry['results'], rank_by)
+    return sweep
+
+
+def save_sweep_results(sweep, sweep_id=None, conn=None):
+    """Simpan hasil ranking ke tabel param_sweep_results. Returns sweep_id"""
+    sweep_id = sweep_id or datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    close_conn = False
+    if conn is None:
+        conn = get_db_connection()
+        close_conn = True
+
+    try:
+        cur = conn.cursor()
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS param_sweep_results (
+                id SERIAL PRIMARY KEY,
+                sweep_id VARCHAR(20) NOT NULL,
+                stock_code VARCHAR(10) NOT NULL,
+                formula VARCHAR(20) NOT NULL,
+                rank INTEGER NOT NULL,
+                params JSONB NOT NULL,
+                trades INTEGER,
+                wins INTEGER,
+                losses INTEGER,
+                open_trades INTEGER,
+                win_rate DECIMAL(6,2),
+                total_pnl DECIMAL(10,2),
+                avg_pnl DECIMAL(10,2),
+                max_drawdown DECIMAL(10,2),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cur.execute('''
+            CREATE INDEX IF NOT EXISTS idx_param_sweep_stock_rank
+            ON param_sweep_results (sweep_id, stock_code, rank)
+        ''')
+        rows = [
+            (sweep_id, stock_code, entry['formula'], r['rank'], json.dumps(r['params']),
+             r['trades'], r['wins'], r['losses'], r['open_trades'],
+             round(r['win_rate'], 2), round(r['total_pnl'], 2), round(r['avg_pnl'], 2),
+             round(r['max_drawdown'], 2))
+            for stock_code, entry in sweep.items()
+            for r in entry['results']
+        ]
+        execute_values(cur, '''
+            INSERT INTO param_sweep_results
+                (sweep_id, stock_code, formula, rank, params, trades, wins, losses, open_trades,
+                 win_rate, total_pnl, avg_pnl, max_drawdown)
+            VALUES %s
+        ''', rows, page_size=1000)
+        conn.commit()
+    finally:
+        if close_conn:
+            conn.close()
+
+    return sweep_id
+
+
+def print_top(sweep, top=10):
+    """Cetak top-N kombinasi per saham"""
+    for stock_code, entry in sweep.items():
+        print(f"\n{stock_code} ({entry['formula']}) - {len(entry['results'])} kombinasi")
+        print(f"  {'#':<4} {'Trades':>6} {'WR':>7} {'PnL':>9} {'MaxDD':>8}  Params")
+        for r in entry['results'][:top]:
+            params = ', '.join(f"{k}={v}" for k, v in r['params'].items())
+            print(f"  {r['rank']:<4} {r['trades']:>6} {r['win_rate']:>6.1f}% {r['total_pnl']:>+8.1f}% "
+                  f"{r['max_drawdown']:>7.1f}%  {params}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Parameter sweep V11b1 / V11b2')
+    parser.add_argument('--stocks', default='ALL', help='Daftar saham dipisah koma atau ALL')
+    parser.add_argument('--formula', default=None, choices=['V11b1', 'V11b2'],
+                        help='Paksa formula untuk semua saham (default: sesuai STOCK_FORMULA)')
+    parser.add_argument('--start-date', default='2024-01-01', help='Tanggal mulai backtest')
+    parser.add_argument('--rank-by', default='total_pnl', choices=RANK_KEYS, help='Metrik ranking')
+    parser.add_argument('--workers', type=int, default=None, help='Jumlah process (default: semua core)')
+    parser.add_argument('--top', type=int, default=10, help='Jumlah kombinasi terbaik yang dicetak per saham')
+    parser.add_argument('--no-save', action='store_true', help='Jangan simpan ke tabel param_sweep_results')
+    args = parser.parse_args()
+
+    stocks = None if args.stocks.upper() == 'ALL' else [s.strip().upper() for s in args.stocks.split(',')]
+
+    started = time.time()
+    sweep = run_sweep(stocks, formula=args.formula, start_date=args.start_date,
+                      rank_by=args.rank_by, max_workers=args.workers)
+    total = sum(len(entry['results']) for entry in sweep.values())
+    print(f"{total} backtest ({len(sweep)} saham) selesai dalam {time.time() - started:.1f}s")
+
+    print_top(sweep, args.top)
+    if not args.no_save:
+        sweep_id = save_sweep_results(sweep)
+        print(f"\nHasil disimpan ke param_sweep_results (sweep_id={sweep_id})")
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+ROLLING RANGE INDEX
+===================
+Index range% rolling untuk deteksi sideways adaptive
+(sideways_v6_analyzer & adaptive_sideways_detector).
+
+Untuk setiap window size (default 3-15 hari) dihitung SEKALI per saham dengan NumPy:
+- high      = max(high) dalam window
+- low       = min(low) dalam window
+- mean      = rata-rata close dalam window
+- range_pct = (high - low) / mean * 100
+
+Posisi di array = index awal window, sama dengan loop calculate_historical_ranges:
+range_pct[w][i] adalah range% untuk data[i:i+w].
+
+Query percentile (p25/p40/p50/p75/...) atas histori trailing dijawab dari
+slice yang sudah terurut. Untuk walk-forward (signal history / backtest),
+precompute_sorted() membangun matrix sorted-window sekali sehingga threshold
+setiap hari tinggal lookup, tanpa sort ulang.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+DEFAULT_WINDOW_SIZES = range(3, 16)
+
+
+def percentile_value(sorted_values, percentile):
+    """Nilai percentile dari array terurut (rumus index sama dengan formula V6)"""
+    return float(sorted_values[int(len(sorted_values) * percentile / 100)])
+
+
+class RollingRangeIndex:
+    """
+    Rolling high/low/mean/range% untuk beberapa window size.
+
+    Args:
+        data: list dict bar (key high, low, close) urut tanggal ASC
+        window_sizes: window size yang di-precompute (window lain dibangun saat diminta)
+
+    Index yang dibangun dari histori penuh bisa menjawab query untuk prefix
+    data[:end] mana pun, karena setiap window hanya melihat ke belakang.
+    """
+
+    def __init__(self, data, window_sizes=DEFAULT_WINDOW_SIZES):
+        self.n = len(data)
+        self._highs = np.array([d['high'] for d in data], dtype='float64')
+        self._lows = np.array([d['low'] for d in data], dtype='float64')
+        self._closes = np.array([d['close'] for d in data], dtype='float64')
+        self._stats = {}        # window_size -> (high, low, mean, range_pct)
+        self._sorted = {}       # (window_size, history_periods) -> matrix sorted-window
+        for window_size in window_sizes:
+            self._get(window_size)
+
+    def _get(self, window_size):
+        stats = self._stats.get(window_size)
+        if stats is None:
+            stats = self._build(window_size)
+            self._stats[window_size] = stats
+        return stats
+
+    def _build(self, window_size):
+        count = self.n - window_size + 1
+        if window_size <= 0 or count <= 0:
+            empty = np.empty(0, dtype='float64')
+            return empty, empty, empty, empty
+
+        high = sliding_window_view(self._highs, window_size).max(axis=1)
+        low = sliding_window_view(self._lows, window_size).min(axis=1)
+
+        # Penjumlahan berurutan per posisi window (urutan sama dengan sum() per window)
+        total = self._closes[:count].copy()
+        for k in range(1, window_size):
+            total += self._closes[k:k + count]
+        mean = total / window_size
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            range_pct = (high - low) / mean * 100
+        return high, low, mean, range_pct
+
+    def window(self, window_size, start):
+        """(high, low, range_pct) untuk data[start:start + window_size]"""
+        high, low, _, range_pct = self._get(window_size)
+        return float(high[start]), float(low[start]), float(range_pct[start])
+
+    def _bounds(self, window_size, history_periods, end):
+        start = max(0, end - history_periods - window_size)
+        stop = max(start, end - window_size)
+        return start, stop
+
+    def ranges(self, window_size, history_periods, end):
+        """Sama dengan calculate_historical_ranges(data[:end], window_size, history_periods)"""
+        start, stop = self._bounds(window_size, history_periods, end)
+        return self._get(window_size)[3][start:stop]
+
+    def sorted_ranges(self, window_size, history_periods, end):
+        """ranges() terurut naik (lookup matrix precompute jika tersedia)"""
+        start, stop = self._bounds(window_size, history_periods, end)
+        matrix = self._sorted.get((window_size, history_periods))
+        if matrix is not None and stop - start == history_periods:
+            return matrix[start]
+        return np.sort(self._get(window_size)[3][start:stop])
+
+    def precompute_sorted(self, history_periods, window_sizes=None):
+        """
+        Bangun matrix sorted-window: baris i = sorted(range_pct[i:i + history_periods]).
+        Dipakai walk-forward agar query percentile harian O(1).
+        """
+        for window_size in (window_sizes or list(self._stats)):
+            range_pct = self._get(window_size)[3]
+            if len(range_pct) < history_periods:
+                continue
+            self._sorted[(window_size, history_periods)] = np.sort(
+                sliding_window_view(range_pct, history_periods), axis=1
+            )
@@ -14,6 +14,11 @@ import os
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from datetime import datetime, timedelta
+from rolling_range_index import RollingRangeIndex, percentile_value
+try:
+    from snapshot_store import get_ohlcv_rows
+except ImportError:
+    get_ohlcv_rows = None
 
 
 def get_db_connection():
@@ -92,15 +97,21 @@ def load_stock_data(stock_code, conn=None):
         conn = get_db_connection()
         close_conn = True
 
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute('''
-        SELECT date, open_price as open, high_price as high, low_price as low,
-               close_price as close, volume
-        FROM stock_daily
-        WHERE stock_code = %s
-        ORDER BY date ASC
-    ''', (stock_code,))
-    all_data = cur.fetchall()
+    # Columnar snapshot (tanpa transfer histori penuh) jika tersedia
+    all_data = None
+    if get_ohlcv_rows is not None:
+        all_data = get_ohlcv_rows(stock_code, conn, require_open_close=False)
+
+    if all_data is None:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute('''
+            SELECT date, open_price as open, high_price as high, low_price as low,
+                   close_price as close, volume
+            FROM stock_daily
+            WHERE stock_code = %s
+            ORDER BY date ASC
+        ''', (stock_code,))
+        all_data = cur.fetchall()
 
     if close_conn:
         conn.close()
@@ -126,73 +137,78 @@ def load_stock_data(stock_code, conn=None):
     return data_list
 
 
-def calculate_historical_ranges(data, window_size=10, history_periods=60):
-    """Hitung range historis untuk kalibrasi threshold"""
-    ranges = []
-
-    start_idx = max(0, len(data) - history_periods - window_size)
-    end_idx = len(data) - window_size
-
-    for i in range(start_idx, end_idx):
-        window = data[i:i+window_size]
-        high = max(d['high'] for d in window)
-        low = min(d['low'] for d in window)
-        avg = sum(d['close'] for d in window) / len(window)
-        range_pct = (high - low) / avg * 100
-        ranges.append(range_pct)
+def calculate_historical_ranges(data, window_size=10, history_periods=60, index=None):
+    """
+    Hitung range historis untuk kalibrasi threshold
 
-    return ranges
+    Args:
+        index: RollingRangeIndex dari data (opsional, dibangun otomatis)
+    """
+    if index is None:
+        index = RollingRangeIndex(data, [window_size])
+    return index.ranges(window_size, history_periods, len(data)).tolist()
 
 
-def get_adaptive_threshold(data, lookback_window=10, history_periods=60, percentile=40):
+def get_adaptive_threshold(data, lookback_window=10, history_periods=60, percentile=40, index=None, end=None):
     """
     Hitung threshold sideways ADAPTIVE berdasarkan history
     Returns: (threshold, hist_stats)
+
+    Args:
+        index: RollingRangeIndex dari data (opsional, dibangun otomatis)
+        end: Hanya pakai data[:end] (untuk walk-forward, default len(data))
     """
-    if len(data) < history_periods + lookback_window:
+    if end is None:
+        end = len(data)
+    if end < history_periods + lookback_window:
         return None, None
 
-    hist_data = data[:-lookback_window] if lookback_window > 0 else data
-    hist_ranges = calculate_historical_ranges(hist_data, lookback_window, history_periods)
+    if index is None:
+        index = RollingRangeIndex(data, [lookback_window])
+    hist_end = end - lookback_window if lookback_window > 0 else end
+    sorted_ranges = index.sorted_ranges(lookback_window, history_periods, hist_end)
 
-    if len(hist_ranges) < 10:
+    if len(sorted_ranges) < 10:
         return None, None
 
-    sorted_ranges = sorted(hist_ranges)
-    idx = int(len(sorted_ranges) * percentile / 100)
-    threshold = sorted_ranges[idx]
+    threshold = percentile_value(sorted_ranges, percentile)
 
     return threshold, {
-        'min': min(hist_ranges),
-        'p25': sorted_ranges[int(len(sorted_ranges) * 0.25)],
+        'min': float(sorted_ranges[0]),
+        'p25': percentile_value(sorted_ranges, 25),
         'p40': threshold,
-        'p50': sorted_ranges[int(len(sorted_ranges) * 0.50)],
-        'p75': sorted_ranges[int(len(sorted_ranges) * 0.75)],
-        'max': max(hist_ranges)
+        'p50': percentile_value(sorted_ranges, 50),
+        'p75': percentile_value(sorted_ranges, 75),
+        'max': float(sorted_ranges[-1])
     }
 
 
-def detect_sideways_adaptive(data, min_days=3, max_days=15):
+def detect_sideways_adaptive(data, min_days=3, max_days=15, index=None, end=None):
     """
     Deteksi sideways dengan threshold adaptive
     Cari window optimal dari min_days sampai max_days
+
+    Args:
+        index: RollingRangeIndex dari data (opsional, dibangun otomatis)
+        end: Deteksi untuk data[:end] (untuk walk-forward, default len(data))
     """
-    if len(data) < max_days + 60:
+    if end is None:
+        end = len(data)
+    if end < max_days + 60:
         return None
 
+    if index is None:
+        index = RollingRangeIndex(data, range(min_days, max_days + 1))
+
     best_result = None
 
     for lookback in range(min_days, max_days + 1):
-        threshold, hist_stats = get_adaptive_threshold(data, lookback)
+        threshold, hist_stats = get_adaptive_threshold(data, lookback, index=index, end=end)
 
         if threshold is None:
             continue
 
-        window = data[-lookback:]
-        high = max(d['high'] for d in window)
-        low = min(d['low'] for d in window)
-        avg = sum(d['close'] for d in window) / len(window)
-        range_pct = (high - low) / avg * 100
+        high, low, range_pct = index.window(lookback, end - lookback)
 
         is_sideways = range_pct < threshold
 
@@ -213,13 +229,9 @@ def detect_sideways_adaptive(data, min_days=3, max_days=15):
         return best_result
 
     # Jika tidak sideways, return info untuk window terpanjang
-    threshold, hist_stats = get_adaptive_threshold(data, max_days)
+    threshold, hist_stats = get_adaptive_threshold(data, max_days, index=index, end=end)
     if threshold:
-        window = data[-max_days:]
-        high = max(d['high'] for d in window)
-        low = min(d['low'] for d in window)
-        avg = sum(d['close'] for d in window) / len(window)
-        range_pct = (high - low) / avg * 100
+        high, low, range_pct = index.window(max_days, end - max_days)
 
         return {
             'is_sideways': False,
@@ -235,6 +247,27 @@ def detect_sideways_adaptive(data, min_days=3, max_days=15):
     return None
 
 
+class SidewaysWalkForward:
+    """
+    Walk-forward detect_sideways_adaptive untuk signal history / backtest.
+
+    detect(end) menghasilkan dict yang sama dengan detect_sideways_adaptive(data[:end]).
+    RollingRangeIndex dan matrix sorted-window dibangun sekali untuk seluruh histori,
+    sehingga setiap hari cukup lookup range & percentile per lookback.
+    """
+
+    def __init__(self, data, min_days=3, max_days=15, history_periods=60):
+        self.data = data
+        self.min_days = min_days
+        self.max_days = max_days
+        self.index = RollingRangeIndex(data, range(min_days, max_days + 1))
+        self.index.precompute_sorted(history_periods)
+
+    def detect(self, end=None):
+        """Sama dengan detect_sideways_adaptive(data[:end])"""
+        return detect_sideways_adaptive(self.data, self.min_days, self.max_days, index=self.index, end=end)
+
+
 def analyze_accumulation_distribution(data, sideways_info):
     """
     Analisis apakah sideways adalah AKUMULASI atau DISTRIBUSI
@@ -521,22 +554,18 @@ def track_sideways_history(data, lookback_days=15):
     sideways_streak = 0
     sideways_start_date = None
 
-    # Check each day going backwards
-    for i in range(lookback_days):
-        day_idx = len(data) - 1 - i
-        if day_idx < 80:
-            break
-
-        data_until_day = data[:day_idx + 1]
+    # Walk forward (kronologis) melewati lookback_days hari terakhir
+    walk = SidewaysWalkForward(data)
+    for day_idx in range(max(80, len(data) - lookback_days), len(data)):
         day_data = data[day_idx]
 
         # Detect sideways for this day
-        sideways = detect_sideways_adaptive(data_until_day)
+        sideways = walk.detect(day_idx + 1)
 
         if sideways and sideways['is_sideways']:
             # Calculate Vol Ratio for this day's sideways
             days = sideways['days']
-            window = data_until_day[-days:]
+            window = data[day_idx + 1 - days:day_idx + 1]
             mid_price = (sideways['high'] + sideways['low']) / 2
 
             vol_lower = 0
@@ -581,9 +610,6 @@ def track_sideways_history(data, lookback_days=15):
                 'close': day_data['close']
             })
 
-    # Reverse to chronological order (oldest first)
-    history = list(reversed(history))
-
     # Find sideways start and calculate streak
     sideways_entries = [h for h in history if h['is_sideways']]
 
@@ -878,20 +904,22 @@ def get_signal_history(stock_code, start_date='2025-01-02', conn=None):
         if start_idx is None or start_idx < 80:
             start_idx = 80
 
+        # State sideways di-update incremental per hari (tanpa slice all_data[:i+1])
+        walk = SidewaysWalkForward(all_data)
+
         for i in range(start_idx, len(all_data)):
-            data_until_now = all_data[:i+1]
             today = all_data[i]
 
             if position is None:
                 # Check for entry signal
-                if len(data_until_now) < 80:
+                if i + 1 < 80:
                     continue
 
-                sideways = detect_sideways_adaptive(data_until_now)
+                sideways = walk.detect(i + 1)
                 if not sideways:
                     continue
 
-                phase = analyze_accumulation_distribution(data_until_now, sideways)
+                phase = analyze_accumulation_distribution(all_data[i + 1 - sideways['days']:i + 1], sideways)
                 if not phase:
                     continue
 
@@ -956,9 +984,9 @@ def get_signal_history(stock_code, start_date='2025-01-02', conn=None):
                     exit_reason = 'TARGET'
                 else:
                     # Check for distribution
-                    sideways = detect_sideways_adaptive(data_until_now)
+                    sideways = walk.detect(i + 1)
                     if sideways:
-                        phase = analyze_accumulation_distribution(data_until_now, sideways)
+                        phase = analyze_accumulation_distribution(all_data[i + 1 - sideways['days']:i + 1], sideways)
                         if phase and phase['vol_ratio'] <= 0.8:
                             exit_reason = 'DISTRIBUTION'
 
@@ -18,6 +18,10 @@ from psycopg2.extras import RealDictCursor
 from datetime import datetime, timedelta
 import statistics
 import math
+try:
+    from snapshot_store import get_ohlcv_rows
+except ImportError:
+    get_ohlcv_rows = None
 
 # Import V8/V9 functions dari strong_sr_v8_atr untuk konsistensi
 from strong_sr_v8_atr import (
@@ -32,6 +36,8 @@ from strong_sr_v8_atr import (
     get_nearest_sr,
     get_custom_sr_zones,
     calculate_vr as calculate_vr_v8,
+    calculate_vr_at,
+    StrongLevelTracker,
     get_phase,
     backtest_v9
 )
@@ -52,6 +58,12 @@ def get_db_connection():
 
 
 def get_stock_data(stock_code, conn):
+    # Columnar snapshot (tanpa transfer histori penuh) jika tersedia
+    if get_ohlcv_rows is not None:
+        rows = get_ohlcv_rows(stock_code, conn)
+        if rows is not None:
+            return rows
+
     cur = conn.cursor(cursor_factory=RealDictCursor)
     cur.execute('''
         SELECT date, open_price as open, high_price as high,
@@ -115,10 +127,13 @@ def get_current_strong_sr(stock_code):
         conn.close()
 
 
-def get_signal_history_sr(stock_code, start_date='2025-01-02'):
+def get_signal_history_sr(stock_code, start_date='2025-01-02', rolling_origin=False):
     """
     Get signal history using V8 ATR-Quality S/R detection.
     Entry criteria: Near Support (<=5%), Phase Accumulation, Quality >= 50%, Touches >= 3
+
+    rolling_origin=True: strong levels auto-detect per hari hanya dari data s/d hari itu
+    (StrongLevelTracker dari strong_sr_v8_atr, tanpa look-ahead).
     """
     conn = get_db_connection()
 
@@ -153,15 +168,19 @@ def get_signal_history_sr(stock_code, start_date='2025-01-02'):
         # Check for custom S/R zones first
         custom_supports, custom_resistances = get_custom_sr_zones(stock_code, conn)
 
+        tracker = None
         if custom_supports and custom_resistances:
             # Use custom zones
             strong_supports = custom_supports
             strong_resistances = custom_resistances
+        elif rolling_origin:
+            # V8: Strong levels per hari, di-update incremental
+            tracker = StrongLevelTracker(data)
         else:
             # V8: Get strong levels dengan fungsi dari strong_sr_v8_atr untuk konsistensi
             strong_supports, strong_resistances = get_strong_levels(data_1year, tol_price)
 
-        if not strong_supports:
+        if tracker is None and not strong_supports:
             return {
                 'summary': {
                     'stock_code': stock_code,
@@ -189,14 +208,16 @@ def get_signal_history_sr(stock_code, start_date='2025-01-02'):
 
         for i in range(start_idx, len(data)):
             price = float(data[i]['close'])
+            if tracker is not None:
+                strong_supports, strong_resistances, tol_price = tracker.levels_at(i)
             support, resistance = get_nearest_sr(strong_supports, strong_resistances, price)
 
             if position is None:
                 if support:
                     dist = (price - support['level']) / price * 100
                     if dist <= 5.0:  # Within 5% of support
-                        # Gunakan calculate_vr_v8 dari strong_sr_v8_atr dengan data slice
-                        vr = calculate_vr_v8(data[:i+1], support['level'])
+                        # Gunakan calculate_vr_v8 dari strong_sr_v8_atr (30 bar terakhir s/d hari i)
+                        vr = calculate_vr_at(data, i, support['level'])
                         phase = get_phase(vr)
 
                         # V8 Entry: Phase valid + Quality >= 50% + Touches >= 3
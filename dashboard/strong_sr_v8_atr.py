@@ -22,8 +22,15 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 from datetime import datetime, timedelta
 from collections import defaultdict
+import bisect
 import math
 import statistics
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+try:
+    from snapshot_store import get_ohlcv_rows
+except ImportError:
+    get_ohlcv_rows = None
 
 def get_db_connection():
     """Get database connection - uses DATABASE_URL for Railway, localhost for local dev"""
@@ -40,6 +47,12 @@ def get_db_connection():
 
 
 def get_stock_data(stock_code, conn):
+    # Columnar snapshot (tanpa transfer histori penuh) jika tersedia
+    if get_ohlcv_rows is not None:
+        rows = get_ohlcv_rows(stock_code, conn)
+        if rows is not None:
+            return rows
+
     cur = conn.cursor(cursor_factory=RealDictCursor)
     cur.execute('''
         SELECT date, open_price as open, high_price as high,
@@ -166,38 +179,49 @@ def calculate_tolerance(data, atr_list):
 
 # ================== PIVOT DETECTION ==================
 
-def detect_pivots(data, left_bars=3, right_bars=3):
+def _price_arrays(data):
+    """Kolom low/high/close/volume sebagai array float64 (konversi float sekali per data)"""
+    return {
+        key: np.array([float(d[key]) for d in data], dtype='float64')
+        for key in ('low', 'high', 'close', 'volume')
+    }
+
+
+def detect_pivots(data, left_bars=3, right_bars=3, arrays=None):
     """
     Detect pivot highs dan lows (fractal).
     Pivot low: Low = MIN dari 7 candle (3 kiri + current + 3 kanan)
     Pivot high: High = MAX dari 7 candle
-    """
-    pivot_lows = []
-    pivot_highs = []
-
-    for i in range(left_bars, len(data) - right_bars):
-        current_low = float(data[i]['low'])
-        current_high = float(data[i]['high'])
-
-        # Check pivot low
-        window_lows = [float(data[j]['low']) for j in range(i - left_bars, i + right_bars + 1)]
-        if current_low == min(window_lows):
-            pivot_lows.append({
-                'index': i,
-                'date': data[i]['date'],
-                'price': current_low,
-                'type': 'SUPPORT'
-            })
 
-        # Check pivot high
-        window_highs = [float(data[j]['high']) for j in range(i - left_bars, i + right_bars + 1)]
-        if current_high == max(window_highs):
-            pivot_highs.append({
-                'index': i,
-                'date': data[i]['date'],
-                'price': current_high,
-                'type': 'RESISTANCE'
-            })
+    Min/max window dihitung sekaligus dengan sliding window NumPy.
+    arrays: hasil _price_arrays(data) jika sudah ada
+    """
+    window = left_bars + right_bars + 1
+    end = len(data) - right_bars
+    if end <= left_bars:
+        return [], []
+
+    arrays = arrays or _price_arrays(data)
+    lows = arrays['low']
+    highs = arrays['high']
+    current_lows = lows[left_bars:end]
+    current_highs = highs[left_bars:end]
+    is_pivot_low = current_lows == sliding_window_view(lows, window).min(axis=1)
+    is_pivot_high = current_highs == sliding_window_view(highs, window).max(axis=1)
+
+    pivot_lows = [{
+        'index': i,
+        'date': data[i]['date'],
+        'price': float(lows[i]),
+        'type': 'SUPPORT'
+    } for i in (np.flatnonzero(is_pivot_low) + left_bars).tolist()]
+
+    pivot_highs = [{
+        'index': i,
+        'date': data[i]['date'],
+        'price': float(highs[i]),
+        'type': 'RESISTANCE'
+    } for i in (np.flatnonzero(is_pivot_high) + left_bars).tolist()]
 
     return pivot_lows, pivot_highs
 
@@ -218,45 +242,66 @@ def cluster_levels(pivots, tol_price):
     return buckets
 
 
-def calculate_strength_score(data, level, tol_price, level_type='SUPPORT'):
+def calculate_strength_scores(data, levels, tol_price, level_type='SUPPORT', arrays=None):
     """
-    Hitung Strength Score untuk setiap level:
+    Hitung Strength Score untuk banyak level sekaligus:
     - Touches: jumlah hari yang menyentuh zona
     - Bounce: jumlah hari yang memantul (close > level untuk support)
     - Quality = Bounce / Touches
     - AvgVol: rata-rata volume saat touch
     - Score = Touches * (0.7 + 0.6*Quality) * LN(1+AvgVol)
+
+    Touch/bounce/volume semua level dihitung dengan broadcasting matrix (level x hari).
+    arrays: hasil _price_arrays(data) jika sudah ada
+    Returns: list dict score, urutan sama dengan levels
     """
-    touches = 0
-    bounces = 0
-    touch_volumes = []
+    levels = list(levels)
+    if not levels:
+        return []
+
+    arrays = arrays or _price_arrays(data)
+    counts = _touch_counts(arrays, levels, tol_price, level_type)
+    return [_level_score(level, touches, bounces, volume_sum)
+            for level, touches, bounces, volume_sum in zip(levels, *counts)]
+
+
+def _touch_counts(arrays, levels, tol_price, level_type='SUPPORT'):
+    """(touches, bounces, volume_sums) per level untuk hari-hari di arrays"""
+    level_arr = np.array(levels, dtype='float64')[:, None]
+    level_high = level_arr + tol_price
+    level_low = level_arr - tol_price
+
+    if level_type == 'SUPPORT':
+        # Touch support: Low masuk band, bounce: close di atas level
+        touch = (arrays['low'] >= level_low) & (arrays['low'] <= level_high)
+        bounce = touch & (arrays['close'] > level_arr)
+    else:  # RESISTANCE
+        # Touch resistance: High masuk band, bounce: close di bawah level
+        touch = (arrays['high'] >= level_low) & (arrays['high'] <= level_high)
+        bounce = touch & (arrays['close'] < level_arr)
+
+    volumes = arrays['volume']
+    touch_volumes = np.where(touch, volumes, 0.0)
+    if _is_integral(volumes):
+        # Volume bulat: penjumlahan exact, urutan tidak berpengaruh
+        volume_sums = touch_volumes.sum(axis=1)
+    else:
+        # Jumlahkan berurutan per hari (sama dengan sum() per level)
+        volume_sums = np.zeros(len(level_arr))
+        for day_volumes in touch_volumes.T:
+            volume_sums += day_volumes
 
-    level_high = level + tol_price
-    level_low = level - tol_price
+    return touch.sum(axis=1).tolist(), bounce.sum(axis=1).tolist(), volume_sums.tolist()
 
-    for d in data:
-        low = float(d['low'])
-        high = float(d['high'])
-        close = float(d['close'])
-        volume = float(d['volume'])
-
-        if level_type == 'SUPPORT':
-            # Touch support: Low masuk band
-            if low >= level_low and low <= level_high:
-                touches += 1
-                touch_volumes.append(volume)
-                # Bounce: close di atas level
-                if close > level:
-                    bounces += 1
-        else:  # RESISTANCE
-            # Touch resistance: High masuk band
-            if high >= level_low and high <= level_high:
-                touches += 1
-                touch_volumes.append(volume)
-                # Bounce: close di bawah level
-                if close < level:
-                    bounces += 1
 
+def _is_integral(volumes):
+    """True jika semua volume bulat dan totalnya masih exact di float64"""
+    return bool(np.isfinite(volumes).all() and (volumes == np.floor(volumes)).all()
+                and np.abs(volumes).sum() < 2 ** 53)
+
+
+def _level_score(level, touches, bounces, volume_sum):
+    """Dict strength score dari hitungan touch/bounce/volume satu level"""
     if touches == 0:
         return {
             'level': level,
@@ -268,7 +313,7 @@ def calculate_strength_score(data, level, tol_price, level_type='SUPPORT'):
         }
 
     quality = bounces / touches
-    avg_vol = sum(touch_volumes) / len(touch_volumes) if touch_volumes else 0
+    avg_vol = volume_sum / touches
 
     # Score formula: Touches * (0.7 + 0.6*Quality) * LN(1+AvgVol)
     # Normalize volume untuk LN calculation
@@ -285,42 +330,227 @@ def calculate_strength_score(data, level, tol_price, level_type='SUPPORT'):
     }
 
 
+def calculate_strength_score(data, level, tol_price, level_type='SUPPORT'):
+    """Strength Score untuk satu level (lihat calculate_strength_scores)"""
+    return calculate_strength_scores(data, [level], tol_price, level_type)[0]
+
+
 def get_strong_levels(data, tol_price):
     """
     Get semua strong levels dengan ATR-Quality method.
     Filter: Touches >= 3, Quality >= 0.5
     """
+    # Konversi OHLCV sekali untuk pivot + scoring
+    arrays = _price_arrays(data)
+
     # Detect pivots
-    pivot_lows, pivot_highs = detect_pivots(data)
+    pivot_lows, pivot_highs = detect_pivots(data, arrays=arrays)
 
     # Cluster ke buckets
     support_buckets = cluster_levels(pivot_lows, tol_price)
     resistance_buckets = cluster_levels(pivot_highs, tol_price)
 
-    # Calculate scores untuk setiap bucket
-    support_levels = []
-    for level, pivots in support_buckets.items():
-        score_data = calculate_strength_score(data, level, tol_price, 'SUPPORT')
+    # Calculate scores untuk semua bucket sekaligus
+    support_levels = calculate_strength_scores(data, support_buckets.keys(), tol_price, 'SUPPORT', arrays)
+    for score_data, pivots in zip(support_levels, support_buckets.values()):
         score_data['type'] = 'SUPPORT'
         score_data['pivot_count'] = len(pivots)
-        support_levels.append(score_data)
 
-    resistance_levels = []
-    for level, pivots in resistance_buckets.items():
-        score_data = calculate_strength_score(data, level, tol_price, 'RESISTANCE')
+    resistance_levels = calculate_strength_scores(data, resistance_buckets.keys(), tol_price, 'RESISTANCE', arrays)
+    for score_data, pivots in zip(resistance_levels, resistance_buckets.values()):
         score_data['type'] = 'RESISTANCE'
         score_data['pivot_count'] = len(pivots)
-        resistance_levels.append(score_data)
 
-    # Filter: Touches >= 3, Quality >= 0.5
-    strong_supports = [s for s in support_levels if s['touches'] >= 3 and s['quality'] >= 0.5]
-    strong_resistances = [r for r in resistance_levels if r['touches'] >= 3 and r['quality'] >= 0.5]
+    return _filter_strong(support_levels), _filter_strong(resistance_levels)
+
+
+def _filter_strong(levels):
+    """Filter Touches >= 3, Quality >= 0.5 lalu sort by score descending"""
+    strong = [s for s in levels if s['touches'] >= 3 and s['quality'] >= 0.5]
+    strong.sort(key=lambda x: -x['score'])
+    return strong
+
+
+def _as_date(value):
+    """Tanggal bar sebagai date (string 'YYYY-MM-DD' di-parse seperti filter_data_1year)"""
+    if isinstance(value, str):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    return value
+
+
+class StrongLevelTracker:
+    """
+    Strong S/R V8 incremental untuk backtest rolling-origin (level per hari
+    hanya dari data s/d hari itu).
+
+    levels_at(i) menghasilkan output yang sama dengan:
+        data_1year = filter_data_1year(data[:i+1])   # fallback data[:i+1] jika < 30 bar
+        tol_price = calculate_tolerance(data_1year, calculate_atr(calculate_true_range(data_1year)))
+        get_strong_levels(data_1year, tol_price)
+    tanpa menghitung ulang dari nol setiap hari:
+    - OHLCV dikonversi, TR/ATR dan pivot dideteksi SEKALI untuk seluruh data
+      (pivot hanya melihat 3 bar kiri/kanan, jadi valid untuk window mana pun)
+    - Window 1 tahun digeser dengan pointer; pivot masuk setelah terkonfirmasi
+      (3 bar kanan) dan keluar saat bar-nya lewat window
+    - MEDIAN(ATR14) dari list terurut (bisect insert/remove)
+    - Counter touch/bounce/volume per bucket hanya di-update untuk hari yang
+      masuk/keluar window selama tolerance tidak berubah (volume bulat);
+      bucket baru atau tolerance berubah dihitung ulang vectorized
+
+    Index i dipanggil naik (walk-forward).
+    """
 
-    # Sort by score descending
-    strong_supports.sort(key=lambda x: -x['score'])
-    strong_resistances.sort(key=lambda x: -x['score'])
+    def __init__(self, data, left_bars=3, right_bars=3, atr_period=14, min_bars=30):
+        self.data = data
+        self.arrays = _price_arrays(data)
+        self.left_bars = left_bars
+        self.right_bars = right_bars
+        self.atr_period = atr_period
+        self.min_bars = min_bars
+
+        self._dates = [_as_date(d['date']) for d in data]
+        self._closes = self.arrays['close'].tolist()
+        highs = self.arrays['high'].tolist()
+        lows = self.arrays['low'].tolist()
+
+        # TR bar pertama window = High-Low (tanpa prev close), sisanya TR biasa
+        self._ranges = [high - low for high, low in zip(highs, lows)]
+        self._tr = self._ranges[:1] + [
+            max(high - low, abs(high - prev_close), abs(low - prev_close))
+            for high, low, prev_close in zip(highs[1:], lows[1:], self._closes)
+        ]
+        self._atr = calculate_atr(self._tr, atr_period)
+
+        pivot_lows, pivot_highs = detect_pivots(data, left_bars, right_bars, arrays=self.arrays)
+        self._pivots = {
+            'SUPPORT': ([p['index'] for p in pivot_lows], [p['price'] for p in pivot_lows]),
+            'RESISTANCE': ([p['index'] for p in pivot_highs], [p['price'] for p in pivot_highs]),
+        }
 
-    return strong_supports, strong_resistances
+        self._integral = _is_integral(self.arrays['volume'])
+        self._last = -1
+        self._year_start = 0
+        self._atr_sorted = []           # ATR[k] untuk k di _atr_range (terurut)
+        self._atr_range = (0, 0)
+        self._counters = {'SUPPORT': {}, 'RESISTANCE': {}}  # level -> [touches, bounces, volume_sum]
+        self._counted = (0, 0)          # range hari yang tercakup counter
+        self._counted_tol = None
+
+    def window(self, i):
+        """Index awal data_1year untuk data[:i+1]"""
+        if i < self._last:
+            self._year_start = 0
+        self._last = i
+
+        cutoff = self._dates[i] - timedelta(days=365)
+        while self._dates[self._year_start] < cutoff:
+            self._year_start += 1
+        return self._year_start if i - self._year_start + 1 >= self.min_bars else 0
+
+    def tolerance(self, lo, i):
+        """calculate_tolerance untuk data[lo:i+1]"""
+        period = self.atr_period
+        close = self._closes[i]
+        if i - lo + 1 < period:
+            return close * 0.005
+
+        self._sync_atr(lo + period, i + 1)
+        # ATR pertama di window memakai TR bar pertama = High-Low
+        first_atr = sum([self._ranges[lo]] + self._tr[lo + 1:lo + period]) / period
+        median_atr = self._median_with(first_atr)
+        return max(0.6 * median_atr, 0.005 * close)
+
+    def _sync_atr(self, start, stop):
+        cur_start, cur_stop = self._atr_range
+        values = self._atr_sorted
+        if start < cur_start or start >= cur_stop:
+            self._atr_sorted = sorted(self._atr[start:stop])
+        else:
+            for k in range(cur_start, start):
+                del values[bisect.bisect_left(values, self._atr[k])]
+            for k in range(cur_stop, stop):
+                bisect.insort(values, self._atr[k])
+        self._atr_range = (start, stop)
+
+    def _median_with(self, extra):
+        """statistics.median dari _atr_sorted + [extra]"""
+        values = self._atr_sorted
+        pos = bisect.bisect_left(values, extra)
+
+        def kth(m):
+            if m < pos:
+                return values[m]
+            return extra if m == pos else values[m - 1]
+
+        n = len(values) + 1
+        if n % 2 == 1:
+            return kth(n // 2)
+        return (kth(n // 2 - 1) + kth(n // 2)) / 2
+
+    def _slice(self, start, stop):
+        return {key: values[start:stop] for key, values in self.arrays.items()}
+
+    def _sync_counters(self, lo, hi, tol_price):
+        cur_lo, cur_hi = self._counted
+        if not self._integral or tol_price != self._counted_tol or lo < cur_lo or lo >= cur_hi:
+            for counters in self._counters.values():
+                counters.clear()
+        else:
+            for level_type, counters in self._counters.items():
+                if not counters:
+                    continue
+                levels = list(counters)
+                for start, stop, sign in ((cur_lo, lo, -1), (cur_hi, hi, 1)):
+                    if stop <= start:
+                        continue
+                    counts = _touch_counts(self._slice(start, stop), levels, tol_price, level_type)
+                    for level, touches, bounces, volume_sum in zip(levels, *counts):
+                        counter = counters[level]
+                        counter[0] += sign * touches
+                        counter[1] += sign * bounces
+                        counter[2] += sign * volume_sum
+        self._counted = (lo, hi)
+        self._counted_tol = tol_price
+
+    def _levels(self, level_type, lo, i, tol_price):
+        indexes, prices = self._pivots[level_type]
+        start = bisect.bisect_left(indexes, lo + self.left_bars)
+        stop = bisect.bisect_right(indexes, i - self.right_bars)
+
+        # Bucket urut kemunculan pivot pertama (sama dengan cluster_levels)
+        buckets = {}
+        for price in prices[start:stop]:
+            bucket_level = round(price / tol_price) * tol_price
+            buckets[bucket_level] = buckets.get(bucket_level, 0) + 1
+
+        counters = self._counters[level_type]
+        for level in [level for level in counters if level not in buckets]:
+            del counters[level]
+        missing = [level for level in buckets if level not in counters]
+        if missing:
+            counts = _touch_counts(self._slice(lo, i + 1), missing, tol_price, level_type)
+            for level, touches, bounces, volume_sum in zip(missing, *counts):
+                counters[level] = [touches, bounces, volume_sum]
+
+        levels = []
+        for level, pivot_count in buckets.items():
+            score_data = _level_score(level, *counters[level])
+            score_data['type'] = level_type
+            score_data['pivot_count'] = pivot_count
+            levels.append(score_data)
+        return _filter_strong(levels)
+
+    def levels_at(self, i):
+        """
+        Strong levels memakai data[:i+1].
+        Returns: (strong_supports, strong_resistances, tol_price)
+        """
+        lo = self.window(i)
+        tol_price = self.tolerance(lo, i)
+        self._sync_counters(lo, i + 1, tol_price)
+        return (self._levels('SUPPORT', lo, i, tol_price),
+                self._levels('RESISTANCE', lo, i, tol_price),
+                tol_price)
 
 
 def get_nearest_sr(strong_supports, strong_resistances, current_price, min_distance_pct=5.0, max_support_distance_pct=30.0):
@@ -397,6 +627,11 @@ def calculate_vr(data, level_price, lookback=30, tolerance_pct=3.0):
     return vol_lower / vol_upper if vol_upper > 0 else (999.0 if vol_lower > 0 else 1.0)
 
 
+def calculate_vr_at(data, i, level_price, lookback=30, tolerance_pct=3.0):
+    """calculate_vr untuk data[:i+1] (hanya slice lookback bar terakhir, bukan prefix penuh)"""
+    return calculate_vr(data[max(0, i + 1 - lookback):i + 1], level_price, lookback, tolerance_pct)
+
+
 def get_phase(vr):
     """Tentukan phase berdasarkan VR"""
     if vr >= 4.0:
@@ -671,9 +906,13 @@ def get_strong_sr_analysis(stock_code):
 
 # ================== BACKTEST ==================
 
-def backtest_v8(stock_code, start_date='2025-01-02'):
+def backtest_v8(stock_code, start_date='2025-01-02', rolling_origin=False):
     """
     Backtest V8 ATR-Quality method untuk stock tertentu.
+
+    rolling_origin=True: strong levels auto-detect dihitung ulang per hari hanya dari
+    data s/d hari itu (StrongLevelTracker, tanpa look-ahead). Default memakai level
+    dari data 1 tahun terakhir untuk seluruh periode backtest.
     """
     conn = get_db_connection()
     try:
@@ -703,10 +942,14 @@ def backtest_v8(stock_code, start_date='2025-01-02'):
         # Check for custom S/R zones first
         custom_supports, custom_resistances = get_custom_sr_zones(stock_code, conn)
 
+        tracker = None
         if custom_supports and custom_resistances:
             # Use custom zones
             strong_supports = custom_supports
             strong_resistances = custom_resistances
+        elif rolling_origin:
+            # Auto-detected levels per hari (incremental)
+            tracker = StrongLevelTracker(all_data)
         else:
             # Use auto-detected levels
             strong_supports, strong_resistances = get_strong_levels(data_1year, tol_price)
@@ -723,6 +966,8 @@ def backtest_v8(stock_code, start_date='2025-01-02'):
 
         for i in range(start_idx, len(all_data)):
             price = float(all_data[i]['close'])
+            if tracker is not None:
+                strong_supports, strong_resistances, _ = tracker.levels_at(i)
 
             # Get nearest S/R
             support, resistance = get_nearest_sr(strong_supports, strong_resistances, price)
@@ -731,7 +976,7 @@ def backtest_v8(stock_code, start_date='2025-01-02'):
                 if support:
                     dist = (price - support['level']) / price * 100
                     if dist <= 5.0:  # Within 5% of support
-                        vr = calculate_vr(all_data[:i+1], support['level'])
+                        vr = calculate_vr_at(all_data, i, support['level'])
                         phase = get_phase(vr)
 
                         if phase in valid_phases:
@@ -894,7 +1139,7 @@ def backtest_v9(stock_code, start_date='2025-01-02'):
                 if support:
                     dist = (price - support['level']) / price * 100
                     if 0 <= dist <= 5.0:  # Within 5% of support
-                        vr = calculate_vr(all_data[:i+1], support['level'])
+                        vr = calculate_vr_at(all_data, i, support['level'])
                         phase = get_phase(vr)
 
                         # V8 criteria: Phase + Quality + Touches
@@ -1188,7 +1433,7 @@ def backtest_v10(stock_code, start_date='2025-01-02'):
                         breakout_type = 'HOLD' if tracking['state'] == 'confirmed_no_pullback' else 'PULLBACK'
 
                         # V8 criteria
-                        vr = calculate_vr(all_data[:i+1], res_zone['level'])
+                        vr = calculate_vr_at(all_data, i, res_zone['level'])
                         phase = get_phase(vr)
 
                         if phase in valid_phases:
@@ -1272,7 +1517,7 @@ def backtest_v10(stock_code, start_date='2025-01-02'):
                         # Jika dalam range 35%, jalankan V8 formula
                         if in_confirm_range:
                             # V8 Formula: cek phase
-                            vr = calculate_vr(all_data[:i+1], support_zone['level'])
+                            vr = calculate_vr_at(all_data, i, support_zone['level'])
                             phase = get_phase(vr)
 
                             # Kondisi entry: CLOSE_STRENGTH (close dekat high >70%)
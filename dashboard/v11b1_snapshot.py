@@ -0,0 +1,231 @@
+"""
+V11b1 Snapshot Service - statistik landing page tanpa backtest di web request
+
+Statistik V11b1 2026, daftar posisi running dan ringkasan backtest per emiten
+dibaca dari tabel precomputed (v11b1_results_latest + v11b1_trades). Service ini:
+- selalu menyajikan snapshot terakhir yang valid (gagal load = snapshot lama tetap dipakai)
+- me-reload snapshot di background thread jika umurnya > SNAPSHOT_MAX_AGE
+- memicu recompute (calculate_daily_v11b1.py) di subprocess terpisah jika tabel
+  precomputed tidak ada / error / watermark hasil tertinggal dari data
+- mengekspos status (tanggal data, stale, sedang diperbarui) untuk ditampilkan di UI
+
+Backtest tidak pernah dijalankan di thread request.
+"""
+import os
+import sys
+import time
+import subprocess
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from database import execute_query, get_connection, query_cache
+
+# Umur maksimum snapshot sebelum di-reload di background (detik)
+SNAPSHOT_MAX_AGE = 120
+# Jeda minimum antar recompute otomatis (detik) - mencegah spawn berulang jika recompute gagal
+RECOMPUTE_COOLDOWN = 600
+# Process pipeline recompute: subprocess berbagi container dengan gunicorn,
+# jangan ambil semua core (default run_pipeline = os.cpu_count())
+RECOMPUTE_WORKERS = int(os.environ.get('V11B1_RECOMPUTE_WORKERS', 1))
+
+CALCULATE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'calculate_daily_v11b1.py')
+
+_lock = threading.Lock()
+_loaders: Dict[str, Callable] = {}
+_snapshot = {
+    'data': {},            # part -> value terakhir yang valid
+    'status': {},          # hasil get_precomputed_status() terakhir
+    'loaded_at': None,     # time.time() load terakhir (gagal pertama tetap dicatat agar tidak diulang per request)
+    'error': None,         # error load terakhir (None jika sukses)
+}
+_refresh_thread: Optional[threading.Thread] = None
+_recompute_proc: Optional[subprocess.Popen] = None
+_recompute_started: Optional[float] = None
+_recompute_finished: Optional[float] = None
+_stock_codes: List[str] = []
+
+
+def register_snapshot_part(name: str, loader: Callable):
+    """Daftarkan loader() bagian snapshot - harus raise jika gagal (bukan return kosong)"""
+    _loaders[name] = loader
+
+
+def set_snapshot_stocks(stock_codes):
+    """Daftar saham V11b1 yang dipantau (untuk cek stale & recompute)"""
+    global _stock_codes
+    _stock_codes = sorted({code.upper() for code in stock_codes})
+
+
+# ============================================================
+# STATUS PRECOMPUTED
+# ============================================================
+
+def get_precomputed_status() -> Dict:
+    """
+    Status tabel precomputed: tanggal kalkulasi terbaru/terlama, saham yang
+    hasilnya basi dan saham yang belum punya hasil. Raise jika tabel belum ada.
+
+    Basi = data_watermark hasil terakhir berbeda dengan watermark data saat ini
+    (import baru, re-import nilai final di tanggal yang sama, perubahan zona) -
+    sama dengan kriteria skip di run_pipeline. calc_date tidak bisa dipakai:
+    isinya tanggal kalkulasi, bukan tanggal data.
+
+    Hasil terakhir dibaca dari v11b1_results termasuk baris error (view latest
+    melewatinya): error pada watermark saat ini dianggap selesai, bukan missing,
+    agar saham yang selalu gagal tidak memicu recompute tiap RECOMPUTE_COOLDOWN.
+    """
+    from calculate_daily_v11b1 import get_data_watermarks
+
+    with get_connection() as conn:
+        current = get_data_watermarks(conn, _stock_codes)
+    rows = execute_query("""
+        SELECT DISTINCT ON (stock_code) stock_code, calc_date, calc_timestamp, data_watermark, has_error
+        FROM v11b1_results
+        WHERE stock_code = ANY(%s)
+        ORDER BY stock_code, calc_date DESC
+    """, (sorted(current),), use_cache=False)
+    results = {row['stock_code']: row for row in rows}
+
+    calc_dates = [row['calc_date'] for row in rows if row['calc_date'] and not row['has_error']]
+    timestamps = [row['calc_timestamp'] for row in rows if row['calc_timestamp']]
+    missing = [code for code in current if code not in results]
+    stale = [code for code, watermark in current.items()
+             if code in results and results[code]['data_watermark'] != watermark]
+    return {
+        'as_of': max(calc_dates) if calc_dates else None,
+        'oldest': min(calc_dates) if calc_dates else None,
+        'last_calc': max(timestamps) if timestamps else None,
+        'stock_count': len(current),
+        'missing': missing,
+        'stale': stale,
+    }
+
+
+# ============================================================
+# RECOMPUTE (subprocess)
+# ============================================================
+
+def is_recomputing() -> bool:
+    """True jika subprocess recompute masih berjalan"""
+    global _recompute_proc, _recompute_finished
+    with _lock:
+        if _recompute_proc is None:
+            return False
+        if _recompute_proc.poll() is None:
+            return True
+        _recompute_proc = None
+        _recompute_finished = time.time()
+        return False
+
+
+def trigger_recompute(stock_codes=None, force: bool = False) -> bool:
+    """
+    Jalankan calculate_daily_v11b1.py di subprocess (tidak memblok request).
+    Diabaikan jika recompute masih berjalan atau masih dalam cooldown (kecuali force).
+
+    Returns:
+        True jika subprocess baru dijalankan
+    """
+    global _recompute_proc, _recompute_started
+    if is_recomputing():
+        return False
+    with _lock:
+        if not force and _recompute_started and time.time() - _recompute_started < RECOMPUTE_COOLDOWN:
+            return False
+        cmd = [sys.executable, CALCULATE_SCRIPT, '--workers', str(RECOMPUTE_WORKERS)]
+        cmd += sorted({c.upper() for c in (stock_codes or [])})
+        try:
+            _recompute_proc = subprocess.Popen(cmd, cwd=os.path.dirname(CALCULATE_SCRIPT))
+            _recompute_started = time.time()
+        except Exception as e:
+            print(f"[V11B1 SNAPSHOT] Recompute failed to start: {e}")
+            return False
+    print(f"[V11B1 SNAPSHOT] Recompute started: {' '.join(cmd[4:]) or 'ALL'}")
+    return True
+
+
+# ============================================================
+# SNAPSHOT LOAD
+# ============================================================
+
+def _load():
+    """Load semua bagian snapshot; snapshot lama dipertahankan jika ada yang gagal"""
+    try:
+        status = get_precomputed_status()
+        data = {name: loader() for name, loader in _loaders.items()}
+    except Exception as e:
+        with _lock:
+            _snapshot['error'] = str(e)
+            _snapshot['loaded_at'] = _snapshot['loaded_at'] or time.time()
+        print(f"[V11B1 SNAPSHOT] Load failed, serving last good snapshot: {e}")
+        trigger_recompute()
+        return
+
+    with _lock:
+        changed = status.get('last_calc') != _snapshot['status'].get('last_calc')
+        _snapshot['data'] = data
+        _snapshot['status'] = status
+        _snapshot['loaded_at'] = time.time()
+        _snapshot['error'] = None
+    if changed:
+        # Hasil baru dari recompute - buang query cache per-stock yang membaca tabel precomputed
+        query_cache.invalidate_tags(['table:v11b1_results_latest', 'table:v11b1_trades'])
+    if status['missing'] or status['stale']:
+        trigger_recompute(status['missing'] + status['stale'])
+
+
+def _refresh_worker():
+    global _refresh_thread
+    try:
+        _load()
+    finally:
+        with _lock:
+            _refresh_thread = None
+
+
+def refresh_snapshot():
+    """Reload snapshot di background thread (duplikat diabaikan)"""
+    global _refresh_thread
+    with _lock:
+        if _refresh_thread is not None:
+            return
+        _refresh_thread = threading.Thread(target=_refresh_worker, name='v11b1-snapshot', daemon=True)
+        _refresh_thread.start()
+
+
+def get_snapshot(name: str, default=None):
+    """
+    Bagian snapshot terakhir yang valid.
+
+    Load pertama berjalan sinkron (query tabel precomputed saja, tanpa backtest);
+    setelahnya snapshot yang kedaluwarsa di-reload di background dan request
+    tetap dilayani snapshot lama.
+    """
+    is_recomputing()  # poll subprocess - catat waktu selesai recompute
+    with _lock:
+        loaded_at = _snapshot['loaded_at']
+        recompute_done = bool(loaded_at and _recompute_finished and _recompute_finished > loaded_at)
+    if loaded_at is None:
+        _load()
+    elif recompute_done or time.time() - loaded_at > SNAPSHOT_MAX_AGE:
+        refresh_snapshot()
+    with _lock:
+        return _snapshot['data'].get(name, default)
+
+
+def get_snapshot_status() -> Dict:
+    """Status snapshot untuk UI: tanggal data, stale, sedang diperbarui, error"""
+    recomputing = is_recomputing()
+    with _lock:
+        status = dict(_snapshot['status'])
+        loaded_at = _snapshot['loaded_at']
+        error = _snapshot['error']
+    return {
+        'as_of': status.get('as_of'),
+        'loaded_at': datetime.fromtimestamp(loaded_at) if loaded_at else None,
+        'stale_stocks': sorted(set(status.get('stale', [])) | set(status.get('missing', []))),
+        'is_stale': bool(error or status.get('stale') or status.get('missing')),
+        'recomputing': recomputing,
+        'error': error,
+    }
@@ -107,6 +107,36 @@ CREATE TABLE alerts (
     created_at TIMESTAMP DEFAULT NOW()
 );
 
+-- Tabel: Agregat flow broker harian (materialized dari broker_summary, di-refresh saat import)
+-- Split foreign/bumn/local mengikuti app/broker_config.py
+CREATE TABLE broker_flow_daily (
+    stock_code VARCHAR(10) NOT NULL,
+    date DATE NOT NULL,
+    net_value NUMERIC(20,2) DEFAULT 0,
+    net_lot BIGINT DEFAULT 0,
+    buy_value NUMERIC(20,2) DEFAULT 0,
+    sell_value NUMERIC(20,2) DEFAULT 0,
+    buy_lot BIGINT DEFAULT 0,
+    sell_lot BIGINT DEFAULT 0,
+    net_buy_value NUMERIC(20,2) DEFAULT 0,   -- SUM(net_value) broker net buyer
+    net_sell_value NUMERIC(20,2) DEFAULT 0,  -- ABS(SUM(net_value)) broker net seller
+    net_buy_lot BIGINT DEFAULT 0,
+    net_sell_lot BIGINT DEFAULT 0,
+    buyer_count INTEGER DEFAULT 0,
+    seller_count INTEGER DEFAULT 0,
+    active_brokers INTEGER DEFAULT 0,
+    foreign_net_value NUMERIC(20,2) DEFAULT 0,
+    foreign_net_lot BIGINT DEFAULT 0,
+    foreign_buy_value NUMERIC(20,2) DEFAULT 0,
+    foreign_sell_value NUMERIC(20,2) DEFAULT 0,
+    bumn_net_value NUMERIC(20,2) DEFAULT 0,
+    bumn_net_lot BIGINT DEFAULT 0,
+    local_net_value NUMERIC(20,2) DEFAULT 0,
+    local_net_lot BIGINT DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (stock_code, date)
+);
+
 -- Index untuk performa query
 CREATE INDEX idx_stock_daily_date ON stock_daily(stock_code, date);
 CREATE INDEX idx_broker_summary_date ON broker_summary(stock_code, date);
@@ -0,0 +1,23 @@
+"""DDL broker_flow_daily dicek per database, bukan sekali per proses"""
+import broker_flow
+
+
+class FakeCursor:
+    def __init__(self, dsn):
+        self.connection = type('Conn', (), {'dsn': dsn})()
+        self.executed = []
+
+    def execute(self, query, params=None):
+        self.executed.append(query)
+
+
+def test_each_database_gets_the_table(monkeypatch):
+    monkeypatch.setattr(broker_flow, '_ready_databases', set())
+    local = FakeCursor('dbname=stock_analysis host=localhost')
+    railway = FakeCursor('dbname=railway host=proxy.rlwy.net')
+
+    assert broker_flow.ensure_broker_flow_table(local)
+    assert broker_flow.ensure_broker_flow_table(railway)
+    assert broker_flow.ensure_broker_flow_table(local)
+    assert local.executed == [broker_flow.FLOW_TABLE_DDL]
+    assert railway.executed == [broker_flow.FLOW_TABLE_DDL]
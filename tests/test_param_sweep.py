@@ -0,0 +1,61 @@
+"""Setiap axis SWEEP_GRID harus benar-benar mengubah hasil run_backtest"""
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from backtest_v11b1_universal import run_backtest, V11B1_PARAMS
+from param_sweep import SWEEP_GRID, MA_KEYS, get_base_params, split_params
+
+STOCK = 'BBCA'
+SEEDS = range(8)
+
+
+def synthetic_ohlcv(seed, bars=600, start_price=7400.0):
+    """Random walk melewati zona BBCA dengan lonjakan volume acak"""
+    rng = random.Random(seed)
+    rows = []
+    price = start_price
+    day = date(2024, 1, 1)
+    for _ in range(bars):
+        open_ = price
+        close = max(6500, min(10800, price * (1 + rng.gauss(0.0008, 0.02))))
+        rows.append({
+            'date': day,
+            'open': open_,
+            'high': max(open_, close) * (1 + abs(rng.gauss(0, 0.008))),
+            'low': min(open_, close) * (1 - abs(rng.gauss(0, 0.008))),
+            'close': close,
+            'volume': rng.uniform(5e6, 1.5e7) * rng.choice([1, 1, 1, 2.5]),
+        })
+        price = close
+        day += timedelta(days=1)
+    return rows
+
+
+def trade_signature(data, combo, formula):
+    _, v11b1_base = get_base_params(STOCK, formula)
+    params, v11b1_params = split_params(combo, v11b1_base)
+    result = run_backtest(STOCK, params, v11b1_params, start_date='2024-01-01', data=data)
+    return [(t['entry_date'], t['exit_date'], round(t['pnl'], 4)) for t in result['trades']]
+
+
+def test_v11b1_keys_routed_to_v11b1_params():
+    combo = {key: values[0] for key, values in SWEEP_GRID.items()}
+    for formula in ('V11b1', 'V11b2'):
+        _, v11b1_base = get_base_params(STOCK, formula)
+        _, v11b1_params = split_params(combo, v11b1_base)
+        for key in V11B1_PARAMS:
+            if key in combo:
+                assert v11b1_params[key] == combo[key]
+
+
+@pytest.mark.parametrize('axis', list(SWEEP_GRID))
+def test_each_axis_changes_result(axis):
+    values = SWEEP_GRID[axis]
+    formula = 'V11b2' if axis in MA_KEYS else 'V11b1'
+    changed = any(
+        trade_signature(data, {axis: min(values)}, formula) != trade_signature(data, {axis: max(values)}, formula)
+        for data in (synthetic_ohlcv(seed) for seed in SEEDS)
+    )
+    assert changed, f"{axis} tidak mengubah trade untuk seed {list(SEEDS)}"
@@ -0,0 +1,42 @@
+"""Tag stock: hanya dari parameter di posisi kolom stock_code"""
+from database import QueryCache, extract_stock_codes
+
+
+def test_filter_placeholder_is_stock():
+    query = "SELECT * FROM stock_daily WHERE stock_code = %s AND date >= %s"
+    assert extract_stock_codes(query, ('BBCA', '2026-01-01')) == {'BBCA'}
+
+
+def test_other_four_letter_params_are_not_stocks():
+    query = "SELECT * FROM v11b1_results WHERE action = %s AND sector = %s"
+    assert extract_stock_codes(query, ('SELL', 'BUMN')) == set()
+    query = "SELECT * FROM signals WHERE signal = %s AND stock_code = %s"
+    assert extract_stock_codes(query, ('HOLD', 'BBRI')) == {'BBRI'}
+
+
+def test_any_in_and_named_placeholders():
+    assert extract_stock_codes("SELECT * FROM stock_daily s WHERE s.stock_code = ANY(%s)",
+                               (['BBCA', 'TLKM'],)) == {'BBCA', 'TLKM'}
+    assert extract_stock_codes("SELECT * FROM stock_daily WHERE stock_code IN (%s, %s) AND flag = %s",
+                               ('BBCA', 'BMRI', 'HOLD')) == {'BBCA', 'BMRI'}
+    assert extract_stock_codes("SELECT * FROM stock_daily WHERE note LIKE '5%%' AND stock_code = %(code)s",
+                               {'code': 'ASII', 'other': 'SELL'}) == {'ASII'}
+
+
+def test_insert_column_position():
+    query = """
+        INSERT INTO forum_threads (title, stock_code, created_at, flag)
+        VALUES (%s, %s, COALESCE(%s, NOW()), %s)
+    """
+    assert extract_stock_codes(query, ('HOLD', 'BBCA', None, 'SELL')) == {'BBCA'}
+    query = "INSERT INTO forum_threads (title, flag) VALUES (%s, %s)"
+    assert extract_stock_codes(query, ('BBCA', 'SELL')) == set()
+
+
+def test_cross_stock_aggregate_invalidated_on_import():
+    cache = QueryCache()
+    aggregate = "SELECT action, COUNT(*) FROM stock_daily WHERE action = %s GROUP BY action"
+    cache.set(aggregate, ('SELL',), [{'count': 3}])
+    assert QueryCache.make_tags(aggregate, ('SELL',)) == {'table:stock_daily'}
+    assert cache.invalidate_stock('BBCA', ['stock_daily']) == 1
+    assert cache.get(aggregate, ('SELL',)) is None
@@ -0,0 +1,88 @@
+"""Snapshot basi harus terdeteksi walau jumlah baris & tanggal terakhir sama"""
+import pytest
+
+import snapshot_store
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot_store, 'SNAPSHOT_DIR', str(tmp_path))
+    return tmp_path
+
+
+def write_snapshot(stamp):
+    arrays = snapshot_store._rows_to_arrays([
+        {'date': '2026-10-14', 'open_price': 100, 'high_price': 110, 'low_price': 95,
+         'close_price': 105, 'volume': 1000, 'value': 105000, 'net_foreign': 0},
+        {'date': '2026-10-15', 'open_price': 105, 'high_price': 112, 'low_price': 101,
+         'close_price': 108, 'volume': 1200, 'value': 129600, 'net_foreign': 50},
+    ], snapshot_store.SNAPSHOT_TABLES['stock_daily']['columns'])
+    snapshot_store._write_arrays('BBCA', 'stock_daily', arrays, stamp)
+    return snapshot_store.read_meta('BBCA', 'stock_daily')
+
+
+def test_same_stamp_is_fresh(snapshot_dir):
+    stamp = {'rows': 2, 'last_date': '2026-10-15', 'version': 3, 'tail_hash': 'abc'}
+    meta = write_snapshot(stamp)
+    assert snapshot_store.is_stamp_fresh(meta, stamp)
+
+
+@pytest.mark.parametrize('field, value', [
+    ('version', 4),          # re-import dari mesin lain (upload_to_web) bump watermark
+    ('tail_hash', 'final'),  # nilai final menimpa intraday di tanggal yang sama
+])
+def test_same_rows_and_date_but_changed_content_is_stale(snapshot_dir, field, value):
+    stamp = {'rows': 2, 'last_date': '2026-10-15', 'version': 3, 'tail_hash': 'abc'}
+    meta = write_snapshot(stamp)
+    assert not snapshot_store.is_stamp_fresh(meta, dict(stamp, **{field: value}))
+
+
+def test_meta_without_stamp_is_stale(snapshot_dir):
+    meta = write_snapshot(None)
+    assert meta['rows'] == 2 and meta['last_date'] == '2026-10-15'
+    assert not snapshot_store.is_stamp_fresh(
+        meta, {'rows': 2, 'last_date': '2026-10-15', 'version': 0, 'tail_hash': 'abc'})
+    assert not snapshot_store.is_stamp_fresh(None, {'rows': 0})
+
+
+def test_failed_build_keeps_previous_snapshot(snapshot_dir, monkeypatch):
+    stamp = {'rows': 2, 'last_date': '2026-10-15', 'version': 3, 'tail_hash': 'abc'}
+    meta = write_snapshot(stamp)
+
+    def crash(*args, **kwargs):
+        raise OSError('disk full')
+    monkeypatch.setattr(snapshot_store.np, 'save', crash)
+    with pytest.raises(OSError):
+        write_snapshot(dict(stamp, version=4))
+
+    assert snapshot_store.read_meta('BBCA', 'stock_daily') == meta
+    arrays = snapshot_store.load_arrays('BBCA', 'stock_daily')
+    assert arrays is not None and len(arrays['date']) == 2
+
+
+def test_old_builds_are_removed(snapshot_dir, monkeypatch):
+    monkeypatch.setattr(snapshot_store, 'SNAPSHOT_GC_SECONDS', -1)
+    builds = [write_snapshot(None)['build'] for _ in range(3)]
+    table_dir = snapshot_dir / 'BBCA' / 'stock_daily'
+    # build aktif + satu generasi sebelumnya
+    assert sorted(p.name for p in table_dir.iterdir() if p.is_dir()) == sorted(builds[1:])
+
+
+def test_stamp_check_is_cached(snapshot_dir, monkeypatch):
+    stamp = {'rows': 2, 'last_date': '2026-10-15', 'version': 3, 'tail_hash': 'abc'}
+    write_snapshot(stamp)
+    calls = []
+
+    def fake_stamp(stock_code, table, conn=None):
+        calls.append(stock_code)
+        return stamp
+    monkeypatch.setattr(snapshot_store, 'get_db_stamp', fake_stamp)
+    monkeypatch.setattr(snapshot_store, '_stamp_checked', {})
+
+    for _ in range(3):
+        assert snapshot_store.get_fresh_arrays('BBCA', 'stock_daily') is not None
+    assert calls == ['BBCA']
+
+    monkeypatch.setattr(snapshot_store, 'SNAPSHOT_STAMP_TTL', -1)
+    snapshot_store.get_fresh_arrays('BBCA', 'stock_daily')
+    assert calls == ['BBCA', 'BBCA']
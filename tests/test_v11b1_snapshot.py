@@ -0,0 +1,44 @@
+"""Status precomputed V11b1: basi berdasarkan watermark data, bukan calc_date"""
+from contextlib import contextmanager
+from datetime import date
+
+import calculate_daily_v11b1
+import v11b1_snapshot
+
+
+@contextmanager
+def fake_connection():
+    yield None
+
+
+def test_stale_follows_data_watermark(monkeypatch):
+    today = date(2026, 10, 16)
+    current = {
+        'BBCA': '3:2026-10-15:900:cfg',   # sama dengan hasil -> fresh
+        'BBRI': '4:2026-10-15:900:cfg',   # re-import tanggal yang sama (version naik)
+        'TLKM': '1:2026-10-15:900:cfg',   # belum punya hasil
+        'GOTO': '2:2026-10-15:900:cfg',   # error tercatat di watermark ini -> selesai
+        'ANTM': '5:2026-10-15:900:cfg',   # error di watermark lama -> coba lagi
+    }
+    results = [
+        {'stock_code': 'BBCA', 'calc_date': today, 'calc_timestamp': None,
+         'data_watermark': current['BBCA'], 'has_error': False},
+        # calc_date hari ini (>= tanggal data) tapi datanya sudah berubah
+        {'stock_code': 'BBRI', 'calc_date': today, 'calc_timestamp': None,
+         'data_watermark': '3:2026-10-15:900:cfg', 'has_error': False},
+        {'stock_code': 'GOTO', 'calc_date': date(2026, 10, 17), 'calc_timestamp': None,
+         'data_watermark': current['GOTO'], 'has_error': True},
+        {'stock_code': 'ANTM', 'calc_date': today, 'calc_timestamp': None,
+         'data_watermark': '4:2026-10-14:899:cfg', 'has_error': True},
+    ]
+    monkeypatch.setattr(v11b1_snapshot, '_stock_codes', sorted(current))
+    monkeypatch.setattr(v11b1_snapshot, 'get_connection', fake_connection)
+    monkeypatch.setattr(calculate_daily_v11b1, 'get_data_watermarks', lambda conn, codes: dict(current))
+    monkeypatch.setattr(v11b1_snapshot, 'execute_query', lambda *args, **kwargs: results)
+
+    status = v11b1_snapshot.get_precomputed_status()
+    assert sorted(status['stale']) == ['ANTM', 'BBRI']
+    assert status['missing'] == ['TLKM']
+    assert status['stock_count'] == 5
+    # tanggal hasil error tidak dihitung sebagai tanggal data yang disajikan
+    assert status['as_of'] == today
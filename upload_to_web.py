@@ -6,7 +6,7 @@ Tool untuk upload data Excel ke website www.hermanstock.com
 Fitur:
 - Upload single file atau batch (semua file)
 - Sync ke lokal dan Railway (production) database
-- Support daily update (hanya update data baru)
+- Support daily update (diff import: hanya tanggal baru / berubah yang ditulis)
 
 Jalankan: python upload_to_web.py
 """
@@ -14,11 +14,21 @@ Jalankan: python upload_to_web.py
 import os
 import sys
 import psycopg2
-from psycopg2.extras import execute_batch, RealDictCursor
+from psycopg2.extras import RealDictCursor
 import pandas as pd
 from datetime import datetime
 import re
 
+# Bulk COPY importer (sama dengan import di app/parser.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+from bulk_import import (
+    PRICE_COLUMNS, PRICE_KEY, BROKER_COLUMNS, BROKER_KEY,
+    price_records, broker_records, diff_upsert, format_diff_report
+)
+from broker_sheet import parse_broker_rows_vectorized
+from broker_flow import refresh_broker_flow
+from data_version import bump_data_version_in_transaction
+
 # ============================================================
 # KONFIGURASI
 # ============================================================
@@ -128,6 +138,11 @@ def parse_change_string(change_str):
     except:
         return 0.0, 0.0
 
+def separator_year(month: int) -> int:
+    """Tahun untuk tanggal separator "30 des": bulan setelah bulan ini = tahun lalu"""
+    now = datetime.now()
+    return now.year - 1 if month > now.month else now.year
+
 def read_excel_data(file_path: str):
     """Baca file Excel dan return dataframe untuk broker summary dan price data"""
     print(f"  Reading: {os.path.basename(file_path)}")
@@ -145,85 +160,14 @@ def read_excel_data(file_path: str):
         price_df = price_df[price_df['date'] != 'Date']
 
     # ===== PARSE BROKER SUMMARY DATA (Kolom A-H, index 0-7) =====
-    broker_data = []
-    current_date = None
-
-    month_map = {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'mei': 5, 'jun': 6,
-                'jul': 7, 'agu': 8, 'sep': 9, 'okt': 10, 'nov': 11, 'des': 12}
-
-    for idx, row in df.iterrows():
-        col0 = row[0]
-        col4 = row[4] if len(row) > 4 else None
-
-        if pd.notna(col0):
-            if isinstance(col0, datetime):
-                current_date = col0.date()
-                continue
-
-            col0_str = str(col0).strip().lower()
-
-            if col0_str in ['buy', 'buy_val', '']:
-                continue
-
-            # Check if date row
-            date_match = re.search(r'(\d{1,2})\s*(jan|feb|mar|apr|mei|jun|jul|agu|sep|okt|nov|des)', col0_str, re.IGNORECASE)
-            if date_match and (len(row) < 2 or pd.isna(row[1])):
-                day = int(date_match.group(1))
-                month = month_map.get(date_match.group(2).lower(), 12)
-                year = datetime.now().year
-                if month > datetime.now().month:
-                    year -= 1
-                current_date = datetime(year, month, day).date()
-                continue
-
-            # Data row
-            if current_date and col0_str not in ['buy', '-', '']:
-                buy_broker = col0_str.upper()
-                buy_val = parse_value_string(row[1]) if len(row) > 1 else 0
-                buy_lot = parse_value_string(row[2]) if len(row) > 2 else 0
-                buy_avg = safe_float(row[3]) if len(row) > 3 else 0
-
-                if buy_broker and buy_broker != '-' and len(buy_broker) <= 4:
-                    broker_data.append({
-                        'date': current_date,
-                        'broker_code': buy_broker,
-                        'buy_value': buy_val,
-                        'buy_lot': int(buy_lot),
-                        'buy_avg': buy_avg,
-                        'sell_value': 0,
-                        'sell_lot': 0,
-                        'sell_avg': 0
-                    })
-
-        # Sell side
-        if current_date and pd.notna(col4):
-            col4_str = str(col4).strip().upper()
-            if col4_str not in ['SL', 'SELL', '-', ''] and len(col4_str) <= 4:
-                sell_broker = col4_str
-                sell_val = parse_value_string(row[5]) if len(row) > 5 else 0
-                sell_lot = parse_value_string(row[6]) if len(row) > 6 else 0
-                sell_avg = safe_float(row[7]) if len(row) > 7 else 0
-
-                found = False
-                for item in broker_data:
-                    if item['date'] == current_date and item['broker_code'] == sell_broker:
-                        item['sell_value'] = sell_val
-                        item['sell_lot'] = int(sell_lot)
-                        item['sell_avg'] = sell_avg
-                        found = True
-                        break
-
-                if not found:
-                    broker_data.append({
-                        'date': current_date,
-                        'broker_code': sell_broker,
-                        'buy_value': 0,
-                        'buy_lot': 0,
-                        'buy_avg': 0,
-                        'sell_value': sell_val,
-                        'sell_lot': int(sell_lot),
-                        'sell_avg': sell_avg
-                    })
+    # Buy & sell digabung per (tanggal, broker) - linear, lihat app/broker_sheet.py
+    broker_data = parse_broker_rows_vectorized(
+        df, parse_value_string, safe_float,
+        year_for_month=separator_year,
+        header_values=('buy', 'buy_val', ''),
+        iso_separator=False,
+        max_code_len=4,
+    )
 
     broker_df = pd.DataFrame(broker_data)
 
@@ -239,6 +183,7 @@ def import_to_database(conn, stock_code, broker_df, price_df, db_name=''):
 
     broker_count = 0
     price_count = 0
+    changed_from = []
 
     # Import broker data
     if not broker_df.empty:
@@ -258,27 +203,16 @@ def import_to_database(conn, stock_code, broker_df, price_df, db_name=''):
                 net_lot = EXCLUDED.net_lot
         """
 
-        batch_data = []
-        for _, row in broker_df.iterrows():
-            net_value = row['buy_value'] - row['sell_value']
-            net_lot = row['buy_lot'] - row['sell_lot']
-            batch_data.append((
-                stock_code,
-                row['date'],
-                row['broker_code'],
-                row['buy_value'],
-                row['buy_lot'],
-                row['buy_avg'],
-                row['sell_value'],
-                row['sell_lot'],
-                row['sell_avg'],
-                net_value,
-                net_lot
-            ))
-
         try:
-            execute_batch(cursor, insert_broker, batch_data, page_size=500)
-            broker_count = len(batch_data)
+            # Diff import: hanya tanggal baru / berubah (COPY + merge, fallback execute_batch)
+            report = diff_upsert(cursor, 'broker_summary', BROKER_COLUMNS, BROKER_KEY,
+                                 broker_records(broker_df, stock_code), insert_broker)
+            broker_count = report['rows']
+            print(f"    [{db_name}] broker: {format_diff_report(report)}")
+            if report['changed_dates']:
+                # Agregat harian ikut transaksi import yang sama
+                refresh_broker_flow(stock_code, since=report['first_changed'], cursor=cursor)
+                changed_from.append(report['first_changed'])
         except Exception as e:
             print(f"    [ERROR] Broker import to {db_name}: {e}")
 
@@ -306,37 +240,22 @@ def import_to_database(conn, stock_code, broker_df, price_df, db_name=''):
                 change_percent = EXCLUDED.change_percent
         """
 
-        for _, row in price_df.iterrows():
-            try:
-                if isinstance(row['date'], datetime):
-                    date = row['date'].date()
-                elif isinstance(row['date'], str):
-                    date = datetime.strptime(row['date'], '%Y-%m-%d').date()
-                else:
-                    date = pd.to_datetime(row['date']).date()
-
-                change_val, change_pct = parse_change_string(row['change'])
-
-                cursor.execute(insert_price, (
-                    stock_code,
-                    date,
-                    float(row['open']) if pd.notna(row['open']) else None,
-                    float(row['high']) if pd.notna(row['high']) else None,
-                    float(row['low']) if pd.notna(row['low']) else None,
-                    float(row['close']) if pd.notna(row['close']) else None,
-                    float(row['avg']) if pd.notna(row['avg']) else None,
-                    int(parse_value_string(row['volume'])),
-                    parse_value_string(row['value']),
-                    int(parse_value_string(row['freq'])),
-                    parse_value_string(row['f_buy']),
-                    parse_value_string(row['f_sell']),
-                    parse_value_string(row['n_foreign']),
-                    change_val,
-                    change_pct
-                ))
-                price_count += 1
-            except Exception as e:
-                pass
+        try:
+            # Diff import: hanya tanggal baru / berubah (COPY + merge, fallback row insert)
+            records = price_records(price_df, stock_code, parse_value_string, parse_change_string)
+            report = diff_upsert(cursor, 'stock_daily', PRICE_COLUMNS, PRICE_KEY, records, insert_price)
+            price_count = report['rows']
+            print(f"    [{db_name}] price: {format_diff_report(report)}")
+            if report['changed_dates']:
+                changed_from.append(report['first_changed'])
+        except Exception as e:
+            print(f"    [ERROR] Price import to {db_name}: {e}")
+
+    if changed_from:
+        # Watermark ikut transaksi import: dashboard (snapshot, cache) tahu data berubah
+        # walau tanggal terakhir & jumlah baris sama (mis. nilai final menimpa intraday)
+        bump_data_version_in_transaction(cursor, stock_code, source='upload_to_web',
+                                         changed_from=min(changed_from))
 
     conn.commit()
     cursor.close()